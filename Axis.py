@@ -0,0 +1,208 @@
+"""
+Axis keeps an x-axis together with facts about it that are expensive to recompute: the minimum and maximum, the sort direction, whether the step is uniform, and a hash of the content.
+
+The facts are calculated the first time they are needed and then kept. Cropping, binning, interpolation and comparisons use them to avoid scanning the whole array: on a sorted axis, a range is found with a binary search (`numpy.searchsorted`) instead of a comparison of every element.
+
+An Axis is not a subclass of ndarray. LinearSpectrum.x is still an ndarray, and LinearSpectrum.axis is the Axis for it. Assigning to LinearSpectrum.x (also an Axis) replaces the Axis. The facts are not updated if the values are changed in place (for example `A.x[0] = 1`); assign the axis again after such a change (`A.x = A.x`).
+
+Example
+-------
+::
+
+    axis = Axis(numpy.linspace(2000, 2100, 10001))
+    axis.direction
+    >>> 1
+    axis.step
+    >>> 0.01
+    A.x = axis
+    B.x = axis   # A and B share the axis and its facts
+
+"""
+
+import hashlib
+import weakref
+
+import numpy
+
+# a step is uniform if all steps are within STEP_RTOL of the first step
+STEP_RTOL = 1e-6
+
+
+
+class Axis(object):
+    """
+    An x-axis with cached facts.
+
+    Attributes
+    ----------
+    values : ndarray
+        The x-axis.
+
+    """
+
+    def __init__(self, values, verbose = 0):
+        """
+
+        Arguments
+        ---------
+        values : array-like
+            The x-axis, 1 dimensional.
+
+        """
+        self.verbose = verbose
+        if self.verbose > 1:
+            print("SpectraTools.Axis.__init__()")
+
+        if isinstance(values, Axis):
+            values = values.values
+        self.values = numpy.asanyarray(values)
+        self._cache = {}
+        # the results of equals() with other axes, see `equals`
+        self._equal = weakref.WeakKeyDictionary()
+
+
+    def __len__(self):
+        return len(self.values)
+
+    def __array__(self, dtype = None, copy = None):
+        if dtype is None:
+            return self.values
+        return self.values.astype(dtype)
+
+    def _cached(self, key, function):
+        if key not in self._cache:
+            self._cache[key] = function()
+        return self._cache[key]
+
+
+    @property
+    def min(self):
+        """
+        The minimum. For a sorted axis, this is the first or last element.
+        """
+        return self._cached("min", lambda: self.values[0] if self.direction == 1 else (self.values[-1] if self.direction == -1 else numpy.amin(self.values)))
+
+    @property
+    def max(self):
+        """
+        The maximum. For a sorted axis, this is the first or last element.
+        """
+        return self._cached("max", lambda: self.values[-1] if self.direction == 1 else (self.values[0] if self.direction == -1 else numpy.amax(self.values)))
+
+    @property
+    def direction(self):
+        """
+        1 if the axis is ascending, -1 if it is descending, 0 if it is not sorted (or has NaN). Equal neighbours are allowed. An axis with less than 2 elements is ascending.
+        """
+        return self._cached("direction", self._direction)
+
+    def _direction(self):
+        if len(self.values) < 2:
+            return 1
+        d = numpy.diff(self.values)
+        if numpy.all(d >= 0):
+            return 1
+        elif numpy.all(d <= 0):
+            return -1
+        return 0
+
+    @property
+    def is_sorted(self):
+        return self.direction != 0
+
+    @property
+    def step(self):
+        """
+        The step if the axis is uniform (all steps within `STEP_RTOL` of the first step, which is not 0), otherwise None.
+        """
+        return self._cached("step", self._step)
+
+    def _step(self):
+        if len(self.values) < 2 or self.direction == 0:
+            return None
+        d = numpy.diff(self.values)
+        if d[0] == 0 or numpy.any(numpy.abs(d - d[0]) > STEP_RTOL * abs(d[0])):
+            return None
+        return (self.values[-1] - self.values[0]) / (len(self.values) - 1)
+
+    @property
+    def hash(self):
+        """
+        A hash of the dtype, the shape and the content.
+        """
+        return self._cached("hash", self._hash)
+
+    def _hash(self):
+        h = hashlib.sha256("{:}{:}".format(self.values.dtype, self.values.shape).encode("utf-8"))
+        h.update(numpy.ascontiguousarray(self.values))
+        return h.hexdigest()
+
+
+    def equals(self, other):
+        """
+        Check if two axes have exactly the same values.
+
+        The check is done in order of cost: the same object, the lengths, the first and last elements, and only then all elements. As with `numpy.all(x1 == x2)`, NaN is not equal to NaN, but an array is always equal to itself.
+        
+        The result for another Axis is kept by both axes (with a weak reference, so that it does not keep the other axis alive). Spectra with different Axis objects for the same values are then compared in constant time after the first comparison. 
+
+        Arguments
+        ---------
+        other : Axis or array-like
+
+        Returns
+        -------
+        equal : bool
+
+        """
+        if other is self:
+            return True
+        if not isinstance(other, Axis):
+            return self._equals(Axis(other))
+        if other not in self._equal:
+            equal = self._equals(other)
+            self._equal[other] = equal
+            other._equal[self] = equal
+        return self._equal[other]
+
+    def _equals(self, other):
+        if other.values is self.values:
+            return True
+        if len(other) != len(self):
+            return False
+        if len(self) == 0:
+            return True
+        if self.values[0] != other.values[0] or self.values[-1] != other.values[-1]:
+            return False
+        return bool(numpy.all(self.values == other.values))
+
+
+    def crop_range(self, min_x = None, max_x = None):
+        """
+        The start and end index of the values in a range, for a sorted axis. The same conditions as `CommonFunctions.find_indices_for_cropping` are used: with min_x and max_x, `min_x <= x <= max_x`, with only min_x, `x > min_x`, with only max_x, `x < max_x`.
+
+        Returns
+        -------
+        start, end : int
+            `values[start:end]` are in the range. If `start == end`, no values are in the range.
+
+        """
+        if self.direction == 0:
+            raise ValueError("SpectraTools.Axis.crop_range(): the axis is not sorted")
+
+        if min_x is not None and max_x is not None:
+            if min_x > max_x:
+                min_x, max_x = max_x, min_x
+            sides = ("left", "right")
+        elif min_x is not None:
+            sides = ("right", None)
+        else:
+            sides = (None, "left")
+
+        x = self.values if self.direction == 1 else self.values[::-1]
+        a = 0 if min_x is None else int(numpy.searchsorted(x, min_x, side = sides[0]))
+        b = len(x) if max_x is None else int(numpy.searchsorted(x, max_x, side = sides[1]))
+        b = max(a, b)
+        if self.direction == -1:
+            a, b = len(x) - b, len(x) - a
+        return a, b
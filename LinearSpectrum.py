@@ -3,8 +3,10 @@ This is the main class for linear spectra.
 
 """
 
+import copy
 import importlib 
 import inspect
+import numbers
 import os
 import warnings
 
@@ -15,15 +17,31 @@ import matplotlib.pyplot as plt
 import PythonTools.ClassTools as CT
 import PythonTools.CommonFunctions as CF
 import PythonTools.Mathematics as MATH
+import SpectraTools.Axis as AX
 import SpectraTools.UnitConversion as UC
 import SpectraTools.Resources.CommonFunctions as ST_CF
 
 importlib.reload(CT)
 importlib.reload(CF)
 importlib.reload(MATH)
+importlib.reload(AX)
 importlib.reload(UC)
 importlib.reload(ST_CF)
 
+def _writable(target, *operands):
+    """
+    Check if the result of a ufunc on the operands can be written in `target`: `target` is a writable ndarray with the shape of the result. The type is checked by the ufunc: it raises a TypeError if the result can not be converted to the type of `target` (for example float to int, float64 to float32 is allowed).
+    """
+    if type(target) != numpy.ndarray or target.flags.writeable == False:
+        return False
+    try:
+        shape = numpy.broadcast_shapes(*[numpy.shape(o) for o in operands])
+    except ValueError:
+        return False
+    return shape == target.shape
+
+
+
 class LinearSpectrum(CT.ClassTools):
     """
     Class for linear spectra. Contains basic methods. Is usually subclassed. 
@@ -31,13 +49,17 @@ class LinearSpectrum(CT.ClassTools):
     Attributes
     ----------
     x : ndarray
-        The x-axis.
+        The x-axis. An Axis can be assigned, x is then its values. 
+    axis : SpectraTools.Axis.Axis
+        The x-axis with cached facts (minimum, maximum, sort direction, step and hash), see `SpectraTools.Axis`. It is replaced when x is assigned. 
     y : ndarray
         The values for x
     x_unit : str
         The unit of the x-axis
     y_unit : str
         The unit of the y-axis
+    dtype : str or None
+        The floating point type of y, see `SpectraTools.Resources.CommonFunctions.get_dtype`. If None, the default is used. 
        
     """      
 
@@ -54,6 +76,8 @@ class LinearSpectrum(CT.ClassTools):
             The unit of the x-axis
         y_unit : str
             The unit of the y-axis
+        dtype : str
+            'float64' or 'float32'. If not given, the default of `SpectraTools.Resources.CommonFunctions.set_dtype` is used. y is converted when it is set. 
         
         """      
         self.verbose = verbose
@@ -64,6 +88,8 @@ class LinearSpectrum(CT.ClassTools):
             for k, v in kwargs.items():
                 print("  {:} : {:}".format(k, v))
 
+        self.dtype = kwargs.get("dtype", None)
+        self._axis = None
         self.x = kwargs.get("x", None)
         self.x_unit = kwargs.get("x_unit", "")
         self.y = kwargs.get("y", None)
@@ -84,6 +110,8 @@ class LinearSpectrum(CT.ClassTools):
         """
         Compare this class with another class and warning for inconsistencies for merging. 
         
+        The x-axes are compared with `Axis.equals`: spectra with the same Axis are compatible without a comparison of the values, the result of a comparison of two different axes is remembered. 
+        
         Arguments
         ---------
         other_class : object
@@ -102,7 +130,7 @@ class LinearSpectrum(CT.ClassTools):
             raise ValueError("PAS.{:}(): A.y and/or B.y are None.".format(label))
             
         if label != "concatenate":
-            if numpy.all(self.x == other_class.x) == False:
+            if self.axis.equals(other_class.axis) == False:
                 raise ValueError("PAS.{:}(): A.x and B.x are not the same.".format(label))
             
         if self.x_unit != other_class.x_unit:
@@ -115,15 +143,61 @@ class LinearSpectrum(CT.ClassTools):
             warnings.warn("LinearSpectrum.{:}(): y_unit is not given.".format(label))
         
         
+    def _operand(self, new, label):
+        """
+        The y-values of the other operand of an arithmetic operation. Numbers and ndarrays are used as they are (normal numpy broadcasting rules apply). Other objects are compared with `object_comparison_tests` and their y is used.
+        """
+        if isinstance(new, numbers.Number) or isinstance(new, numpy.ndarray):
+            if self.y is None:
+                raise ValueError("LinearSpectrum.{:}(): A.y is None.".format(label))
+            return new
+
+        self.object_comparison_tests(new, label = label)
+        return new.y
+
+
+    def _arithmetic(self, new, ufunc, label, out = None):
+        """
+        Apply `ufunc` to A.y and the other operand.
+
+        If `out` is None, the result is a shallow copy of A (`copy.copy`) with the new y: the class and all other attributes (metadata) of A are kept, the other attributes are shared with A. 
+        
+        Otherwise the result is written in `out.y`, without making a new array if the shape and type of `out.y` allow it (see `_writable`), otherwise `out.y` is replaced. `out` gets the x-axis and units of A, other attributes of `out` are not changed. `out` can be A itself, this is used for the in-place operators. 
+        """
+        other = self._operand(new, label)
+
+        if out is None:
+            result = copy.copy(self)
+            result.y = ufunc(self.y, other)
+            return result
+
+        if out is not self:
+            if out.axis is not self.axis:
+                out.x = self.axis
+            out.x_unit = self.x_unit
+            out.y_unit = self.y_unit
+
+        if _writable(out.y, self.y, other):
+            try:
+                ufunc(self.y, other, out = out.y)
+                return out
+            except TypeError:
+                pass
+        out.y = ufunc(self.y, other)
+        return out
+
+        
     def __add__(self, new):
         """
         Make a new object C, with A.y and B.y added. Only works if A.x and B.x are **exactly** the same.
         The function checks if the x_unit and y_unit are the same for A and B and throws a warning if they are not. 
         
+        B can also be a number or an ndarray. C is a copy of A (the same class, with the same attributes), see `_arithmetic`. 
+        
         Arguments
         ---------
         self : object
-        new : object
+        new : object, number or ndarray
         
         Returns
         -------
@@ -133,12 +207,7 @@ class LinearSpectrum(CT.ClassTools):
         if self.verbose > 1:
             print("LinearSpectrum.__add__()")
         
-        self.object_comparison_tests(new, label = "__add__")
-
-        x = self.x
-        y = self.y + new.y
-        
-        return LinearSpectrum(x = x, y = y, x_unit = self.x_unit, y_unit = self.y_unit)
+        return self._arithmetic(new, numpy.add, "__add__")
 
         
     def __radd__(self, new):
@@ -156,10 +225,12 @@ class LinearSpectrum(CT.ClassTools):
         Make a new object C, with B.y subtracted from B.y. Only works if A.x and B.x are **exactly** the same.
         The function checks if the x_unit and y_unit are the same for A and B and throws a warning if they are not. 
         
+        B can also be a number or an ndarray. C is a copy of A (the same class, with the same attributes), see `_arithmetic`. 
+        
         Arguments
         ---------
         self : object
-        new : object
+        new : object, number or ndarray
         
         Returns
         -------
@@ -168,12 +239,28 @@ class LinearSpectrum(CT.ClassTools):
         """   
         if self.verbose > 1:
             print("LinearSpectrum.__sub__()")
-        self.object_comparison_tests(new, label = "__sub__")
 
-        x = self.x
-        y = self.y - new.y
-        
-        return LinearSpectrum(x = x, y = y, x_unit = self.x_unit, y_unit = self.y_unit)
+        return self._arithmetic(new, numpy.subtract, "__sub__")
+
+
+    def __mul__(self, new):
+        """
+        Make a new object C, with A.y multiplied with B.y. See `__add__`.
+        """
+        if self.verbose > 1:
+            print("LinearSpectrum.__mul__()")
+
+        return self._arithmetic(new, numpy.multiply, "__mul__")
+
+
+    def __rmul__(self, new):
+        """
+        Reverse multiply.
+        """
+        if self.verbose > 1:
+            print("LinearSpectrum.__rmul__()")
+
+        return self.__mul__(new)
 
         
     def __truediv__(self, new):
@@ -181,10 +268,12 @@ class LinearSpectrum(CT.ClassTools):
         Make a new object C, with A.y divided by B.y. Only works if A.x and B.x are **exactly** the same.
         The function checks if the x_unit and y_unit are the same for A and B and throws a warning if they are not. 
         
+        B can also be a number or an ndarray. C is a copy of A (the same class, with the same attributes), see `_arithmetic`. 
+        
         Arguments
         ---------
         self : object
-        new : object
+        new : object, number or ndarray
         
         Returns
         -------
@@ -193,13 +282,103 @@ class LinearSpectrum(CT.ClassTools):
         """
         if self.verbose > 1:
             print("LinearSpectrum.__truediv__()")    
-            
-        self.object_comparison_tests(new, label = "__truediv__")
 
-        x = self.x
-        y = self.y / new.y
-        
-        return LinearSpectrum(x = x, y = y, x_unit = self.x_unit, y_unit = self.y_unit)        
+        return self._arithmetic(new, numpy.true_divide, "__truediv__")
+
+
+    def __iadd__(self, new):
+        """
+        In-place add: `A += B`. A.y is changed in place if possible (see `_writable`), also for other objects that share A.y. If A.y is an integer array and B is not, a new array is made.
+        """
+        if self.verbose > 1:
+            print("LinearSpectrum.__iadd__()")
+
+        return self._arithmetic(new, numpy.add, "__iadd__", out = self)
+
+
+    def __isub__(self, new):
+        """
+        In-place subtract: `A -= B`. See `__iadd__`.
+        """
+        if self.verbose > 1:
+            print("LinearSpectrum.__isub__()")
+
+        return self._arithmetic(new, numpy.subtract, "__isub__", out = self)
+
+
+    def __imul__(self, new):
+        """
+        In-place multiply: `A *= B`. See `__iadd__`.
+        """
+        if self.verbose > 1:
+            print("LinearSpectrum.__imul__()")
+
+        return self._arithmetic(new, numpy.multiply, "__imul__", out = self)
+
+
+    def __itruediv__(self, new):
+        """
+        In-place divide: `A /= B`. See `__iadd__`.
+        """
+        if self.verbose > 1:
+            print("LinearSpectrum.__itruediv__()")
+
+        return self._arithmetic(new, numpy.true_divide, "__itruediv__", out = self)
+
+
+    def add(self, new, out = None):
+        """
+        A + B, with the result in `out`.
+
+        Arguments
+        ---------
+        new : object, number or ndarray
+            B
+
+        Keyword Arguments
+        -----------------
+        out : LinearSpectrum (None)
+            A spectrum for the result, for example made earlier with the same x-axis. `out.y` is used for the result if its shape and type allow it, otherwise a new array is made. If None, a new object is made, as with `A + B`.
+
+        Returns
+        -------
+        out : object
+
+        """
+        if self.verbose > 1:
+            print("LinearSpectrum.add()")
+
+        return self._arithmetic(new, numpy.add, "add", out = out)
+
+
+    def subtract(self, new, out = None):
+        """
+        A - B, with the result in `out`. See `add`.
+        """
+        if self.verbose > 1:
+            print("LinearSpectrum.subtract()")
+
+        return self._arithmetic(new, numpy.subtract, "subtract", out = out)
+
+
+    def multiply(self, new, out = None):
+        """
+        A * B, with the result in `out`. See `add`.
+        """
+        if self.verbose > 1:
+            print("LinearSpectrum.multiply()")
+
+        return self._arithmetic(new, numpy.multiply, "multiply", out = out)
+
+
+    def divide(self, new, out = None):
+        """
+        A / B, with the result in `out`. See `add`.
+        """
+        if self.verbose > 1:
+            print("LinearSpectrum.divide()")
+
+        return self._arithmetic(new, numpy.true_divide, "divide", out = out)
         
         
     def concatenate(self, new):
@@ -215,7 +394,7 @@ class LinearSpectrum(CT.ClassTools):
         x = numpy.concatenate((self.x, new.x))
         y = numpy.concatenate((self.y, new.y))
         
-        return LinearSpectrum(x = x, y = y, x_unit = self.x_unit, y_unit = self.y_unit)
+        return LinearSpectrum(x = x, y = y, x_unit = self.x_unit, y_unit = self.y_unit, dtype = self.dtype)
         
         
     @property
@@ -224,11 +403,30 @@ class LinearSpectrum(CT.ClassTools):
 
     @x.setter
     def x(self, value):
+        # the facts of the old axis are not valid anymore
+        if isinstance(value, AX.Axis):
+            self._axis = value
+            value = value.values
+        else:
+            self._axis = None
         self._x = value
 
     @x.deleter
     def x(self):
         self._x = None
+        self._axis = None
+
+    @property
+    def axis(self):
+        """
+        The Axis for x, made when it is used for the first time. None if x is None. 
+        """
+        x = self.x
+        if x is None:
+            return None
+        if self._axis is None or self._axis.values is not x:
+            self._axis = AX.Axis(x)
+        return self._axis
             
     @property
     def y(self):
@@ -236,7 +434,7 @@ class LinearSpectrum(CT.ClassTools):
 
     @y.setter
     def y(self, value):
-        self._y = value
+        self._y = ST_CF.as_dtype(value, self.dtype)
 
     @y.deleter
     def y(self):
@@ -293,7 +491,7 @@ class LinearSpectrum(CT.ClassTools):
         if self.verbose > 1:
             print("LinearSpectrum.make_new_x()")
         
-        return ST_CF.make_new_x(x_resolution = x_resolution, x = self.x, min_x = min_x, max_x = max_x, verbose = self.verbose)
+        return ST_CF.make_new_x(x_resolution = x_resolution, x = self.axis, min_x = min_x, max_x = max_x, verbose = self.verbose)
 
         
     def get_min_max_x(self, min_x = 1e9, max_x = -1e9):
@@ -317,7 +515,7 @@ class LinearSpectrum(CT.ClassTools):
         if self.verbose > 1:
             print("SpectraTools.LinearSpectrum.get_min_max_x()")    
         
-        return ST_CF.get_min_max_x(x = self.x, min_x = min_x, max_x = max_x, verbose = self.verbose)
+        return ST_CF.get_min_max_x(x = self.axis, min_x = min_x, max_x = max_x, verbose = self.verbose)
       
 
     def find_indices_for_cropping(self, min_x = None, max_x = None, x = None, pad = 5, crop_index = False, **kwargs):
@@ -353,12 +551,12 @@ class LinearSpectrum(CT.ClassTools):
                 warnings.warn("LinearSpectrum.find_indices_for_cropping(): no x data")
                 return None
             else:
-                x = self.x
+                x = self.axis
 
         return ST_CF.find_indices_for_cropping(x = x, min_x = min_x, max_x = max_x, pad = pad, crop_index = crop_index, verbose = self.verbose, **kwargs)
 
         
-    def bin_data_helper(self, new_x, y = None):
+    def bin_data_helper(self, new_x, y = None, resampler = None):
         """
         Take data and bin it. By default self.y is binned, unless y is given in the function parameters. 
         self.x and self.y are not changed in this function. 
@@ -368,6 +566,8 @@ class LinearSpectrum(CT.ClassTools):
         new_x : ndarray
         y : ndarray, optional 
             If not given, use self.y. y can be 1 dimension, or 2 dimensions (cols x data). 
+        resampler : SpectraTools.Resampler.Resampler, optional
+            If given, it is used instead of new_x. The mapping from x to new_x is then not calculated again. The x-axis of the resampler has to be self.x. 
         
         Returns
         -------
@@ -386,48 +586,66 @@ class LinearSpectrum(CT.ClassTools):
             else:
                 y = self.y[:]
 
-        return ST_CF.bin_data(x = self.x, new_x = new_x, y = y, verbose = self.verbose)
+        if resampler is not None:
+            return resampler.new_x, resampler.apply(y, x = self.axis, dtype = self.dtype)
 
+        return ST_CF.bin_data(x = self.axis, new_x = new_x, y = y, dtype = self.dtype, verbose = self.verbose)
 
-    def bin_data(self, new_x = None, x_resolution = None):    
+
+    def bin_data(self, new_x = None, x_resolution = None, resampler = None):    
         """
         This function provides the most basic binning functionality: self.y. In most cases this has to be sub-classed.  
         
+        For many spectra with the same x-axis, make a `SpectraTools.Resampler.Resampler` with method 'bin-mean' once and use it for all spectra (see `bin_data_helper`). 
+        
         """
         if self.verbose > 1:
             print("LinearSpectra.bin_data()")         
         
-        if new_x is None:
+        if new_x is None and resampler is None:
             if x_resolution is None:
                 return None
             else:
                 new_x = self.make_bins(x_resolution)
 
-        self.x, y = self.bin_data_helper(new_x, self.y)
+        self.x, y = self.bin_data_helper(new_x, self.y, resampler = resampler)
         
         self.y = y
 
 
-    def interpolate_data_helper(self, new_x = None, x_resolution = None):
+    def interpolate_data_helper(self, new_x = None, x_resolution = None, resampler = None):
         """
-         
-
+        Interpolate self.y on new_x. 
+        
+        If a `SpectraTools.Resampler.Resampler` is given, it is used instead of new_x. The interpolation weights are then not calculated again. The x-axis of the resampler has to be self.x. 
         
         """    
         if self.verbose > 1:
             print("LinearSpectra.interpolate_data_helper()") 
 
+        if resampler is not None:
+            return resampler.apply(self.y, x = self.axis, dtype = self.dtype)
+
         if new_x is None:
             if x_resolution is None:
                 return None
             else:
                 new_x = self.make_bins(x_resolution)            
-            
-        y = MATH.interpolate_data(self.x, self.y, new_x, interpolate_kind = "default", verbose = self.verbose)
+        
+        # for a sorted axis and new_x within its range, the linear interpolation does not need to sort x
+        axis = self.axis
+        new_x = numpy.asarray(new_x)
+        if axis.is_sorted and numpy.ndim(self.y) == 1 and len(new_x) > 0 and numpy.amin(new_x) >= axis.min and numpy.amax(new_x) <= axis.max:
+            if axis.direction == 1:
+                y = numpy.interp(new_x, axis.values, self.y)
+            else:
+                y = numpy.interp(new_x, axis.values[::-1], self.y[::-1])
+        else:
+            y = MATH.interpolate_data(self.x, self.y, new_x, interpolate_kind = "default", verbose = self.verbose)
         
         return y
         
-    def interpolate_data(self, new_x = None, x_resolution = None):
+    def interpolate_data(self, new_x = None, x_resolution = None, resampler = None):
         """
         Placeholder function.
        
@@ -435,14 +653,21 @@ class LinearSpectrum(CT.ClassTools):
         if self.verbose > 1:
             print("LinearSpectra.interpolate_data()")         
 
-        y = self.interpolate_data_helper(new_x = new_x, x_resolution = x_resolution)            
+        y = self.interpolate_data_helper(new_x = new_x, x_resolution = x_resolution, resampler = resampler)            
         
         return y
         
         
-    def crop_x(self, min_x = None, max_x = None, **kwargs):
+    def crop_x(self, min_x = None, max_x = None, copy = False, **kwargs):
         """
-        Wrapper around LinearSpectra.find_indices_for_cropping().
+        Crop x and y to the range min_x to max_x. See `SpectraTools.Resources.CommonFunctions.find_slice_for_cropping` for the arguments.
+        
+        For a sorted x-axis, x and y become views of the original arrays (the original arrays are not freed). For an unsorted x-axis, x and y are copies.
+        
+        Keyword Arguments
+        -----------------
+        copy : bool (False)
+            If True, x and y are always copies. Use this to free the memory of the original arrays, or if the original arrays will be changed. 
         
         """           
         if self.verbose > 1:
@@ -451,17 +676,22 @@ class LinearSpectrum(CT.ClassTools):
             print("kwargs:")  
             for k, v in kwargs.items():
                 print("  {:} : {:}".format(k, v))
-                
-        idx = self.find_indices_for_cropping(min_x, max_x, **kwargs)
+        
+        if self.x is None:
+            warnings.warn("LinearSpectrum.crop_x(): no x data")
+            return None
+        
+        idx = ST_CF.find_slice_for_cropping(self.axis, min_x = min_x, max_x = max_x, verbose = self.verbose, **kwargs)
 
         if idx is None:
             return None
         
-        if self.x is not None:
-            self.x = self.x[idx]
+        copy = copy and type(idx) == slice
+        
+        self.x = self.x[idx].copy() if copy else self.x[idx]
 
         if self.y is not None:
-            self.y = self.y[idx]            
+            self.y = self.y[idx].copy() if copy else self.y[idx]
    
 
     def calculate_signal(self):
@@ -8,7 +8,11 @@ import matplotlib
 import matplotlib.pyplot as plt
 
 import PythonTools.ClassTools as CT
+import SpectraTools.Axis as AX
 import SpectraTools.LinearSpectrum as LS
+import SpectraTools.Resampler as RS
+import SpectraTools.SpectrumStack as SS
+import SpectraTools.Resources.CommonFunctions as ST_CF
 
 flag_ST = True
 try:
@@ -26,6 +30,120 @@ if flag_ST:
     
 
 
+class VirtualBatch(LS.LinearSpectrum):
+    """
+    A batch that keeps references to its members. The data is only combined when x or y is accessed for the first time. After that, the combined data is kept. Use `invalidate()` if the members have changed. 
+    
+    Attributes
+    ----------
+    members : list with LinearSpectrum objects
+    sort, deduplicate, new_x : 
+        See SpectraTools.Resources.CommonFunctions.concatenate_data()
+    
+    """
+    
+    def __init__(self, members = None, sort = False, deduplicate = False, new_x = None, verbose = 0, **kwargs):
+        """
+        
+        Arguments
+        ---------
+        members : list with LinearSpectrum objects (None)
+            If None, the batch has no members. 
+        sort : bool (False)
+            Sort the combined data by x.
+        deduplicate : bool (False)
+            Merge data points with the same x. 
+        new_x : ndarray (optional)
+            Bin the combined data on this axis. 
+        
+        """
+        self.members = [] if members is None else list(members)
+        self.sort = sort
+        self.deduplicate = deduplicate
+        self.new_x = new_x
+        self._materialized = False
+        
+        LS.LinearSpectrum.__init__(self, verbose = verbose, **kwargs)
+        if self.verbose > 1:
+            print("SpectraTools.MultiLinearSpectra.VirtualBatch.__init__()")   
+        
+        
+    def materialize(self):
+        """
+        Combine the data of the members. 
+        """
+        if self.verbose > 1:
+            print("SpectraTools.MultiLinearSpectra.VirtualBatch.materialize()")   
+        
+        self._x, self._y = ST_CF.concatenate_data([m.x for m in self.members], [m.y for m in self.members], sort = self.sort, deduplicate = self.deduplicate, new_x = self.new_x, dtype = self.dtype, verbose = self.verbose)
+        self._materialized = True
+        
+        
+    def invalidate(self):
+        """
+        Discard the combined data. It will be combined again on the next access to x or y. 
+        """
+        self._x = None
+        self._y = None
+        self._materialized = False
+        
+        
+    def is_materialized(self):
+        return self._materialized
+        
+        
+    def __len__(self):
+        """
+        The number of data points, without combining the data. 
+        """
+        if self._materialized:
+            return len(self._x)
+        elif self.new_x is not None:
+            return len(self.new_x)
+        elif self.deduplicate and len(self.members) > 0:
+            return len(numpy.unique(numpy.concatenate([m.x for m in self.members])))
+        else:
+            return int(numpy.sum([len(m.x) for m in self.members]))
+        
+        
+    @property
+    def x(self):
+        if not self._materialized and len(self.members) > 0:
+            self.materialize()
+        return self._x
+
+    @x.setter
+    def x(self, value):
+        # setting the data explicitly replaces the virtual data
+        if isinstance(value, AX.Axis):
+            self._axis = value
+            value = value.values
+        self._x = value
+        if value is not None:
+            self._materialized = True
+
+    @x.deleter
+    def x(self):
+        self._x = None
+            
+    @property
+    def y(self):
+        if not self._materialized and len(self.members) > 0:
+            self.materialize()
+        return self._y
+
+    @y.setter
+    def y(self, value):
+        self._y = ST_CF.as_dtype(value, self.dtype)
+        if value is not None:
+            self._materialized = True
+
+    @y.deleter
+    def y(self):
+        self._y = None
+        
+        
+
 class MultiLinearSpectra(CT.ClassTools):
     """
     Class for working on a number of linear spectra.
@@ -312,6 +430,7 @@ class MultiLinearSpectra(CT.ClassTools):
         exclude : list with indices
             Objects not to be binned.
             
+        The mapping from the x-axis of an object to the bins is calculated once for every different x-axis (see `SpectraTools.Resampler.Resampler`), objects with the same x-axis use the same mapping. 
 
         Notes
         -----
@@ -324,10 +443,23 @@ class MultiLinearSpectra(CT.ClassTools):
     
         bins = self.mess[0]["object"].make_new_x(x_resolution = x_resolution, min_x = min_x, max_x = max_x) 
     
+        resamplers = []
         for m in range(len(self.mess)):
             if m not in exclude and self.mess[m]["class"] not in exclude:
-                if hasattr(self.mess[m]["object"], "bin_data"):
-                    self.mess[m]["object"].bin_data(bins)
+                obj = self.mess[m]["object"]
+                # subclasses that bin more than y do not accept a resampler
+                if isinstance(obj, LS.LinearSpectrum) and obj.x is not None and obj.y is not None and "resampler" in inspect.signature(obj.bin_data).parameters:
+                    resampler = None
+                    for r in resamplers:
+                        if r.matches(obj.axis):
+                            resampler = r
+                            break
+                    if resampler is None:
+                        resampler = RS.Resampler(obj.axis, bins, method = "bin-mean", verbose = self.verbose)
+                        resamplers.append(resampler)
+                    obj.bin_data(resampler = resampler)
+                elif hasattr(obj, "bin_data"):
+                    obj.bin_data(bins)
 
 
 
@@ -403,8 +535,11 @@ class MultiLinearSpectra(CT.ClassTools):
 
          
          
-    def make_batches(self, batches = [], batch_props = None, **kwargs):
+    def make_batches(self, batches = [], batch_props = None, sort = False, deduplicate = False, new_x = None, virtual = False, **kwargs):
         """
+        Combine the data of several objects into a batch. The batches are appended to mess, with class 'batch'. 
+        
+        The size of each batch is determined from the members, the data is written in place in a single array. See SpectraTools.Resources.CommonFunctions.concatenate_data().
          
         Arguments
         ---------
@@ -412,6 +547,14 @@ class MultiLinearSpectra(CT.ClassTools):
             A list with lists of batches. 
         batch_props : list 
             A list with kwargs for each batch
+        sort : bool (False)
+            Sort the data of a batch by x.
+        deduplicate : bool (False)
+            Merge data points with the same x (y is averaged). 
+        new_x : ndarray (optional)
+            Bin the data of a batch on this axis. 
+        virtual : bool (False)
+            If True, the batch is a VirtualBatch: it keeps references to the members and the data is combined when it is used for the first time. 
         
 
         Notes
@@ -429,7 +572,6 @@ class MultiLinearSpectra(CT.ClassTools):
         if len(batches) == 0:
             return None
         
-        batch = [{}] * len(batches)
         for b in range(len(batches)):
             batch = {}
             
@@ -439,23 +581,24 @@ class MultiLinearSpectra(CT.ClassTools):
             
             batch["index"] = b + n_mess
             batch["class"] = "batch"
-            batch["object"] = LS.LinearSpectrum(verbose = self.verbose)
             
-            batch["object"].x = numpy.array([])
-            batch["object"].y = numpy.array([])
+            members = [self.mess[m]["object"] for m in batches[b]]
+            
+            if virtual:
+                batch["object"] = VirtualBatch(members = members, sort = sort, deduplicate = deduplicate, new_x = new_x, verbose = self.verbose)
+            else:
+                batch["object"] = LS.LinearSpectrum(verbose = self.verbose)
+                batch["object"].x, batch["object"].y = ST_CF.concatenate_data([m.x for m in members], [m.y for m in members], sort = sort, deduplicate = deduplicate, new_x = new_x, verbose = self.verbose)
             
             x_unit = self.mess[0]["object"].x_unit
             y_unit = self.mess[0]["object"].y_unit
 
-            for m in batches[b]:
-                batch["object"].x = numpy.concatenate((batch["object"].x, self.mess[m]["object"].x), axis = 0)
-                batch["object"].y = numpy.concatenate((batch["object"].y, self.mess[m]["object"].y), axis = 0)
-                
-                if x_unit != self.mess[m]["object"].x_unit:
+            for m in members:
+                if x_unit != m.x_unit:
                     warnings.warn("MultiLinearSpectra.make_batches(): inconsistant x_unit")
                     x_unit = None
 
-                if y_unit != self.mess[m]["object"].y_unit:
+                if y_unit != m.y_unit:
                     warnings.warn("MultiLinearSpectra.make_batches(): inconsistant y_unit")
                     y_unit = None                    
                     
@@ -464,6 +607,47 @@ class MultiLinearSpectra(CT.ClassTools):
                 
             self.mess.append(batch)
 
+
+    def to_stack(self, exclude = [], **kwargs):
+        """
+        Make a SpectrumStack from the objects in mess. All objects need to have the same x-axis, use bin_data() first if that is not the case. Operations on the stack work on all spectra at once. 
+        
+        Arguments
+        ---------
+        exclude : list
+            Objects (indices or classes) not to be included in the stack.
+            
+        Returns
+        -------
+        stack : SpectrumStack
+        
+        """
+        if self.verbose > 1:
+            print("MultiLinearSpectra.to_stack()")  
+        
+        return SS.SpectrumStack.from_mess(self.mess, exclude = exclude, verbose = self.verbose)
+        
+        
+    def from_stack(self, stack, **kwargs):
+        """
+        Write the data of a SpectrumStack back to mess. Dictionaries that came from mess (see to_stack()) are updated, other spectra are appended to mess. 
+        
+        Arguments
+        ---------
+        stack : SpectrumStack
+        
+        """
+        if self.verbose > 1:
+            print("MultiLinearSpectra.from_stack()")  
+        
+        if getattr(self, "mess", None) is None:
+            self.mess = []
+        
+        for m in stack.to_mess():
+            if not any(m is n for n in self.mess):
+                m["index"] = len(self.mess)
+                self.mess.append(m)
+
         
         
         
@@ -0,0 +1,218 @@
+"""
+A Resampler maps data from one x-axis to another. The mapping (which points of the old axis contribute to which point of the new axis, and with which weight) is calculated once, and can then be applied to many spectra on the same x-axis.
+
+The methods are:
+
+- 'bin-mean': the mean of the values in each bin, new_x is the center of the bins (the same as `CommonFunctions.bin_data`). Empty bins are NaN.
+- 'linear': linear interpolation.
+- 'nearest': the value of the nearest point.
+- 'cubic': cubic interpolation through the 4 nearest points (Lagrange). This is local, it is not a spline.
+
+For the interpolation methods, the mapping is kept as an array with the indices in old_x and an array with the weights, both with shape (k, len(new_x)), with k 1 (nearest), 2 (linear) or 4 (cubic). For 'bin-mean', the indices in old_x are kept sorted by bin, with the start of every bin. The old x-axis does not need to be sorted.
+
+Example
+-------
+::
+
+    resampler = Resampler(x, new_x, method = "bin-mean")
+    for A in spectra:
+        A.bin_data(resampler = resampler)
+    # or for 2 dimensional y (spectra x data)
+    new_y = resampler.apply(y)
+
+"""
+
+import importlib
+
+import numpy
+
+import SpectraTools.Axis as AX
+import SpectraTools.Resources.CommonFunctions as ST_CF
+
+importlib.reload(AX)
+importlib.reload(ST_CF)
+
+METHODS = ["bin-mean", "linear", "nearest", "cubic"]
+
+
+
+class Resampler(object):
+    """
+    Map data from old_x to new_x.
+
+    Attributes
+    ----------
+    old_x : SpectraTools.Axis.Axis
+        The old x-axis.
+    new_x : ndarray
+        The new x-axis.
+    method : str
+        One of `METHODS`.
+    indices, weights : ndarray
+        For the interpolation methods: `new_y[j] = sum(weights[:,j] * y[indices[:,j]])`.
+    outside : ndarray
+        For the interpolation methods: True where new_x is outside old_x.
+    source, filled, starts, count : ndarray
+        For 'bin-mean': the indices in old_x sorted by bin, the non-empty bins, the start of every non-empty bin in source, and the number of values in every bin.
+
+    """
+
+    def __init__(self, old_x, new_x, method = "linear", fill_value = numpy.nan, verbose = 0):
+        """
+
+        Arguments
+        ---------
+        old_x : ndarray or Axis
+            The x-axis of the data.
+        new_x : ndarray
+            The new x-axis. For 'bin-mean', the center of the bins, with a constant step.
+
+        Keyword Arguments
+        -----------------
+        method : str {'bin-mean', 'linear', 'nearest', 'cubic'}
+            See the module documentation.
+        fill_value : number or None
+            For the interpolation methods, the value for new_x outside old_x. If None, the first or last interval is extrapolated (for 'nearest', the first or last value is used).
+
+        """
+        self.verbose = verbose
+        if self.verbose > 1:
+            print("SpectraTools.Resampler.__init__()")
+
+        if method not in METHODS:
+            raise ValueError("SpectraTools.Resampler.__init__(): '{:}' is not a valid method, use one of {:}".format(method, METHODS))
+
+        self.old_x = old_x if isinstance(old_x, AX.Axis) else AX.Axis(old_x)
+        self.new_x = numpy.asarray(new_x)
+        self.method = method
+        self.fill_value = fill_value
+
+        if method == "bin-mean":
+            self._init_bins()
+        else:
+            self._init_interpolation()
+
+
+    def _init_bins(self):
+        if len(self.new_x) < 2:
+            raise ValueError("SpectraTools.Resampler.__init__(): new_x needs at least 2 bins")
+
+        digitized = ST_CF.indices_for_binning(self.old_x, self.new_x)
+        source = numpy.where(digitized >= 0)[0]
+        target = digitized[source]
+        order = numpy.argsort(target, kind = "stable")
+        self.source = source[order]
+        self.count = numpy.bincount(target, minlength = len(self.new_x))
+        self.filled = numpy.where(self.count > 0)[0]
+        self.starts = numpy.concatenate(([0], numpy.cumsum(self.count[self.filled])[:-1])).astype(int)
+
+
+    def _init_interpolation(self):
+        x = self.old_x.values
+        n = len(x)
+        k = {"nearest": 1, "linear": 2, "cubic": 4}[self.method]
+        if n < k:
+            raise ValueError("SpectraTools.Resampler.__init__(): '{:}' needs at least {:d} points in old_x".format(self.method, k))
+
+        # positions in the sorted axis, order maps them back to old_x
+        if self.old_x.direction == 1:
+            order = numpy.arange(n)
+        elif self.old_x.direction == -1:
+            order = numpy.arange(n)[::-1]
+        else:
+            order = numpy.argsort(x, kind = "stable")
+        xs = x[order]
+        new_x = self.new_x.astype(float)
+
+        if self.method == "nearest":
+            if n == 1:
+                idx = numpy.zeros((1, len(new_x)), dtype = int)
+            else:
+                right = numpy.clip(numpy.searchsorted(xs, new_x), 1, n - 1)
+                left = right - 1
+                idx = numpy.where(new_x - xs[left] <= xs[right] - new_x, left, right)[numpy.newaxis, :]
+            weights = numpy.ones(idx.shape)
+
+        elif self.method == "linear":
+            left = numpy.clip(numpy.searchsorted(xs, new_x, side = "right") - 1, 0, n - 2)
+            dx = xs[left + 1] - xs[left]
+            with numpy.errstate(invalid = "ignore", divide = "ignore"):
+                t = numpy.where(dx > 0, (new_x - xs[left]) / dx, 0.0)
+            idx = numpy.vstack((left, left + 1))
+            weights = numpy.vstack((1 - t, t))
+
+        else:
+            if numpy.any(numpy.diff(xs) == 0):
+                raise ValueError("SpectraTools.Resampler.__init__(): 'cubic' needs old_x without duplicate values")
+            left = numpy.clip(numpy.searchsorted(xs, new_x, side = "right") - 1, 0, n - 2)
+            start = numpy.clip(left - 1, 0, n - 4)
+            idx = start + numpy.arange(4)[:, numpy.newaxis]
+            nodes = xs[idx]
+            weights = numpy.ones(idx.shape)
+            for m in range(4):
+                for l in range(4):
+                    if l != m:
+                        weights[m] *= (new_x - nodes[l]) / (nodes[m] - nodes[l])
+
+        # a point with weight 0 uses the index of the point with the largest weight, so that NaN in a point that does not contribute does not give NaN
+        main = idx[numpy.argmax(numpy.abs(weights), axis = 0), numpy.arange(len(new_x))]
+        idx = numpy.where(weights == 0, main, idx)
+
+        self.indices = order[idx]
+        self.weights = weights
+        self.outside = numpy.logical_or.reduce((new_x < xs[0], new_x > xs[-1], numpy.isnan(new_x)))
+
+
+    def matches(self, x):
+        """
+        Check if x is the old x-axis, with `Axis.equals`.
+        """
+        return self.old_x.equals(x)
+
+
+    def apply(self, y, x = None, dtype = None):
+        """
+        Map y from old_x to new_x.
+
+        Arguments
+        ---------
+        y : ndarray
+            1 dimensional, or 2 dimensional (spectra x data). The last axis has the length of old_x.
+
+        Keyword Arguments
+        -----------------
+        x : ndarray or Axis (None)
+            The x-axis of y. If given, it is checked that it is old_x.
+        dtype : str (None)
+            The dtype of new_y, see `CommonFunctions.get_dtype`. The calculation is done in float64.
+
+        Returns
+        -------
+        new_y : ndarray
+            The same dimensions as y, the last axis has the length of new_x.
+
+        """
+        if self.verbose > 1:
+            print("SpectraTools.Resampler.apply()")
+
+        if x is not None and self.matches(x) == False:
+            raise ValueError("SpectraTools.Resampler.apply(): x is not the x-axis of the resampler")
+        y = numpy.asarray(y)
+        if numpy.shape(y)[-1] != len(self.old_x):
+            raise ValueError("SpectraTools.Resampler.apply(): y has {:d} points, old_x has {:d}".format(numpy.shape(y)[-1], len(self.old_x)))
+
+        if self.method == "bin-mean":
+            new_y = numpy.full(numpy.shape(y)[:-1] + (len(self.new_x),), numpy.nan)
+            if len(self.filled) > 0:
+                summed = numpy.add.reduceat(y[..., self.source], self.starts, axis = -1, dtype = float)
+                new_y[..., self.filled] = summed / self.count[self.filled]
+        else:
+            new_y = numpy.zeros(numpy.shape(y)[:-1] + (len(self.new_x),))
+            for k in range(len(self.indices)):
+                new_y += y[..., self.indices[k]] * self.weights[k]
+            if self.fill_value is not None:
+                new_y[..., self.outside] = self.fill_value
+
+        return ST_CF.as_dtype(new_y, dtype)
+
+    __call__ = apply
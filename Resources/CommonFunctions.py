@@ -2,6 +2,74 @@ import warnings
 
 import numpy
 
+import SpectraTools.Axis as AX
+
+# the floating point types for the data (y), see `get_dtype`
+DTYPES = ["float64", "float32"]
+
+# the default dtype of the data, change it with `set_dtype`. None keeps the dtype of the data. The modules reload this module when they are imported, the default is kept when that happens.
+DTYPE = globals().get("DTYPE", {"default": None})
+
+
+
+def get_dtype(dtype = None):
+    """
+    The floating point type for the data.
+    
+    Arguments
+    ---------
+    dtype : str, numpy.dtype or None
+        'float64' or 'float32'. If None, the default (see `set_dtype`) is used.
+    
+    Returns
+    -------
+    dtype : numpy.dtype or None
+        None if the dtype of the data should not be changed. 
+    
+    """
+    if dtype is None:
+        dtype = DTYPE["default"]
+    if dtype is None:
+        return None
+    dtype = numpy.dtype(dtype)
+    if dtype.name not in DTYPES:
+        raise ValueError("SpectraTools.Resources.CommonFunctions.get_dtype(): '{:}' is not a valid dtype, use one of {:}".format(dtype, DTYPES))
+    return dtype
+    
+    
+    
+def set_dtype(dtype):
+    """
+    Set the default floating point type for the data, for example 'float32' to halve the memory and the memory bandwidth. 
+    
+    With float32, the data (y) of spectra, stacks and binned data is stored in float32. Accumulations (the sums for binning, the absorption coefficients) are still done in float64 and the result is converted. The x-axis is not converted: with 7 significant digits, float32 is not precise enough for wavenumbers with small steps.
+    
+    Arguments
+    ---------
+    dtype : str, numpy.dtype or None
+        'float64', 'float32' or None (keep the dtype of the data).
+    
+    Returns
+    -------
+    previous : numpy.dtype or None
+        The previous default, to restore it.
+    
+    """
+    previous = DTYPE["default"]
+    DTYPE["default"] = None if dtype is None else get_dtype(dtype)
+    return previous
+
+
+
+def as_dtype(y, dtype = None):
+    """
+    Convert floating point data to the dtype (see `get_dtype`). Other data (integers, lists, None) and memory-mapped arrays (converting them would read the whole file) are returned unchanged. If the dtype is already correct, no copy is made.
+    """
+    dtype = get_dtype(dtype)
+    if dtype is None or type(y) != numpy.ndarray or y.dtype.kind != "f" or y.dtype == dtype:
+        return y
+    return y.astype(dtype)
+
 
 
 def indices_for_binning(x, new_x):
@@ -12,8 +80,8 @@ def indices_for_binning(x, new_x):
     
     Arguments
     ---------
-    x : ndarray
-        the old x-axis
+    x : ndarray or Axis
+        the old x-axis. If it is a sorted Axis, the edges of the bins are found with a binary search in x, instead of a search in the bins for every value of x. 
     new_x : ndarray
         the new x-axis, the center of the bins
 
@@ -47,6 +115,17 @@ def indices_for_binning(x, new_x):
     
     x_r = new_x[1] - new_x[0]
     bins = numpy.concatenate((new_x - x_r/2, numpy.array([new_x[-1] + x_r/2])))
+    
+    if isinstance(x, AX.Axis):
+        if x.is_sorted and x_r > 0:
+            # the values of bin i are edges[i]:edges[i+1] of the ascending axis
+            values = x.values if x.direction == 1 else x.values[::-1]
+            edges = numpy.searchsorted(values, bins, side = "left")
+            digitized = numpy.full(len(values), -1)
+            digitized[edges[0]:edges[-1]] = numpy.repeat(numpy.arange(len(new_x)), numpy.diff(edges))
+            return digitized if x.direction == 1 else digitized[::-1]
+        x = x.values
+    
     digitized = numpy.digitize(x, bins, right = False) 
     idx = numpy.where(numpy.logical_or(x < bins[0], x >= bins[-1]))[0]
     digitized[idx] = 0
@@ -280,8 +359,8 @@ def get_min_max_x(x, min_x = 1e9, max_x = -1e9, verbose = 0):
     
     Arguments
     ---------
-    x : array-like
-        Data for which the minimum and maximum should be determined.
+    x : array-like or Axis
+        Data for which the minimum and maximum should be determined. For an Axis, the cached minimum and maximum are used.
     min_x : float
         Default: 1e9
     max_x : float
@@ -302,10 +381,15 @@ def get_min_max_x(x, min_x = 1e9, max_x = -1e9, verbose = 0):
     if verbose > 1:
         print("SpectraTools.CommonFunctions.get_min_max_x()")    
 
-    if numpy.amin(x) < min_x:
-        min_x = numpy.amin(x)
-    if numpy.amax(x) > max_x:
-        max_x = numpy.amax(x)   
+    if isinstance(x, AX.Axis):
+        x_min, x_max = x.min, x.max
+    else:
+        x_min, x_max = numpy.amin(x), numpy.amax(x)
+        
+    if x_min < min_x:
+        min_x = x_min
+    if x_max > max_x:
+        max_x = x_max   
         
     return min_x, max_x   
     
@@ -320,8 +404,8 @@ def find_indices_for_cropping(x, min_x = None, max_x = None, pad = 5, crop_index
     
     Arguments
     ---------
-    x : ndarray
-        The axis to be cropped.   
+    x : ndarray or Axis
+        The axis to be cropped. If it is a sorted Axis, the range is found with a binary search.   
     min_x : number, optional 
     max_x : number, optional
     pad : number (5)
@@ -371,8 +455,18 @@ def find_indices_for_cropping(x, min_x = None, max_x = None, pad = 5, crop_index
     
     suppress_range_warning = kwargs.get("suppress_range_warning", False)
     
+    axis = None
+    if isinstance(x, AX.Axis):
+        axis = x
+        x = axis.values
+    
     if crop_index == False:
-        if min_x is not None and max_x is not None:
+        if axis is not None and axis.is_sorted and (min_x is not None or max_x is not None):
+            if min_x is not None and max_x is not None and min_x > max_x:
+                min_x, max_x = max_x, min_x
+            a, b = axis.crop_range(min_x, max_x)
+            idx = numpy.arange(a, b)
+        elif min_x is not None and max_x is not None:
             if min_x > max_x:
                 temp = max_x
                 max_x = min_x
@@ -412,6 +506,63 @@ def find_indices_for_cropping(x, min_x = None, max_x = None, pad = 5, crop_index
     idx = idx[temp] 
     
     return idx
+
+
+def find_slice_for_cropping(x, min_x = None, max_x = None, pad = 5, crop_index = False, verbose = 0, **kwargs):
+    """
+    The same as `find_indices_for_cropping`, but for a sorted axis the result is a slice, found with a binary search. Cropping with a slice gives a view of the array instead of a copy. 
+    
+    If x is not sorted, the indices of `find_indices_for_cropping` are returned. 
+    
+    Arguments
+    ---------
+    x : ndarray or Axis
+        The axis to be cropped. An ndarray is checked if it is sorted, for an Axis this is cached. 
+    
+    For the other arguments, see `find_indices_for_cropping`.
+    
+    Returns
+    -------
+    idx : slice or ndarray 
+        Slice or indices to be used. None if no values are found in the range, or if min_x and max_x are not given.
+
+    Examples
+    --------
+    ::
+    
+        x = numpy.arange(10)
+        
+        find_slice_for_cropping(x, min_x = 3.5, max_x = 6.5, pad = 1)
+        >>> slice(3, 8)
+        
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.CommonFunctions.find_slice_for_cropping()")        
+    
+    if min_x is None and max_x is None:
+        return None
+    
+    axis = x if isinstance(x, AX.Axis) else AX.Axis(x)
+    if axis.is_sorted == False:
+        return find_indices_for_cropping(axis.values, min_x = min_x, max_x = max_x, pad = pad, crop_index = crop_index, verbose = verbose, **kwargs)
+
+    if crop_index == False:
+        a, b = axis.crop_range(min_x, max_x)
+    else:
+        a, b = sorted([int(min_x), int(max_x)])
+        b += 1
+        
+    if a >= b:
+        if kwargs.get("suppress_range_warning", False) == False:
+            warnings.warn("SpectraTools.Resources.CommonFunctions.find_slice_for_cropping(): array ({:}-{:}) does not contain values in the range {:}-{:}".format(axis.values[0], axis.values[-1], min_x, max_x))
+        return None
+    
+    if type(pad) != int:
+        pad = 5
+    if pad < 1:
+        pad = 1
+    
+    return slice(min(max(a - pad, 0), len(axis)), max(min(b + pad, len(axis)), 0))
         
     
     
@@ -424,8 +575,8 @@ def make_new_x(x_resolution, x = None, min_x = None, max_x = None, verbose = 0):
     ---------
     x_resolution : float
         required resolution
-    x : array-like (opt)
-        Use min and max for new x, unless min_x and/or max_x are given.
+    x : array-like or Axis (opt)
+        Use min and max for new x, unless min_x and/or max_x are given. For an Axis, the cached minimum and maximum are used.
     min_x : number (opt)
         Use as minimum for new x. If min_x is not given, min(x) will be used.
     max_x : number (opt)
@@ -450,14 +601,14 @@ def make_new_x(x_resolution, x = None, min_x = None, max_x = None, verbose = 0):
     if min_x is not None:
         start = min_x + x_resolution / 2
     elif x is not None:
-        start = numpy.amin(x) + x_resolution / 2
+        start = get_min_max_x(x)[0] + x_resolution / 2
     else:
         raise ValueError("SpectraTools.Resources.CommonFunctions.make_new_x(): no x or min_x given, can not determine where to start array.")
         
     if max_x is not None:
         end = max_x + x_resolution / 10
     elif x is not None:
-        end = numpy.amax(x) + x_resolution / 10
+        end = get_min_max_x(x)[1] + x_resolution / 10
     else:
         raise ValueError("SpectraTools.Resources.CommonFunctions.make_new_x(): no x or max_x given, can not determine where to end array.")
         
@@ -465,19 +616,137 @@ def make_new_x(x_resolution, x = None, min_x = None, max_x = None, verbose = 0):
     
     
     
-def bin_data(x, new_x, y, verbose = 0):
+def bin_statistics(x, new_x, y, statistics = ["mean"], dtype = None, verbose = 0):
     """
-    Take data and bin it. 
+    Bin data and calculate statistics per bin in a single pass. The values of x are mapped to the bins with `indices_for_binning`, the accumulation is done with `numpy.bincount` (sum, count, mean, std) and `reduceat` (min, max). There is no loop over the bins, so the time scales with the number of data points, not with the number of bins times the number of data points.
     
     Arguments
     ---------
+    x : ndarray or Axis
+        x-axis. For a sorted Axis, see `indices_for_binning`. 
     new_x : ndarray
-    x : ndarray
+        new x-axis, the center of the bins
+    y : ndarray 
+        y can be 1 dimension, or 2 dimensions (cols x data). 
+    statistics : list with str
+        Statistics to calculate, in addition to 'sum', 'count' and 'mean', which are always calculated. Options are 'min', 'max' and 'std'. 
+    dtype : str (None)
+        The dtype of the statistics, see `get_dtype`. The sums are always calculated in float64. 
+    
+    Returns
+    -------
+    result : dict
+        With keys 'sum', 'count', 'mean', 'empty_bin_count' and the requested statistics. The arrays have the same dimensions as y (1 or 2), with the last axis having the length of new_x. 'count' is 1 dimensional: it is the same for every column of y. Empty bins are NaN for all statistics, except for 'sum' and 'count', which are 0.
+
+    Notes
+    -----
+    The standard deviation is the population standard deviation (ddof = 0), calculated in a second pass from the deviations to the mean of the bin. 
+    
+    Example
+    -------
+    ::
+    
+        x = numpy.array([0,1,2,3,4,5])
+        y = numpy.array([1,3,2,2,5,7])
+        new_x = numpy.array([1, 3, 5])
+        r = bin_statistics(x, new_x, y, statistics = ["max"])
+        r["mean"]
+        >>> [2, 2, 6]
+        r["max"]
+        >>> [3, 2, 7]
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.CommonFunctions.bin_statistics()")      
+
+    for s in statistics:
+        if s not in ["sum", "count", "mean", "min", "max", "std"]:
+            raise ValueError("SpectraTools.Resources.CommonFunctions.bin_statistics(): unknown statistic '{:}'".format(s))
+
+    y = numpy.asarray(y)
+    dim = len(numpy.shape(y))
+    if dim == 1:
+        y = numpy.reshape(y, (1, len(y)))     
+    n_y = numpy.shape(y)[0]
+    n_bins = len(new_x)
+
+    digitized = indices_for_binning(x, new_x)
+    valid = digitized >= 0
+    digitized = digitized[valid]
+    y = y[:, valid]
+    
+    count = numpy.bincount(digitized, minlength = n_bins)
+    empty = count == 0
+    
+    # one bincount for all columns: shift the bin index of each column by n_bins
+    offsets = (numpy.arange(n_y) * n_bins)[:, numpy.newaxis]
+    flat_idx = (digitized[numpy.newaxis, :] + offsets).ravel()
+    summed = numpy.bincount(flat_idx, weights = y.ravel(), minlength = n_y * n_bins).reshape((n_y, n_bins))
+    
+    with numpy.errstate(invalid = "ignore", divide = "ignore"):
+        mean = summed / count
+    mean[:, empty] = numpy.nan
+    
+    result = {
+        "sum": summed,
+        "count": count,
+        "mean": mean,
+        "empty_bin_count": int(numpy.sum(empty)),
+    }
+    
+    if "std" in statistics:
+        deviation = (y - mean[:, digitized])**2
+        ssq = numpy.bincount(flat_idx, weights = deviation.ravel(), minlength = n_y * n_bins).reshape((n_y, n_bins))
+        with numpy.errstate(invalid = "ignore", divide = "ignore"):
+            std = numpy.sqrt(ssq / count)
+        std[:, empty] = numpy.nan
+        result["std"] = std
+    
+    if "min" in statistics or "max" in statistics:
+        # reduceat needs the data sorted by bin, and the start index of each non-empty bin. For a sorted axis, the bins are already in order. 
+        if isinstance(x, AX.Axis) and x.is_sorted and new_x[1] > new_x[0]:
+            y_sorted = y if x.direction == 1 else y[:, ::-1]
+        else:
+            order = numpy.argsort(digitized, kind = "stable")
+            y_sorted = y[:, order]
+        filled = numpy.where(~empty)[0]
+        starts = numpy.concatenate(([0], numpy.cumsum(count[filled])[:-1]))
+        for s, ufunc in [("min", numpy.minimum), ("max", numpy.maximum)]:
+            if s in statistics:
+                temp = numpy.full((n_y, n_bins), numpy.nan)
+                if len(filled) > 0:
+                    temp[:, filled] = ufunc.reduceat(y_sorted, starts, axis = 1)
+                result[s] = temp
+    
+    for k in ["sum", "mean", "std", "min", "max"]:
+        if k in result:
+            result[k] = as_dtype(result[k], dtype)
+            if dim == 1:
+                result[k] = result[k][0,:]
+    
+    if verbose > 0:
+        print("SpectraTools.Resources.CommonFunctions.bin_statistics(): Number of empty bins: {:d}".format(result["empty_bin_count"]))
+    
+    return result
+
+
+
+def bin_data(x, new_x, y, dtype = None, verbose = 0):
+    """
+    Take data and bin it. The value of a bin is the mean of the values in that bin. Empty bins are NaN. 
+    
+    Wrapper around bin_statistics().
+    
+    Arguments
+    ---------
+    x : ndarray or Axis
         x-axis
     new_x : ndarray
         new x_axis
     y : ndarray 
         y can be 1 dimension, or 2 dimensions (cols x data). 
+    dtype : str (None)
+        The dtype of new_y, see `get_dtype`.
     
     Returns
     -------
@@ -488,30 +757,102 @@ def bin_data(x, new_x, y, verbose = 0):
     if verbose > 1:
         print("SpectraTools.Resources.CommonFunctions.bin_data()")            
 
-    digitized = indices_for_binning(x, new_x)
-
-    dim = len(numpy.shape(y))
-    if dim == 1:
-        y = numpy.reshape(y, (1, len(y)))        
-    n_y = numpy.shape(y)[0]
-    new_y = numpy.zeros((n_y, len(new_x)))     
-    empty_bin_count = 0
-    for b in range(len(new_x)):
-        temp = y[:, digitized == b]
-        if numpy.shape(temp)[1] == 0:
-            new_y[:,b] = numpy.nan
-            empty_bin_count += 1                    
-        else:
-            new_y[:, b] = temp.mean(axis = 1)         
-    
-    if dim == 1:    
-        new_y = new_y[0,:]
+    result = bin_statistics(x = x, new_x = new_x, y = y, dtype = dtype, verbose = 0)
     
     if verbose > 0:
-        print("LinearSpectrum : bin_data: Number of empty bins: {:d}".format(empty_bin_count))
+        print("LinearSpectrum : bin_data: Number of empty bins: {:d}".format(result["empty_bin_count"]))
+
+    return new_x, result["mean"]
+    
+
 
-    return new_x, new_y
+def concatenate_data(x_list, y_list, sort = False, deduplicate = False, new_x = None, dtype = None, verbose = 0):
+    """
+    Combine the data of several spectra into one spectrum. The output is allocated once, with the total length of the input, and filled in place. 
+    
+    Optionally, the result is sorted by x, duplicate x-values are merged, or the data is binned. Binning is done per input array, the sum and count for each bin are accumulated, so the combined data is never concatenated in memory. 
+    
+    Arguments
+    ---------
+    x_list : list with ndarrays
+        The x-axes.
+    y_list : list with ndarrays
+        The y-values, same lengths as the arrays in x_list. 
+    sort : bool (False)
+        Sort the result by x. A stable sort is used, so for equal x the order of the input is retained. 
+    deduplicate : bool (False)
+        Merge data points with the same x. The y-value is the mean of the merged points. The result is sorted. 
+    new_x : ndarray (optional)
+        If given, bin the data on this axis (the center of the bins). sort and deduplicate are ignored. Empty bins are NaN. 
+    dtype : str (None)
+        The dtype of y, see `get_dtype`. The sums for binning and deduplication are calculated in float64. 
+    
+    Returns
+    -------
+    x : ndarray
+    y : ndarray
     
+    Example
+    -------
+    ::
+    
+        concatenate_data([numpy.array([2, 1]), numpy.array([1, 3])], [numpy.array([5, 6]), numpy.array([8, 9])], deduplicate = True)
+        >>> [1, 2, 3], [7, 5, 9]
+    
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.CommonFunctions.concatenate_data()")       
+    
+    if len(x_list) != len(y_list):
+        raise ValueError("SpectraTools.Resources.CommonFunctions.concatenate_data(): x_list and y_list do not have the same length ({:d} and {:d})".format(len(x_list), len(y_list)))
+        
+    for i in range(len(x_list)):
+        if len(x_list[i]) != len(y_list[i]):
+            raise ValueError("SpectraTools.Resources.CommonFunctions.concatenate_data(): x and y of item {:d} do not have the same length".format(i))
+
+    if new_x is not None:
+        n_bins = len(new_x)
+        summed = numpy.zeros(n_bins)
+        count = numpy.zeros(n_bins, dtype = int)
+        for x, y in zip(x_list, y_list):
+            digitized = indices_for_binning(numpy.asarray(x), new_x)
+            valid = digitized >= 0
+            count += numpy.bincount(digitized[valid], minlength = n_bins)
+            summed += numpy.bincount(digitized[valid], weights = numpy.asarray(y)[valid], minlength = n_bins)
+        with numpy.errstate(invalid = "ignore", divide = "ignore"):
+            y = summed / count
+        y[count == 0] = numpy.nan
+        return new_x, as_dtype(y, dtype)
+        
+    lengths = [len(x) for x in x_list]
+    n = int(numpy.sum(lengths))
+    
+    if len(x_list) == 0:
+        return numpy.array([]), numpy.array([])
+    
+    x = numpy.empty(n, dtype = numpy.result_type(*x_list))
+    y_dtype = numpy.result_type(*y_list)
+    if y_dtype.kind == "f" and get_dtype(dtype) is not None:
+        y_dtype = get_dtype(dtype)
+    y = numpy.empty(n, dtype = y_dtype)
+    
+    start = 0
+    for i in range(len(x_list)):
+        x[start:start + lengths[i]] = x_list[i]
+        y[start:start + lengths[i]] = y_list[i]
+        start += lengths[i]
+    
+    if sort or deduplicate:
+        order = numpy.argsort(x, kind = "stable")
+        x = x[order]
+        y = y[order]
+        
+    if deduplicate:
+        x, inverse, count = numpy.unique(x, return_inverse = True, return_counts = True)
+        y = as_dtype(numpy.bincount(inverse.ravel(), weights = y) / count, dtype)
+        
+    return x, y
+
 
 
 def moving_average(a, n = 3) :
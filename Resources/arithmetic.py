@@ -0,0 +1,91 @@
+"""
+Benchmark of the arithmetic of LinearSpectrum: the operators make a new array for every operation, `subtract`, `divide`, etc. with `out` and the in-place operators (`-=`, `/=`, etc.) write into an existing array.
+
+Example
+-------
+::
+
+    result = benchmark(n = 10000000, verbose = 1)
+
+"""
+
+import importlib
+import time
+import tracemalloc
+
+import numpy
+
+import SpectraTools.LinearSpectrum as LS
+
+importlib.reload(LS)
+
+
+def benchmark(n = 1000000, repeat = 3, verbose = 0):
+    """
+    Compare the memory and time of `(A - B) / R` with the operators, with `subtract` and `divide` with `out`, and with the in-place operators.
+
+    The memory is measured with `tracemalloc` (numpy reports the memory of arrays to tracemalloc): `peak` is the maximum of the memory that is allocated during the operation and is not yet freed. 
+
+    Keyword Arguments
+    -----------------
+    n : int
+        Number of points.
+    repeat : int
+        The time is the fastest of `repeat` evaluations.
+
+    Returns
+    -------
+    result : dict
+        Key is 'operators', 'out' or 'in-place', value is a dict with `time` (s), `peak` (bytes) and `arrays` (the peak in arrays of n points).
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.arithmetic.benchmark()")
+
+    rng = numpy.random.default_rng(0)
+    x = numpy.arange(n, dtype = float)
+    y_A = rng.uniform(1, 2, n)
+    A = LS.LinearSpectrum(x = x, y = y_A.copy(), x_unit = "cm-1", y_unit = "A")
+    B = LS.LinearSpectrum(x = A.axis, y = rng.uniform(0, 1, n), x_unit = "cm-1", y_unit = "A")
+    R = LS.LinearSpectrum(x = A.axis, y = rng.uniform(1, 2, n), x_unit = "cm-1", y_unit = "A")
+    C = LS.LinearSpectrum(x = A.axis, y = numpy.zeros(n), x_unit = "cm-1", y_unit = "A")
+
+    def operators():
+        return (A - B) / R
+
+    def out():
+        A.subtract(B, out = C)
+        return C.divide(R, out = C)
+
+    def in_place():
+        nonlocal A
+        A.y[:] = y_A
+        A -= B
+        A /= R
+        return A
+
+    result = {}
+    for mode, function in [("operators", operators), ("out", out), ("in-place", in_place)]:
+        t = []
+        for i in range(repeat):
+            t0 = time.perf_counter()
+            function()
+            t.append(time.perf_counter() - t0)
+
+        tracemalloc.start()
+        D = function()
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del D
+
+        result[mode] = {
+            "time": min(t),
+            "peak": peak,
+            "arrays": peak / y_A.nbytes,
+        }
+
+    if verbose > 0:
+        for mode, r in result.items():
+            print("  {:10s} {:8.4f} s  peak {:12d} bytes ({:.2f} arrays)".format(mode, r["time"], r["peak"], r["arrays"]))
+
+    return result
@@ -0,0 +1,210 @@
+"""
+Calculation of spectra on very large wavenumber grids, in blocks.
+
+For a wide range with a small step (for example 0.001 cm-1), the grid has tens of millions of points. `hitran.calculate_signal` keeps the grid, the absorption coefficient, the spectrum and the convolved spectrum in memory at the same time. `block_signal` calculates the grid in blocks of `block_size` points and writes the result to a `.npy` file with `numpy.lib.format.open_memmap`. Only one block is in memory at a time.
+
+For each block, the lines within the wing of the block are selected (see `hitran_xsect.grid_line_data`). Lines outside the block that have wings in the block are therefore included. The absorption coefficient is converted to transmittance or absorption per block. For the convolution with the slit function, the block is calculated with an overlap of the width of the slit function on both sides, the overlap is not written.
+
+The result is the same as for the whole grid at once, apart from rounding errors (the sums are done in a different order).
+
+Example
+-------
+::
+
+    x, y = block_signal("CO2.npy", "Voigt", SourceTables = "CO2", OmegaRange = [2000, 2500], OmegaStep = 0.001, SlitFunction = "GAUSSIAN", Resolution = 0.1)
+
+"""
+
+import importlib
+import os
+import pathlib
+
+import numpy
+
+import hapi
+
+import SpectraTools.Resources.hitran_convolve as HCONV
+import SpectraTools.Resources.hitran_xsect as HX
+
+importlib.reload(hapi)
+importlib.reload(HCONV)
+importlib.reload(HX)
+
+# what block_signal calculates
+SPECTRA = ["coefficient", "transmittance", "absorption"]
+
+
+
+def grid_size(OmegaRange, OmegaStep):
+    """
+    The grid of `hapi.arange_`, without making it.
+
+    Returns
+    -------
+    lower, upper : float
+        The first and last point.
+    n : int
+        Number of points.
+
+    """
+    lower, upper = float(OmegaRange[0]), float(OmegaRange[1])
+    n = int(numpy.floor((upper - lower) / OmegaStep)) + 1
+    upper_new = lower + OmegaStep * (n - 1)
+    if abs((upper - upper_new) - OmegaStep) < 1e-10:
+        upper_new += OmegaStep
+        n += 1
+    return lower, upper_new, n
+
+
+def grid_block(lower, upper, n, a, b):
+    """
+    Points `a:b` of the grid, the same as `numpy.linspace(lower, upper, n)[a:b]`.
+    """
+    if n == 1:
+        return numpy.array([lower])[a:b]
+    step = (upper - lower) / (n - 1)
+    Omegas = numpy.arange(a, b) * step + lower
+    if b == n and b > a:
+        Omegas[-1] = upper
+    return Omegas
+
+
+def block_bounds(a, b, block_size):
+    """
+    Divide `a:b` in blocks of at most `block_size` points.
+
+    Returns
+    -------
+    bounds : list
+        List of (start, end).
+
+    """
+    return [(i, min(i + block_size, b)) for i in range(a, b, block_size)]
+
+
+def block_signal(paf, line_profile = "Voigt", SourceTables = None, Environment = None, OmegaRange = None, OmegaStep = None, WavenumberRange = None, WavenumberStep = None, spectrum = "transmittance", scale = 1.0, SlitFunction = None, Resolution = 0.1, AF_wing = 10., convolution_method = "auto", block_size = 1048576, verbose = 0, **kwargs):
+    """
+    Calculate a spectrum in blocks and write it to a file.
+
+    Arguments
+    ---------
+    paf : pathlib.Path
+        The `.npy` file for the result. An existing file is replaced.
+
+    Keyword Arguments
+    -----------------
+    line_profile : str {'Voigt', 'Lorentz', 'Doppler', 'HT', 'default'}
+        The line profile.
+    SourceTables : str or list
+        The tables.
+    Environment : dict
+        `T` in Kelvin, `p` in atmosphere and (for transmittance and absorption) `l` in centimeters.
+    OmegaRange : list
+        The first and last point of the grid. This is required.
+    OmegaStep : number
+        The step of the grid. Default is 0.01.
+    spectrum : str {'coefficient', 'transmittance', 'absorption'}
+        Calculate the absorption coefficient, or convert it to transmittance or absorption (see `hapi.transmittanceSpectrum` and `hapi.absorptionSpectrum`).
+    scale : number
+        The result is multiplied with `scale`, for example 100 for transmittance in percent.
+    SlitFunction : function or str (None)
+        If not None, the spectrum is convolved with this slit function, see `hitran_convolve.convolve_spectrum`. As with HAPI, half the width of the slit function is removed at both ends.
+    Resolution, AF_wing : number
+        See `hitran_convolve.convolve_spectrum`.
+    convolution_method : str {'auto', 'direct', 'fft'}
+        See `hitran_convolve.convolve_same`.
+    block_size : int
+        Number of points of the result that are calculated at once. The memory that is used also depends on `chunk_size` (see `hitran_xsect.accumulate_lines`).
+
+    For the other keyword arguments, see `hitran_xsect.absorption_coefficient`. `OmegaGrid` and `File` can not be used.
+
+    Returns
+    -------
+    x, y : ndarray
+        The wavenumbers and the spectrum, memory-mapped from `paf` (read only).
+
+    Notes
+    -----
+
+    The file contains an array with shape (2, points): the wavenumbers and the spectrum. Use `numpy.load(paf, mmap_mode = 'r')` to read it.
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_blocks.block_signal()")
+
+    if WavenumberRange is not None:
+        OmegaRange = WavenumberRange
+    if WavenumberStep is not None:
+        OmegaStep = WavenumberStep
+    if OmegaRange is None:
+        raise ValueError("SpectraTools.Resources.hitran_blocks.block_signal(): OmegaRange is required")
+    if OmegaStep is None:
+        OmegaStep = 0.01
+    if spectrum not in SPECTRA:
+        raise ValueError("SpectraTools.Resources.hitran_blocks.block_signal(): '{:}' is not a valid spectrum, use one of {:}".format(spectrum, SPECTRA))
+    for k in ["OmegaGrid", "WavenumberGrid", "File"]:
+        if k in kwargs:
+            raise ValueError("SpectraTools.Resources.hitran_blocks.block_signal(): '{:}' can not be used".format(k))
+    if block_size < 1:
+        raise ValueError("SpectraTools.Resources.hitran_blocks.block_signal(): block_size should be at least 1")
+
+    if Environment is None:
+        Environment = {"T": 296., "p": 1.}
+    if spectrum != "coefficient" and "l" not in Environment:
+        Environment = dict(Environment, l = 1)
+
+    lower, upper, n = grid_size(OmegaRange, OmegaStep)
+
+    # the part of the grid that is written, and the overlap of the blocks
+    if SlitFunction is not None:
+        if n < 2:
+            raise ValueError("SpectraTools.Resources.hitran_blocks.block_signal(): the grid is too small for the convolution")
+        step = numpy.diff(grid_block(lower, upper, n, 0, 2))[0]
+        if step >= Resolution:
+            raise ValueError("SpectraTools.Resources.hitran_blocks.block_signal(): step must be less than resolution")
+        slit = HCONV.slit_kernel(SlitFunction, Resolution, step, AF_wing)
+        start = int(len(slit) / 2)
+        end = n - int(len(slit) / 2)
+        overlap = len(slit)
+    else:
+        start = 0
+        end = n
+        overlap = 0
+
+    if end <= start:
+        raise ValueError("SpectraTools.Resources.hitran_blocks.block_signal(): the grid is smaller than the slit function")
+
+    paf = pathlib.Path(paf)
+    tmp = paf.with_name("{:s}.{:d}.tmp.npy".format(paf.stem, os.getpid()))
+    result = numpy.lib.format.open_memmap(tmp, mode = "w+", dtype = float, shape = (2, end - start))
+
+    try:
+        for a, b in block_bounds(start, end, block_size):
+            a_in = max(0, a - overlap)
+            b_in = min(n, b + overlap)
+            Omegas = grid_block(lower, upper, n, a_in, b_in)
+            if verbose > 0:
+                print("SpectraTools.Resources.hitran_blocks.block_signal(): {:} to {:} ({:d} points)".format(Omegas[0], Omegas[-1], len(Omegas)))
+
+            w, y = HX.absorption_coefficient(line_profile, SourceTables = SourceTables, Environment = Environment, OmegaRange = (Omegas[0], Omegas[-1]), OmegaStep = OmegaStep, OmegaGrid = Omegas, verbose = verbose, **kwargs)
+
+            if spectrum == "transmittance":
+                y = hapi.transmittanceSpectrum(w, y, Environment = Environment)[1]
+            elif spectrum == "absorption":
+                y = hapi.absorptionSpectrum(w, y, Environment = Environment)[1]
+
+            if SlitFunction is not None:
+                y = HCONV.convolve_same(y, slit, method = convolution_method) * step
+
+            result[0, a - start:b - start] = Omegas[a - a_in:b - a_in]
+            result[1, a - start:b - start] = scale * y[a - a_in:b - a_in]
+
+        result.flush()
+        del result
+        os.replace(tmp, paf)
+    finally:
+        if tmp.is_file():
+            tmp.unlink()
+
+    result = numpy.load(paf, mmap_mode = "r")
+    return result[0], result[1]
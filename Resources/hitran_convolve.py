@@ -0,0 +1,225 @@
+"""
+Convolution of spectra with an instrument (slit) function.
+
+`hapi.convolveSpectrum` calculates the slit function for every call and convolves with `numpy.convolve`, which takes a time proportional to the number of points times the number of points of the slit function. For a wide slit function (large `AF_wing` compared to the step) this is slow. `convolve_spectrum` gives the same result, but:
+
+- the slit functions are cached for each (function, resolution, step, wing).
+- for large slit functions the convolution is done with FFTs in blocks (overlap-add), which takes a time proportional to the number of points times the log of the size of the slit function.
+
+Which method is used is determined by the size of the slit function (see `DIRECT_MAX_KERNEL`).
+
+"""
+
+import collections
+import importlib
+
+import numpy
+
+import hapi
+
+importlib.reload(hapi)
+
+# the slit functions in HAPI
+SLIT_FUNCTIONS = {
+    "RECTANGULAR": hapi.SLIT_RECTANGULAR,
+    "TRIANGULAR": hapi.SLIT_TRIANGULAR,
+    "GAUSSIAN": hapi.SLIT_GAUSSIAN,
+    "DIFFRACTION": hapi.SLIT_DIFFRACTION,
+    "MICHELSON": hapi.SLIT_MICHELSON,
+    "DISPERSION": hapi.SLIT_DISPERSION,
+}
+
+# slit functions with more points are convolved with FFTs
+DIRECT_MAX_KERNEL = 64
+
+# number of slit functions that are kept in memory
+KERNEL_CACHE_SIZE = 32
+KERNELS = collections.OrderedDict()
+
+
+
+def slit_kernel(slit_function, resolution, step, wing):
+    """
+    The normalized slit function, as calculated by `hapi.convolveSpectrum`. The result is cached and should not be changed.
+
+    Arguments
+    ---------
+    slit_function : function or str
+        A function with arguments (x, resolution), like `hapi.SLIT_GAUSSIAN`, or one of the keys of `SLIT_FUNCTIONS`.
+    resolution : number
+        Instrumental resolution.
+    step : number
+        Step of the wavenumber grid.
+    wing : number
+        The slit function is calculated from -wing to wing.
+
+    Returns
+    -------
+    slit : ndarray
+
+    """
+    if type(slit_function) == str:
+        if slit_function not in SLIT_FUNCTIONS:
+            raise ValueError("SpectraTools.Resources.hitran_convolve.slit_kernel(): '{:}' is not a valid slit function".format(slit_function))
+        slit_function = SLIT_FUNCTIONS[slit_function]
+
+    key = (slit_function, float(resolution), float(step), float(wing))
+    if key in KERNELS:
+        KERNELS.move_to_end(key)
+        return KERNELS[key]
+
+    x = hapi.arange_(-wing, wing + step, step)
+    slit = slit_function(x, resolution)
+    # the Python sum, as in HAPI, gives the same rounding
+    slit /= sum(slit) * step
+    slit.setflags(write = False)
+
+    KERNELS[key] = slit
+    while len(KERNELS) > KERNEL_CACHE_SIZE:
+        KERNELS.popitem(last = False)
+    return slit
+
+
+def fft_size(n_kernel):
+    """
+    FFT length for overlap-add: a power of 2, at least 8 times the size of the kernel.
+    """
+    return int(2**numpy.ceil(numpy.log2(8 * n_kernel)))
+
+
+def fft_convolve(y, kernel):
+    """
+    Full linear convolution of `y` (along the last axis) with `kernel`, with the overlap-add method.
+
+    Arguments
+    ---------
+    y : ndarray
+        1 or 2 dimensional. For 2 dimensional arrays, each row is convolved.
+    kernel : ndarray
+        1 dimensional.
+
+    Returns
+    -------
+    result : ndarray
+        The last axis has length `len(y) + len(kernel) - 1`, as `numpy.convolve(mode = 'full')`.
+
+    """
+    y = numpy.asarray(y, dtype = float)
+    n = y.shape[-1]
+    k = len(kernel)
+    n_full = n + k - 1
+
+    # everything fits in one FFT
+    if n_full <= fft_size(k):
+        n_fft = int(2**numpy.ceil(numpy.log2(n_full)))
+        return numpy.fft.irfft(numpy.fft.rfft(y, n_fft) * numpy.fft.rfft(kernel, n_fft), n_fft)[..., :n_full]
+
+    n_fft = fft_size(k)
+    L = n_fft - k + 1
+    n_blocks = int(numpy.ceil(n / L))
+
+    # blocks of length L, zero padded
+    padded = numpy.zeros(y.shape[:-1] + (n_blocks * L,))
+    padded[..., :n] = y
+    blocks = padded.reshape(y.shape[:-1] + (n_blocks, L))
+
+    conv = numpy.fft.irfft(numpy.fft.rfft(blocks, n_fft) * numpy.fft.rfft(kernel, n_fft), n_fft)
+
+    # overlap-add: the tail (k-1 points) of each block is added to the start of the next block
+    result = numpy.zeros(y.shape[:-1] + ((n_blocks + 1) * L,))
+    blocked = result[..., :n_blocks * L].reshape(blocks.shape)
+    blocked += conv[..., :L]
+    blocked[..., 1:, :k-1] += conv[..., :-1, L:L+k-1]
+    result[..., n_blocks * L:n_blocks * L + k - 1] += conv[..., -1, L:L+k-1]
+    return result[..., :n_full]
+
+
+def convolve_same(y, kernel, method = "auto"):
+    """
+    Convolution with the same output as `numpy.convolve(y, kernel, mode = 'same')`.
+
+    Arguments
+    ---------
+    y : ndarray
+        1 or 2 dimensional. For 2 dimensional arrays, each row is convolved.
+    kernel : ndarray
+        1 dimensional.
+
+    Keyword Arguments
+    -----------------
+    method : str {'auto', 'direct', 'fft'}
+        With 'auto', 'direct' is used for kernels with up to `DIRECT_MAX_KERNEL` points, otherwise 'fft'.
+
+    """
+    if method not in ["auto", "direct", "fft"]:
+        raise ValueError("SpectraTools.Resources.hitran_convolve.convolve_same(): '{:}' is not a valid method".format(method))
+
+    y = numpy.asarray(y, dtype = float)
+    n = y.shape[-1]
+    k = len(kernel)
+
+    if method == "auto":
+        if k <= DIRECT_MAX_KERNEL:
+            method = "direct"
+        else:
+            method = "fft"
+
+    if method == "direct":
+        if y.ndim == 1:
+            return numpy.convolve(y, kernel, mode = "same")
+        return numpy.array([numpy.convolve(row, kernel, mode = "same") for row in y.reshape(-1, n)]).reshape(y.shape[:-1] + (max(n, k),))
+
+    start = (min(n, k) - 1) // 2
+    return fft_convolve(y, kernel)[..., start:start + max(n, k)]
+
+
+def convolve_spectrum(Omega, CrossSection, Resolution = 0.1, AF_wing = 10., SlitFunction = hapi.SLIT_RECTANGULAR, Wavenumber = None, method = "auto", verbose = 0):
+    """
+    Convolve a spectrum with a slit function. This is a faster version of `hapi.convolveSpectrum`, with the same arguments and results.
+
+    Arguments
+    ---------
+    Omega : ndarray
+        Equidistant wavenumber grid.
+    CrossSection : ndarray
+        1 or 2 dimensional: for 2 dimensional arrays each row is a spectrum.
+
+    Keyword Arguments
+    -----------------
+    Resolution : number
+        Instrumental resolution.
+    AF_wing : number
+        Wing of the slit function.
+    SlitFunction : function or str
+        For example `hapi.SLIT_GAUSSIAN` or 'GAUSSIAN'.
+    method : str {'auto', 'direct', 'fft'}
+        See `convolve_same`.
+
+    Returns
+    -------
+    Omega : ndarray
+        The wavenumber grid, without half the width of the slit function at both ends.
+    CrossSection : ndarray
+        The convolved spectrum.
+    i1, i2 : int
+        Lower and upper index in the input grid.
+    slit : ndarray
+        The slit function.
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_convolve.convolve_spectrum()")
+
+    if Wavenumber is not None:
+        Omega = Wavenumber
+
+    step = Omega[1] - Omega[0]
+    if step >= Resolution:
+        raise ValueError("SpectraTools.Resources.hitran_convolve.convolve_spectrum(): step must be less than resolution")
+
+    slit = slit_kernel(SlitFunction, Resolution, step, AF_wing)
+
+    left_bnd = int(len(slit) / 2)
+    right_bnd = len(Omega) - int(len(slit) / 2)
+    CrossSectionLowRes = convolve_same(CrossSection, slit, method = method) * step
+    return Omega[left_bnd:right_bnd], CrossSectionLowRes[..., left_bnd:right_bnd], left_bnd, right_bnd, slit
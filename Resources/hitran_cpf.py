@@ -0,0 +1,307 @@
+"""
+Complex probability functions (Faddeeva functions) for the Voigt profile.
+
+The Voigt profile is the real part of the complex probability function w(z) = exp(-z**2) erfc(-iz), with z = x + iy. HAPI uses `hapi.VARIABLES['CPF']`, by default `hapi.hum1_wei`: the Humlicek approximation far from the line center and the Weideman approximation with 24 terms elsewhere. The Weideman coefficients are calculated with an FFT at every call.
+
+This module has backends with different accuracies. They all have the signature of `hapi.hum1_wei`: `WR, WI = cpf(x, y)`, with x and y arrays of any shape (they are broadcast). Arrays with many lines times many grid points are evaluated at once, and the Weideman coefficients are calculated once for each number of terms.
+
+=============== =============== ===========================================================
+Name            Max. rel. error Method
+=============== =============== ===========================================================
+'exact'         1e-13           `scipy.special.wofz` (only if scipy is installed)
+'weideman32'    1e-12           Weideman, N = 32, continued fraction for |x| + y >= 15
+'weideman16'    1e-6            Weideman, N = 16, continued fraction for |x| + y >= 15
+'humlicek'      1e-4            Humlicek (1982) W4, four regions
+'hapi'          1e-4            `hapi.hum1_wei` (the default of HAPI)
+=============== =============== ===========================================================
+
+The errors (`CPF_MAX_ERROR`) are the maximum of |w - w_exact| / |w_exact| for y between 1e-5 and 1e3 and any x, see `benchmark`. The relative error of the real part alone (the Voigt profile) is larger where it is much smaller than |w|, in the far wings of narrow lines.
+
+A backend is selected with its name, with `get_cpf`, or for HAPI and this package at the same time with `set_cpf`, which changes `hapi.VARIABLES['CPF']`.
+
+References
+----------
+
+- J. Humlicek, J. Quant. Spectrosc. Radiat. Transfer 27, 437 (1982)
+- J.A.C. Weideman, SIAM J. Numer. Anal. 31, 1497 (1994)
+
+"""
+
+import importlib
+import time
+
+import numpy
+
+import hapi
+
+importlib.reload(hapi)
+
+flag_scipy = True
+try:
+    import scipy.special
+except ImportError:
+    flag_scipy = False
+
+# the asymptotic expansion is used for |x| + y >= ASYMPTOTIC_LIMIT
+ASYMPTOTIC_LIMIT = 15.0
+
+# Weideman coefficients, key is the number of terms
+WEIDEMAN_COEFFICIENTS = {}
+
+
+
+def weideman_coefficients(N):
+    """
+    The constant L and the polynomial coefficients (highest order first) of the Weideman approximation with N terms. The result is cached.
+    """
+    if N not in WEIDEMAN_COEFFICIENTS:
+        M = 2 * N
+        k = numpy.arange(-M + 1, M)
+        L = numpy.sqrt(N / numpy.sqrt(2))
+        t = L * numpy.tan(k * numpy.pi / M / 2)
+        f = numpy.zeros(len(t) + 1)
+        f[1:] = numpy.exp(-t**2) * (L**2 + t**2)
+        a = numpy.real(numpy.fft.fft(numpy.fft.fftshift(f))) / (2 * M)
+        WEIDEMAN_COEFFICIENTS[N] = (L, numpy.flipud(a[1:N+1]))
+    return WEIDEMAN_COEFFICIENTS[N]
+
+
+def weideman(z, N):
+    """
+    Weideman approximation of w(z) with N terms, for complex z.
+    """
+    L, a = weideman_coefficients(N)
+    d = L - 1j * z
+    Z = (L + 1j * z) / d
+    p = numpy.zeros(Z.shape, dtype = complex)
+    for c in a:
+        p = p * Z + c
+    return 2 * p / d**2 + (1 / numpy.sqrt(numpy.pi)) / d
+
+
+def continued_fraction(z, n):
+    """
+    Laplace continued fraction of w(z) with n terms, for complex z far from the origin.
+    """
+    r = z
+    for k in range(n, 0, -1):
+        r = z - (k / 2) / r
+    return 1j / numpy.sqrt(numpy.pi) / r
+
+
+def _split(x, y, inner, outer):
+    """
+    Evaluate `inner(z)` for |x| + y < ASYMPTOTIC_LIMIT and `outer(z)` elsewhere.
+    """
+    x, y = numpy.broadcast_arrays(numpy.asarray(x, dtype = float), numpy.asarray(y, dtype = float))
+    z = x + 1j * y
+    w = numpy.empty(z.shape, dtype = complex)
+    far = numpy.abs(x) + y >= ASYMPTOTIC_LIMIT
+    w[far] = outer(z[far])
+    w[~far] = inner(z[~far])
+    return w.real, w.imag
+
+
+def weideman16(x, y):
+    """
+    Weideman approximation with 16 terms. Max. relative error 1e-6.
+    """
+    return _split(x, y, lambda z: weideman(z, 16), lambda z: continued_fraction(z, 2))
+
+
+def weideman32(x, y):
+    """
+    Weideman approximation with 32 terms. Max. relative error 1e-12.
+    """
+    return _split(x, y, lambda z: weideman(z, 32), lambda z: continued_fraction(z, 6))
+
+
+def humlicek(x, y):
+    """
+    Humlicek W4 algorithm, with four regions. Max. relative error 1e-4.
+    """
+    x, y = numpy.broadcast_arrays(numpy.asarray(x, dtype = float), numpy.asarray(y, dtype = float))
+    t = y - 1j * x
+    s = numpy.abs(x) + y
+    w = numpy.empty(t.shape, dtype = complex)
+
+    region = s >= 15
+    tt = t[region]
+    w[region] = tt * 0.5641896 / (0.5 + tt**2)
+
+    select = (s < 15) & (s >= 5.5)
+    tt = t[select]
+    u = tt**2
+    w[select] = tt * (1.410474 + u * 0.5641896) / (0.75 + u * (3 + u))
+    region |= select
+
+    select = (s < 5.5) & (y >= 0.195 * numpy.abs(x) - 0.176)
+    tt = t[select]
+    w[select] = (16.4955 + tt * (20.20933 + tt * (11.96482 + tt * (3.778987 + tt * 0.5642236)))) / (16.4955 + tt * (38.82363 + tt * (39.27121 + tt * (21.69274 + tt * (6.699398 + tt)))))
+    region |= select
+
+    select = ~region
+    tt = t[select]
+    u = tt**2
+    w[select] = numpy.exp(u) - tt * (36183.31 - u * (3321.9905 - u * (1540.787 - u * (219.0313 - u * (35.76683 - u * (1.320522 - u * 0.56419)))))) / (32066.6 - u * (24322.84 - u * (9022.228 - u * (2186.181 - u * (364.2191 - u * (61.57037 - u * (1.841439 - u)))))))
+
+    return w.real, w.imag
+
+
+def exact(x, y):
+    """
+    `scipy.special.wofz`, accurate to machine precision.
+    """
+    w = scipy.special.wofz(numpy.asarray(x, dtype = float) + 1j * numpy.asarray(y, dtype = float))
+    return w.real, w.imag
+
+
+def hum1_wei(x, y):
+    """
+    `hapi.hum1_wei` for arrays of any shape. Max. relative error 1e-4.
+    """
+    x, y = numpy.broadcast_arrays(numpy.asarray(x, dtype = float), numpy.asarray(y, dtype = float))
+    WR, WI = hapi.hum1_wei(x.ravel(), y.ravel())
+    return numpy.reshape(WR, x.shape), numpy.reshape(WI, x.shape)
+
+
+# the backends, from accurate to fast
+CPF_BACKENDS = {
+    "weideman32": weideman32,
+    "weideman16": weideman16,
+    "humlicek": humlicek,
+    "hapi": hum1_wei,
+}
+if flag_scipy:
+    CPF_BACKENDS = {"exact": exact, **CPF_BACKENDS}
+
+# maximum of |w - w_exact| / |w_exact|, see `benchmark`
+CPF_MAX_ERROR = {
+    "exact": 1e-13,
+    "weideman32": 1e-12,
+    "weideman16": 1e-6,
+    "humlicek": 1e-4,
+    "hapi": 1e-4,
+}
+
+
+def get_cpf(cpf = None):
+    """
+    Get a complex probability function.
+
+    Arguments
+    ---------
+    cpf : str, function or None
+        The name of a backend (see `CPF_BACKENDS`) or a function `cpf(x, y)`. If None, `hapi.VARIABLES['CPF']` is used, which can also be a name.
+
+    Returns
+    -------
+    cpf : function
+
+    """
+    if cpf is None:
+        cpf = hapi.VARIABLES["CPF"]
+    if callable(cpf):
+        return cpf
+    if cpf not in CPF_BACKENDS:
+        raise ValueError("SpectraTools.Resources.hitran_cpf.get_cpf(): '{:}' is not a valid backend, use one of {:}".format(cpf, list(CPF_BACKENDS.keys())))
+    return CPF_BACKENDS[cpf]
+
+
+def set_cpf(cpf):
+    """
+    Set `hapi.VARIABLES['CPF']`. This is used by HAPI (`hapi.pcqsdhc`) and by `hitran_xsect`.
+
+    Arguments
+    ---------
+    cpf : str or function
+        See `get_cpf`.
+
+    Returns
+    -------
+    previous : function
+        The previous value, to restore it.
+
+    """
+    previous = hapi.VARIABLES["CPF"]
+    hapi.VARIABLES["CPF"] = get_cpf(cpf)
+    return previous
+
+
+def cpf_key(cpf = None):
+    """
+    The complex probability function that is used for `cpf`, for the keys of stored results. With None, this is the current value of `hapi.VARIABLES['CPF']`, so that a result that was calculated with another backend is not used.
+
+    Returns
+    -------
+    cpf : str or function
+        The name of the backend (see `CPF_BACKENDS`), or the function if it is not a backend.
+
+    """
+    cpf = get_cpf(cpf)
+    for name, function in CPF_BACKENDS.items():
+        if function is cpf:
+            return name
+    return cpf
+
+
+def sample_points(n = 100000, seed = 0):
+    """
+    Points to compare the backends: x from -30 to 30 and with |x| from 1e-3 to 1e4, y from 1e-5 to 1e3 (logarithmically distributed).
+    """
+    rng = numpy.random.default_rng(seed)
+    m = n // 4
+    x = numpy.concatenate((rng.uniform(-30, 30, n - m), 10**rng.uniform(-3, 4, m) * rng.choice([-1, 1], m)))
+    y = 10**rng.uniform(-5, 3, n)
+    return x, y
+
+
+def benchmark(backends = None, n = 100000, repeat = 3, verbose = 0):
+    """
+    Compare the speed and the accuracy of the backends.
+
+    Keyword Arguments
+    -----------------
+    backends : list (None)
+        Names of the backends. If None, all backends.
+    n : int
+        Number of points, see `sample_points`.
+    repeat : int
+        The time is the fastest of `repeat` evaluations.
+
+    Returns
+    -------
+    result : dict
+        Key is the name of the backend, value is a dict with `time` (s), `points_per_second`, `max_rel_error` (of w) and `max_rel_error_real` (of the real part, the Voigt profile). The errors are relative to 'exact', or to 'weideman32' if scipy is not installed.
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_cpf.benchmark()")
+
+    if backends is None:
+        backends = list(CPF_BACKENDS.keys())
+
+    x, y = sample_points(n)
+    WR, WI = get_cpf("exact" if flag_scipy else "weideman32")(x, y)
+    w_ref = WR + 1j * WI
+
+    result = {}
+    for name in backends:
+        cpf = get_cpf(name)
+        t = []
+        for i in range(repeat):
+            t0 = time.perf_counter()
+            WR, WI = cpf(x, y)
+            t.append(time.perf_counter() - t0)
+        result[name] = {
+            "time": min(t),
+            "points_per_second": n / min(t),
+            "max_rel_error": numpy.amax(numpy.abs(WR + 1j * WI - w_ref) / numpy.abs(w_ref)),
+            "max_rel_error_real": numpy.amax(numpy.abs(WR - w_ref.real) / w_ref.real),
+        }
+
+    if verbose > 0:
+        for name, r in result.items():
+            print("  {:12s} {:8.4f} s  {:10.3e} points/s  max. rel. error {:8.1e} (real part {:8.1e})".format(name, r["time"], r["points_per_second"], r["max_rel_error"], r["max_rel_error_real"]))
+
+    return result
@@ -0,0 +1,318 @@
+"""
+Incremental downloads of HITRAN tables.
+
+`hapi.fetch` downloads all lines in a range and replaces the table. To extend a table to a slightly larger range, everything is downloaded again. The functions in this module keep a coverage manifest (`<tablename>.coverage`) for each table, with the wavenumber intervals that have been downloaded for each isotopologue. `fetch` only downloads the intervals that are missing and merges the new lines with the lines in the data file. Lines that are in both are only kept once.
+
+The manifest contains the size and modification time of the data and header files (see `hitran_storage.fingerprint`). If the table is changed in another way (for example with `hapi.fetch`), the manifest is not valid anymore and the coverage is unknown.
+
+The downloads are done with `hapi.fetch_by_ids`, from `hapi.VARIABLES['GLOBAL_HOST']`. The database folder should be the folder of HAPI (`hapi.db_begin`).
+
+Example
+-------
+::
+
+    requests = fetch(db_path, "CO2", [(2, 1), (2, 2)], 2000, 2100)
+    # later, only 2100-2200 is downloaded
+    requests = fetch(db_path, "CO2", [(2, 1), (2, 2)], 2000, 2200)
+
+"""
+
+import importlib
+import json
+import os
+import pathlib
+
+import hapi
+
+import SpectraTools.Resources.hitran_storage as HS
+
+importlib.reload(hapi)
+importlib.reload(HS)
+
+COVERAGE_EXTENSION = "coverage"
+COVERAGE_VERSION = 1
+
+# the temporary table for the downloads
+FETCH_SUFFIX = "__fetch"
+
+
+
+def coverage_path(db_path, tablename):
+    return pathlib.Path(db_path).joinpath("{:s}.{:s}".format(tablename, COVERAGE_EXTENSION))
+
+
+def merge_intervals(intervals):
+    """
+    Merge overlapping and touching intervals.
+
+    Arguments
+    ---------
+    intervals : list
+        List of [min, max].
+
+    Returns
+    -------
+    intervals : list
+        Sorted list of [min, max], without overlaps.
+
+    """
+    result = []
+    for a, b in sorted([float(a), float(b)] for a, b in intervals):
+        if len(result) > 0 and a <= result[-1][1]:
+            result[-1][1] = max(result[-1][1], b)
+        else:
+            result.append([a, b])
+    return result
+
+
+def missing_intervals(intervals, numin, numax):
+    """
+    The parts of [numin, numax] that are not in `intervals`.
+
+    Arguments
+    ---------
+    intervals : list
+        List of [min, max], see `merge_intervals`.
+    numin, numax : number
+
+    Returns
+    -------
+    missing : list
+        List of [min, max].
+
+    """
+    missing = []
+    start = float(numin)
+    for a, b in merge_intervals(intervals):
+        if b < start:
+            continue
+        if a > numax:
+            break
+        if a > start:
+            missing.append([start, a])
+        start = max(start, b)
+    if start < numax:
+        missing.append([start, float(numax)])
+    return missing
+
+
+def read_coverage(db_path, tablename):
+    """
+    Read the coverage manifest of a table.
+
+    Returns
+    -------
+    coverage : dict or None
+        Keys are (M, I), values are lists with [min, max]. None if there is no manifest or if it does not belong to the current data and header files.
+
+    """
+    paf = coverage_path(db_path, tablename)
+    if not paf.is_file():
+        return None
+    try:
+        with open(paf, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != COVERAGE_VERSION:
+        return None
+    fp = HS.fingerprint(db_path, tablename)
+    if len(fp) == 0 or manifest.get("fingerprint") != fp:
+        return None
+    return {(int(c["M"]), int(c["I"])): merge_intervals(c["intervals"]) for c in manifest["components"]}
+
+
+def write_coverage(db_path, tablename, coverage):
+    """
+    Write the coverage manifest of a table, with the fingerprint of the current data and header files.
+    """
+    manifest = {
+        "version": COVERAGE_VERSION,
+        "fingerprint": HS.fingerprint(db_path, tablename),
+        "components": [{"M": M, "I": I, "intervals": merge_intervals(intervals)} for (M, I), intervals in sorted(coverage.items())],
+    }
+    paf = coverage_path(db_path, tablename)
+    tmp = paf.with_name("{:s}.{:d}.tmp".format(paf.name, os.getpid()))
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent = 2)
+    os.replace(tmp, paf)
+
+
+def fetch_requests(coverage, components, numin, numax):
+    """
+    The downloads that are needed to cover [numin, numax] for the components.
+
+    Arguments
+    ---------
+    coverage : dict
+        See `read_coverage`.
+    components : list
+        (M, I) or (M, I, abundance).
+
+    Returns
+    -------
+    requests : list
+        List of ([min, max], [(M, I), ...]): the components that miss an interval are downloaded together.
+
+    """
+    requests = {}
+    for c in components:
+        MI = (int(c[0]), int(c[1]))
+        for a, b in missing_intervals(coverage.get(MI, []), numin, numax):
+            requests.setdefault((a, b), [])
+            if MI not in requests[(a, b)]:
+                requests[(a, b)].append(MI)
+    return [([a, b], MIs) for (a, b), MIs in sorted(requests.items())]
+
+
+def _nu_field(header):
+    """
+    The start and end of the `nu` column in a line of the data file. None if the positions are not known.
+    """
+    end = 0
+    for qnt in header["order"]:
+        if "position" in header:
+            start = header["position"][qnt]
+        else:
+            start = end
+        fmt = header["format"][qnt].lower()
+        aux = fmt[fmt.index("%")+1:-1]
+        if "." in aux:
+            aux = aux[:aux.index(".")]
+        end = start + int(aux)
+        if qnt == "nu":
+            return start, end
+    return None
+
+
+def merge_lines(lines, new_lines, header):
+    """
+    Merge the lines of two data files. Lines that are in both are kept once. If the position of `nu` is known, the lines are sorted by wavenumber.
+
+    Arguments
+    ---------
+    lines, new_lines : list
+        The lines of the data files, without line endings.
+    header : dict
+        The header of the table.
+
+    Returns
+    -------
+    lines : list
+
+    """
+    merged = list(dict.fromkeys([l for l in lines + new_lines if l.strip() != ""]))
+    try:
+        field = _nu_field(header)
+        if field is not None:
+            merged.sort(key = lambda l: float(l[field[0]:field[1]]))
+    except (KeyError, ValueError):
+        pass
+    return merged
+
+
+def _read_lines(paf):
+    if not paf.is_file():
+        return []
+    with open(paf, "r") as f:
+        return f.read().splitlines()
+
+
+def _drop_table(tablename):
+    """
+    Remove a table from `hapi.LOCAL_TABLE_CACHE`. HAPI keeps the data file open and `hapi.storage2cache` would read from the old file.
+    """
+    entry = hapi.LOCAL_TABLE_CACHE.pop(tablename, None)
+    if entry is not None and dict.get(entry, "filehandler") is not None:
+        entry["filehandler"].close()
+
+
+def fetch(db_path, tablename, components, numin, numax, replace = False, verbose = 0):
+    """
+    Download the lines of the components in [numin, numax] that are not in the table yet, and add them to the table.
+
+    Arguments
+    ---------
+    db_path : pathlib.Path
+        The folder of the database. This should be the folder of HAPI.
+    tablename : str
+        Name of the table.
+    components : list
+        (M, I) or (M, I, abundance).
+    numin, numax : number
+        The wavenumber range.
+
+    Keyword Arguments
+    -----------------
+    replace : bool (False)
+        If True, the table is removed and the whole range is downloaded.
+
+    Returns
+    -------
+    requests : list
+        The downloads that were done, see `fetch_requests`. If it is empty, nothing was downloaded and the table was not changed.
+
+    Notes
+    -----
+    After a download, the table is loaded in `hapi.LOCAL_TABLE_CACHE` with `hapi.storage2cache`. The sidecar of the table (see `hitran_storage`) is not updated.
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_fetch.fetch()")
+
+    db_path = pathlib.Path(db_path)
+    data_path, header_path = HS.table_paths(db_path, tablename)
+
+    if replace:
+        coverage = {}
+        lines = []
+    else:
+        # without coverage, the lines in the file are kept, but their range is not known
+        coverage = read_coverage(db_path, tablename) or {}
+        lines = _read_lines(data_path)
+
+    requests = fetch_requests(coverage, components, numin, numax)
+    if len(requests) == 0:
+        if verbose > 0:
+            print("SpectraTools.Resources.hitran_fetch.fetch(): no need to download data")
+        return requests
+
+    header = None
+    if header_path.is_file() and not replace:
+        with open(header_path, "r") as f:
+            header = json.load(f)
+
+    fetch_name = tablename + FETCH_SUFFIX
+    try:
+        for (a, b), MIs in requests:
+            if verbose > 0:
+                print("SpectraTools.Resources.hitran_fetch.fetch(): downloading {:} from {:} to {:}".format(MIs, a, b))
+            _drop_table(fetch_name)
+            hapi.fetch_by_ids(fetch_name, [hapi.ISO[MI][hapi.ISO_INDEX["id"]] for MI in MIs], a, b)
+            fetch_data_path = db_path.joinpath("{:s}.data".format(fetch_name))
+            if header is None:
+                with open(db_path.joinpath("{:s}.header".format(fetch_name)), "r") as f:
+                    header = json.load(f)
+                header["table_name"] = tablename
+            lines = merge_lines(lines, _read_lines(fetch_data_path), header)
+            for MI in MIs:
+                coverage.setdefault(MI, []).append([a, b])
+    finally:
+        _drop_table(fetch_name)
+        for ext in ["data", "header"]:
+            paf = db_path.joinpath("{:s}.{:s}".format(fetch_name, ext))
+            if paf.is_file():
+                paf.unlink()
+
+    data_path = db_path.joinpath("{:s}.data".format(tablename))
+    header["number_of_rows"] = len(lines)
+    for paf, content in [(data_path, "".join(l + "\n" for l in lines)), (header_path, json.dumps(header, indent = 2))]:
+        tmp = paf.with_name("{:s}.{:d}.tmp".format(paf.name, os.getpid()))
+        with open(tmp, "w") as f:
+            f.write(content)
+        os.replace(tmp, paf)
+    write_coverage(db_path, tablename, coverage)
+
+    _drop_table(tablename)
+    hapi.storage2cache(tablename)
+    return requests
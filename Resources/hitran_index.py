@@ -0,0 +1,183 @@
+"""
+Index of the lines of HITRAN tables.
+
+To select the lines of some components in a wavenumber range, all rows of a table have to be checked. `LineIndex` sorts the lines of a table by wavenumber once, and divides them in partitions, one for each (molec_id, local_iso_id). The lines of a component in a range are then found with `numpy.searchsorted` in the partition of that component.
+
+The index is kept as long as the table in `hapi.LOCAL_TABLE_CACHE` does not change. A table is considered changed if the `nu` column is replaced by another array (as HAPI and `hitran_storage` do when they load a table) or if the number of rows changes. Changes to the values in the `nu` column itself are not detected, use `get_index(..., rebuild = True)` after such changes.
+
+Example
+-------
+::
+
+    index = get_index("CO2")
+    rows = index.rows(components = [(2, 1)], nu_min = 2000, nu_max = 2100)
+    nu = hapi.LOCAL_TABLE_CACHE["CO2"]["data"]["nu"][rows]
+
+"""
+
+import importlib
+import weakref
+
+import numpy
+
+import hapi
+
+importlib.reload(hapi)
+
+
+
+class LineIndex(object):
+    """
+    Lines of a table sorted by wavenumber, per component.
+
+    Attributes
+    ----------
+    tablename : str
+    n_rows : int
+        Number of lines in the table.
+    nu : ndarray
+        The wavenumbers, sorted.
+    partitions : dict
+        Key is (M, I), value is a tuple (nu, rows) with the sorted wavenumbers and the row numbers of the lines of the component.
+
+    """
+
+    def __init__(self, tablename, verbose = 0):
+        if verbose > 1:
+            print("SpectraTools.Resources.hitran_index.LineIndex.__init__()")
+        self.verbose = verbose
+        self.tablename = tablename
+        self.extremes_cache = {}
+
+        table = hapi.LOCAL_TABLE_CACHE[tablename]
+        data = table["data"]
+        column = data["nu"]
+        self.n_rows = table["header"]["number_of_rows"]
+        try:
+            self.column = weakref.ref(column)
+        except TypeError:
+            # for example a list: the index is not reused
+            self.column = None
+
+        nu = numpy.asarray(numpy.ma.getdata(column), dtype = float)
+        order = numpy.argsort(nu, kind = "stable")
+        self.nu = nu[order]
+
+        M = numpy.asarray(numpy.ma.getdata(data["molec_id"]))[order]
+        I = numpy.asarray(numpy.ma.getdata(data["local_iso_id"]))[order]
+        self.partitions = {}
+        if len(order) > 0:
+            keys, inverse = numpy.unique(numpy.stack((M, I), axis = 1), axis = 0, return_inverse = True)
+            inverse = inverse.ravel()
+            # stable: the rows of a partition stay sorted by wavenumber
+            by_partition = numpy.argsort(inverse, kind = "stable")
+            bounds = numpy.searchsorted(inverse[by_partition], numpy.arange(len(keys) + 1))
+            for i, (m, iso) in enumerate(keys):
+                idx = by_partition[bounds[i]:bounds[i+1]]
+                self.partitions[(int(m), int(iso))] = (self.nu[idx], order[idx])
+
+    def is_current(self):
+        """
+        True if the index belongs to the table that is currently in `hapi.LOCAL_TABLE_CACHE`.
+        """
+        if self.column is None:
+            return False
+        table = hapi.LOCAL_TABLE_CACHE.get(self.tablename)
+        if table is None:
+            return False
+        return self.column() is table["data"]["nu"] and table["header"]["number_of_rows"] == self.n_rows
+
+    def nu_range(self):
+        """
+        The lowest and highest wavenumber. For a table without lines, (None, None).
+        """
+        if self.n_rows == 0:
+            return None, None
+        return self.nu[0], self.nu[-1]
+
+    def components(self):
+        """
+        The (M, I) of the components in the table.
+        """
+        return list(self.partitions.keys())
+
+    def rows(self, components = None, nu_min = None, nu_max = None):
+        """
+        The lines of components in a wavenumber range.
+
+        Keyword Arguments
+        -----------------
+        components : list
+            (M, I) of the components. If None, all components.
+        nu_min, nu_max : number
+            The range, including the limits. If None, there is no limit.
+
+        Returns
+        -------
+        rows : ndarray
+            The row numbers, in the order of the table.
+
+        """
+        if components is None:
+            components = self.components()
+        rows = []
+        for MI in components:
+            MI = (int(MI[0]), int(MI[1]))
+            if MI not in self.partitions:
+                continue
+            nu, r = self.partitions[MI]
+            a = 0 if nu_min is None else numpy.searchsorted(nu, nu_min, side = "left")
+            b = len(nu) if nu_max is None else numpy.searchsorted(nu, nu_max, side = "right")
+            rows.append(r[a:b])
+        if len(rows) == 0:
+            return numpy.zeros(0, dtype = int)
+        return numpy.sort(numpy.concatenate(rows))
+
+    def extremes(self, column, components = None):
+        """
+        The lowest and highest value of a column for the lines of some components. Masked values are used as zero. The result is cached.
+
+        Returns
+        -------
+        extremes : tuple
+            (min, max), or None if there are no lines or no such column.
+
+        """
+        if components is None:
+            components = self.components()
+        components = tuple(sorted((int(M), int(I)) for M, I in components if (int(M), int(I)) in self.partitions))
+        key = (column, components)
+        if key not in self.extremes_cache:
+            data = hapi.LOCAL_TABLE_CACHE[self.tablename]["data"]
+            if column not in data or len(components) == 0:
+                self.extremes_cache[key] = None
+            else:
+                col = data[column]
+                if numpy.ma.isMaskedArray(col):
+                    col = col.filled(0)
+                col = numpy.asarray(col)
+                values = col[numpy.concatenate([self.partitions[MI][1] for MI in components])]
+                self.extremes_cache[key] = (numpy.amin(values), numpy.amax(values))
+        return self.extremes_cache[key]
+
+
+# one index per table
+INDEXES = {}
+
+def get_index(tablename, rebuild = False, verbose = 0):
+    """
+    Get the `LineIndex` of a table in `hapi.LOCAL_TABLE_CACHE`. It is made if it does not exist or if the table has changed.
+
+    Raises
+    ------
+    KeyError
+        If the table is not in `hapi.LOCAL_TABLE_CACHE`.
+
+    """
+    if tablename not in hapi.LOCAL_TABLE_CACHE:
+        raise KeyError("SpectraTools.Resources.hitran_index.get_index(): no table '{:}'".format(tablename))
+    index = INDEXES.get(tablename)
+    if rebuild or index is None or not index.is_current():
+        index = LineIndex(tablename, verbose = verbose)
+        INDEXES[tablename] = index
+    return index
@@ -0,0 +1,333 @@
+"""
+Lookup tables with absorption coefficients on a grid of temperatures and pressures.
+
+A line-by-line calculation takes too long to calculate many spectra per second. `build` calculates the absorption coefficient of each component for all combinations of the temperatures and pressures of a grid (with `hitran_xsect.absorption_coefficients`). `LookupTable.interpolate` then calculates the absorption coefficient at any temperature and pressure within the grid by interpolation: linear in the pressure and linear in the logarithm of the temperature. This only takes a few additions of arrays.
+
+The absorption coefficients are in HITRAN units (cm2/molecule). Multiply with `hapi.volumeConcentration(p, T)` for cm-1.
+
+The error of the interpolation depends on the spacing of the grid. `diagnostics` compares the interpolation with the direct calculation, by default in the middle of the cells of the grid, where the error is largest.
+
+A table is saved with `LookupTable.save` as a `.npz` file and read with `load`.
+
+Example
+-------
+::
+
+    table = build("CO2", T = [250, 275, 300], p = [0.5, 1, 1.5], components = [(2, 1)], OmegaStep = 0.01)
+    Xsect = table.interpolate(280, 0.8)
+    errors = diagnostics(table, "CO2", OmegaStep = 0.01)
+
+"""
+
+import importlib
+import json
+import os
+import pathlib
+import time
+
+import numpy
+
+import SpectraTools.Resources.hitran_xsect as HX
+
+importlib.reload(HX)
+
+LOOKUP_EXTENSION = "npz"
+LOOKUP_VERSION = 1
+
+
+
+def _interval(grid, value, log = False):
+    """
+    The grid points around `value` and the weight of the upper point.
+
+    Returns
+    -------
+    i : int
+        `value` is between `grid[i]` and `grid[i+1]`.
+    w : float
+        The weight of `grid[i+1]`. For a grid with one point, i = 0 and w = 0.
+
+    """
+    if len(grid) == 1:
+        if value != grid[0]:
+            raise ValueError("SpectraTools.Resources.hitran_lookup._interval(): {:} is not on the grid {:}".format(value, grid))
+        return 0, 0.0
+    if value < grid[0] or value > grid[-1]:
+        raise ValueError("SpectraTools.Resources.hitran_lookup._interval(): {:} is outside the grid ({:} to {:})".format(value, grid[0], grid[-1]))
+    i = min(numpy.searchsorted(grid, value, side = "right") - 1, len(grid) - 2)
+    if log:
+        w = (numpy.log(value) - numpy.log(grid[i])) / (numpy.log(grid[i+1]) - numpy.log(grid[i]))
+    else:
+        w = (value - grid[i]) / (grid[i+1] - grid[i])
+    return i, float(w)
+
+
+class LookupTable(object):
+    """
+    Absorption coefficients on a (T, p) grid, for each component.
+
+    Attributes
+    ----------
+    Omegas : ndarray
+        The wavenumber grid.
+    T : ndarray
+        The temperatures (K), sorted.
+    p : ndarray
+        The pressures (atm), sorted.
+    components : list
+        (M, I) or (M, I, abundance).
+    xsect : ndarray
+        The absorption coefficients in cm2/molecule, with shape (components, T, p, wavenumbers).
+    line_profile : str
+    stats : dict
+        Statistics of the build: `n_spectra`, `build_time` (s), `time_per_spectrum` (s) and `size` (bytes).
+
+    """
+
+    def __init__(self, Omegas, T, p, components, xsect, line_profile = "Voigt", stats = None, verbose = 0):
+        self.verbose = verbose
+        self.Omegas = numpy.asarray(Omegas)
+        self.T = numpy.asarray(T, dtype = float)
+        self.p = numpy.asarray(p, dtype = float)
+        self.components = [tuple(c) for c in components]
+        self.xsect = numpy.asarray(xsect)
+        self.line_profile = line_profile
+        self.stats = {} if stats is None else stats
+
+        if self.xsect.shape != (len(self.components), len(self.T), len(self.p), len(self.Omegas)):
+            raise ValueError("SpectraTools.Resources.hitran_lookup.LookupTable.__init__(): the shape of xsect {:} does not match the grid".format(self.xsect.shape))
+
+    def component_index(self, components = None):
+        """
+        The indices of components, with (M, I) or (M, I, abundance). If None, all components.
+        """
+        if components is None:
+            return list(range(len(self.components)))
+        MIs = [(int(c[0]), int(c[1])) for c in self.components]
+        index = []
+        for c in components:
+            MI = (int(c[0]), int(c[1]))
+            if MI not in MIs:
+                raise ValueError("SpectraTools.Resources.hitran_lookup.LookupTable.component_index(): {:} is not in the table".format(MI))
+            index.append(MIs.index(MI))
+        return index
+
+    def weights(self, T, p):
+        """
+        The grid points and weights for the interpolation at T and p.
+
+        Returns
+        -------
+        weights : list
+            List of (i_T, i_p, weight), only for weights that are not zero.
+
+        """
+        iT, wT = _interval(self.T, T, log = True)
+        ip, wp = _interval(self.p, p)
+        weights = []
+        for dT, fT in [(0, 1 - wT), (1, wT)]:
+            for dp, fp in [(0, 1 - wp), (1, wp)]:
+                if fT * fp != 0:
+                    weights.append((iT + dT, ip + dp, fT * fp))
+        return weights
+
+    def interpolate(self, T, p, components = None):
+        """
+        The absorption coefficient at T and p.
+
+        Arguments
+        ---------
+        T : number
+            Temperature in K, within the grid.
+        p : number
+            Pressure in atm, within the grid.
+
+        Keyword Arguments
+        -----------------
+        components : list (None)
+            Only use these components. If None, all components.
+
+        Returns
+        -------
+        Xsect : ndarray
+            The sum of the absorption coefficients of the components in cm2/molecule.
+
+        """
+        index = self.component_index(components)
+        Xsect = numpy.zeros(len(self.Omegas))
+        for iT, ip, w in self.weights(T, p):
+            for k in index:
+                Xsect += w * self.xsect[k, iT, ip]
+        return Xsect
+
+    def save(self, paf):
+        """
+        Save the table as a `.npz` file. The file is replaced at once, a table that is being read is not affected.
+        """
+        paf = pathlib.Path(paf)
+        paf.parent.mkdir(parents = True, exist_ok = True)
+        tmp = paf.with_name("{:s}.{:d}.tmp.{:s}".format(paf.stem, os.getpid(), LOOKUP_EXTENSION))
+        info = {
+            "version": LOOKUP_VERSION,
+            "components": [list(c) for c in self.components],
+            "line_profile": self.line_profile,
+            "stats": self.stats,
+        }
+        numpy.savez(tmp, Omegas = self.Omegas, T = self.T, p = self.p, xsect = self.xsect, info = numpy.array(json.dumps(info)))
+        os.replace(tmp, paf)
+
+
+def load(paf, verbose = 0):
+    """
+    Read a table that was saved with `LookupTable.save`.
+
+    Returns
+    -------
+    table : LookupTable
+        None if the file does not exist or can not be read.
+
+    """
+    try:
+        with numpy.load(paf) as f:
+            info = json.loads(str(f["info"]))
+            if info.get("version") != LOOKUP_VERSION:
+                return None
+            return LookupTable(f["Omegas"], f["T"], f["p"], info["components"], f["xsect"], line_profile = info["line_profile"], stats = info["stats"], verbose = verbose)
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def build(tablename, T, p, components, line_profile = "Voigt", processes = None, cpf = None, verbose = 0, **kwargs):
+    """
+    Calculate a lookup table.
+
+    Arguments
+    ---------
+    tablename : str
+        Name of the table in `hapi.LOCAL_TABLE_CACHE`.
+    T : list
+        Temperatures in K.
+    p : list
+        Pressures in atm.
+    components : list
+        (M, I) or (M, I, abundance).
+
+    Keyword Arguments
+    -----------------
+    line_profile : str {'Voigt', 'Lorentz', 'Doppler', 'HT', 'default'}
+        The line profile.
+    processes : int (None)
+        Number of processes, see `hitran_xsect.absorption_coefficients`.
+    cpf : str or function (None)
+        Complex probability function, see `hitran_cpf.get_cpf`. If None, `hapi.VARIABLES['CPF']` is used.
+
+    For the other keyword arguments, see `hitran_xsect.absorption_coefficient`. `HITRAN_units` and `Environments` can not be used.
+
+    Returns
+    -------
+    table : LookupTable
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_lookup.build()")
+
+    T = numpy.unique(numpy.asarray(T, dtype = float))
+    p = numpy.unique(numpy.asarray(p, dtype = float))
+    if len(T) == 0 or len(p) == 0 or numpy.any(T <= 0):
+        raise ValueError("SpectraTools.Resources.hitran_lookup.build(): the grid needs at least one temperature (larger than 0) and one pressure")
+
+    environments = [{"T": _T, "p": _p} for _T in T for _p in p]
+
+    t0 = time.perf_counter()
+    xsect = []
+    for component in components:
+        Omegas, c = HX.absorption_coefficients(line_profile, Environments = environments, processes = processes, Components = [component], SourceTables = tablename, HITRAN_units = True, cpf = cpf, verbose = verbose, **kwargs)
+        xsect.append(c.reshape((len(T), len(p), len(Omegas))))
+    build_time = time.perf_counter() - t0
+    xsect = numpy.array(xsect)
+
+    stats = {
+        "n_spectra": len(components) * len(environments),
+        "build_time": build_time,
+        "time_per_spectrum": build_time / (len(components) * len(environments)),
+        "size": int(xsect.nbytes),
+    }
+    if verbose > 0:
+        print("SpectraTools.Resources.hitran_lookup.build(): {:d} spectra in {:.3f} s".format(stats["n_spectra"], build_time))
+
+    return LookupTable(Omegas, T, p, components, xsect, line_profile = line_profile, stats = stats, verbose = verbose)
+
+
+def cell_centers(table):
+    """
+    The environments in the middle of the cells of the grid (in log(T) and p), where the error of the interpolation is largest. For a grid with one temperature or pressure, the grid point is used.
+    """
+    if len(table.T) > 1:
+        T = numpy.exp((numpy.log(table.T[:-1]) + numpy.log(table.T[1:])) / 2)
+    else:
+        T = table.T
+    if len(table.p) > 1:
+        p = (table.p[:-1] + table.p[1:]) / 2
+    else:
+        p = table.p
+    return [{"T": float(_T), "p": float(_p)} for _T in T for _p in p]
+
+
+def diagnostics(table, tablename, environments = None, processes = None, verbose = 0, **kwargs):
+    """
+    Compare the interpolation with the direct calculation.
+
+    Arguments
+    ---------
+    table : LookupTable
+    tablename : str
+        Name of the table in `hapi.LOCAL_TABLE_CACHE`.
+
+    Keyword Arguments
+    -----------------
+    environments : list of dicts (None)
+        With `T` and `p`. If None, the centers of the cells (see `cell_centers`).
+    processes : int (None)
+        Number of processes for the direct calculation.
+
+    The other keyword arguments should be the same as for `build`.
+
+    Returns
+    -------
+    result : dict
+        `environments`, `max_abs_error` and `max_rel_error` (relative to the maximum of the direct calculation) for each environment, the largest relative error (`max_rel_error_all`), `time_direct` and `time_lookup` (s, per spectrum) and `speedup`.
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_lookup.diagnostics()")
+
+    if environments is None:
+        environments = cell_centers(table)
+
+    # the same grid as the table
+    kwargs = {k: v for k, v in kwargs.items() if k not in ["OmegaGrid", "WavenumberGrid"]}
+
+    t0 = time.perf_counter()
+    Omegas, direct = HX.absorption_coefficients(table.line_profile, Environments = environments, processes = processes, Components = table.components, SourceTables = tablename, HITRAN_units = True, OmegaGrid = table.Omegas, verbose = verbose, **kwargs)
+    t1 = time.perf_counter()
+    lookup = numpy.array([table.interpolate(env["T"], env["p"]) for env in environments])
+    t2 = time.perf_counter()
+
+    max_abs_error = numpy.amax(numpy.abs(lookup - direct), axis = 1)
+    max_rel_error = max_abs_error / numpy.amax(numpy.abs(direct), axis = 1)
+    result = {
+        "environments": environments,
+        "max_abs_error": max_abs_error,
+        "max_rel_error": max_rel_error,
+        "max_rel_error_all": numpy.amax(max_rel_error),
+        "time_direct": (t1 - t0) / len(environments),
+        "time_lookup": (t2 - t1) / len(environments),
+        "speedup": (t1 - t0) / (t2 - t1),
+    }
+
+    if verbose > 0:
+        for env, e in zip(environments, max_rel_error):
+            print("  T = {:} K, p = {:} atm: max. rel. error {:.2e}".format(env["T"], env["p"], e))
+        print("  speedup: {:.1f}".format(result["speedup"]))
+
+    return result
@@ -0,0 +1,595 @@
+"""
+Column-based queries on HAPI tables.
+
+`hapi.select`, `hapi.selectInto` and `hapi.filter` evaluate the conditions row by row: for every row a row object and a dictionary with the values are made and the condition is evaluated recursively. The functions in this module take the same arguments, but evaluate the conditions once for whole columns, with numpy. The result is a boolean mask and the destination table is made by indexing the columns with it.
+
+The condition syntax is the same as in HAPI, for example::
+
+    ('and', ('>=', 'nu', 2000), ('<', 'nu', 2100), ('>', 'sw', 1e-22))
+
+Supported are the logical operators (AND, OR, NOT), comparisons (<, >, <=, >=, ==, != and their aliases, also chained), RANGE/BETWEEN, IN/SUBSET, arithmetic (+, -, *, /), MATCH/LIKE, STR and SET, and column names (including `LineNumber`). For expressions that can not be evaluated for whole columns (SEARCH, FINDALL, COUNT), the HAPI functions are used.
+
+`sort` and `group` replace `hapi.sort` (a recursive quick sort that compares row objects) and `hapi.group`. `sort` uses `numpy.lexsort`, with the same order as HAPI. `group` makes one row per group, with the group functions COUNT, SUM, AVG, MIN, MAX and SSQ (sum of squares), for example::
+
+    group('CO2', ParameterNames = ('local_iso_id', ('count', 'nu'), ('let', 'S', ('sum', 'sw'))), GroupParameterNames = ('local_iso_id',))
+
+"""
+
+import copy
+import importlib
+import re
+
+import numpy
+
+import hapi
+
+importlib.reload(hapi)
+
+QUERY_BUFFER = hapi.QUERY_BUFFER
+
+# aliases of the operators, as in hapi.OPERATORS
+OPERATOR_ALIASES = {
+    "AND": ["&", "&&", "AND"],
+    "OR": ["|", "||", "OR"],
+    "NOT": ["!", "NOT"],
+    "RANGE": ["RANGE", "BETWEEN"],
+    "IN": ["IN", "SUBSET"],
+    "LESS": ["<", "LESS", "LT"],
+    "MORE": [">", "MORE", "MT"],
+    "LESSOREQUAL": ["<=", "LESSOREQUAL", "LTE"],
+    "MOREOREQUAL": [">=", "MOREOREQUAL", "MTE"],
+    "EQUAL": ["=", "==", "EQ", "EQUAL", "EQUALS"],
+    "NOTEQUAL": ["!=", "<>", "~=", "NE", "NOTEQUAL"],
+    "SUM": ["+", "SUM"],
+    "DIFF": ["-", "DIFF"],
+    "MUL": ["*", "MUL"],
+    "DIV": ["/", "DIV"],
+    "MATCH": ["MATCH", "LIKE"],
+    "LIST": ["LIST"],
+}
+OPERATORS = {alias: name for name, aliases in OPERATOR_ALIASES.items() for alias in aliases}
+
+# functions of a group, see `group`
+GROUP_FUNCTIONS = ["COUNT", "SUM", "AVG", "MIN", "MAX", "SSQ"]
+
+
+
+class UnsupportedExpression(ValueError):
+    """
+    The expression can not be evaluated for whole columns.
+    """
+    pass
+
+
+def _is_str(x):
+    if isinstance(x, str):
+        return True
+    return isinstance(x, numpy.ndarray) and x.dtype.kind in "US"
+
+
+def _truth(x):
+    """
+    Truth value, element-wise: as `bool(x)` in Python.
+    """
+    if isinstance(x, numpy.ndarray):
+        if x.dtype.kind in "US":
+            return numpy.char.str_len(x) > 0
+        return x.astype(bool)
+    return bool(x)
+
+
+def _compare(args, function):
+    """
+    Chained comparison: `function` should be True for each pair of consecutive arguments.
+    """
+    result = True
+    for i in range(1, len(args)):
+        result = numpy.logical_and(result, function(args[i-1], args[i]))
+    return result
+
+
+def _elementwise(function, *args):
+    """
+    Apply a Python function to each element of the arguments (with broadcasting).
+    """
+    if not any(isinstance(a, numpy.ndarray) for a in args):
+        return function(*args)
+    arrays = numpy.broadcast_arrays(*[numpy.asarray(a, dtype = object) for a in args])
+    return numpy.array([function(*values) for values in zip(*[a.ravel() for a in arrays])], dtype = object).reshape(arrays[0].shape)
+
+
+def evaluate(root, columns, n_rows, aggregate = None):
+    """
+    Evaluate an expression in the HAPI condition syntax for all rows at once.
+
+    Arguments
+    ---------
+    root : tuple, str or number
+        The expression. A string is the name of a column.
+    columns : dict
+        The columns of the table, as ndarrays.
+    n_rows : int
+        Number of rows in the table.
+
+    Keyword Arguments
+    -----------------
+    aggregate : function
+        Used by `group`: called with the name of the group function and its arguments, for the group functions (see `GROUP_FUNCTIONS`; SUM with one argument).
+
+    Returns
+    -------
+    value : ndarray or constant
+        An ndarray with one value per row, or a constant if the expression does not depend on the columns.
+
+    """
+    if type(root) in [list, tuple]:
+        head = root[0].upper()
+        if head in ["STR", "STRING"]:
+            if type(root[1]) != str:
+                raise Exception("Type mismatch: STR")
+            return root[1]
+        if head == "SET":
+            if type(root[1]) not in [list, tuple, set]:
+                raise Exception("Type mismatch: SET")
+            return list(root[1])
+        if aggregate is not None and head in GROUP_FUNCTIONS and (head != "SUM" or len(root) == 2):
+            return aggregate(head, root[1:])
+        if head not in OPERATORS:
+            if head in hapi.OPERATORS:
+                raise UnsupportedExpression("SpectraTools.Resources.hitran_query.evaluate(): {:} can not be evaluated for columns".format(head))
+            raise Exception("Unknown operator: {:}".format(head))
+
+        args = [evaluate(element, columns, n_rows, aggregate) for element in root[1:]]
+        operator = OPERATORS[head]
+
+        if operator == "LIST":
+            return args
+        elif operator == "AND":
+            result = True
+            for arg in args:
+                result = numpy.logical_and(result, _truth(arg))
+            return result
+        elif operator == "OR":
+            result = False
+            for arg in args:
+                result = numpy.logical_or(result, _truth(arg))
+            return result
+        elif operator == "NOT":
+            return numpy.logical_not(_truth(args[0]))
+        elif operator == "RANGE":
+            return numpy.logical_and(numpy.less_equal(args[1], args[0]), numpy.less_equal(args[0], args[2]))
+        elif operator == "IN":
+            if type(args[1]) in [list, tuple, set]:
+                return numpy.isin(args[0], list(args[1]))
+            return numpy.asarray(_elementwise(lambda a, b: a in b, args[0], args[1])).astype(bool)
+        # the comparisons are written as in HAPI, for the same result with NaN
+        elif operator == "LESS":
+            return _compare(args, lambda a, b: numpy.logical_not(numpy.greater_equal(a, b)))
+        elif operator == "MORE":
+            return _compare(args, lambda a, b: numpy.logical_not(numpy.less_equal(a, b)))
+        elif operator == "LESSOREQUAL":
+            return _compare(args, lambda a, b: numpy.logical_not(numpy.greater(a, b)))
+        elif operator == "MOREOREQUAL":
+            return _compare(args, lambda a, b: numpy.logical_not(numpy.less(a, b)))
+        elif operator == "EQUAL":
+            return _compare(args, lambda a, b: numpy.logical_not(numpy.not_equal(a, b)))
+        elif operator == "NOTEQUAL":
+            return numpy.not_equal(args[0], args[1])
+        elif operator == "SUM":
+            if _is_str(args[0]):
+                result = args[0]
+                for arg in args[1:]:
+                    result = numpy.char.add(result, arg)
+                return result
+            result = args[0]
+            for arg in args[1:]:
+                result = result + arg
+            return result
+        elif operator == "DIFF":
+            return args[0] - args[1]
+        elif operator == "MUL":
+            result = args[0]
+            for arg in args[1:]:
+                result = result * arg
+            return result
+        elif operator == "DIV":
+            return args[0] / args[1]
+        elif operator == "MATCH":
+            return numpy.asarray(_elementwise(lambda a, b: bool(re.search(a, b)), args[0], args[1])).astype(bool)
+
+    elif type(root) == str:
+        if root == "LineNumber" and root not in columns:
+            return numpy.arange(n_rows)
+        return columns[root]
+
+    return root
+
+
+def table_columns(TableName):
+    """
+    The columns of a table as ndarrays. Masked values are not used: for masked arrays the underlying data is used.
+    """
+    data = hapi.LOCAL_TABLE_CACHE[TableName]["data"]
+    return {k: numpy.ma.getdata(numpy.asarray(v) if type(v) == list else v) for k, v in data.items()}
+
+
+def condition_mask(TableName, Conditions):
+    """
+    Evaluate `Conditions` for all rows of a table.
+
+    Returns
+    -------
+    mask : ndarray
+        Boolean, True for the rows that fulfill the conditions.
+
+    """
+    n_rows = hapi.LOCAL_TABLE_CACHE[TableName]["header"]["number_of_rows"]
+    if not Conditions:
+        return numpy.ones(n_rows, dtype = bool)
+    mask = _truth(evaluate(Conditions, table_columns(TableName), n_rows))
+    return numpy.array(numpy.broadcast_to(mask, (n_rows,)))
+
+
+def parameter_columns(TableName, ParameterNames, mask):
+    """
+    The columns of the destination table, for the rows in `mask`.
+
+    Returns
+    -------
+    names : list
+        Names of the columns: the parameter name, the name of a LET/BIND expression or '#N' for other expressions (as in `hapi.newRowObject`).
+    columns : list
+        ndarrays.
+
+    """
+    data = hapi.LOCAL_TABLE_CACHE[TableName]["data"]
+    n_rows = hapi.LOCAL_TABLE_CACHE[TableName]["header"]["number_of_rows"]
+    n_selected = int(numpy.sum(mask))
+    names = []
+    columns = []
+    anoncount = 0
+    source = None
+    for expr in ParameterNames:
+        if type(expr) in [list, tuple]:
+            head = expr[0]
+            if head in ["let", "bind", "LET", "BIND"]:
+                par_name = expr[1]
+                par_expr = expr[2]
+            else:
+                par_name = "#{:d}".format(anoncount)
+                anoncount += 1
+                par_expr = expr
+            if source is None:
+                source = table_columns(TableName)
+            value = evaluate(par_expr, source, n_rows)
+            if isinstance(value, numpy.ndarray) and numpy.shape(value) == (n_rows,):
+                column = value[mask]
+            else:
+                column = numpy.array([value] * n_selected)
+        else:
+            par_name = expr
+            column = data[par_name]
+            if type(column) == list:
+                column = numpy.asarray(column)
+            column = column[mask]
+        names.append(par_name)
+        columns.append(column)
+    return names, columns
+
+
+def selectInto(DestinationTableName, TableName, ParameterNames, Conditions):
+    """
+    Add the rows of `TableName` that fulfill `Conditions` to the existing table `DestinationTableName`. Same as `hapi.selectInto`.
+    """
+    if DestinationTableName == TableName:
+        raise Exception("Selecting into source table is forbidden")
+
+    try:
+        mask = condition_mask(TableName, Conditions)
+        names, columns = parameter_columns(TableName, ParameterNames, mask)
+    except UnsupportedExpression:
+        # HAPI adds the rows to lists
+        data = hapi.LOCAL_TABLE_CACHE[DestinationTableName]["data"]
+        for par_name in data:
+            data[par_name] = list(data[par_name])
+        return hapi.selectInto(DestinationTableName, TableName, ParameterNames, Conditions)
+
+    destination = hapi.LOCAL_TABLE_CACHE[DestinationTableName]
+    for par_name, column in zip(names, columns):
+        existing = destination["data"][par_name]
+        if len(existing) == 0:
+            destination["data"][par_name] = column
+        elif numpy.ma.isMaskedArray(existing) or numpy.ma.isMaskedArray(column):
+            destination["data"][par_name] = numpy.ma.concatenate((existing, column))
+        else:
+            destination["data"][par_name] = numpy.concatenate((numpy.asarray(existing), column))
+    destination["header"]["number_of_rows"] += int(numpy.sum(mask))
+
+
+def select(TableName, DestinationTableName = QUERY_BUFFER, ParameterNames = None, Conditions = None, Output = True, File = None):
+    """
+    Select rows and columns from a table. Same as `hapi.select`, but the conditions are evaluated for whole columns.
+
+    Arguments
+    ---------
+    TableName : str
+        Name of the source table.
+
+    Keyword Arguments
+    -----------------
+    DestinationTableName : str
+        Name of the resulting table.
+    ParameterNames : list
+        Names of the columns or expressions. If None, all columns.
+    Conditions : tuple
+        Logical expression, for example `('and', ('>=', 'nu', 2000), ('<', 'nu', 2100))`.
+    Output : bool
+        If True and the destination is the query buffer, the result is printed.
+    File : str
+        Write the result to this file.
+
+    """
+    if TableName not in hapi.LOCAL_TABLE_CACHE.keys():
+        raise Exception("%s: no such table. Check tableList() for more info." % TableName)
+    if not ParameterNames:
+        ParameterNames = hapi.LOCAL_TABLE_CACHE[TableName]["header"]["order"]
+
+    # the header of the new table, from the default values (as HAPI does)
+    RowObjectDefault = hapi.getDefaultRowObject(TableName)
+    VarDictionary = hapi.getVarDictionary(RowObjectDefault)
+    ContextFormat = hapi.getContextFormat(RowObjectDefault)
+    RowObjectDefaultNew = hapi.newRowObject(ParameterNames, RowObjectDefault, VarDictionary, ContextFormat)
+    hapi.dropTable(DestinationTableName)
+    hapi.createTable(DestinationTableName, RowObjectDefaultNew)
+
+    selectInto(DestinationTableName, TableName, ParameterNames, Conditions)
+
+    if DestinationTableName != QUERY_BUFFER:
+        if File:
+            hapi.outputTable(DestinationTableName, File = File)
+    elif Output:
+        hapi.outputTable(DestinationTableName, File = File)
+
+
+def filter(TableName, Conditions):
+    """
+    Select the rows that fulfill `Conditions` into the query buffer. Same as `hapi.filter`.
+    """
+    select(TableName = TableName, Conditions = Conditions, Output = False)
+
+
+def _format(column):
+    """
+    Default format and value for a column, from its dtype (as `hapi.getDefaultFormat` and `hapi.getDefaultValue`).
+    """
+    Type = {"i": int, "u": int, "f": float, "b": bool}.get(numpy.asarray(column).dtype.kind, str)
+    return hapi.getDefaultFormat(Type), hapi.getDefaultValue(Type)
+
+
+def sort_index(TableName, ParameterNames, Accending = True):
+    """
+    The order of the rows of a table, sorted by `ParameterNames`.
+
+    Arguments
+    ---------
+    TableName : str
+    ParameterNames : list
+        Names of the columns or expressions. The table is sorted by the first, rows with the same value for the first by the second, etc.
+
+    Keyword Arguments
+    -----------------
+    Accending : bool
+        If False, the order is reversed.
+
+    Returns
+    -------
+    index : ndarray
+
+    Notes
+    -----
+    The sort is stable: rows with the same values keep their order. In descending order, the order is reversed, as with `hapi.sort`.
+
+    """
+    n_rows = hapi.LOCAL_TABLE_CACHE[TableName]["header"]["number_of_rows"]
+    columns = table_columns(TableName)
+    keys = [numpy.broadcast_to(evaluate(p, columns, n_rows), (n_rows,)) for p in ParameterNames]
+    # numpy.lexsort sorts by the last key first
+    index = numpy.lexsort(keys[::-1])
+    if not Accending:
+        index = index[::-1]
+    return index
+
+
+def arrangeTable(TableName, DestinationTableName = None, RowIDList = None):
+    """
+    Put the rows `RowIDList` of a table in `DestinationTableName`. Same as `hapi.arrangeTable`, but the columns stay ndarrays.
+    """
+    if not DestinationTableName:
+        DestinationTableName = TableName
+    source = hapi.LOCAL_TABLE_CACHE[TableName]
+    if DestinationTableName != TableName:
+        hapi.LOCAL_TABLE_CACHE[DestinationTableName] = {"header": copy.deepcopy(source["header"]), "data": {}}
+        hapi.LOCAL_TABLE_CACHE[DestinationTableName]["header"]["table_name"] = DestinationTableName
+    destination = hapi.LOCAL_TABLE_CACHE[DestinationTableName]
+    index = numpy.asarray(RowIDList, dtype = int)
+    destination["header"]["number_of_rows"] = len(index)
+    for par_name in destination["header"]["order"]:
+        column = source["data"][par_name]
+        if type(column) == list:
+            column = numpy.asarray(column)
+        destination["data"][par_name] = column[index]
+
+
+def sort(TableName, DestinationTableName = None, ParameterNames = None, Accending = True, Output = False, File = None):
+    """
+    Sort a table. Same as `hapi.sort`.
+
+    Arguments
+    ---------
+    TableName : str
+        Name of the source table.
+
+    Keyword Arguments
+    -----------------
+    DestinationTableName : str
+        Name of the sorted table. If None, the table itself is sorted.
+    ParameterNames : list
+        Names of the columns or expressions to sort by. If None, all columns.
+    Accending : bool
+        Ascending (True) or descending (False) order.
+    Output : bool
+        Print the sorted table.
+    File : str
+        Write the sorted table to this file (if `Output` is True).
+
+    """
+    if not DestinationTableName:
+        DestinationTableName = TableName
+    if not ParameterNames:
+        ParameterNames = hapi.LOCAL_TABLE_CACHE[TableName]["header"]["order"]
+    elif type(ParameterNames) not in [list, tuple]:
+        ParameterNames = [ParameterNames]
+    index = sort_index(TableName, ParameterNames, Accending = Accending)
+    arrangeTable(TableName, DestinationTableName, index)
+    if Output:
+        hapi.outputTable(DestinationTableName, File = File)
+
+
+def group_index(TableName, GroupParameterNames):
+    """
+    The group of each row of a table.
+
+    Arguments
+    ---------
+    TableName : str
+    GroupParameterNames : list
+        Names of the columns or expressions. Rows with the same values are in the same group. If None, all rows are in one group.
+
+    Returns
+    -------
+    inverse : ndarray
+        The number of the group for each row. The groups are numbered in the order in which they first appear in the table.
+    n_groups : int
+
+    """
+    n_rows = hapi.LOCAL_TABLE_CACHE[TableName]["header"]["number_of_rows"]
+    if n_rows == 0:
+        return numpy.zeros(0, dtype = int), 0
+    if not GroupParameterNames:
+        return numpy.zeros(n_rows, dtype = int), 1
+    if type(GroupParameterNames) not in [list, tuple]:
+        GroupParameterNames = [GroupParameterNames]
+
+    columns = table_columns(TableName)
+    codes = []
+    for p in GroupParameterNames:
+        key = numpy.broadcast_to(evaluate(p, columns, n_rows), (n_rows,))
+        codes.append(numpy.unique(key, return_inverse = True)[1].ravel())
+    __, first, inverse = numpy.unique(numpy.stack(codes, axis = 1), axis = 0, return_index = True, return_inverse = True)
+    inverse = inverse.ravel()
+
+    # number the groups in order of appearance
+    rank = numpy.empty(len(first), dtype = int)
+    rank[numpy.argsort(first, kind = "stable")] = numpy.arange(len(first))
+    return rank[inverse], len(first)
+
+
+def group(TableName, DestinationTableName = QUERY_BUFFER, ParameterNames = None, GroupParameterNames = None, File = None, Output = True):
+    """
+    Group the rows of a table and calculate group functions. This replaces `hapi.group`.
+
+    Arguments
+    ---------
+    TableName : str
+        Name of the source table.
+
+    Keyword Arguments
+    -----------------
+    DestinationTableName : str
+        Name of the resulting table, with one row per group.
+    ParameterNames : list
+        Names of the columns or expressions. Expressions can contain the group functions `('count', ...)`, `('sum', expr)`, `('avg', expr)`, `('min', expr)`, `('max', expr)` and `('ssq', expr)`. For columns outside of group functions the value of the last row of the group is used. If None, all columns.
+    GroupParameterNames : list
+        Names of the columns or expressions to group by. If None, all rows are in one group.
+    Output : bool
+        If True and the destination is the query buffer, the result is printed.
+    File : str
+        Write the result to this file.
+
+    Notes
+    -----
+    The groups are in the order in which they first appear in the table. The names of expressions are as in `select`: the name of LET/BIND or '#N'.
+
+    """
+    if TableName == DestinationTableName:
+        raise Exception("TableName and DestinationTableName must be different")
+    if not ParameterNames:
+        ParameterNames = hapi.LOCAL_TABLE_CACHE[TableName]["header"]["order"]
+
+    source = hapi.LOCAL_TABLE_CACHE[TableName]
+    n_rows = source["header"]["number_of_rows"]
+    inverse, n_groups = group_index(TableName, GroupParameterNames)
+
+    columns = table_columns(TableName)
+    # the last row of each group
+    last = numpy.zeros(n_groups, dtype = int)
+    numpy.maximum.at(last, inverse, numpy.arange(n_rows))
+    group_columns = {k: v[last] for k, v in columns.items()}
+
+    # the rows sorted by group, with the start of each group
+    order = numpy.argsort(inverse, kind = "stable")
+    starts = numpy.searchsorted(inverse[order], numpy.arange(n_groups))
+    count = numpy.bincount(inverse, minlength = n_groups)
+
+    def aggregate(function, args):
+        if function == "COUNT":
+            return count
+        values = numpy.broadcast_to(evaluate(args[0], columns, n_rows), (n_rows,))[order]
+        if n_groups == 0:
+            return values[:0]
+        if function == "SUM":
+            return numpy.add.reduceat(values, starts)
+        elif function == "AVG":
+            return numpy.add.reduceat(values, starts) / count
+        elif function == "MIN":
+            return numpy.minimum.reduceat(values, starts)
+        elif function == "MAX":
+            return numpy.maximum.reduceat(values, starts)
+        elif function == "SSQ":
+            return numpy.add.reduceat(values**2, starts)
+
+    RowObjectDefault = []
+    data = {}
+    anoncount = 0
+    for expr in ParameterNames:
+        if type(expr) in [list, tuple]:
+            head = expr[0]
+            if head in ["let", "bind", "LET", "BIND"]:
+                par_name = expr[1]
+                par_expr = expr[2]
+            else:
+                par_name = "#{:d}".format(anoncount)
+                anoncount += 1
+                par_expr = expr
+            column = numpy.array(numpy.broadcast_to(evaluate(par_expr, group_columns, n_groups, aggregate), (n_groups,)))
+            par_format, par_default = _format(column)
+            if len(expr) > 3:
+                par_format = expr[3]
+        else:
+            par_name = expr
+            column = source["data"][par_name]
+            if type(column) == list:
+                column = numpy.asarray(column)
+            column = column[last]
+            par_format = source["header"]["format"][par_name]
+            par_default = source["header"]["default"][par_name]
+        RowObjectDefault.append((par_name, par_default, par_format))
+        data[par_name] = column
+
+    hapi.dropTable(DestinationTableName)
+    hapi.createTable(DestinationTableName, RowObjectDefault)
+    hapi.LOCAL_TABLE_CACHE[DestinationTableName]["data"] = data
+    hapi.LOCAL_TABLE_CACHE[DestinationTableName]["header"]["number_of_rows"] = n_groups
+
+    if Output and DestinationTableName == QUERY_BUFFER:
+        hapi.outputTable(DestinationTableName, File = File)
@@ -0,0 +1,253 @@
+"""
+Disk cache for calculated HITRAN spectra.
+
+The result of `hitran.calculate_signal` depends only on the table and the arguments. `ResultCache` stores the (x, y) arrays of a calculation in a file with a name that is the hash of the arguments and the fingerprint of the table files (see `hitran_storage.fingerprint`). If the table is changed (for example because new data is fetched), the fingerprint changes and the old results are not used anymore. They are removed when the cache is full: the files that have not been used for the longest time are removed first.
+
+Only the files of the table are used for the fingerprint: changes to the table in `hapi.LOCAL_TABLE_CACHE` that are not saved are not detected.
+
+Example
+-------
+::
+
+    cache = ResultCache(db_path.joinpath("results.npcache"), max_size = 100e6)
+    key = cache.key(HS.fingerprint(db_path, "CO2"), {"environment": {"T": 296, "p": 1}})
+    result = cache.get(key)
+    if result is None:
+        x, y = ...
+        cache.put(key, x, y)
+
+"""
+
+import hashlib
+import importlib
+import os
+import pathlib
+
+import numpy
+
+import SpectraTools.Resources.hitran_tips as TIPS
+
+importlib.reload(TIPS)
+
+RESULT_EXTENSION = "npz"
+RESULT_VERSION = 1
+# the default maximum size (in bytes) of the results in a folder
+RESULT_CACHE_SIZE = 500000000
+
+
+class UnhashableError(ValueError):
+    """
+    An argument can not be used for the key, for example a lambda function.
+    """
+    pass
+
+
+def _code_digest(code):
+    """
+    A hex digest of the bytecode, constants and names of a code object. Nested code objects (for example of a comprehension) are included.
+    """
+    h = hashlib.sha256(code.co_code)
+    for c in code.co_consts:
+        if hasattr(c, "co_code"):
+            h.update(_code_digest(c).encode("utf-8"))
+        else:
+            h.update(repr(c).encode("utf-8"))
+    h.update(repr(code.co_names).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _hashable(value):
+    """
+    Convert `value` to an object with a `repr` that only depends on the content.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, numpy.generic):
+        return value.item()
+    if isinstance(value, numpy.ndarray):
+        value = numpy.ascontiguousarray(value)
+        return ("ndarray", str(value.dtype), value.shape, hashlib.sha256(value.tobytes()).hexdigest())
+    if isinstance(value, dict):
+        return ("dict", sorted((str(k), _hashable(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return ("list", [_hashable(v) for v in value])
+    if isinstance(value, pathlib.PurePath):
+        return str(value)
+    if isinstance(value, TIPS.PartitionFunction):
+        if value.name is None:
+            raise UnhashableError("SpectraTools.Resources.hitran_results._hashable(): partition function without a name")
+        return ("PartitionFunction", value.name, value.step)
+    if callable(value):
+        name = getattr(value, "__qualname__", None)
+        if name is None or "<lambda>" in name or "<locals>" in name:
+            raise UnhashableError("SpectraTools.Resources.hitran_results._hashable(): {:} can not be used for the key".format(value))
+        code = getattr(value, "__code__", None)
+        if code is None:
+            # builtins and numpy ufuncs
+            return ("function", getattr(value, "__module__", ""), name)
+        # the name is not enough: the function can be edited without changing the name
+        defaults = (getattr(value, "__defaults__", None), getattr(value, "__kwdefaults__", None))
+        return ("function", getattr(value, "__module__", ""), name, _code_digest(code), _hashable(defaults))
+    raise UnhashableError("SpectraTools.Resources.hitran_results._hashable(): {:} can not be used for the key".format(type(value)))
+
+
+def inputs_key(fingerprint, inputs, version = RESULT_VERSION):
+    """
+    A hex digest of the fingerprint of the table(s) and the arguments of a calculation.
+
+    Raises
+    ------
+    UnhashableError
+        If one of the inputs can not be hashed.
+
+    """
+    h = _hashable({"version": version, "fingerprint": fingerprint, "inputs": inputs})
+    return hashlib.sha256(repr(h).encode("utf-8")).hexdigest()
+
+
+
+class ResultCache(object):
+    """
+    Calculated spectra on disk, with the hash of the arguments as file name.
+
+    Attributes
+    ----------
+    cache_path : pathlib.Path
+        The folder with the results.
+    max_size : int
+        Maximum size of the files in bytes. If None, there is no maximum.
+    stats : dict
+        `hits`, `misses`, `stored` and `evicted`.
+
+    """
+
+    def __init__(self, cache_path, max_size = None, verbose = 0):
+        self.verbose = verbose
+        self.cache_path = pathlib.Path(cache_path)
+        self.max_size = max_size
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+
+    def key(self, fingerprint, inputs):
+        """
+        The key for the arguments of a calculation.
+
+        Arguments
+        ---------
+        fingerprint : dict
+            Fingerprint of the table(s), see `hitran_storage.fingerprint`.
+        inputs : dict
+            The arguments of the calculation.
+
+        Returns
+        -------
+        key : str
+            A hex digest. None if the table has no fingerprint or if one of the inputs can not be hashed (for example a lambda function).
+
+        """
+        if not fingerprint:
+            return None
+        try:
+            return inputs_key(fingerprint, inputs)
+        except UnhashableError:
+            if self.verbose > 0:
+                print("SpectraTools.Resources.hitran_results.ResultCache.key(): the result can not be cached")
+            return None
+
+    def path(self, key):
+        return self.cache_path.joinpath("{:s}.{:s}".format(key, RESULT_EXTENSION))
+
+    def get(self, key):
+        """
+        Get a result.
+
+        Returns
+        -------
+        result : tuple
+            (x, y, y_unit), or None if the result is not in the cache.
+
+        """
+        if key is None:
+            return None
+        paf = self.path(key)
+        try:
+            with numpy.load(paf) as f:
+                result = (f["x"], f["y"], str(f["y_unit"]))
+        except (OSError, KeyError, ValueError):
+            self.stats["misses"] += 1
+            return None
+        # the modification time is used as the last time the result was used
+        os.utime(paf)
+        self.stats["hits"] += 1
+        if self.verbose > 1:
+            print("SpectraTools.Resources.hitran_results.ResultCache.get(): hit")
+        return result
+
+    def put(self, key, x, y, y_unit = ""):
+        """
+        Store a result. If the cache is too large, the least recently used results are removed.
+        """
+        if key is None:
+            return
+        self.cache_path.mkdir(parents = True, exist_ok = True)
+        paf = self.path(key)
+        tmp = paf.with_name("{:s}.{:d}.tmp.{:s}".format(key, os.getpid(), RESULT_EXTENSION))
+        numpy.savez(tmp, x = numpy.asarray(x), y = numpy.asarray(y), y_unit = numpy.array(y_unit))
+        os.replace(tmp, paf)
+        self.stats["stored"] += 1
+        self.evict(keep = key)
+
+    def files(self):
+        """
+        The result files, least recently used first.
+        """
+        if not self.cache_path.is_dir():
+            return []
+        files = [p for p in self.cache_path.glob("*.{:s}".format(RESULT_EXTENSION)) if ".tmp." not in p.name]
+        return sorted(files, key = lambda p: p.stat().st_mtime_ns)
+
+    def size(self):
+        """
+        Total size of the results in bytes.
+        """
+        return sum(p.stat().st_size for p in self.files())
+
+    def evict(self, keep = None):
+        """
+        Remove the least recently used results until the size is below `max_size`. The result for `keep` is not removed.
+        """
+        if self.max_size is None:
+            return
+        files = self.files()
+        size = sum(p.stat().st_size for p in files)
+        for p in files:
+            if size <= self.max_size:
+                break
+            if keep is not None and p.stem == keep:
+                continue
+            size -= p.stat().st_size
+            p.unlink()
+            self.stats["evicted"] += 1
+            if self.verbose > 1:
+                print("SpectraTools.Resources.hitran_results.ResultCache.evict(): removed {:}".format(p.name))
+
+    def clear(self):
+        """
+        Remove all results.
+        """
+        for p in self.files():
+            p.unlink()
+
+
+# one cache per folder
+RESULT_CACHES = {}
+
+def get_result_cache(cache_path, max_size = RESULT_CACHE_SIZE, verbose = 0):
+    """
+    Get the `ResultCache` for a folder. It is made if it does not exist, otherwise `max_size` is updated. If `max_size` is None, there is no maximum.
+    """
+    key = str(pathlib.Path(cache_path).resolve())
+    if key not in RESULT_CACHES:
+        RESULT_CACHES[key] = ResultCache(cache_path, max_size = max_size, verbose = verbose)
+    else:
+        RESULT_CACHES[key].max_size = max_size
+    return RESULT_CACHES[key]
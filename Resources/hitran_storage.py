@@ -0,0 +1,713 @@
+"""
+Binary column storage for HAPI tables.
+
+HAPI stores a table as a fixed-width text file (`.data`) and a JSON header (`.header`). Every time `hapi.db_begin` is called, the text file is parsed line by line, which takes a long time for large tables. The functions in this module write the parsed columns to a sidecar directory (`<tablename>.npcache`) with one `.npy` file per column and a manifest. Later, the columns are loaded with `numpy.load(..., mmap_mode = 'c')`: the data is not copied or parsed, the operating system reads the parts that are used.
+
+The manifest contains the size and the modification time of the `.data` and `.header` files. If these change (for example because new data is fetched), the sidecar is invalid and the table is parsed again.
+
+It is possible to load only some columns (for example only those needed for a line profile, see `hitran_xsect.profile_columns`). The other columns can be added later with `load_columns`.
+
+`db_begin` loads all tables in a folder. `db_begin_lazy` only registers the headers: the data of a table is loaded when it is used for the first time, and tables that have not been used for the longest time are removed from memory when a memory budget is exceeded (see `LazyTableStore`).
+
+"""
+
+import collections
+import importlib
+import json
+import os
+import pathlib
+import shutil
+
+import numpy
+
+import hapi
+
+importlib.reload(hapi)
+
+SIDECAR_EXTENSION = "npcache"
+MANIFEST_NAME = "manifest.json"
+SIDECAR_VERSION = 1
+
+
+
+def table_paths(db_path, tablename):
+    """
+    The paths to the data and header files of a table. As in HAPI, a `.data` file has priority over a `.par` file.
+
+    Arguments
+    ---------
+    db_path : pathlib.Path
+        The folder of the database.
+    tablename : str
+        Name of the table.
+
+    Returns
+    -------
+    data_path, header_path : pathlib.Path
+
+    """
+    db_path = pathlib.Path(db_path)
+    data_path = db_path.joinpath("{:s}.data".format(tablename))
+    if not data_path.is_file():
+        par_path = db_path.joinpath("{:s}.par".format(tablename))
+        if par_path.is_file():
+            data_path = par_path
+    header_path = db_path.joinpath("{:s}.header".format(tablename))
+    return data_path, header_path
+
+
+def sidecar_path(db_path, tablename):
+    """
+    The folder with the binary columns of a table.
+    """
+    return pathlib.Path(db_path).joinpath("{:s}.{:s}".format(tablename, SIDECAR_EXTENSION))
+
+
+def fingerprint(db_path, tablename):
+    """
+    Size and modification time of the data and header files of a table.
+
+    Returns
+    -------
+    fp : dict
+        Empty if one of the files does not exist.
+
+    """
+    data_path, header_path = table_paths(db_path, tablename)
+    if not data_path.is_file() or not header_path.is_file():
+        return {}
+    data_stat = os.stat(data_path)
+    header_stat = os.stat(header_path)
+    return {
+        "data_file": data_path.name,
+        "data_size": data_stat.st_size,
+        "data_mtime_ns": data_stat.st_mtime_ns,
+        "header_size": header_stat.st_size,
+        "header_mtime_ns": header_stat.st_mtime_ns,
+    }
+
+
+def read_manifest(db_path, tablename):
+    """
+    Read the manifest of the sidecar.
+
+    Returns
+    -------
+    manifest : dict or None
+        None if there is no (readable) manifest.
+
+    """
+    paf = sidecar_path(db_path, tablename).joinpath(MANIFEST_NAME)
+    if not paf.is_file():
+        return None
+    try:
+        with open(paf, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_valid(db_path, tablename, verbose = 0):
+    """
+    Check if the sidecar of a table exists and belongs to the current data and header files.
+
+    Returns
+    -------
+    valid : bool
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_storage.is_valid()")
+
+    manifest = read_manifest(db_path, tablename)
+    if manifest is None:
+        return False
+    if manifest.get("version") != SIDECAR_VERSION:
+        return False
+    fp = fingerprint(db_path, tablename)
+    if len(fp) == 0:
+        return False
+    return manifest.get("fingerprint") == fp
+
+
+def _json_default(o):
+    """
+    Convert numpy scalars in the header for json.
+    """
+    if isinstance(o, numpy.generic):
+        return o.item()
+    raise TypeError("Object of type {:} is not JSON serializable".format(type(o)))
+
+
+def write_sidecar(db_path, tablename, verbose = 0):
+    """
+    Write the columns of a table in `hapi.LOCAL_TABLE_CACHE` to the sidecar.
+
+    The table should be completely loaded, the manifest is written last.
+
+    Arguments
+    ---------
+    db_path : pathlib.Path
+        The folder of the database.
+    tablename : str
+        Name of the table.
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_storage.write_sidecar()")
+
+    if tablename not in hapi.LOCAL_TABLE_CACHE:
+        raise KeyError("SpectraTools.Resources.hitran_storage.write_sidecar(): no table '{:}'".format(tablename))
+
+    fp = fingerprint(db_path, tablename)
+    if len(fp) == 0:
+        raise FileNotFoundError("SpectraTools.Resources.hitran_storage.write_sidecar(): no data or header file for '{:}' in {:}".format(tablename, db_path))
+
+    folder = sidecar_path(db_path, tablename)
+    if folder.is_dir():
+        shutil.rmtree(folder)
+    folder.mkdir()
+
+    table = hapi.LOCAL_TABLE_CACHE[tablename]
+
+    columns = {}
+    for i, (name, col) in enumerate(table["data"].items()):
+        data = numpy.ascontiguousarray(numpy.ma.getdata(col))
+        if data.dtype == object:
+            raise ValueError("SpectraTools.Resources.hitran_storage.write_sidecar(): column '{:}' has dtype object".format(name))
+        filename = "{:03d}.npy".format(i)
+        numpy.save(folder.joinpath(filename), data, allow_pickle = False)
+        columns[name] = {
+            "file": filename,
+            "masked_array": bool(numpy.ma.isMaskedArray(col)),
+            "has_mask": bool(numpy.any(numpy.ma.getmaskarray(col))),
+        }
+
+    manifest = {
+        "version": SIDECAR_VERSION,
+        "tablename": tablename,
+        "fingerprint": fp,
+        "header": table["header"],
+        "columns": columns,
+    }
+
+    with open(folder.joinpath(MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent = 2, default = _json_default)
+
+    if verbose > 0:
+        print("SpectraTools.Resources.hitran_storage.write_sidecar(): wrote {:d} columns for {:}".format(len(columns), tablename))
+
+
+def _load_column(folder, info, mmap_mode):
+    """
+    Load one column from the sidecar, as a masked array if HAPI uses a masked array.
+    """
+    data = numpy.load(folder.joinpath(info["file"]), mmap_mode = mmap_mode, allow_pickle = False)
+    if info["masked_array"]:
+        if info["has_mask"]:
+            return numpy.ma.array(data, mask = numpy.isnan(data))
+        else:
+            return numpy.ma.array(data)
+    return data
+
+
+def read_columns(db_path, tablename, columns = None, mmap_mode = "c", verbose = 0):
+    """
+    Read the header and columns of a table from the sidecar. The validity is not checked, see `is_valid`.
+
+    Arguments
+    ---------
+    db_path : pathlib.Path
+        The folder of the database.
+    tablename : str
+        Name of the table.
+
+    Keyword Arguments
+    -----------------
+    columns : list (None)
+        The columns to load. If None, all columns are loaded. Unknown columns are ignored.
+    mmap_mode : str ('c')
+        See `numpy.load`. With 'c' (copy-on-write) the arrays can be changed in memory, without changing the files. With None the data is read into memory.
+
+    Returns
+    -------
+    header : dict
+        The header, as it is after parsing by HAPI.
+    data : hapi.CaselessDict
+        The columns.
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_storage.read_columns()")
+
+    manifest = read_manifest(db_path, tablename)
+    if manifest is None:
+        raise FileNotFoundError("SpectraTools.Resources.hitran_storage.read_columns(): no sidecar for '{:}' in {:}".format(tablename, db_path))
+
+    folder = sidecar_path(db_path, tablename)
+
+    if columns is None:
+        columns = list(manifest["columns"].keys())
+
+    data = hapi.CaselessDict()
+    for name in manifest["columns"]:
+        if name in columns:
+            data[name] = _load_column(folder, manifest["columns"][name], mmap_mode)
+
+    return manifest["header"], data
+
+
+def read_sidecar(db_path, tablename, columns = None, mmap_mode = "c", verbose = 0):
+    """
+    Load a table from the sidecar into `hapi.LOCAL_TABLE_CACHE`. The validity is not checked, see `is_valid`.
+
+    If the table is registered as a `LazyTable`, the data is added to it. For the arguments, see `read_columns`.
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_storage.read_sidecar()")
+
+    header, data = read_columns(db_path, tablename, columns = columns, mmap_mode = mmap_mode, verbose = verbose)
+
+    entry = hapi.LOCAL_TABLE_CACHE.get(tablename)
+    if isinstance(entry, LazyTable):
+        entry.set_data(header, data)
+    else:
+        hapi.LOCAL_TABLE_CACHE[tablename] = {
+            "header": header,
+            "data": data,
+            "filehandler": None,
+        }
+
+
+def ensure_sidecar(db_path, tablename, verbose = 0):
+    """
+    Make sure the sidecar of a table is valid: if it is not, the text file is parsed and the sidecar is written.
+
+    HAPI replaces the table in `hapi.LOCAL_TABLE_CACHE` when it parses it. A `LazyTable` is put back afterwards.
+
+    Returns
+    -------
+    source : str {'sidecar', 'parsed'}
+        'parsed' if the text file had to be parsed.
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_storage.ensure_sidecar()")
+
+    if is_valid(db_path, tablename, verbose = verbose):
+        return "sidecar"
+
+    if verbose > 0:
+        print("SpectraTools.Resources.hitran_storage.ensure_sidecar(): parsing {:}".format(tablename))
+
+    entry = hapi.LOCAL_TABLE_CACHE.get(tablename)
+    hapi.VARIABLES["BACKEND_DATABASE_NAME"] = str(db_path)
+    hapi.storage2cache(tablename)
+    write_sidecar(db_path, tablename, verbose = verbose)
+    if isinstance(entry, LazyTable):
+        hapi.LOCAL_TABLE_CACHE[tablename] = entry
+    return "parsed"
+
+
+def load_table(db_path, tablename, columns = None, mmap_mode = "c", verbose = 0):
+    """
+    Load a table into `hapi.LOCAL_TABLE_CACHE`, from the sidecar if it is valid, otherwise by parsing the text file (after which the sidecar is written).
+
+    Arguments
+    ---------
+    db_path : pathlib.Path
+        The folder of the database.
+    tablename : str
+        Name of the table.
+
+    Keyword Arguments
+    -----------------
+    columns : list (None)
+        The columns to load. If None, all columns are loaded.
+    mmap_mode : str ('c')
+        See `read_columns`.
+
+    Returns
+    -------
+    source : str {'sidecar', 'parsed'}
+        Where the data came from.
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_storage.load_table()")
+
+    source = ensure_sidecar(db_path, tablename, verbose = verbose)
+    read_sidecar(db_path, tablename, columns = columns, mmap_mode = mmap_mode, verbose = verbose)
+
+    return source
+
+
+def missing_columns(tablename, columns):
+    """
+    The columns that are not (yet) loaded.
+
+    Returns
+    -------
+    missing : list
+        If the table is not loaded, all columns are missing.
+
+    """
+    if tablename not in hapi.LOCAL_TABLE_CACHE:
+        return list(columns)
+    data = hapi.LOCAL_TABLE_CACHE[tablename]["data"]
+    return [c for c in columns if c not in data]
+
+
+def load_columns(db_path, tablename, columns = None, mmap_mode = "c", verbose = 0):
+    """
+    Make sure that columns of a table are loaded. Columns that are already loaded are not loaded again.
+
+    Arguments
+    ---------
+    db_path : pathlib.Path
+        The folder of the database.
+    tablename : str
+        Name of the table.
+
+    Keyword Arguments
+    -----------------
+    columns : list (None)
+        The columns. If None, all columns.
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_storage.load_columns()")
+
+    if tablename not in hapi.LOCAL_TABLE_CACHE or not is_valid(db_path, tablename):
+        load_table(db_path, tablename, columns = columns, mmap_mode = mmap_mode, verbose = verbose)
+        return
+
+    manifest = read_manifest(db_path, tablename)
+    if columns is None:
+        columns = list(manifest["columns"].keys())
+
+    folder = sidecar_path(db_path, tablename)
+    data = hapi.LOCAL_TABLE_CACHE[tablename]["data"]
+    for name in missing_columns(tablename, columns):
+        if name in manifest["columns"]:
+            data[name] = _load_column(folder, manifest["columns"][name], mmap_mode)
+
+
+def remove_sidecar(db_path, tablename):
+    """
+    Remove the sidecar of a table, if it exists.
+    """
+    folder = sidecar_path(db_path, tablename)
+    if folder.is_dir():
+        shutil.rmtree(folder)
+
+
+def table_names(db_path):
+    """
+    The tables in the database. As in HAPI, headers are made for `.par` files without a header.
+
+    Returns
+    -------
+    names : list
+
+    """
+    db_path = str(db_path)
+    names = hapi.getTableNamesFromStorage(db_path)
+    for tablename in hapi.scanForNewParfiles(db_path):
+        hapi.createHeader(tablename)
+        names.append(tablename)
+    return names
+
+
+def db_begin(db_path, columns = None, mmap_mode = "c", verbose = 0):
+    """
+    Replacement for `hapi.db_begin`: load all tables in a folder, using the sidecars.
+
+    Arguments
+    ---------
+    db_path : pathlib.Path
+        The folder of the database. It is made if it does not exist.
+
+    Keyword Arguments
+    -----------------
+    columns : list (None)
+        The columns to load. If None, all columns are loaded.
+
+    Returns
+    -------
+    sources : dict
+        The table names with the source of the data ('sidecar' or 'parsed').
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_storage.db_begin()")
+
+    hapi.VARIABLES["BACKEND_DATABASE_NAME"] = str(db_path)
+    if not os.path.exists(str(db_path)):
+        os.mkdir(str(db_path))
+
+    sources = {}
+    for tablename in table_names(db_path):
+        sources[tablename] = load_table(db_path, tablename, columns = columns, mmap_mode = mmap_mode, verbose = verbose)
+
+    return sources
+
+
+class LazyTable(dict):
+    """
+    An entry of `hapi.LOCAL_TABLE_CACHE` of which only the header is loaded. The data is loaded from the sidecar (see `LazyTableStore.materialize`) when `table['data']` is used for the first time. 
+
+    """
+
+    def __init__(self, store, tablename, header):
+        dict.__init__(self, header = header, filehandler = None)
+        self.store = store
+        self.tablename = tablename
+
+    def __getitem__(self, key):
+        if key == "data":
+            if not self.is_materialized():
+                self.store.materialize(self.tablename)
+            self.store.touch(self.tablename)
+        return dict.__getitem__(self, key)
+
+    def __contains__(self, key):
+        if key == "data":
+            return True
+        return dict.__contains__(self, key)
+
+    def get(self, key, default = None):
+        if key in self:
+            return self[key]
+        return default
+
+    def is_materialized(self):
+        """
+        True if the data is loaded.
+        """
+        return dict.__contains__(self, "data")
+
+    def set_data(self, header, data):
+        """
+        Set the header and the data.
+        """
+        dict.__setitem__(self, "header", header)
+        dict.__setitem__(self, "data", data)
+
+    def release(self):
+        """
+        Remove the data. It will be loaded again when it is used.
+        """
+        dict.pop(self, "data", None)
+
+    def nbytes(self):
+        """
+        The size of the loaded columns in bytes. For memory-mapped columns this is the size of the file, not the memory that is actually used.
+        """
+        if not self.is_materialized():
+            return 0
+        n = 0
+        for col in dict.__getitem__(self, "data").values():
+            n += numpy.ma.getdata(col).nbytes
+            mask = numpy.ma.getmask(col)
+            if mask is not numpy.ma.nomask:
+                n += mask.nbytes
+        return n
+
+
+
+class LazyTableStore(object):
+    """
+    Register the tables of a database in `hapi.LOCAL_TABLE_CACHE` without loading the data. The data of a table is loaded when it is used and is removed again when the memory budget is exceeded, starting with the table that was used longest ago (least recently used). 
+
+    Use `get_store` to get the store for a folder, there should be only one store per folder.
+
+    Attributes
+    ----------
+    db_path : pathlib.Path
+        The folder of the database.
+    memory_budget : int or None
+        Maximum size in bytes of the loaded tables. The table that is used last is never removed, even if it is larger. If None, tables are never removed.
+    columns : list or None
+        The columns that are loaded. If None, all columns are loaded.
+    mmap_mode : str
+        See `read_columns`.
+    stats : dict
+        Number of times a table was registered, materialized (loaded) and evicted (removed).
+
+    """
+
+    def __init__(self, db_path, memory_budget = None, columns = None, mmap_mode = "c", verbose = 0):
+        self.verbose = verbose
+        self.db_path = pathlib.Path(db_path)
+        self.memory_budget = memory_budget
+        self.columns = columns
+        self.mmap_mode = mmap_mode
+        self.loaded = collections.OrderedDict()
+        self.stats = {"registered": 0, "materialized": 0, "evicted": 0}
+
+    def register(self, tablename):
+        """
+        Put a `LazyTable` for the table in `hapi.LOCAL_TABLE_CACHE`. Data that was already loaded for this table is removed from the cache.
+        """
+        if self.verbose > 1:
+            print("SpectraTools.Resources.hitran_storage.LazyTableStore.register()")
+
+        manifest = None
+        if is_valid(self.db_path, tablename):
+            manifest = read_manifest(self.db_path, tablename)
+        if manifest is not None:
+            header = manifest["header"]
+        else:
+            data_path, header_path = table_paths(self.db_path, tablename)
+            with open(header_path, "r") as f:
+                header = json.load(f)
+
+        hapi.LOCAL_TABLE_CACHE[tablename] = LazyTable(self, tablename, header)
+        self.loaded.pop(tablename, None)
+        self.stats["registered"] += 1
+
+    def register_all(self):
+        """
+        Register all tables in the folder.
+
+        Returns
+        -------
+        names : list
+            The table names.
+        """
+        if self.verbose > 1:
+            print("SpectraTools.Resources.hitran_storage.LazyTableStore.register_all()")
+
+        hapi.VARIABLES["BACKEND_DATABASE_NAME"] = str(self.db_path)
+        if not os.path.exists(str(self.db_path)):
+            os.mkdir(str(self.db_path))
+
+        names = table_names(self.db_path)
+        for tablename in names:
+            self.register(tablename)
+        return names
+
+    def materialize(self, tablename):
+        """
+        Load the data of a table. Afterwards, other tables are removed if the memory budget is exceeded.
+        """
+        if self.verbose > 0:
+            print("SpectraTools.Resources.hitran_storage.LazyTableStore.materialize(): {:}".format(tablename))
+
+        load_table(self.db_path, tablename, columns = self.columns, mmap_mode = self.mmap_mode, verbose = self.verbose)
+        self.loaded[tablename] = True
+        self.stats["materialized"] += 1
+        self.evict(keep = tablename)
+
+    def touch(self, tablename):
+        """
+        Mark a table as used.
+        """
+        if tablename in self.loaded:
+            self.loaded.move_to_end(tablename)
+
+    def _entry(self, tablename):
+        """
+        The `LazyTable` of a table, or None if the table is not (or no longer) managed by this store.
+        """
+        entry = hapi.LOCAL_TABLE_CACHE.get(tablename)
+        if isinstance(entry, LazyTable) and entry.store is self:
+            return entry
+        return None
+
+    def loaded_tables(self):
+        """
+        The tables with loaded data, the least recently used first.
+        """
+        for tablename in list(self.loaded.keys()):
+            entry = self._entry(tablename)
+            if entry is None or not entry.is_materialized():
+                del self.loaded[tablename]
+        return list(self.loaded.keys())
+
+    def memory_usage(self):
+        """
+        Total size in bytes of the loaded tables, see `LazyTable.nbytes`.
+        """
+        return sum([self._entry(tablename).nbytes() for tablename in self.loaded_tables()])
+
+    def release(self, tablename):
+        """
+        Remove the data of a table.
+        """
+        entry = self._entry(tablename)
+        if entry is not None:
+            entry.release()
+        self.loaded.pop(tablename, None)
+
+    def evict(self, keep = None):
+        """
+        Remove the data of the least recently used tables until the memory budget is met.
+
+        Keyword Arguments
+        -----------------
+        keep : str (None)
+            This table is not removed.
+
+        """
+        if self.memory_budget is None:
+            return
+
+        while self.memory_usage() > self.memory_budget:
+            candidates = [t for t in self.loaded_tables() if t != keep]
+            if len(candidates) == 0:
+                break
+            if self.verbose > 0:
+                print("SpectraTools.Resources.hitran_storage.LazyTableStore.evict(): {:}".format(candidates[0]))
+            self.release(candidates[0])
+            self.stats["evicted"] += 1
+
+
+# one store per database folder
+STORES = {}
+
+def get_store(db_path, memory_budget = None, columns = None, mmap_mode = "c", verbose = 0):
+    """
+    Get the `LazyTableStore` for a folder. It is made if it does not exist yet. If it exists, `memory_budget` and `columns` are updated if they are not None.
+
+    """
+    key = str(pathlib.Path(db_path).resolve())
+    if key not in STORES:
+        STORES[key] = LazyTableStore(db_path, memory_budget = memory_budget, columns = columns, mmap_mode = mmap_mode, verbose = verbose)
+    else:
+        if memory_budget is not None:
+            STORES[key].memory_budget = memory_budget
+        if columns is not None:
+            STORES[key].columns = columns
+    return STORES[key]
+
+
+def db_begin_lazy(db_path, memory_budget = None, columns = None, mmap_mode = "c", verbose = 0):
+    """
+    Replacement for `hapi.db_begin` that only registers the tables. The data of a table is loaded when it is used, see `LazyTableStore`.
+
+    Arguments
+    ---------
+    db_path : pathlib.Path
+        The folder of the database. It is made if it does not exist.
+
+    Keyword Arguments
+    -----------------
+    memory_budget : int (None)
+        Maximum size in bytes of the loaded tables. If None, there is no maximum.
+    columns : list (None)
+        The columns to load. If None, all columns are loaded.
+
+    Returns
+    -------
+    store : LazyTableStore
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_storage.db_begin_lazy()")
+
+    store = get_store(db_path, memory_budget = memory_budget, columns = columns, mmap_mode = mmap_mode, verbose = verbose)
+    store.register_all()
+    return store
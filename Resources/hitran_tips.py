@@ -0,0 +1,333 @@
+"""
+Tabulated total internal partition sums (TIPS) with vectorized temperature lookup.
+
+HAPI calculates the partition sum with `hapi.PYTIPS(M, I, T)`, which interpolates the TIPS table of an isotopologue with 3- and 4-point Lagrange interpolation (`hapi.AtoB`). This is done in a Python loop over the table, for a single temperature. `hapi.partitionSum(M, I, [T0, T1], step = ...)` loops over the temperatures as well.
+
+`PartitionFunction` keeps the temperature grid and partition sums of each (M, I) as numpy arrays in memory (and optionally on disk) and interpolates an array of temperatures at once. For the TIPS tables in HAPI, the same Lagrange interpolation as `hapi.AtoB` is used, so the result is the same as `hapi.PYTIPS` up to rounding. Other partition functions (for example a user function) are first calculated on a temperature grid.
+
+Example
+-------
+::
+
+    Q = partition_sum(2, 1, numpy.array([200., 296., 1000.]))
+
+"""
+
+import importlib
+import os
+import pathlib
+import time
+
+import numpy
+
+import hapi
+
+importlib.reload(hapi)
+
+# the TIPS tables in HAPI
+TIPS_VERSIONS = {}
+for _version in [2017, 2021, 2025]:
+    if hasattr(hapi, "TIPS_{:d}_ISOT_HASH".format(_version)):
+        TIPS_VERSIONS[_version] = (getattr(hapi, "TIPS_{:d}_ISOT_HASH".format(_version)), getattr(hapi, "TIPS_{:d}_ISOQ_HASH".format(_version)))
+
+# temperature grid for partition functions that are not tabulated
+GRID_STEP = 1.0
+GRID_RANGE = (1.0, 5000.0)
+
+
+
+def default_version():
+    """
+    The TIPS version that is used by `hapi.PYTIPS`. If it can not be determined, the newest version is used.
+    """
+    for version in TIPS_VERSIONS:
+        if getattr(hapi, "PYTIPS{:d}".format(version), None) is hapi.PYTIPS:
+            return version
+    return max(TIPS_VERSIONS.keys())
+
+
+def lagrange_interpolate(T, TT, QQ):
+    """
+    Vectorized version of `hapi.AtoB`: 4-point Lagrange interpolation, 3-point interpolation at the first and last interval.
+
+    Arguments
+    ---------
+    T : ndarray
+        Temperatures, within the range of TT.
+    TT : ndarray
+        Increasing temperature grid.
+    QQ : ndarray
+        Values at TT.
+
+    Returns
+    -------
+    Q : ndarray
+
+    """
+    T = numpy.asarray(T, dtype = float)
+    TT = numpy.asarray(TT, dtype = float)
+    QQ = numpy.asarray(QQ, dtype = float)
+    npt = len(TT)
+
+    # I as in hapi.AtoB: the first (1-based) index with TT[I-1] >= T, at least 2
+    k = numpy.searchsorted(TT, T, side = "left")
+    I = numpy.maximum(k, 1) + 1
+    three = numpy.logical_or(I < 3, I == npt)
+
+    # first node of the interpolation
+    s = numpy.where(three, numpy.where(I < 3, 0, npt - 3), I - 3)
+
+    Q = numpy.zeros(T.shape)
+
+    # 3-point
+    if numpy.any(three):
+        t = T[three]
+        j = s[three]
+        x0 = TT[j]
+        x1 = TT[j+1]
+        x2 = TT[j+2]
+        A0 = (t - x1) * (t - x2) / ((x0 - x1) * (x0 - x2))
+        A1 = (t - x0) * (t - x2) / ((x1 - x0) * (x1 - x2))
+        A2 = (t - x0) * (t - x1) / ((x2 - x0) * (x2 - x1))
+        Q[three] = A0 * QQ[j] + A1 * QQ[j+1] + A2 * QQ[j+2]
+
+    # 4-point
+    four = ~three
+    if numpy.any(four):
+        t = T[four]
+        j = s[four]
+        x0 = TT[j]
+        x1 = TT[j+1]
+        x2 = TT[j+2]
+        x3 = TT[j+3]
+        A0 = (t - x1) * (t - x2) * (t - x3)
+        A0 = A0 / ((x0 - x1) * (x0 - x2) * (x0 - x3))
+        A1 = (t - x0) * (t - x2) * (t - x3)
+        A1 = A1 / ((x1 - x0) * (x1 - x2) * (x1 - x3))
+        A2 = (t - x0) * (t - x1) * (t - x3)
+        A2 = A2 / ((x2 - x0) * (x2 - x1) * (x2 - x3))
+        A3 = (t - x0) * (t - x1) * (t - x2)
+        A3 = A3 / ((x3 - x0) * (x3 - x1) * (x3 - x2))
+        Q[four] = A0 * QQ[j] + A1 * QQ[j+1] + A2 * QQ[j+2] + A3 * QQ[j+3]
+
+    return Q
+
+
+
+class PartitionFunction(object):
+    """
+    Partition sums for arrays of temperatures. Instances can be used instead of `hapi.PYTIPS`: `Q = pf(M, I, T)`.
+
+    Attributes
+    ----------
+    version : int
+        The TIPS version in HAPI that is used, if `function` is None.
+    function : function
+        Other partition function, with arguments (M, I, T) for a single temperature. It is calculated on a grid with `step` and interpolated.
+    name : str
+        Name used for the files on disk. If `function` is given without a name, the tables are not saved.
+    cache_path : pathlib.Path
+        Folder for the tables. If None, they are kept only in memory.
+    step : float
+        Step of the grid for `function`.
+    tables : dict
+        The tables in memory: (M, I) as key, (TT, QQ) as value.
+    stats : dict
+        How often a table was found in memory (`hits`), on disk (`disk`) or had to be made (`built`).
+
+    """
+
+    def __init__(self, function = None, version = None, name = None, cache_path = None, step = GRID_STEP, verbose = 0):
+        self.verbose = verbose
+        self.function = function
+        if version is None:
+            version = default_version()
+        if function is None and version not in TIPS_VERSIONS:
+            raise ValueError("SpectraTools.Resources.hitran_tips.PartitionFunction(): TIPS version {:} is not available".format(version))
+        self.version = version
+        if name is None and function is None:
+            name = "TIPS{:d}".format(version)
+        self.name = name
+        self.cache_path = cache_path
+        self.step = step
+        self.tables = {}
+        self.stats = {"hits": 0, "disk": 0, "built": 0}
+
+    def table_path(self, M, I):
+        """
+        Path of the file with the table for (M, I), or None if the tables are not saved.
+        """
+        if self.cache_path is None or self.name is None:
+            return None
+        return pathlib.Path(self.cache_path).joinpath("{:s}_{:d}_{:d}.npy".format(self.name, M, I))
+
+    def build_table(self, M, I):
+        """
+        Make the table for (M, I).
+
+        Returns
+        -------
+        TT, QQ : ndarray
+            Temperatures and partition sums.
+
+        """
+        if self.verbose > 1:
+            print("SpectraTools.Resources.hitran_tips.PartitionFunction.build_table()")
+
+        if self.function is None:
+            TT_HASH, QQ_HASH = TIPS_VERSIONS[self.version]
+            if (M, I) not in TT_HASH:
+                raise KeyError("SpectraTools.Resources.hitran_tips.PartitionFunction.build_table(): TIPS{:d}: no data for M,I = {:}, {:}".format(self.version, M, I))
+            return numpy.array(TT_HASH[(M, I)], dtype = float), numpy.array(QQ_HASH[(M, I)], dtype = float)
+
+        TT = []
+        QQ = []
+        for t in numpy.arange(GRID_RANGE[0], GRID_RANGE[1] + self.step / 2, self.step):
+            try:
+                q = self.function(M, I, t)
+            except Exception:
+                continue
+            TT.append(t)
+            QQ.append(q)
+        if len(TT) < 4:
+            raise ValueError("SpectraTools.Resources.hitran_tips.PartitionFunction.build_table(): no values for M,I = {:}, {:}".format(M, I))
+        return numpy.array(TT, dtype = float), numpy.array(QQ, dtype = float)
+
+    def table(self, M, I):
+        """
+        The table for (M, I): from memory, from disk, or made and saved.
+
+        Returns
+        -------
+        TT, QQ : ndarray
+            Temperatures and partition sums.
+
+        """
+        if (M, I) in self.tables:
+            self.stats["hits"] += 1
+            return self.tables[(M, I)]
+
+        paf = self.table_path(M, I)
+        if paf is not None and paf.is_file():
+            TTQQ = numpy.load(paf)
+            self.tables[(M, I)] = (TTQQ[0], TTQQ[1])
+            self.stats["disk"] += 1
+            return self.tables[(M, I)]
+
+        TT, QQ = self.build_table(M, I)
+        self.tables[(M, I)] = (TT, QQ)
+        self.stats["built"] += 1
+        if paf is not None:
+            # write to a temporary file first, other processes may read the file at the same time
+            paf.parent.mkdir(parents = True, exist_ok = True)
+            tmp = paf.with_name("{:s}.{:d}.tmp.npy".format(paf.stem, os.getpid()))
+            numpy.save(tmp, numpy.vstack((TT, QQ)))
+            os.replace(tmp, paf)
+        return self.tables[(M, I)]
+
+    def temperature_range(self, M, I):
+        """
+        Minimum and maximum temperature for (M, I).
+        """
+        TT, QQ = self.table(M, I)
+        return TT[0], TT[-1]
+
+    def __call__(self, M, I, T):
+        """
+        Partition sum of (M, I) at temperature(s) T.
+
+        Arguments
+        ---------
+        M, I : int
+            Molecule and isotopologue number.
+        T : number or ndarray
+            Temperature(s) in Kelvin.
+
+        Returns
+        -------
+        Q : float or ndarray
+            A float if T is a number.
+
+        """
+        TT, QQ = self.table(M, I)
+        scalar = numpy.ndim(T) == 0
+        T = numpy.atleast_1d(numpy.asarray(T, dtype = float))
+        if numpy.any(T < TT[0]) or numpy.any(T > TT[-1]):
+            raise ValueError("SpectraTools.Resources.hitran_tips.PartitionFunction(): T must be between {:.1f}K and {:.1f}K for M,I = {:}, {:}".format(TT[0], TT[-1], M, I))
+        Q = lagrange_interpolate(T, TT, QQ)
+        if scalar:
+            return float(Q[0])
+        return Q
+
+    def clear(self, disk = False):
+        """
+        Remove the tables from memory and, if `disk` is True, from disk.
+        """
+        if disk:
+            for (M, I) in list(self.tables.keys()):
+                paf = self.table_path(M, I)
+                if paf is not None and paf.is_file():
+                    paf.unlink()
+        self.tables = {}
+
+
+# one instance per cache folder
+PARTITION_FUNCTIONS = {}
+
+def get_partition_function(cache_path = None, version = None, verbose = 0):
+    """
+    Get the `PartitionFunction` for the TIPS tables for a cache folder. It is made if it does not exist.
+
+    Keyword Arguments
+    -----------------
+    cache_path : pathlib.Path (None)
+        Folder for the tables on disk. If None, the tables are only kept in memory.
+    version : int (None)
+        TIPS version. If None, the version used by `hapi.PYTIPS`.
+
+    """
+    if version is None:
+        version = default_version()
+    key = (None if cache_path is None else str(pathlib.Path(cache_path).resolve()), version)
+    if key not in PARTITION_FUNCTIONS:
+        PARTITION_FUNCTIONS[key] = PartitionFunction(version = version, cache_path = cache_path, verbose = verbose)
+    return PARTITION_FUNCTIONS[key]
+
+
+def partition_sum(M, I, T):
+    """
+    Partition sum of (M, I) at temperature(s) T, with the TIPS version used by `hapi.PYTIPS`. This can be used instead of `hapi.PYTIPS`, T can be an array.
+    """
+    return get_partition_function()(M, I, T)
+
+
+def benchmark(M = 2, I = 1, n = 1000, verbose = 0):
+    """
+    Compare the time and result with `hapi.PYTIPS`, for `n` temperatures between the minimum and maximum of the table.
+
+    Returns
+    -------
+    result : dict
+        `t_hapi` and `t_tips` in seconds, `speedup` and `max_rel_error`.
+
+    """
+    pf = get_partition_function(verbose = verbose)
+    T_min, T_max = pf.temperature_range(M, I)
+    T = numpy.linspace(T_min, T_max, n)
+
+    t0 = time.perf_counter()
+    Q_ref = numpy.array([hapi.PYTIPS(M, I, t) for t in T])
+    t1 = time.perf_counter()
+    Q = pf(M, I, T)
+    t2 = time.perf_counter()
+
+    result = {
+        "t_hapi": t1 - t0,
+        "t_tips": t2 - t1,
+        "speedup": (t1 - t0) / (t2 - t1),
+        "max_rel_error": numpy.amax(numpy.abs(Q / Q_ref - 1)),
+    }
+    if verbose > 0:
+        for k, v in result.items():
+            print("{:}: {:}".format(k, v))
+    return result
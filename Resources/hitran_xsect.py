@@ -0,0 +1,1038 @@
+"""
+Vectorized line-by-line calculation of absorption coefficients for HITRAN tables.
+
+HAPI calculates the absorption coefficient line by line: for every line a Python dictionary is made, the parameters are looked up, the partition functions are calculated and the line profile is added to the grid. For tables with many lines this is slow. The functions in this module take the columns of a table (as they are stored in `hapi.LOCAL_TABLE_CACHE`) and calculate the intensities, widths and shifts for all lines at once. The line profiles are then evaluated in chunks: all (line, grid point) pairs of a chunk are flattened into one array, the profile is evaluated in one call and the result is added to the grid with `numpy.bincount`. The chunks can be divided over several processes (`workers`).
+
+The keyword arguments are the same as for `hapi.absorptionCoefficient_Voigt` etc, so that `absorption_coefficient` can be used as a drop-in replacement. The result agrees with HAPI within `XSECT_TOLERANCE` (relative to the maximum of the absorption coefficient). The differences are only due to the order of the summation.
+
+Supported are the Voigt, Lorentz and Doppler profiles. The HT profile is supported when the table does not contain HT or SDV parameters: HAPI then falls back to the Voigt parameters and the HT profile reduces to a Voigt profile. Use `is_supported` to check if a table can be calculated with this module.
+
+`absorption_coefficients` calculates several environments (temperatures and pressures) at once. The parts that do not depend on the environment (`line_data`) are done once and the environments are divided over a pool of processes.
+
+The lines are selected with the index of the table (see `hitran_index`): only the lines of the components and within the wing of the grid (see `max_wing`) are used.
+
+The Voigt profile is calculated with a complex probability function. With the `cpf` argument a faster or more accurate backend can be chosen (see `hitran_cpf`).
+
+"""
+
+import concurrent.futures
+import copy
+import importlib
+import os
+import time
+
+import numpy
+
+import hapi
+
+import SpectraTools.Resources.hitran_cpf as HCPF
+import SpectraTools.Resources.hitran_index as HIDX
+import SpectraTools.Resources.hitran_tips as TIPS
+
+importlib.reload(hapi)
+importlib.reload(HCPF)
+importlib.reload(HIDX)
+importlib.reload(TIPS)
+
+# maximum difference with HAPI, relative to the maximum of the absorption coefficient
+XSECT_TOLERANCE = 1e-9
+
+# profiles that can be calculated
+LINE_PROFILES = ["Voigt", "Lorentz", "Doppler", "HT", "default"]
+
+# reference temperature and pressure, as used by HAPI
+T_REF = 296.0
+P_REF = 1.0
+
+# columns with these parts in their name indicate HT or SDV parameters
+HT_COLUMN_MARKERS = ["_HT", "_SDV", "SD_", "eta_", "kappa_"]
+
+# columns that are always needed, and the start of the names of the pressure-induced parameters
+BASE_COLUMNS = ["molec_id", "local_iso_id", "nu", "sw", "elower"]
+PRESSURE_COLUMN_PREFIXES = ["gamma_", "n_", "delta_", "deltap_", "y_"]
+
+
+
+def is_supported(tablename, line_profile = "Voigt", verbose = 0):
+    """
+    Check if the absorption coefficient for a table can be calculated with this module.
+
+    Arguments
+    ---------
+    tablename : str
+        Name of the table in `hapi.LOCAL_TABLE_CACHE`.
+
+    Keyword Arguments
+    -----------------
+    line_profile : str {'Voigt', 'Lorentz', 'Doppler', 'HT', 'default'}
+        The line profile.
+
+    Returns
+    -------
+    supported : bool
+        False if the table is not loaded, the profile is unknown or if the table contains HT parameters while the HT profile is requested.
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_xsect.is_supported()")
+
+    if line_profile not in LINE_PROFILES:
+        return False
+
+    if tablename not in hapi.LOCAL_TABLE_CACHE:
+        return False
+
+    if line_profile in ["HT", "default"]:
+        for column in hapi.LOCAL_TABLE_CACHE[tablename]["data"]:
+            for marker in HT_COLUMN_MARKERS:
+                if marker.lower() in column.lower():
+                    return False
+
+    return True
+
+
+def profile_columns(line_profile, available, verbose = 0):
+    """
+    The columns that are needed to calculate a line profile.
+
+    Arguments
+    ---------
+    line_profile : str {'Voigt', 'Lorentz', 'Doppler', 'HT', 'default'}
+        The line profile.
+    available : list
+        The columns of the table.
+
+    Returns
+    -------
+    columns : list
+        The columns in `available` that are needed. For the HT profile the HT and SDV parameters are included, because HAPI needs them.
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_xsect.profile_columns()")
+
+    columns = []
+    for c in available:
+        if c in BASE_COLUMNS:
+            columns.append(c)
+        elif line_profile == "Doppler":
+            continue
+        elif any([c.startswith(prefix) for prefix in PRESSURE_COLUMN_PREFIXES]):
+            columns.append(c)
+        elif line_profile in ["HT", "default"] and any([marker.lower() in c.lower() for marker in HT_COLUMN_MARKERS]):
+            columns.append(c)
+
+    return columns
+
+
+def get_columns(tablename, columns = None, rows = None, verbose = 0):
+    """
+    Get the columns of a table as numpy arrays.
+
+    Arguments
+    ---------
+    tablename : str
+        Name of the table in `hapi.LOCAL_TABLE_CACHE`.
+
+    Keyword Arguments
+    -----------------
+    columns : list (None)
+        Names of the columns. If None, all columns are returned.
+    rows : ndarray (None)
+        Row numbers. If None, all rows are returned.
+
+    Returns
+    -------
+    data : dict
+        Column name as key, ndarray as value. Masked columns are filled with zeros.
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_xsect.get_columns()")
+
+    if tablename not in hapi.LOCAL_TABLE_CACHE:
+        raise KeyError("SpectraTools.Resources.hitran_xsect.get_columns(): no table '{:}'".format(tablename))
+
+    table_data = hapi.LOCAL_TABLE_CACHE[tablename]["data"]
+
+    if columns is None:
+        columns = list(table_data.keys())
+
+    data = {}
+    for c in columns:
+        if c not in table_data:
+            continue
+        col = table_data[c]
+        if rows is not None:
+            if type(col) == list:
+                col = numpy.asarray(col)
+            col = col[rows]
+        if numpy.ma.isMaskedArray(col):
+            col = col.filled(0)
+        data[c] = numpy.asarray(col)
+
+    return data
+
+
+def _pressure_induced(data, parameter, diluent, T, p, line_profile):
+    """
+    Sum of a pressure-induced parameter over the diluent components, see `hapi.calculate_parameter_PI`. Parameters that are missing for a component are treated as zero, as HAPI does.
+
+    """
+    n_lines = len(data["nu"])
+    result = numpy.zeros(n_lines)
+
+    for species, abun in diluent.items():
+
+        if parameter == "Gamma0":
+            gamma_name = "gamma_{:s}".format(species)
+            if gamma_name not in data:
+                continue
+            if "n_{:s}".format(species) in data:
+                n = data["n_{:s}".format(species)]
+            elif "n_air" in data:
+                n = data["n_air"]
+            else:
+                continue
+            result += abun * data[gamma_name] * (T_REF / T)**n * p / P_REF
+
+        elif parameter == "Delta0":
+            delta = data.get("delta_{:s}".format(species), 0)
+            deltap = data.get("deltap_{:s}".format(species), 0)
+            result += abun * (delta + deltap * (T - T_REF)) * p / P_REF
+
+        elif parameter == "YRosen":
+            y = data.get("y_{:s}".format(species), 0)
+            n_y = data.get("n_y_{:s}".format(species), 0)
+            if line_profile == "Lorentz":
+                result += abun * (y + n_y * (T - T_REF)) * p / P_REF
+            else:
+                result += abun * y * (T_REF / T)**n_y * p / P_REF
+
+        else:
+            raise ValueError("SpectraTools.Resources.hitran_xsect._pressure_induced(): unknown parameter '{:}'".format(parameter))
+
+    return result
+
+
+def line_data(tablename, abundances, line_profile = "Voigt", nu_range = None, verbose = 0):
+    """
+    Select the lines of the components and look up the parameters that do not depend on the environment. This is the part of `line_parameters` that can be reused for several environments.
+
+    Arguments
+    ---------
+    tablename : str
+        Name of the table in `hapi.LOCAL_TABLE_CACHE`.
+    abundances : dict
+        Keys are (M, I), values are the abundances. Lines of other components are skipped.
+
+    Keyword Arguments
+    -----------------
+    line_profile : str {'Voigt', 'Lorentz', 'Doppler', 'HT', 'default'}
+        Determines which columns are used.
+    nu_range : tuple (None)
+        (min, max): only lines with a wavenumber in this range (including the limits) are selected. If None, all lines.
+
+    Returns
+    -------
+    lines : dict
+        `data`: dict with the columns of the selected lines. `components`: list with ((M, I), mask) for each component with lines. `abundance_factor` and `molmass`: ndarrays with one value per line.
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_xsect.line_data()")
+
+    if nu_range is None:
+        nu_range = (None, None)
+    rows = HIDX.get_index(tablename, verbose = verbose).rows(components = list(abundances.keys()), nu_min = nu_range[0], nu_max = nu_range[1])
+
+    # columns with another length than nu are not used
+    table_data = hapi.LOCAL_TABLE_CACHE[tablename]["data"]
+    columns = [c for c in profile_columns(line_profile, list(table_data.keys())) if len(table_data[c]) == len(table_data["nu"])]
+    data = get_columns(tablename, columns = columns, rows = rows)
+    n_lines = len(rows)
+
+    abundance_factor = numpy.zeros(n_lines)
+    molmass = numpy.ones(n_lines)
+    masks = []
+
+    for (M, I), ni in abundances.items():
+        mask = numpy.logical_and(data["molec_id"] == M, data["local_iso_id"] == I)
+        if not numpy.any(mask):
+            continue
+        abundance_factor[mask] = ni / hapi.abundance(M, I)
+        molmass[mask] = hapi.molecularMass(M, I)
+        masks.append(((M, I), mask))
+
+    data["nu"] = data["nu"].astype(float)
+
+    return {
+        "data": data,
+        "components": masks,
+        "abundance_factor": abundance_factor,
+        "molmass": molmass,
+    }
+
+
+def environment_parameters(lines, environment, line_profile = "Voigt", partition_function = None, diluent = {"air": 1.0}, intensity_threshold = 0.0, line_shift = True, line_mixing = False, verbose = 0):
+    """
+    Calculate the line parameters for an environment, from the output of `line_data`.
+
+    For the arguments, see `line_parameters`.
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_xsect.environment_parameters()")
+
+    if partition_function is None:
+        partition_function = TIPS.partition_sum
+
+    T = environment["T"]
+    p = environment["p"]
+
+    data = lines["data"]
+    n_lines = len(data["nu"])
+
+    # per component: the partition functions
+    SigmaT = numpy.ones(n_lines)
+    SigmaTref = numpy.ones(n_lines)
+    for (M, I), mask in lines["components"]:
+        SigmaT[mask] = partition_function(M, I, T)
+        SigmaTref[mask] = partition_function(M, I, T_REF)
+
+    Sw = hapi.EnvironmentDependency_Intensity(data["sw"], T, T_REF, SigmaT, SigmaTref, data["elower"], data["nu"])
+    Sw *= lines["abundance_factor"]
+
+    select = Sw >= intensity_threshold
+    if not numpy.all(select):
+        data = {k: v[select] for k, v in data.items()}
+        n_lines = len(data["nu"])
+
+    pars = {
+        "nu": data["nu"],
+        "Sw": Sw[select],
+        "GammaD": numpy.zeros(n_lines),
+        "Gamma0": numpy.zeros(n_lines),
+        "Delta0": numpy.zeros(n_lines),
+        "YRosen": numpy.zeros(n_lines),
+    }
+
+    if line_profile != "Lorentz":
+        m = lines["molmass"][select] * 1.66053873e-27 * 1000
+        pars["GammaD"] = numpy.sqrt(2 * hapi.cBolts * T * numpy.log(2) / m / hapi.cc**2) * pars["nu"]
+
+    if line_profile != "Doppler":
+        pars["Gamma0"] = _pressure_induced(data, "Gamma0", diluent, T, p, line_profile)
+        if line_shift:
+            pars["Delta0"] = _pressure_induced(data, "Delta0", diluent, T, p, line_profile)
+        if line_mixing:
+            pars["YRosen"] = _pressure_induced(data, "YRosen", diluent, T, p, line_profile)
+
+    return pars
+
+
+def max_wing(tablename, abundances, environments, line_profile = "Voigt", diluent = {"air": 1.0}, OmegaWing = 0.0, OmegaWingHW = 50.0, verbose = 0):
+    """
+    Upper limit of the wing of the lines of a table (see `accumulate_lines`), for one or more environments. Lines that are further away from the grid do not contribute and do not have to be selected.
+
+    The limit is calculated from the largest wavenumber and width parameters of the components (see `hitran_index.LineIndex.extremes`), not from the widths of the lines themselves.
+
+    Arguments
+    ---------
+    tablename : str
+        Name of the table in `hapi.LOCAL_TABLE_CACHE`.
+    abundances : dict
+        Keys are (M, I).
+    environments : list of dicts
+        With `T` in Kelvin and `p` in atmosphere.
+
+    For the keyword arguments, see `line_parameters` and `accumulate_lines`.
+
+    Returns
+    -------
+    wing : float
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_xsect.max_wing()")
+
+    wing = OmegaWing
+    if OmegaWingHW == 0:
+        # accumulate_lines uses 10 cm-1 for lines without widths
+        wing = max(wing, 10.0)
+
+    index = HIDX.get_index(tablename, verbose = verbose)
+    components = [MI for MI in abundances if MI in index.partitions]
+    nu = index.extremes("nu", components)
+    if nu is None:
+        return wing
+    molmass = min([hapi.molecularMass(M, I) for M, I in components])
+    columns = [c for c in hapi.LOCAL_TABLE_CACHE[tablename]["data"] if c.startswith("gamma_") or c.startswith("n_")]
+
+    for environment in environments:
+        T = environment["T"]
+        p = environment["p"]
+        GammaMax = 0.0
+        if line_profile != "Lorentz":
+            m = molmass * 1.66053873e-27 * 1000
+            GammaMax = numpy.sqrt(2 * hapi.cBolts * T * numpy.log(2) / m / hapi.cc**2) * max(abs(nu[0]), abs(nu[1]))
+        if line_profile != "Doppler":
+            # the largest widths, with the temperature exponent that gives the largest factor
+            data = {"nu": numpy.zeros(1)}
+            for c in columns:
+                extremes = index.extremes(c, components)
+                if c.startswith("gamma_") or T <= T_REF:
+                    data[c] = numpy.array([extremes[1]])
+                else:
+                    data[c] = numpy.array([extremes[0]])
+            GammaMax = max(GammaMax, _pressure_induced(data, "Gamma0", diluent, T, p, line_profile)[0])
+        wing = max(wing, OmegaWingHW * GammaMax)
+
+    # a small margin for rounding errors
+    return wing * (1 + 1e-9)
+
+
+def grid_line_data(tablename, Omegas, abundances, environments, line_profile = "Voigt", diluent = {"air": 1.0}, OmegaWing = 0.0, OmegaWingHW = 50.0, verbose = 0):
+    """
+    `line_data` for the lines that can contribute to the grid `Omegas` (within `max_wing` of the grid).
+    """
+    if len(Omegas) == 0:
+        return line_data(tablename, abundances, line_profile = line_profile, verbose = verbose)
+    wing = max_wing(tablename, abundances, environments, line_profile = line_profile, diluent = diluent, OmegaWing = OmegaWing, OmegaWingHW = OmegaWingHW, verbose = verbose)
+    return line_data(tablename, abundances, line_profile = line_profile, nu_range = (Omegas[0] - wing, Omegas[-1] + wing), verbose = verbose)
+
+
+def line_parameters(tablename, abundances, environment, line_profile = "Voigt", partition_function = None, diluent = {"air": 1.0}, intensity_threshold = 0.0, line_shift = True, line_mixing = False, verbose = 0):
+    """
+    Calculate the parameters of all lines of a table at once.
+
+    Arguments
+    ---------
+    tablename : str
+        Name of the table in `hapi.LOCAL_TABLE_CACHE`.
+    abundances : dict
+        Keys are (M, I), values are the abundances. Lines of other components are skipped.
+    environment : dict
+        `T` in Kelvin and `p` in atmosphere.
+
+    Keyword Arguments
+    -----------------
+    line_profile : str {'Voigt', 'Lorentz', 'Doppler', 'HT', 'default'}
+        Determines which parameters are calculated.
+    partition_function : function (None)
+        Function with arguments (M, I, T). The default is `hitran_tips.partition_sum`, which gives the same values as `hapi.PYTIPS` from cached tables. It is called twice for each component, not for each line.
+    diluent : dict
+        Broadening mixture, for example `{'air': 0.7, 'self': 0.3}`.
+    intensity_threshold : number
+        Lines with a lower intensity are skipped.
+    line_shift : bool
+        If False, the pressure shift is not included.
+    line_mixing : bool
+        If True, the first order (Rosenkranz) line mixing is included.
+
+    Returns
+    -------
+    pars : dict
+        With `nu`, `Sw`, `GammaD`, `Gamma0`, `Delta0`, `YRosen` as ndarrays, with one value for each selected line. Parameters that are not used by the profile are zero.
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_xsect.line_parameters()")
+
+    lines = line_data(tablename, abundances, line_profile = line_profile, verbose = verbose)
+    return environment_parameters(lines, environment, line_profile = line_profile, partition_function = partition_function, diluent = diluent, intensity_threshold = intensity_threshold, line_shift = line_shift, line_mixing = line_mixing, verbose = verbose)
+
+
+def line_profile_values(line_profile, sg, nu, Sw, GammaD, Gamma0, Delta0, YRosen, cpf = None):
+    """
+    Evaluate the line profiles, multiplied with the intensity.
+
+    All arguments are ndarrays with the same length: each element is one (line, grid point) pair.
+
+    Arguments
+    ---------
+    line_profile : str {'Voigt', 'Lorentz', 'Doppler', 'HT', 'default'}
+        The line profile. 'HT' and 'default' are calculated as Voigt.
+    sg : ndarray
+        The wavenumbers of the grid.
+    nu, Sw, GammaD, Gamma0, Delta0, YRosen : ndarray
+        Line parameters.
+
+    Keyword Arguments
+    -----------------
+    cpf : function or str (None)
+        Complex probability function `cpf(x, y)` returning the real and imaginary part, or the name of a backend in `hitran_cpf`. Default is `hapi.VARIABLES['CPF']`.
+
+    Returns
+    -------
+    values : ndarray
+
+    Notes
+    -----
+
+    The Voigt profile is the limit of the HT profile (`hapi.pcqsdhc`) for Gamma2, Delta2, NuVC and Eta equal to zero. The Lorentz profile uses the same sign convention for the shift as `hapi.PROFILE_LORENTZ`.
+
+    """
+    if line_profile in ["Voigt", "HT", "default"]:
+        cpf = HCPF.get_cpf(cpf)
+        cte = numpy.sqrt(numpy.log(2.0)) / GammaD
+        WR, WI = cpf((sg - nu - Delta0) * cte, Gamma0 * cte)
+        return Sw * cte / numpy.sqrt(numpy.pi) * (WR + YRosen * WI)
+
+    elif line_profile == "Lorentz":
+        d = sg + Delta0 - nu
+        return Sw * (Gamma0 + YRosen * d) / (numpy.pi * (Gamma0**2 + d**2))
+
+    elif line_profile == "Doppler":
+        return Sw * hapi.cSqrtLn2divSqrtPi * numpy.exp(-hapi.cLn2 * ((sg - nu) / GammaD)**2) / GammaD
+
+    else:
+        raise ValueError("SpectraTools.Resources.hitran_xsect.line_profile_values(): '{:}' is not a valid line_profile".format(line_profile))
+
+
+def line_bounds(Omegas, nu, wing):
+    """
+    Indices of the grid points within the wings of the lines. This is the vectorized equivalent of the `bisect` calls in HAPI.
+
+    Arguments
+    ---------
+    Omegas : ndarray
+        Sorted grid.
+    nu : ndarray
+        Line centers.
+    wing : ndarray
+        Wing for each line.
+
+    Returns
+    -------
+    lower, upper : ndarray
+        Line i is calculated for `Omegas[lower[i]:upper[i]]`.
+
+    """
+    lower = numpy.searchsorted(Omegas, nu - wing, side = "right")
+    upper = numpy.searchsorted(Omegas, nu + wing, side = "right")
+    return lower, upper
+
+
+def chunk_bounds(counts, chunk_size):
+    """
+    Divide the lines in chunks with approximately `chunk_size` (line, grid point) pairs.
+
+    Arguments
+    ---------
+    counts : ndarray
+        Number of grid points for each line.
+    chunk_size : int
+        Target number of pairs per chunk. A single line with more points forms its own chunk.
+
+    Returns
+    -------
+    bounds : ndarray
+        Chunk i contains lines `bounds[i]:bounds[i+1]`.
+
+    """
+    n_lines = len(counts)
+    if n_lines == 0:
+        return numpy.array([0, 0])
+    cumulative = numpy.cumsum(counts)
+    total = cumulative[-1]
+    targets = numpy.arange(chunk_size, total, chunk_size)
+    splits = numpy.searchsorted(cumulative, targets, side = "left") + 1
+    bounds = numpy.unique(numpy.concatenate(([0], splits, [n_lines])))
+    return bounds[bounds <= n_lines]
+
+
+def _chunk_xsect(Omegas, pars, lower, counts, a, b, line_profile, cpf):
+    """
+    The profiles of lines `a:b` (see `accumulate_lines`).
+
+    Returns
+    -------
+    i_min : int
+        The first grid point.
+    values : ndarray
+        The sum of the profiles, for the grid points from `i_min`.
+
+    """
+    c = counts[a:b]
+    n = numpy.sum(c)
+    line = numpy.repeat(numpy.arange(a, b), c)
+    offset = numpy.arange(n) - numpy.repeat(numpy.cumsum(c) - c, c)
+    idx = lower[line] + offset
+
+    values = line_profile_values(line_profile, Omegas[idx], pars["nu"][line], pars["Sw"][line], pars["GammaD"][line], pars["Gamma0"][line], pars["Delta0"][line], pars["YRosen"][line], cpf = cpf)
+
+    i_min = numpy.amin(lower[a:b])
+    i_max = numpy.amax(lower[a:b] + c)
+    return i_min, numpy.bincount(idx - i_min, weights = values, minlength = i_max - i_min)
+
+
+# the data for the processes of accumulate_lines
+_CHUNKS = {}
+
+def _chunks_init(Omegas, pars, lower, counts, line_profile, cpf):
+    _CHUNKS["args"] = (Omegas, pars, lower, counts)
+    _CHUNKS["line_profile"] = line_profile
+    _CHUNKS["cpf"] = cpf
+
+def _chunks_task(bounds):
+    return _chunk_xsect(*_CHUNKS["args"], bounds[0], bounds[1], _CHUNKS["line_profile"], _CHUNKS["cpf"])
+
+
+def accumulate_lines(Omegas, pars, line_profile = "Voigt", OmegaWing = 0.0, OmegaWingHW = 50.0, chunk_size = 1048576, cpf = None, workers = 1, Xsect = None, verbose = 0):
+    """
+    Add the line profiles to the grid.
+
+    Arguments
+    ---------
+    Omegas : ndarray
+        Sorted grid.
+    pars : dict
+        Line parameters, see `line_parameters`.
+
+    Keyword Arguments
+    -----------------
+    line_profile : str {'Voigt', 'Lorentz', 'Doppler', 'HT', 'default'}
+        The line profile.
+    OmegaWing : number
+        Absolute wing (cm-1).
+    OmegaWingHW : number
+        Wing in half-widths.
+    chunk_size : int
+        Number of (line, grid point) pairs that are evaluated at once. This determines the memory use.
+    cpf : function or str (None)
+        Complex probability function, see `line_profile_values`.
+    workers : int (1)
+        Number of processes for the chunks. If None, the number of CPUs. With 1, no processes are started.
+    Xsect : ndarray (None)
+        If given, the profiles are added to this array.
+
+    Returns
+    -------
+    Xsect : ndarray
+
+    Notes
+    -----
+
+    The lines are divided in chunks with the same number of (line, grid point) pairs, so that a chunk with broad lines or in a region with few lines has less lines. The chunks do not depend on the number of workers. With more than one worker, each process calculates the sum of the profiles of a chunk and the sums are added to `Xsect` in the order of the chunks, as without workers. The result is therefore the same for any number of workers.
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_xsect.accumulate_lines()")
+
+    number_of_points = len(Omegas)
+    if Xsect is None:
+        Xsect = numpy.zeros(number_of_points)
+
+    GammaMax = numpy.maximum(pars["Gamma0"], pars["GammaD"])
+    if OmegaWingHW == 0 and numpy.any(GammaMax == 0):
+        OmegaWing = max(OmegaWing, 10.0)
+    wing = numpy.maximum(OmegaWing, OmegaWingHW * GammaMax)
+
+    lower, upper = line_bounds(Omegas, pars["nu"], wing)
+    counts = upper - lower
+
+    keep = counts > 0
+    lower = lower[keep]
+    counts = counts[keep]
+    pars = {k: v[keep] for k, v in pars.items()}
+
+    bounds = chunk_bounds(counts, chunk_size)
+    chunks = [(bounds[i], bounds[i+1]) for i in range(len(bounds) - 1) if bounds[i] < bounds[i+1]]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(chunks))
+
+    if workers <= 1:
+        for a, b in chunks:
+            i_min, values = _chunk_xsect(Omegas, pars, lower, counts, a, b, line_profile, cpf)
+            Xsect[i_min:i_min + len(values)] += values
+    else:
+        if verbose > 0:
+            print("SpectraTools.Resources.hitran_xsect.accumulate_lines(): {:d} chunks, {:d} workers".format(len(chunks), workers))
+        # the processes may not have the same hapi.VARIABLES
+        cpf = HCPF.get_cpf(cpf) if line_profile in ["Voigt", "HT", "default"] else cpf
+        with concurrent.futures.ProcessPoolExecutor(max_workers = workers, initializer = _chunks_init, initargs = (Omegas, pars, lower, counts, line_profile, cpf)) as executor:
+            for i_min, values in executor.map(_chunks_task, chunks):
+                Xsect[i_min:i_min + len(values)] += values
+
+    return Xsect
+
+
+def _xsect_arguments(line_profile, Components, SourceTables, Environment, OmegaRange, OmegaStep, OmegaWing, IntensityThreshold, OmegaWingHW, GammaL, Format, OmegaGrid, WavenumberRange, WavenumberStep, WavenumberWing, WavenumberWingHW, WavenumberGrid, Diluent, function_name):
+    """
+    Check the arguments of `absorption_coefficient` and `absorption_coefficients` and fill in the defaults, as HAPI does.
+
+    Returns
+    -------
+    args : dict
+        `Omegas`, `SourceTables`, `Environment`, `OmegaWing`, `OmegaWingHW`, `IntensityThreshold`, `Format`, `abundances` and `Diluent`.
+
+    """
+    if line_profile not in LINE_PROFILES:
+        raise ValueError("SpectraTools.Resources.hitran_xsect.{:s}(): '{:}' is not a valid line_profile".format(function_name, line_profile))
+
+    if WavenumberRange is not None:
+        OmegaRange = WavenumberRange
+    if WavenumberStep is not None:
+        OmegaStep = WavenumberStep
+    if WavenumberWing is not None:
+        OmegaWing = WavenumberWing
+    if WavenumberWingHW is not None:
+        OmegaWingHW = WavenumberWingHW
+    if WavenumberGrid is not None:
+        OmegaGrid = WavenumberGrid
+
+    Components = hapi.listOfTuples(Components)
+    SourceTables = hapi.listOfTuples(SourceTables)
+
+    Components, SourceTables, Environment, OmegaRange, OmegaStep, OmegaWing, IntensityThreshold, Format = hapi.getDefaultValuesForXsect(Components, SourceTables, Environment, OmegaRange, OmegaStep, OmegaWing, IntensityThreshold, Format)
+
+    if OmegaGrid is not None:
+        Omegas = numpy.sort(OmegaGrid)
+    else:
+        Omegas = hapi.arange_(OmegaRange[0], OmegaRange[1], OmegaStep)
+
+    abundances = {}
+    for c in Components:
+        M = c[0]
+        I = c[1]
+        if len(c) >= 3:
+            abundances[(M, I)] = c[2]
+        else:
+            try:
+                abundances[(M, I)] = hapi.ISO[(M, I)][hapi.ISO_INDEX["abundance"]]
+            except KeyError:
+                raise ValueError("SpectraTools.Resources.hitran_xsect.{:s}(): cannot find component M,I = {:}, {:}".format(function_name, M, I))
+
+    if not Diluent:
+        if GammaL.lower() == "gamma_air":
+            Diluent = {"air": 1.0}
+        elif GammaL.lower() == "gamma_self":
+            Diluent = {"self": 1.0}
+        else:
+            raise ValueError("SpectraTools.Resources.hitran_xsect.{:s}(): unknown GammaL value: {:}".format(function_name, GammaL))
+    for k, v in Diluent.items():
+        if v < 0 or v > 1:
+            raise ValueError("SpectraTools.Resources.hitran_xsect.{:s}(): Diluent fraction must be in [0,1]".format(function_name))
+
+    return {
+        "Omegas": Omegas,
+        "SourceTables": SourceTables,
+        "Environment": Environment,
+        "OmegaWing": OmegaWing,
+        "OmegaWingHW": OmegaWingHW,
+        "IntensityThreshold": IntensityThreshold,
+        "Format": Format,
+        "abundances": abundances,
+        "Diluent": Diluent,
+    }
+
+
+def environment_xsect(Omegas, tables, environment, line_profile = "Voigt", partition_function = None, diluent = {"air": 1.0}, intensity_threshold = 0.0, line_shift = True, line_mixing = False, HITRAN_units = True, OmegaWing = 0.0, OmegaWingHW = 0.0, chunk_size = 1048576, cpf = None, workers = 1, verbose = 0):
+    """
+    Calculate the absorption coefficient for one environment, from the output of `line_data` for one or more tables.
+
+    Arguments
+    ---------
+    Omegas : ndarray
+        Sorted grid.
+    tables : list
+        With the output of `line_data` for each table.
+    environment : dict
+        `T` in Kelvin and `p` in atmosphere.
+
+    For the keyword arguments, see `line_parameters` and `accumulate_lines`. If `HITRAN_units` is False, the result is multiplied with the number density.
+
+    Returns
+    -------
+    Xsect : ndarray
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_xsect.environment_xsect()")
+
+    Xsect = numpy.zeros(len(Omegas))
+    for lines in tables:
+        pars = environment_parameters(lines, environment, line_profile = line_profile, partition_function = partition_function, diluent = diluent, intensity_threshold = intensity_threshold, line_shift = line_shift, line_mixing = line_mixing, verbose = verbose)
+        if verbose > 0:
+            print("SpectraTools.Resources.hitran_xsect.environment_xsect(): {:d} lines".format(len(pars["nu"])))
+        accumulate_lines(Omegas, pars, line_profile = line_profile, OmegaWing = OmegaWing, OmegaWingHW = OmegaWingHW, chunk_size = chunk_size, cpf = cpf, workers = workers, Xsect = Xsect, verbose = verbose)
+
+    if not HITRAN_units:
+        Xsect *= hapi.volumeConcentration(environment["p"], environment["T"])
+
+    return Xsect
+
+
+def absorption_coefficient(line_profile = "Voigt", Components = None, SourceTables = None, partitionFunction = None, Environment = None, OmegaRange = None, OmegaStep = None, OmegaWing = None, IntensityThreshold = hapi.DefaultIntensityThreshold, OmegaWingHW = hapi.DefaultOmegaWingHW, GammaL = "gamma_air", HITRAN_units = True, LineShift = True, File = None, Format = None, OmegaGrid = None, WavenumberRange = None, WavenumberStep = None, WavenumberWing = None, WavenumberWingHW = None, WavenumberGrid = None, Diluent = {}, LineMixingRosen = False, chunk_size = 1048576, cpf = None, workers = 1, verbose = 0):
+    """
+    Calculate the absorption coefficient. This is a vectorized version of `hapi.absorptionCoefficient_Voigt` etc.
+
+    Keyword Arguments
+    -----------------
+    line_profile : str {'Voigt', 'Lorentz', 'Doppler', 'HT', 'default'}
+        The line profile.
+    chunk_size : int
+        Number of (line, grid point) pairs that are evaluated at once.
+    cpf : function or str (None)
+        Complex probability function, see `line_profile_values`.
+    workers : int (1)
+        Number of processes for the lines, see `accumulate_lines`. The result does not depend on the number of workers.
+
+    For the other keyword arguments, see `hapi.absorptionCoefficient_Voigt`.
+
+    Returns
+    -------
+    Omegas : ndarray
+        The wavenumber grid.
+    Xsect : ndarray
+        The absorption coefficient.
+
+    Notes
+    -----
+
+    ::
+
+        w, c = hapi.absorptionCoefficient_Voigt(SourceTables = "CO2", Environment = {"T": 296, "p": 1})
+        w2, c2 = absorption_coefficient("Voigt", SourceTables = "CO2", Environment = {"T": 296, "p": 1})
+        numpy.amax(numpy.abs(c2 - c)) < XSECT_TOLERANCE * numpy.amax(c)
+        >>> True
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_xsect.absorption_coefficient()")
+
+    args = _xsect_arguments(line_profile, Components, SourceTables, Environment, OmegaRange, OmegaStep, OmegaWing, IntensityThreshold, OmegaWingHW, GammaL, Format, OmegaGrid, WavenumberRange, WavenumberStep, WavenumberWing, WavenumberWingHW, WavenumberGrid, Diluent, "absorption_coefficient")
+
+    Omegas = args["Omegas"]
+    tables = [grid_line_data(tablename, Omegas, args["abundances"], [args["Environment"]], line_profile = line_profile, diluent = args["Diluent"], OmegaWing = args["OmegaWing"], OmegaWingHW = args["OmegaWingHW"], verbose = verbose) for tablename in args["SourceTables"]]
+
+    Xsect = environment_xsect(Omegas, tables, args["Environment"], line_profile = line_profile, partition_function = partitionFunction, diluent = args["Diluent"], intensity_threshold = args["IntensityThreshold"], line_shift = LineShift, line_mixing = LineMixingRosen, HITRAN_units = HITRAN_units, OmegaWing = args["OmegaWing"], OmegaWingHW = args["OmegaWingHW"], chunk_size = chunk_size, cpf = cpf, workers = workers, verbose = verbose)
+
+    if File:
+        hapi.save_to_file(File, args["Format"], Omegas, Xsect)
+
+    return Omegas, Xsect
+
+
+# the data for the processes of absorption_coefficients
+_SWEEP = {}
+
+def _sweep_init(Omegas, tables, kwargs):
+    _SWEEP["Omegas"] = Omegas
+    _SWEEP["tables"] = tables
+    _SWEEP["kwargs"] = kwargs
+
+def _sweep_environment(environment):
+    return environment_xsect(_SWEEP["Omegas"], _SWEEP["tables"], environment, **_SWEEP["kwargs"])
+
+
+def absorption_coefficients(line_profile = "Voigt", Environments = None, processes = None, Components = None, SourceTables = None, partitionFunction = None, OmegaRange = None, OmegaStep = None, OmegaWing = None, IntensityThreshold = hapi.DefaultIntensityThreshold, OmegaWingHW = hapi.DefaultOmegaWingHW, GammaL = "gamma_air", HITRAN_units = True, LineShift = True, OmegaGrid = None, WavenumberRange = None, WavenumberStep = None, WavenumberWing = None, WavenumberWingHW = None, WavenumberGrid = None, Diluent = {}, LineMixingRosen = False, chunk_size = 1048576, cpf = None, verbose = 0):
+    """
+    Calculate the absorption coefficient for several environments.
+
+    The lines of the components are selected and the parameters that do not depend on the environment are looked up once (see `line_data`). The environments are calculated in a pool of processes.
+
+    Keyword Arguments
+    -----------------
+    line_profile : str {'Voigt', 'Lorentz', 'Doppler', 'HT', 'default'}
+        The line profile.
+    Environments : list of dicts
+        With `T` in Kelvin and `p` in atmosphere. Missing values are 296 K and 1 atm.
+    processes : int (None)
+        Number of processes. If None, the number of CPUs (but not more than the number of environments). With 1, no processes are started. With more than 1, `partitionFunction` and `cpf` must be picklable if the processes are not forked.
+
+    For the other keyword arguments, see `absorption_coefficient`.
+
+    Returns
+    -------
+    Omegas : ndarray
+        The wavenumber grid.
+    Xsect : ndarray
+        The absorption coefficients, with shape (environments, wavenumbers). Each row is the same as the result of `absorption_coefficient` for that environment.
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_xsect.absorption_coefficients()")
+
+    if Environments is None or len(Environments) == 0:
+        raise ValueError("SpectraTools.Resources.hitran_xsect.absorption_coefficients(): no environments")
+
+    args = _xsect_arguments(line_profile, Components, SourceTables, None, OmegaRange, OmegaStep, OmegaWing, IntensityThreshold, OmegaWingHW, GammaL, None, OmegaGrid, WavenumberRange, WavenumberStep, WavenumberWing, WavenumberWingHW, WavenumberGrid, Diluent, "absorption_coefficients")
+
+    environments = []
+    for environment in Environments:
+        env = dict(args["Environment"])
+        env.update(environment)
+        environments.append(env)
+
+    Omegas = args["Omegas"]
+    tables = [grid_line_data(tablename, Omegas, args["abundances"], environments, line_profile = line_profile, diluent = args["Diluent"], OmegaWing = args["OmegaWing"], OmegaWingHW = args["OmegaWingHW"], verbose = verbose) for tablename in args["SourceTables"]]
+
+    kwargs = {
+        "line_profile": line_profile,
+        "partition_function": partitionFunction,
+        "diluent": args["Diluent"],
+        "intensity_threshold": args["IntensityThreshold"],
+        "line_shift": LineShift,
+        "line_mixing": LineMixingRosen,
+        "HITRAN_units": HITRAN_units,
+        "OmegaWing": args["OmegaWing"],
+        "OmegaWingHW": args["OmegaWingHW"],
+        "chunk_size": chunk_size,
+        "cpf": cpf,
+        "verbose": verbose,
+    }
+
+    if processes is None:
+        processes = min(len(environments), os.cpu_count() or 1)
+
+    Xsect = numpy.zeros((len(environments), len(Omegas)))
+    if processes <= 1:
+        for i, environment in enumerate(environments):
+            Xsect[i] = environment_xsect(Omegas, tables, environment, **kwargs)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers = processes, initializer = _sweep_init, initargs = (Omegas, tables, kwargs)) as executor:
+            for i, xsect in enumerate(executor.map(_sweep_environment, environments)):
+                Xsect[i] = xsect
+
+    return Omegas, Xsect
+
+
+def hapi_absorption_coefficient(line_profile, **kwargs):
+    """
+    Calculate the absorption coefficient with HAPI.
+
+    Arguments
+    ---------
+    line_profile : str {'Voigt', 'Lorentz', 'Doppler', 'HT', 'default'}
+        The line profile.
+
+    For the keyword arguments, see `hapi.absorptionCoefficient_Voigt`.
+
+    """
+    functions = {
+        "Voigt": hapi.absorptionCoefficient_Voigt,
+        "Lorentz": hapi.absorptionCoefficient_Lorentz,
+        "Doppler": hapi.absorptionCoefficient_Doppler,
+        "HT": hapi.absorptionCoefficient_HT,
+        "default": hapi.absorptionCoefficient_HT,
+    }
+    if line_profile not in functions:
+        raise ValueError("SpectraTools.Resources.hitran_xsect.hapi_absorption_coefficient(): '{:}' is not a valid line_profile".format(line_profile))
+    return functions[line_profile](**kwargs)
+
+
+def make_synthetic_table(tablename, n_lines = 1000, min_x = 2000, max_x = 2100, components = [(2, 1), (2, 2)], seed = 0, verbose = 0):
+    """
+    Make a table with random lines in `hapi.LOCAL_TABLE_CACHE`. This is used for testing and benchmarking without downloading data. The table has the columns of the HITRAN format, so it can be written to disk with `hapi.cache2storage`.
+
+    Arguments
+    ---------
+    tablename : str
+        Name of the table. An existing table with this name is overwritten.
+
+    Keyword Arguments
+    -----------------
+    n_lines : int
+        Number of lines.
+    min_x, max_x : number
+        Range of the line centers.
+    components : list of tuples
+        The (M, I) of the lines.
+    seed : int
+        Seed for the random number generator.
+
+    Returns
+    -------
+    tablename : str
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_xsect.make_synthetic_table()")
+
+    rng = numpy.random.default_rng(seed)
+
+    c = rng.integers(0, len(components), n_lines)
+    data = {
+        "molec_id": numpy.array([components[i][0] for i in c], dtype = int),
+        "local_iso_id": numpy.array([components[i][1] for i in c], dtype = int),
+        "nu": numpy.sort(rng.uniform(min_x, max_x, n_lines)),
+        "sw": 10**rng.uniform(-24, -19, n_lines),
+        "a": rng.uniform(0, 100, n_lines),
+        "gamma_air": rng.uniform(0.05, 0.1, n_lines),
+        "gamma_self": rng.uniform(0.07, 0.12, n_lines),
+        "elower": rng.uniform(0, 3000, n_lines),
+        "n_air": rng.uniform(0.5, 0.8, n_lines),
+        "delta_air": rng.uniform(-0.005, 0.0, n_lines),
+        "gp": rng.integers(1, 100, n_lines).astype(float),
+        "gpp": rng.integers(1, 100, n_lines).astype(float),
+    }
+
+    # the other columns of the HITRAN format are strings
+    header = copy.deepcopy(hapi.HITRAN_DEFAULT_HEADER)
+    for k in header["order"]:
+        if k not in data:
+            width = int(header["format"][k][1:-1].split(".")[0])
+            data[k] = numpy.array(["0".rjust(width)] * n_lines)
+    header["table_name"] = tablename
+    header["number_of_rows"] = n_lines
+
+    hapi.LOCAL_TABLE_CACHE[tablename] = {"header": header, "data": data}
+
+    return tablename
+
+
+def benchmark(tablename = None, line_profile = "Voigt", n_lines = 2000, verbose = 0, **kwargs):
+    """
+    Compare the speed and the result of `absorption_coefficient` with HAPI.
+
+    Keyword Arguments
+    -----------------
+    tablename : str (None)
+        Name of the table. If None, a synthetic table with `n_lines` lines is used.
+    line_profile : str {'Voigt', 'Lorentz', 'Doppler', 'HT', 'default'}
+        The line profile.
+    n_lines : int
+        Number of lines for the synthetic table.
+
+    For the other keyword arguments, see `hapi.absorptionCoefficient_Voigt`.
+
+    Returns
+    -------
+    result : dict
+        `time_hapi`, `time_vectorized` and `speedup`, the number of lines and points, the maximum absolute error and the maximum error relative to the maximum of the absorption coefficient.
+
+    """
+    if verbose > 1:
+        print("SpectraTools.Resources.hitran_xsect.benchmark()")
+
+    if tablename is None:
+        tablename = make_synthetic_table("__benchmark__", n_lines = n_lines)
+    kwargs["SourceTables"] = tablename
+
+    t0 = time.perf_counter()
+    w_ref, c_ref = hapi_absorption_coefficient(line_profile, **kwargs)
+    t1 = time.perf_counter()
+    w, c = absorption_coefficient(line_profile, **kwargs)
+    t2 = time.perf_counter()
+
+    max_abs_error = numpy.amax(numpy.abs(c - c_ref))
+
+    result = {
+        "n_lines": len(hapi.LOCAL_TABLE_CACHE[tablename]["data"]["nu"]),
+        "n_points": len(w),
+        "time_hapi": t1 - t0,
+        "time_vectorized": t2 - t1,
+        "speedup": (t1 - t0) / (t2 - t1),
+        "max_abs_error": max_abs_error,
+        "max_rel_error": max_abs_error / numpy.amax(numpy.abs(c_ref)),
+    }
+
+    if verbose > 0:
+        for k, v in result.items():
+            print("  {:} : {:}".format(k, v))
+
+    return result
@@ -0,0 +1,458 @@
+"""
+SpectrumStack stores a number of spectra that share the same x-axis as one 2-dimensional array.
+
+MultiLinearSpectra keeps a list with dictionaries, each with its own LinearSpectrum object. Operations on all spectra then loop over the objects. In SpectrumStack, `y` is a single array (spectra x data points) and the metadata (class, label, unit and index) are arrays with one element per spectrum. Arithmetic, cropping, unit conversion and binning are a single numpy call for the whole stack.
+
+The conversion from and to the `mess` format of MultiLinearSpectra is lossless: the stack returned by `from_mess` retains the original dictionaries (including the objects) and updates them when converting back. Stacks made from it (with `copy`, `select` or arithmetic) do not share these dictionaries, `to_mess` makes new dictionaries and objects for them, so that the original spectra are not changed.
+
+"""
+
+import importlib
+import warnings
+
+import numpy
+import matplotlib
+import matplotlib.pyplot as plt
+
+import PythonTools.ClassTools as CT
+import SpectraTools.LinearSpectrum as LS
+import SpectraTools.UnitConversion as UC
+import SpectraTools.Resources.CommonFunctions as ST_CF
+
+importlib.reload(LS)
+importlib.reload(UC)
+importlib.reload(ST_CF)
+
+
+class SpectrumStack(CT.ClassTools):
+    """
+    N spectra on a shared x-axis.
+
+    Attributes
+    ----------
+    x : ndarray
+        The shared x-axis, length n_x.
+    y : ndarray
+        The spectra, shape (N, n_x).
+    x_unit : str
+        The unit of the x-axis.
+    y_unit : ndarray
+        The unit of y, for each spectrum.
+    dtype : str or None
+        The floating point type of y, see `SpectraTools.Resources.CommonFunctions.get_dtype`.
+    classes : ndarray
+        The class of each spectrum (the 'class' keyword in mess).
+    labels : ndarray
+        The label of each spectrum.
+    index : ndarray
+        The index of each spectrum (the 'index' keyword in mess).
+    mess : list with dicts
+        The original dictionaries, if the stack was made from a mess. Otherwise a list with empty dictionaries.
+
+    """
+
+    def __init__(self, x = None, y = None, x_unit = "", y_unit = None, classes = None, labels = None, index = None, dtype = None, verbose = 0, **kwargs):
+        """
+
+        Arguments
+        ---------
+        x : ndarray
+            The shared x-axis.
+        y : ndarray
+            1 or 2 dimensional (spectra x data points). A 1 dimensional array is a stack with one spectrum.
+        x_unit : str
+        y_unit : str or list with str (optional)
+            If a str, it is used for all spectra.
+        classes, labels : list with str (optional)
+        index : list with int (optional)
+            Default is 0 to N-1.
+        dtype : str (optional)
+            'float64' or 'float32'. If not given, the default of `SpectraTools.Resources.CommonFunctions.set_dtype` is used.
+
+        """
+        self.verbose = verbose
+        if self.verbose > 1:
+            print("SpectraTools.SpectrumStack.__init__()")
+
+        self.dtype = dtype
+        self.x = x
+        if y is not None:
+            y = ST_CF.as_dtype(numpy.asarray(y), dtype)
+            if len(numpy.shape(y)) == 1:
+                y = numpy.reshape(y, (1, len(y)))
+        self.y = y
+        self.x_unit = x_unit
+
+        n = self.n_spectra()
+        self.y_unit = self._metadata_array(y_unit, n, "")
+        self.classes = self._metadata_array(classes, n, "LinearSpectrum")
+        self.labels = self._metadata_array(labels, n, None)
+        if index is None:
+            self.index = numpy.arange(n)
+        else:
+            self.index = numpy.array(index, dtype = int)
+        self.mess = [{} for i in range(n)]
+
+
+    def _metadata_array(self, value, n, default):
+        """
+        Make an array with one element per spectrum.
+        """
+        if value is None or type(value) == str:
+            if value is None:
+                value = default
+            temp = numpy.empty(n, dtype = object)
+            temp[:] = value
+            return temp
+        else:
+            temp = numpy.empty(len(value), dtype = object)
+            temp[:] = list(value)
+            if len(temp) != n:
+                raise ValueError("SpectraTools.SpectrumStack: metadata has length {:d}, but there are {:d} spectra".format(len(temp), n))
+            return temp
+
+
+    def n_spectra(self):
+        """
+        Number of spectra in the stack.
+        """
+        if self.y is None:
+            return 0
+        return numpy.shape(self.y)[0]
+
+    def __len__(self):
+        return self.n_spectra()
+
+
+    @classmethod
+    def from_mess(cls, mess, exclude = [], verbose = 0):
+        """
+        Make a stack from a list with dictionaries in the format of MultiLinearSpectra.mess. All objects need to have exactly the same x-axis, bin or interpolate them first if that is not the case.
+
+        Arguments
+        ---------
+        mess : list with dicts
+            Each dictionary has the keys 'class' and 'object', and optionally 'label' and 'index'.
+        exclude : list
+            Indices or classes that should not be included.
+
+        Returns
+        -------
+        stack : SpectrumStack
+
+        """
+        if verbose > 1:
+            print("SpectraTools.SpectrumStack.from_mess()")
+
+        selection = [m for m in range(len(mess)) if m not in exclude and mess[m]["class"] not in exclude]
+        if len(selection) == 0:
+            raise ValueError("SpectraTools.SpectrumStack.from_mess(): no spectra to stack")
+
+        first = mess[selection[0]]["object"]
+        x = first.x
+        y = numpy.zeros((len(selection), len(x)), dtype = numpy.result_type(*[mess[m]["object"].y for m in selection]))
+
+        for i, m in enumerate(selection):
+            obj = mess[m]["object"]
+            if obj.x is not x and (len(obj.x) != len(x) or numpy.all(obj.x == x) == False):
+                raise ValueError("SpectraTools.SpectrumStack.from_mess(): the x-axis of object {:d} is not the same as that of object {:d}. Bin or interpolate the data first.".format(m, selection[0]))
+            if obj.x_unit != first.x_unit:
+                warnings.warn("SpectraTools.SpectrumStack.from_mess(): inconsistent x_unit ('{:}' and '{:}'). The unit of the first object will be used.".format(first.x_unit, obj.x_unit))
+            y[i,:] = obj.y
+
+        stack = cls(
+            x = numpy.array(x),
+            y = y,
+            x_unit = first.x_unit,
+            y_unit = [mess[m]["object"].y_unit for m in selection],
+            classes = [mess[m]["class"] for m in selection],
+            labels = [mess[m].get("label", None) for m in selection],
+            index = [mess[m].get("index", m) for m in selection],
+            verbose = verbose,
+        )
+        stack.mess = [mess[m] for m in selection]
+        return stack
+
+
+    def to_mess(self):
+        """
+        Convert the stack to a list with dictionaries in the format of MultiLinearSpectra.mess.
+
+        If the stack was made with from_mess(), the original dictionaries and objects are used, x, y and the units of the objects are updated. Otherwise, new LinearSpectrum objects are made. Each object gets its own copy of x and y.
+
+        Returns
+        -------
+        mess : list with dicts
+
+        """
+        if self.verbose > 1:
+            print("SpectraTools.SpectrumStack.to_mess()")
+
+        mess = []
+        for i in range(self.n_spectra()):
+            m = self.mess[i]
+            if "object" in m:
+                obj = m["object"]
+            else:
+                m = {}
+                m["class"] = self.classes[i]
+                if self.labels[i] is not None:
+                    m["label"] = self.labels[i]
+                obj = LS.LinearSpectrum(verbose = self.verbose)
+                m["object"] = obj
+
+            m["index"] = int(self.index[i])
+            obj.x = numpy.array(self.x)
+            obj.y = numpy.array(self.y[i,:])
+            obj.x_unit = self.x_unit
+            obj.y_unit = self.y_unit[i]
+            mess.append(m)
+
+        return mess
+
+
+    def copy(self):
+        """
+        Make a copy. The dictionaries in `mess` are not shared with the original, `to_mess` of the copy makes new objects.
+        """
+        new = SpectrumStack(x = numpy.array(self.x), y = numpy.array(self.y), x_unit = self.x_unit, y_unit = self.y_unit.copy(), classes = self.classes.copy(), labels = self.labels.copy(), index = self.index.copy(), dtype = self.dtype, verbose = self.verbose)
+        return new
+
+
+    def select(self, indices):
+        """
+        Make a new stack with a selection of the spectra.
+
+        Arguments
+        ---------
+        indices : list with int, or boolean ndarray
+            Positions in this stack (not the values of `index`).
+
+        Returns
+        -------
+        stack : SpectrumStack
+        """
+        if self.verbose > 1:
+            print("SpectraTools.SpectrumStack.select()")
+
+        indices = numpy.arange(self.n_spectra())[indices]
+        new = SpectrumStack(x = self.x, y = self.y[indices,:], x_unit = self.x_unit, y_unit = self.y_unit[indices], classes = self.classes[indices], labels = self.labels[indices], index = self.index[indices], dtype = self.dtype, verbose = self.verbose)
+        return new
+
+
+    def _other_y(self, other, label):
+        """
+        Get the y-values of the other operand of an arithmetic operation.
+
+        A SpectrumStack or LinearSpectrum needs to have the same x-axis. A LinearSpectrum or a stack with one spectrum is applied to all spectra. Numbers and ndarrays are used as they are (normal numpy broadcasting rules apply).
+        """
+        if isinstance(other, SpectrumStack) or isinstance(other, LS.LinearSpectrum):
+            if other.y is None:
+                raise ValueError("SpectraTools.SpectrumStack.{:}(): y of the other object is None.".format(label))
+            if other.x is not self.x and (len(other.x) != len(self.x) or numpy.all(other.x == self.x) == False):
+                raise ValueError("SpectraTools.SpectrumStack.{:}(): the x-axes are not the same.".format(label))
+            if other.x_unit != self.x_unit:
+                warnings.warn("SpectraTools.SpectrumStack.{:}(): x_units are not the same (A = '{:}' and B = '{:}'). The unit of A will be used.".format(label, self.x_unit, other.x_unit))
+            return other.y
+        else:
+            return other
+
+
+    def _arithmetic(self, other, ufunc, label):
+        y = ufunc(self.y, self._other_y(other, label))
+        new = SpectrumStack(x = self.x, y = y, x_unit = self.x_unit, y_unit = self.y_unit.copy(), classes = self.classes.copy(), labels = self.labels.copy(), index = self.index.copy(), dtype = self.dtype, verbose = self.verbose)
+        return new
+
+    def __add__(self, other):
+        """
+        Add a SpectrumStack, LinearSpectrum, number or ndarray to all spectra. Returns a new stack.
+        """
+        return self._arithmetic(other, numpy.add, "__add__")
+
+    def __radd__(self, other):
+        return self.__add__(other)
+
+    def __sub__(self, other):
+        """
+        Subtract a SpectrumStack, LinearSpectrum, number or ndarray from all spectra. Returns a new stack.
+        """
+        return self._arithmetic(other, numpy.subtract, "__sub__")
+
+    def __mul__(self, other):
+        """
+        Multiply all spectra with a SpectrumStack, LinearSpectrum, number or ndarray. Returns a new stack.
+        """
+        return self._arithmetic(other, numpy.multiply, "__mul__")
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __truediv__(self, other):
+        """
+        Divide all spectra by a SpectrumStack, LinearSpectrum, number or ndarray. Returns a new stack.
+        """
+        return self._arithmetic(other, numpy.true_divide, "__truediv__")
+
+
+    def get_min_max_x(self, min_x = 1e9, max_x = -1e9):
+        """
+        Get the minimum and maximum value of x. Because the x-axis is shared, this is a single call.
+
+        Wrapper around SpectraTools.CommonFunctions.get_min_max_x().
+        """
+        if self.verbose > 1:
+            print("SpectraTools.SpectrumStack.get_min_max_x()")
+
+        return ST_CF.get_min_max_x(x = self.x, min_x = min_x, max_x = max_x, verbose = self.verbose)
+
+
+    def make_new_x(self, x_resolution, min_x = None, max_x = None):
+        """
+        Make a new x axis, for binning or interpolation. See SpectraTools.CommonFunctions.make_new_x().
+        """
+        if self.verbose > 1:
+            print("SpectraTools.SpectrumStack.make_new_x()")
+
+        return ST_CF.make_new_x(x_resolution = x_resolution, x = self.x, min_x = min_x, max_x = max_x, verbose = self.verbose)
+
+
+    def crop_x(self, min_x = None, max_x = None, copy = False, **kwargs):
+        """
+        Crop all spectra. See SpectraTools.CommonFunctions.find_slice_for_cropping() for the arguments.
+
+        For a sorted x-axis, x and y become views of the original arrays. If `copy` is True, they are always copies (see `LinearSpectrum.crop_x`).
+        """
+        if self.verbose > 1:
+            print("SpectraTools.SpectrumStack.crop_x()")
+
+        idx = ST_CF.find_slice_for_cropping(x = self.x, min_x = min_x, max_x = max_x, verbose = self.verbose, **kwargs)
+
+        if idx is None:
+            return None
+
+        copy = copy and type(idx) == slice
+
+        self.x = self.x[idx].copy() if copy else self.x[idx]
+        self.y = self.y[:, idx].copy() if copy else self.y[:, idx]
+
+
+    def bin_data(self, new_x = None, x_resolution = None, min_x = None, max_x = None, resampler = None):
+        """
+        Bin all spectra on a new x-axis.
+
+        Arguments
+        ---------
+        new_x : ndarray (optional)
+            The new x-axis, the center of the bins.
+        x_resolution : number (optional)
+            If new_x is not given, make a new x-axis with this resolution.
+        min_x, max_x : number (optional)
+            Used with x_resolution.
+        resampler : SpectraTools.Resampler.Resampler (optional)
+            If given, it is used instead of new_x (any method can be used). The x-axis of the resampler has to be self.x.
+
+        """
+        if self.verbose > 1:
+            print("SpectraTools.SpectrumStack.bin_data()")
+
+        if resampler is not None:
+            self.y = resampler.apply(self.y, x = self.x, dtype = self.dtype)
+            self.x = resampler.new_x
+            return
+
+        if new_x is None:
+            if x_resolution is None:
+                return None
+            else:
+                new_x = self.make_new_x(x_resolution, min_x = min_x, max_x = max_x)
+
+        self.x, self.y = ST_CF.bin_data(x = self.x, new_x = new_x, y = self.y, dtype = self.dtype, verbose = self.verbose)
+
+
+    def convert_x(self, new_unit):
+        """
+        Convert the x-axis to a new unit. The spectra do not change.
+
+        Arguments
+        ---------
+        new_unit : str
+
+        """
+        if self.verbose > 1:
+            print("SpectraTools.SpectrumStack.convert_x()")
+
+        self.x, self.x_unit = UC.convert_x(x = self.x, old_unit = self.x_unit, new_unit = new_unit, verbose = self.verbose)
+
+
+    def convert_y(self, new_unit):
+        """
+        Convert all spectra to a new unit. Spectra with the same unit are converted with one call.
+
+        Arguments
+        ---------
+        new_unit : str
+
+        """
+        if self.verbose > 1:
+            print("SpectraTools.SpectrumStack.convert_y()")
+
+        units = set(self.y_unit)
+
+        if len(units) == 1:
+            self.y, y_unit = UC.convert_y(y = self.y, old_unit = self.y_unit[0], new_unit = new_unit, verbose = self.verbose)
+            self.y_unit[:] = y_unit
+        else:
+            # keep float32 (see `dtype`), integer data becomes float
+            y = numpy.zeros(numpy.shape(self.y), dtype = self.y.dtype if self.y.dtype.kind == "f" else float)
+            y_units = self.y_unit.copy()
+            for unit in units:
+                idx = numpy.where(self.y_unit == unit)[0]
+                y[idx,:], y_units[idx] = UC.convert_y(y = self.y[idx,:], old_unit = unit, new_unit = new_unit, verbose = self.verbose)
+            self.y = y
+            self.y_unit = y_units
+
+
+    def plot_spectra(self, exclude = [], axi = None, plot_props = [], **kwargs):
+        """
+        Plot the spectra.
+
+        Arguments
+        ---------
+        exclude : list
+            Exclude these spectra (positions in the stack or classes) from plotting.
+        axi : Matplotlib axis
+            If none, a new figure will be created.
+        plot_props : list
+            List with options for Matplotlib plotting for each plot. Examples are line color, thickness etc.
+
+        """
+        if self.verbose > 1:
+            print("SpectraTools.SpectrumStack.plot_spectra()")
+
+        if axi is None:
+            fig = plt.figure()
+            axi = fig.add_subplot(111)
+
+        selection = [m for m in range(self.n_spectra()) if m not in exclude and self.classes[m] not in exclude]
+
+        if len(plot_props) == 0:
+            lines = axi.plot(self.x, self.y[selection,:].T, **kwargs)
+            for line, m in zip(lines, selection):
+                if self.labels[m] is not None:
+                    line.set_label(self.labels[m])
+        else:
+            for m in selection:
+                _kwargs = dict(kwargs)
+                _kwargs.update(plot_props[m])
+                axi.plot(self.x, self.y[m,:], **_kwargs)
+
+        if numpy.any(self.labels[selection] != None) or len(plot_props) > 0:
+            axi.legend()
+
+        axi.set_xlabel(UC.labels_x(self.x_unit))
+        if len(set(self.y_unit)) == 1:
+            axi.set_ylabel(UC.labels_y(self.y_unit[0]))
+
+
+if __name__ == '__main__':
+    pass
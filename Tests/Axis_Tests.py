@@ -0,0 +1,195 @@
+import importlib
+import unittest
+
+import numpy
+
+import SpectraTools.Axis as AX
+import SpectraTools.LinearSpectrum as LS
+import SpectraTools.Resources.CommonFunctions as ST_CF
+
+importlib.reload(AX)
+
+
+class Test_facts(unittest.TestCase):
+
+    def setUp(self):
+        self.verbose = 0
+
+    def test_ascending(self):
+        axis = AX.Axis(numpy.linspace(2000, 2100, 10001))
+        self.assertTrue(axis.direction == 1)
+        self.assertTrue(axis.min == 2000 and axis.max == 2100)
+        self.assertTrue(numpy.isclose(axis.step, 0.01))
+
+    def test_descending(self):
+        axis = AX.Axis(numpy.arange(10.0)[::-1])
+        self.assertTrue(axis.direction == -1)
+        self.assertTrue(axis.min == 0 and axis.max == 9)
+        self.assertTrue(axis.step == -1)
+
+    def test_not_sorted(self):
+        x = numpy.array([3.0, 1, 2, 5])
+        axis = AX.Axis(x)
+        self.assertTrue(axis.direction == 0)
+        self.assertTrue(axis.min == 1 and axis.max == 5)
+        self.assertTrue(axis.step is None)
+        self.assertTrue(AX.Axis(numpy.array([0, 1, 2, 3, 5])).step is None)
+        self.assertTrue(AX.Axis(numpy.array([1.0, numpy.nan, 3])).direction == 0)
+
+    def test_cached(self):
+        axis = AX.Axis(numpy.arange(10.0))
+        axis.direction
+        axis.values[-1] = -1
+        # the values were changed in place, the facts are not updated
+        self.assertTrue(axis.direction == 1)
+        self.assertTrue(AX.Axis(axis.values).direction == 0)
+
+    def test_hash(self):
+        x = numpy.arange(10.0)
+        self.assertTrue(AX.Axis(x).hash == AX.Axis(x.copy()).hash)
+        self.assertTrue(AX.Axis(x).hash != AX.Axis(x + 1e-12).hash)
+        self.assertTrue(AX.Axis(x).hash != AX.Axis(x.astype(numpy.float32)).hash)
+
+    def test_equals(self):
+        x = numpy.arange(10.0)
+        axis = AX.Axis(x)
+        self.assertTrue(axis.equals(axis))
+        self.assertTrue(axis.equals(AX.Axis(x)))
+        self.assertTrue(axis.equals(x.copy()))
+        self.assertFalse(axis.equals(x[:-1]))
+        y = x.copy()
+        y[5] = 0
+        self.assertFalse(axis.equals(y))
+
+    def test_equals_memoized(self):
+        """
+        The result of a comparison of two axes is kept by both axes.
+        """
+        a = AX.Axis(numpy.arange(10.0))
+        b = AX.Axis(numpy.arange(10.0))
+        c = AX.Axis(numpy.arange(1.0, 11.0))
+        self.assertTrue(a.equals(b))
+        self.assertFalse(a.equals(c))
+        # the values are changed in place, the comparison is not done again
+        b.values[5] = -1
+        self.assertTrue(a.equals(b))
+        self.assertTrue(b.equals(a))
+        self.assertFalse(c.equals(a))
+        self.assertTrue(b in a._equal and a in b._equal)
+        # the memo does not keep the other axis alive
+        del b
+        self.assertTrue(len(a._equal) == 1)
+
+
+class Test_fast_paths(unittest.TestCase):
+    """
+    The results with a sorted Axis are the same as with an ndarray.
+    """
+
+    def setUp(self):
+        self.verbose = 0
+        rng = numpy.random.default_rng(0)
+        x = numpy.sort(numpy.round(rng.uniform(0, 100, 1000), 1))
+        self.x_list = [x, x[::-1], numpy.arange(100.0)]
+
+    def test_find_indices_for_cropping(self):
+        for x in self.x_list:
+            axis = AX.Axis(x)
+            for min_x, max_x in [(10, 20), (20, 10), (20.5, None), (None, 50), (-5, 200), (10.3, 10.3)]:
+                for pad in [1, 5]:
+                    idx = ST_CF.find_indices_for_cropping(x, min_x = min_x, max_x = max_x, pad = pad)
+                    fast = ST_CF.find_indices_for_cropping(axis, min_x = min_x, max_x = max_x, pad = pad)
+                    self.assertTrue(numpy.all(idx == fast))
+
+    def test_indices_for_binning(self):
+        for x in self.x_list:
+            for new_x in [numpy.arange(5, 100, 10), numpy.arange(-5, 50, 2.5), numpy.arange(20, 40, 1)]:
+                digitized = ST_CF.indices_for_binning(x, new_x)
+                self.assertTrue(numpy.all(digitized == ST_CF.indices_for_binning(AX.Axis(x), new_x)))
+
+    def test_bin_statistics(self):
+        new_x = numpy.arange(5, 100, 10)
+        for x in self.x_list:
+            y = numpy.vstack((numpy.sin(x), numpy.cos(x)))
+            r = ST_CF.bin_statistics(x, new_x, y, statistics = ["min", "max", "std"])
+            fast = ST_CF.bin_statistics(AX.Axis(x), new_x, y, statistics = ["min", "max", "std"])
+            for k in ["sum", "mean", "min", "max", "std"]:
+                self.assertTrue(numpy.allclose(r[k], fast[k], equal_nan = True))
+
+    def test_min_max(self):
+        for x in self.x_list:
+            self.assertTrue(ST_CF.get_min_max_x(AX.Axis(x)) == ST_CF.get_min_max_x(x))
+            self.assertTrue(numpy.all(ST_CF.make_new_x(2, x = AX.Axis(x)) == ST_CF.make_new_x(2, x = x)))
+
+
+class Test_linear_spectrum(unittest.TestCase):
+
+    def setUp(self):
+        self.verbose = 0
+        self.x = numpy.linspace(0, 10, 101)
+        self.A = LS.LinearSpectrum(x = self.x, y = numpy.sin(self.x), x_unit = "cm-1", y_unit = "A")
+
+    def test_invalidate(self):
+        axis = self.A.axis
+        self.assertTrue(self.A.axis is axis)
+        self.A.x = self.x[::-1]
+        self.assertTrue(self.A.axis is not axis)
+        self.assertTrue(self.A.axis.direction == -1)
+        self.A.x += 1
+        self.assertTrue(self.A.axis.min == 1)
+        del self.A.x
+        self.assertTrue(self.A.axis is None)
+
+    def test_assign_axis(self):
+        axis = AX.Axis(self.x)
+        self.A.x = axis
+        B = LS.LinearSpectrum(x = axis, y = numpy.cos(self.x), x_unit = "cm-1", y_unit = "A")
+        self.assertTrue(type(self.A.x) == numpy.ndarray)
+        self.assertTrue(self.A.axis is axis and B.axis is axis)
+        C = self.A + B
+        self.assertTrue(C.axis is axis)
+
+    def test_arithmetic_shared_axis(self):
+        """
+        Spectra with their own copy of the same x are compared once.
+        """
+        B = LS.LinearSpectrum(x = self.x.copy(), y = numpy.cos(self.x), x_unit = "cm-1", y_unit = "A")
+        C = self.A + B
+        self.assertTrue(B.axis in self.A.axis._equal)
+        for i in range(10):
+            C = C + B
+        self.assertTrue(C.axis is self.A.axis)
+        self.assertTrue(numpy.allclose(C.y, numpy.sin(self.x) + 11 * numpy.cos(self.x)))
+        # a different x is still found
+        B.x = self.x + 1
+        with self.assertRaises(ValueError) as cm:
+            C = self.A + B
+
+    def test_interpolate(self):
+        new_x = numpy.linspace(0.05, 9.95, 50)
+        y = self.A.interpolate_data(new_x = new_x)
+        self.assertTrue(numpy.allclose(y, numpy.interp(new_x, self.x, numpy.sin(self.x))))
+        self.A.x = self.x[::-1]
+        self.A.y = numpy.sin(self.x[::-1])
+        self.assertTrue(numpy.allclose(self.A.interpolate_data(new_x = new_x), y))
+
+    def test_crop_x(self):
+        self.A.crop_x(min_x = 2.05, max_x = 3.05, pad = 1)
+        self.assertTrue(numpy.allclose(self.A.x, numpy.linspace(2.0, 3.1, 12)))
+
+
+
+if __name__ == '__main__':
+    verbosity = 1
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_facts)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_fast_paths)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_linear_spectrum)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
@@ -530,7 +530,226 @@ class Test_find_indices_for_cropping(unittest.TestCase):
         res = CF.find_indices_for_cropping(x = x, min_x = 8.5, max_x = 13.5, pad = 2.3, verbose = self.verbose)
         self.assertTrue(len(res) == 15)
         self.assertTrue(numpy.allclose(res, numpy.arange(4,19)))             
+
+    def test_slice(self):
+        """
+        find_slice_for_cropping gives the same indices as find_indices_for_cropping.
+        """
+        x_list = [numpy.arange(10), numpy.arange(10)[::-1], -numpy.arange(10), numpy.repeat(numpy.arange(5), 2)]
+        for x in x_list:
+            for min_x, max_x in [(3.5, 6.5), (3, 6), (6, 3), (-1, 6.5), (3.5, 11), (-11, 11), (None, 6.5), (3.5, None), (-3.5, -6.5), (2, 2)]:
+                for pad in [1, 3, 2.3]:
+                    with self.subTest("{:}, {:}, {:}, {:}".format(x, min_x, max_x, pad)):
+                        idx = CF.find_indices_for_cropping(x, min_x = min_x, max_x = max_x, pad = pad, suppress_range_warning = True)
+                        s = CF.find_slice_for_cropping(x, min_x = min_x, max_x = max_x, pad = pad, suppress_range_warning = True)
+                        if idx is None:
+                            self.assertTrue(s is None)
+                        else:
+                            self.assertTrue(type(s) == slice)
+                            self.assertTrue(numpy.all(numpy.arange(len(x))[s] == idx))
+        # indices
+        x = numpy.arange(10)
+        for min_x, max_x in [(3, 6), (6, 3), (0, 12), (-2, 1)]:
+            idx = CF.find_indices_for_cropping(x, min_x = min_x, max_x = max_x, pad = 1, crop_index = True)
+            s = CF.find_slice_for_cropping(x, min_x = min_x, max_x = max_x, pad = 1, crop_index = True)
+            self.assertTrue(numpy.all(x[s] == idx))
+
+    def test_slice_not_sorted(self):
+        x = numpy.array([3, 1, 4, 1, 5, 9, 2, 6])
+        s = CF.find_slice_for_cropping(x, min_x = 2, max_x = 5, pad = 1)
+        self.assertTrue(type(s) == numpy.ndarray)
+        self.assertTrue(numpy.all(s == CF.find_indices_for_cropping(x, min_x = 2, max_x = 5, pad = 1)))
+        self.assertTrue(CF.find_slice_for_cropping(x) is None)
+        
+        
+class Test_bin_data(unittest.TestCase):
+
+    def setUp(self):
+        self.verbose = 0
+        
+    def bin_data_loop(self, x, new_x, y):
+        """
+        Reference implementation: loop over the bins. 
+        """
+        digitized = CF.indices_for_binning(x, new_x)
+        new_y = numpy.zeros((numpy.shape(y)[0], len(new_x)))
+        for b in range(len(new_x)):
+            temp = y[:, digitized == b]
+            if numpy.shape(temp)[1] == 0:
+                new_y[:,b] = numpy.nan
+            else:
+                new_y[:, b] = temp.mean(axis = 1)  
+        return new_y
+        
+    def test_basic(self):
+        x = numpy.array([0,1, 2,3, 4,5, 6,7, 8,9])
+        y = numpy.array([1,1, 1,1, 1,2, 2,2, 2,2])
+        new_x = numpy.array([1, 3, 5, 7, 9])
+        new_x, new_y = CF.bin_data(x, new_x, y)
+        self.assertTrue(numpy.allclose(new_y, [1,1,1.5,2,2]))
+    
+    def test_empty_bin(self):
+        x = numpy.array([0,0.1,1.9, 4.0,5.9, 6.0,7.9]) 
+        y = numpy.array([1,1,1,     2,2,     3,3])
+        new_x = numpy.array([1, 3, 5, 7])
+        new_x, new_y = CF.bin_data(x, new_x, y)
+        self.assertTrue(numpy.isnan(new_y[1]))
+        self.assertTrue(numpy.allclose(numpy.delete(new_y, 1), [1,2,3]))
+        
+        r = CF.bin_statistics(x, new_x, y, statistics = ["min", "max", "std"])
+        self.assertTrue(r["empty_bin_count"] == 1)
+        self.assertTrue(r["count"][1] == 0)
+        self.assertTrue(r["sum"][1] == 0)
+        for k in ["mean", "min", "max", "std"]:
+            self.assertTrue(numpy.isnan(r[k][1]))
+            
+    def test_2d_against_loop(self):
+        numpy.random.seed(0)
+        x = numpy.sort(numpy.random.uniform(-1, 11, 500))
+        y = numpy.random.normal(size = (3, 500))
+        new_x = numpy.arange(0.05, 10, 0.1)
+        
+        new_x, new_y = CF.bin_data(x, new_x, y)
+        test = self.bin_data_loop(x, new_x, y)
+        self.assertTrue(numpy.shape(new_y) == (3, len(new_x)))
+        self.assertTrue(numpy.allclose(new_y, test, equal_nan = True))
+        
+    def test_statistics(self):
+        numpy.random.seed(1)
+        x = numpy.random.uniform(0, 10, 300)
+        y = numpy.random.normal(size = (2, 300))
+        new_x = numpy.array([1, 3, 5, 7, 9])
+
+        r = CF.bin_statistics(x, new_x, y, statistics = ["min", "max", "std"])
+        digitized = CF.indices_for_binning(x, new_x)
+        for b in range(len(new_x)):
+            temp = y[:, digitized == b]
+            self.assertTrue(r["count"][b] == numpy.shape(temp)[1])
+            self.assertTrue(numpy.allclose(r["sum"][:,b], temp.sum(axis = 1)))
+            self.assertTrue(numpy.allclose(r["min"][:,b], temp.min(axis = 1)))
+            self.assertTrue(numpy.allclose(r["max"][:,b], temp.max(axis = 1)))
+            self.assertTrue(numpy.allclose(r["std"][:,b], temp.std(axis = 1)))
+
+    def test_unknown_statistic(self):
+        x = numpy.arange(10)
+        with self.assertRaises(ValueError) as cm:
+            CF.bin_statistics(x, numpy.array([1, 3, 5]), x, statistics = ["median"])
+        
         
+
+class Test_concatenate_data(unittest.TestCase):
+
+    def setUp(self):
+        self.verbose = 0
+        self.x_list = [numpy.array([2, 1, 0]), numpy.array([1, 3]), numpy.array([4.5])]
+        self.y_list = [numpy.array([5, 6, 7]), numpy.array([8, 9]), numpy.array([10])]
+        
+    def test_basic(self):
+        x, y = CF.concatenate_data(self.x_list, self.y_list)
+        self.assertTrue(numpy.allclose(x, numpy.concatenate(self.x_list)))
+        self.assertTrue(numpy.allclose(y, numpy.concatenate(self.y_list)))
+        self.assertTrue(x.dtype == numpy.float64)
+
+    def test_sort(self):
+        x, y = CF.concatenate_data(self.x_list, self.y_list, sort = True)
+        self.assertTrue(numpy.allclose(x, [0, 1, 1, 2, 3, 4.5]))
+        self.assertTrue(numpy.allclose(y, [7, 6, 8, 5, 9, 10]))
+
+    def test_deduplicate(self):
+        x, y = CF.concatenate_data(self.x_list, self.y_list, deduplicate = True)
+        self.assertTrue(numpy.allclose(x, [0, 1, 2, 3, 4.5]))
+        self.assertTrue(numpy.allclose(y, [7, 7, 5, 9, 10]))
+
+    def test_bin(self):
+        new_x = numpy.array([1, 3, 5, 7])
+        x, y = CF.concatenate_data(self.x_list, self.y_list, new_x = new_x)
+        test_x, test_y = CF.bin_data(numpy.concatenate(self.x_list), new_x, numpy.concatenate(self.y_list))
+        self.assertTrue(numpy.allclose(y, test_y, equal_nan = True))
+        self.assertTrue(numpy.isnan(y[-1]))
+        
+    def test_empty(self):
+        x, y = CF.concatenate_data([], [])
+        self.assertTrue(len(x) == 0)
+
+    def test_wrong_length(self):
+        with self.assertRaises(ValueError) as cm:
+            CF.concatenate_data(self.x_list, self.y_list[:2])
+        with self.assertRaises(ValueError) as cm:
+            CF.concatenate_data([numpy.arange(3)], [numpy.arange(4)])
+
+
+class Test_dtype(unittest.TestCase):
+    """
+    float32 results, with the accumulations in float64. The errors are bounded by the rounding of the input and the output to float32 (2**-24 each).
+    """
+
+    def setUp(self):
+        self.verbose = 0
+        rng = numpy.random.default_rng(0)
+        self.x = numpy.sort(rng.uniform(0, 1000, 200000))
+        self.y = rng.uniform(0.5, 1.5, len(self.x))
+        self.new_x = numpy.arange(0.5, 1000, 1.0)
+        self.previous = CF.set_dtype(None)
+
+    def tearDown(self):
+        CF.set_dtype(self.previous)
+
+    def test_get_set(self):
+        self.assertTrue(CF.get_dtype() is None)
+        self.assertTrue(CF.get_dtype("float32") == numpy.float32)
+        previous = CF.set_dtype("float32")
+        self.assertTrue(previous is None)
+        self.assertTrue(CF.get_dtype() == numpy.float32)
+        self.assertTrue(CF.get_dtype("float64") == numpy.float64)
+        with self.assertRaises(ValueError) as cm:
+            CF.get_dtype("float16")
+        with self.assertRaises(ValueError) as cm:
+            CF.set_dtype(int)
+
+    def test_as_dtype(self):
+        y = numpy.arange(10, dtype = float)
+        self.assertTrue(CF.as_dtype(y) is y)
+        self.assertTrue(CF.as_dtype(y, "float64") is y)
+        self.assertTrue(CF.as_dtype(y, "float32").dtype == numpy.float32)
+        # integers, lists and None are not converted
+        self.assertTrue(CF.as_dtype(numpy.arange(10), "float32").dtype.kind == "i")
+        self.assertTrue(CF.as_dtype([1.0, 2.0], "float32") == [1.0, 2.0])
+        self.assertTrue(CF.as_dtype(None, "float32") is None)
+
+    def test_bin_data(self):
+        new_x, y64 = CF.bin_data(self.x, self.new_x, self.y)
+        new_x, y32 = CF.bin_data(self.x, self.new_x, self.y.astype(numpy.float32), dtype = "float32")
+        self.assertTrue(y64.dtype == numpy.float64)
+        self.assertTrue(y32.dtype == numpy.float32)
+        self.assertTrue(numpy.amax(numpy.abs(y32 - y64) / y64) < 2**-23)
+
+        r = CF.bin_statistics(self.x, self.new_x, self.y, statistics = ["std", "min", "max"], dtype = "float32")
+        for k in ["sum", "mean", "std", "min", "max"]:
+            self.assertTrue(r[k].dtype == numpy.float32)
+
+    def test_accumulation(self):
+        """
+        The sum of many float32 values in float32 has a much larger error than the float64 accumulation.
+        """
+        y32 = self.y.astype(numpy.float32)
+        r = CF.bin_statistics(self.x, numpy.array([250.0, 750.0]), y32, dtype = "float32")
+        exact = numpy.array([numpy.sum(y32[self.x < 500], dtype = numpy.float64), numpy.sum(y32[self.x >= 500], dtype = numpy.float64)])
+        self.assertTrue(numpy.amax(numpy.abs(r["sum"] - exact) / exact) < 2**-24)
+        naive = numpy.cumsum(y32[self.x < 500])[-1]
+        self.assertTrue(abs(naive - exact[0]) / exact[0] > 2**-20)
+
+    def test_default(self):
+        CF.set_dtype("float32")
+        new_x, y = CF.bin_data(self.x, self.new_x, self.y)
+        self.assertTrue(y.dtype == numpy.float32)
+        x, y = CF.concatenate_data([self.x[:10], self.x[10:20]], [self.y[:10], self.y[10:20]])
+        self.assertTrue(x.dtype == numpy.float64)
+        self.assertTrue(y.dtype == numpy.float32)
+        x, y = CF.concatenate_data([self.x[:10], self.x[10:20]], [self.y[:10], self.y[10:20]], new_x = self.new_x[:2])
+        self.assertTrue(y.dtype == numpy.float32)
+        # per call
+        new_x, y = CF.bin_data(self.x, self.new_x, self.y, dtype = "float64")
+        self.assertTrue(y.dtype == numpy.float64)
         
 
 if __name__ == '__main__': 
@@ -561,5 +780,17 @@ if __name__ == '__main__':
         suite = unittest.TestLoader().loadTestsFromTestCase(Test_find_indices_for_cropping)
         unittest.TextTestRunner(verbosity=verbosity).run(suite)     
 
+    if 0:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_bin_data)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)     
+
+    if 0:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_concatenate_data)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)     
+
+    if 0:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_dtype)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)     
+
   
 
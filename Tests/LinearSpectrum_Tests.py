@@ -10,8 +10,11 @@ import matplotlib
 import matplotlib.pyplot as plt
 
 import SpectraTools.LinearSpectrum as LS
+import SpectraTools.Resources.CommonFunctions as ST_CF
+import SpectraTools.Resources.arithmetic as ST_AR
 
 importlib.reload(LS)
+importlib.reload(ST_AR)
 
 class Test_init(unittest.TestCase):
 
@@ -360,6 +363,28 @@ class Test_find_indices_for_cropping(unittest.TestCase):
                 self.assertTrue(len(res) == len(t[3]))
                 self.assertTrue(numpy.allclose(res, t[3]))            
 
+    def test_crop_x_view(self):
+        """
+        For a sorted x-axis, x and y are views, unless copy is True. 
+        """
+        x = numpy.arange(100.0)
+        y = numpy.sin(x)
+        for copy in [False, True]:
+            A = LS.LinearSpectrum(x = x, y = y)
+            A.crop_x(min_x = 20.5, max_x = 30.5, pad = 1, copy = copy)
+            self.assertTrue(numpy.all(A.x == numpy.arange(20.0, 32.0)))
+            self.assertTrue(numpy.all(A.y == y[20:32]))
+            self.assertTrue(numpy.shares_memory(A.x, x) != copy)
+            self.assertTrue(numpy.shares_memory(A.y, y) != copy)
+        # not sorted: a copy
+        x = numpy.array([3.0, 1, 4, 1, 5, 9, 2, 6])
+        A = LS.LinearSpectrum(x = x, y = x * 2)
+        A.crop_x(min_x = 2, max_x = 5, pad = 1)
+        idx = ST_CF.find_indices_for_cropping(x, min_x = 2, max_x = 5, pad = 1)
+        self.assertTrue(numpy.all(A.x == x[idx]))
+        self.assertTrue(numpy.all(A.y == 2 * A.x))
+        self.assertFalse(numpy.shares_memory(A.x, x))
+            
     def test_crop_x_no_xmin_xmax(self):
 
         P = LS.LinearSpectrum(verbose = self.verbose)
@@ -736,10 +761,179 @@ class Test_add_sub_div_concat(unittest.TestCase):
             with self.assertWarns(Warning) as cm2:
                 C = self.A + D
 
+class Test_dtype(unittest.TestCase):
+    """
+    y in float32. The relative error of an operation on float32 data is at most 2**-24 (the rounding of the result), plus the rounding of the input to float32.
+    """
+
+    def setUp(self):
+        self.verbose = 0
+        rng = numpy.random.default_rng(1)
+        self.x = numpy.linspace(2000, 2100, 100001)
+        self.y_A = rng.uniform(0.1, 1, len(self.x))
+        self.y_B = rng.uniform(0.1, 1, len(self.x))
+        self.previous = ST_CF.set_dtype(None)
+
+    def tearDown(self):
+        ST_CF.set_dtype(self.previous)
+
+    def test_per_object(self):
+        A = LS.LinearSpectrum(x = self.x, y = self.y_A, x_unit = "cm-1", y_unit = "A", dtype = "float32")
+        self.assertTrue(A.y.dtype == numpy.float32)
+        self.assertTrue(A.x.dtype == numpy.float64)
+        A.y = self.y_B
+        self.assertTrue(A.y.dtype == numpy.float32)
+        B = LS.LinearSpectrum(x = self.x, y = self.y_A, x_unit = "cm-1", y_unit = "A")
+        self.assertTrue(B.y.dtype == numpy.float64)
+
+    def test_arithmetic(self):
+        A = LS.LinearSpectrum(x = self.x, y = self.y_A, x_unit = "cm-1", y_unit = "A", dtype = "float32")
+        B = LS.LinearSpectrum(x = self.x, y = self.y_B, x_unit = "cm-1", y_unit = "A", dtype = "float32")
+        for C, ref in [(A + B, self.y_A + self.y_B), (A - B, self.y_A - self.y_B), (A / B, self.y_A / self.y_B)]:
+            self.assertTrue(C.y.dtype == numpy.float32)
+            # the error of A - B is relative to the inputs
+            error = numpy.abs(C.y - ref) / numpy.maximum(numpy.abs(ref), numpy.abs(self.y_A))
+            self.assertTrue(numpy.amax(error) < 3 * 2**-24)
+
+    def test_bin_data(self):
+        A = LS.LinearSpectrum(x = self.x, y = self.y_A, x_unit = "cm-1", y_unit = "A", dtype = "float32")
+        new_x = numpy.arange(2000.5, 2100, 1.0)
+        A.bin_data(new_x = new_x)
+        x, ref = ST_CF.bin_data(self.x, new_x, self.y_A)
+        self.assertTrue(A.y.dtype == numpy.float32)
+        self.assertTrue(numpy.amax(numpy.abs(A.y - ref) / ref) < 2 * 2**-24)
+
+    def test_default(self):
+        ST_CF.set_dtype("float32")
+        A = LS.LinearSpectrum(x = self.x, y = self.y_A)
+        self.assertTrue(A.y.dtype == numpy.float32)
+        A = LS.LinearSpectrum(x = self.x, y = self.y_A, dtype = "float64")
+        self.assertTrue(A.y.dtype == numpy.float64)
+        # integers are not converted
+        A = LS.LinearSpectrum(x = self.x, y = numpy.arange(10))
+        self.assertTrue(A.y.dtype.kind == "i")
+
+    def test_default_reload(self):
+        """
+        The default survives importing (and thus reloading) the modules.
+        """
+        ST_CF.set_dtype("float32")
+        importlib.reload(LS)
+        importlib.reload(ST_CF)
+        self.assertTrue(ST_CF.get_dtype() == numpy.float32)
+        A = LS.LinearSpectrum(x = self.x, y = self.y_A)
+        self.assertTrue(A.y.dtype == numpy.float32)
+        
+        
+
+class Test_in_place(unittest.TestCase):
+    """
+    In-place operators, `out`, and the class of the result.
+    """
+
+    def setUp(self):
+        self.verbose = 0
+        self.x = numpy.arange(10.0)
+        self.y_A = numpy.arange(10) + 1.0
+        self.y_B = numpy.arange(10) + 2.0
+        self.A = LS.LinearSpectrum(x = self.x, y = self.y_A.copy(), x_unit = "x", y_unit = "y")
+        self.B = LS.LinearSpectrum(x = self.x.copy(), y = self.y_B.copy(), x_unit = "x", y_unit = "y")
+
+    def test_in_place(self):
+        y = self.A.y
+        self.A += self.B
+        self.A -= 2
+        self.A *= numpy.full(10, 3.0)
+        self.A /= self.B
+        self.assertTrue(self.A.y is y)
+        self.assertTrue(numpy.allclose(self.A.y, (self.y_A + self.y_B - 2) * 3 / self.y_B))
+        self.assertTrue(numpy.all(self.B.y == self.y_B))
+
+    def test_scalar_ndarray(self):
+        for C, ref in [(self.A + 1, self.y_A + 1), (2 + self.A, self.y_A + 2), (self.A - self.y_B, self.y_A - self.y_B), (self.A * 2, self.y_A * 2), (3 * self.A, self.y_A * 3), (self.A / self.y_B, self.y_A / self.y_B)]:
+            self.assertTrue(numpy.all(C.y == ref))
+            self.assertTrue(C.x_unit == "x" and C.y_unit == "y")
+        self.assertTrue(numpy.all(self.A.y == self.y_A))
+
+    def test_new_array(self):
+        """
+        A new array is made if the result does not fit in y.
+        """
+        A = LS.LinearSpectrum(x = self.x, y = numpy.arange(10))
+        y = A.y
+        A /= 2
+        self.assertTrue(A.y is not y and numpy.all(A.y == numpy.arange(10) / 2))
+        self.assertTrue(numpy.all(y == numpy.arange(10)))
+        # read only
+        y = self.A.y
+        y.flags.writeable = False
+        self.A += self.B
+        self.assertTrue(self.A.y is not y and numpy.all(y == self.y_A))
+        # the shape of the result is different
+        self.A += numpy.zeros((2, 10))
+        self.assertTrue(self.A.y.shape == (2, 10))
+
+    def test_float32(self):
+        A = LS.LinearSpectrum(x = self.x, y = self.y_A, dtype = "float32")
+        y = A.y
+        A += self.B
+        self.assertTrue(A.y is y and A.y.dtype == numpy.float32)
+
+    def test_out(self):
+        C = LS.LinearSpectrum(x = self.x, y = numpy.zeros(10))
+        y = C.y
+        for function, ref in [(self.A.add, self.y_A + self.y_B), (self.A.subtract, self.y_A - self.y_B), (self.A.multiply, self.y_A * self.y_B), (self.A.divide, self.y_A / self.y_B)]:
+            D = function(self.B, out = C)
+            self.assertTrue(D is C and C.y is y)
+            self.assertTrue(numpy.all(C.y == ref))
+        self.assertTrue(C.axis is self.A.axis)
+        self.assertTrue(C.x_unit == "x" and C.y_unit == "y")
+        # without out, the same as the operators
+        self.assertTrue(numpy.all(self.A.add(self.B).y == self.y_A + self.y_B))
+        # a different x-axis
+        C = LS.LinearSpectrum(x = numpy.arange(5.0), y = numpy.zeros(5))
+        self.A.add(self.B, out = C)
+        self.assertTrue(numpy.all(C.x == self.x) and numpy.all(C.y == self.y_A + self.y_B))
+
+    def test_errors(self):
+        self.B.x = self.x + 1
+        with self.assertRaises(ValueError) as cm:
+            self.A += self.B
+        with self.assertRaises(ValueError) as cm:
+            self.A.add(self.B, out = self.A)
+        self.assertTrue(numpy.all(self.A.y == self.y_A))
+        with self.assertRaises(ValueError) as cm:
+            LS.LinearSpectrum() + 1
+
+    def test_subclass(self):
+        A = ExampleSubclass(x = self.x, y = self.y_A.copy(), x_unit = "x", y_unit = "y")
+        A.metadata = {"molecule": "CO2"}
+        for C in [A + self.B, A - 1, A * 2, A / self.y_B, A.add(self.B)]:
+            self.assertTrue(type(C) == ExampleSubclass)
+            self.assertTrue(C.metadata == {"molecule": "CO2"})
+            self.assertTrue(C is not A)
+        self.assertTrue(numpy.all(A.y == self.y_A))
+        A += self.B
+        self.assertTrue(type(A) == ExampleSubclass and numpy.all(A.y == self.y_A + self.y_B))
+
+    def test_benchmark(self):
+        r = ST_AR.benchmark(n = 100000, repeat = 1)
+        self.assertTrue(r["operators"]["arrays"] >= 1)
+        self.assertTrue(r["out"]["arrays"] < 0.1)
+        self.assertTrue(r["in-place"]["arrays"] < 0.1)
+
+        
+
 class ExampleClass():
     def __init__(self):
         pass
     
+
+class ExampleSubclass(LS.LinearSpectrum):
+    def __init__(self, verbose = 0, **kwargs):
+        LS.LinearSpectrum.__init__(self, verbose = verbose, **kwargs)
+        self.metadata = {}
+    
         
         
 if __name__ == '__main__': 
@@ -807,6 +1001,21 @@ if __name__ == '__main__':
         """
         suite = unittest.TestLoader().loadTestsFromTestCase(Test_add_sub_div_concat)
         unittest.TextTestRunner(verbosity=verbosity).run(suite) 
+
+    if 1:
+        """
+        + dtype
+        """
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_dtype)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite) 
+
+    if 1:
+        """
+        + __iadd__, __isub__, __imul__, __itruediv__
+        + add, subtract, multiply, divide
+        """
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_in_place)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite) 
         
         
     # if 1:
@@ -8,6 +8,7 @@ import numpy
 import matplotlib 
 import matplotlib.pyplot as plt
 
+import SpectraTools.LinearSpectrum as LS
 import SpectraTools.MultiLinearSpectra as MLS
 
 flag_ST = True
@@ -278,6 +279,104 @@ class Test_batches(unittest.TestCase):
         self.assertTrue(self.P.mess[-1]["object"].y_unit is None)
 
 
+class Test_batches_linear_spectra(unittest.TestCase):
+    """
+    Batches of LinearSpectrum objects, these tests do not need SensorTools. 
+    """
+
+    def setUp(self):
+        self.verbose = 0
+        
+        self.P = MLS.MultiLinearSpectra(verbose = self.verbose)
+        self.P.mess = []
+        for i in range(4):
+            x = numpy.arange(10, dtype = float)[::-1] + i
+            obj = LS.LinearSpectrum(x = x, y = x * 0 + i, x_unit = "cm-1", y_unit = "A")
+            self.P.mess.append({"class": "LinearSpectrum", "index": i, "object": obj})
+
+    def test_batches(self):
+        self.P.make_batches([[0,1], [2,3]])
+        self.assertTrue(len(self.P.mess) == 6)
+        batch = self.P.mess[4]
+        self.assertTrue(batch["class"] == "batch")
+        self.assertTrue(batch["index"] == 4)
+        self.assertTrue(numpy.allclose(batch["object"].x, numpy.concatenate((self.P.mess[0]["object"].x, self.P.mess[1]["object"].x))))
+        self.assertTrue(numpy.allclose(batch["object"].y, numpy.concatenate((self.P.mess[0]["object"].y, self.P.mess[1]["object"].y))))
+        self.assertTrue(batch["object"].x_unit == "cm-1")
+
+    def test_batches_sort(self):
+        self.P.make_batches([[0,1]], sort = True)
+        x = self.P.mess[-1]["object"].x
+        self.assertTrue(len(x) == 20)
+        self.assertTrue(numpy.all(numpy.diff(x) >= 0))
+
+    def test_batches_deduplicate(self):
+        self.P.make_batches([[0,1]], deduplicate = True)
+        batch = self.P.mess[-1]["object"]
+        self.assertTrue(numpy.allclose(batch.x, numpy.arange(11)))
+        self.assertTrue(batch.y[0] == 0)
+        self.assertTrue(batch.y[5] == 0.5)
+        self.assertTrue(batch.y[-1] == 1)
+
+    def test_batches_binned(self):
+        new_x = numpy.array([1, 3, 5, 7, 9, 11])
+        self.P.make_batches([[0,1,2,3]], new_x = new_x)
+        batch = self.P.mess[-1]["object"]
+        self.assertTrue(numpy.allclose(batch.x, new_x))
+        self.assertTrue(len(batch.y) == len(new_x))
+
+    def test_batches_virtual(self):
+        self.P.make_batches([[0,1]], virtual = True)
+        batch = self.P.mess[-1]["object"]
+        self.assertFalse(batch.is_materialized())
+        self.assertTrue(len(batch) == 20)
+        self.assertFalse(batch.is_materialized())
+        
+        # the batch uses the members at the time of access
+        self.P.mess[1]["object"].y = self.P.mess[1]["object"].y + 10
+        self.assertTrue(numpy.allclose(batch.y[10:], 11))
+        self.assertTrue(batch.is_materialized())
+        self.assertTrue(batch.x_unit == "cm-1")
+
+    def test_batches_virtual_deduplicate(self):
+        self.P.make_batches([[0,1]], virtual = True, deduplicate = True)
+        batch = self.P.mess[-1]["object"]
+        self.assertTrue(len(batch) == 11)
+        self.assertFalse(batch.is_materialized())
+        self.assertTrue(len(batch.x) == 11)
+
+    def test_virtual_batch_members(self):
+        """
+        Batches do not share the list with members.
+        """
+        a = MLS.VirtualBatch()
+        b = MLS.VirtualBatch()
+        a.members.append(self.P.mess[0]["object"])
+        self.assertTrue(len(b.members) == 0)
+        members = [self.P.mess[0]["object"]]
+        c = MLS.VirtualBatch(members = members)
+        members.append(self.P.mess[1]["object"])
+        self.assertTrue(len(c.members) == 1)
+
+    def test_batches_units_inconsistent(self):
+        self.P.mess[1]["object"].y_unit = "T1"
+        with self.assertWarns(Warning) as cm:
+            self.P.make_batches([[0,1]])
+        self.assertTrue(self.P.mess[-1]["object"].y_unit is None)
+        
+    def test_bin_data(self):
+        """
+        Objects with the same x-axis share the mapping to the bins. 
+        """
+        self.P.mess[1]["object"].x = self.P.mess[0]["object"].x.copy()
+        refs = [m["object"].bin_data_helper(numpy.array([1, 3, 5, 7, 9]))[1] for m in self.P.mess]
+        self.P.bin_data(x_resolution = 2, min_x = 0, max_x = 10)
+        for m, ref in zip(self.P.mess, refs):
+            self.assertTrue(numpy.allclose(m["object"].x, [1, 3, 5, 7, 9]))
+            self.assertTrue(numpy.allclose(m["object"].y, ref, equal_nan = True))
+        
+
+
 class Test_make_uniform_x(unittest.TestCase):
 
     def setUp(self):
@@ -298,6 +397,10 @@ if __name__ == '__main__':
         suite = unittest.TestLoader().loadTestsFromTestCase(Test_batches)
         unittest.TextTestRunner(verbosity=verbosity).run(suite)     
         
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_batches_linear_spectra)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)     
+        
     if 1:
         suite = unittest.TestLoader().loadTestsFromTestCase(Test_make_uniform_x)
         unittest.TextTestRunner(verbosity=verbosity).run(suite)            
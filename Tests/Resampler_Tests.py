@@ -0,0 +1,151 @@
+import importlib
+import unittest
+
+import numpy
+
+import SpectraTools.LinearSpectrum as LS
+import SpectraTools.Resampler as RS
+import SpectraTools.SpectrumStack as SS
+import SpectraTools.Resources.CommonFunctions as ST_CF
+
+importlib.reload(RS)
+
+
+class Test_methods(unittest.TestCase):
+
+    def setUp(self):
+        self.verbose = 0
+        rng = numpy.random.default_rng(0)
+        x = numpy.sort(rng.uniform(0, 100, 1000))
+        self.x_list = [x, x[::-1], rng.permutation(x)]
+        self.new_x = numpy.arange(2.5, 100, 5.0)
+
+    def test_bin_mean(self):
+        for x in self.x_list:
+            y = numpy.vstack((numpy.sin(x), numpy.cos(x), x))
+            r = RS.Resampler(x, self.new_x, method = "bin-mean")
+            for _y in [y, y[0]]:
+                new_x, ref = ST_CF.bin_data(x, self.new_x, _y)
+                self.assertTrue(numpy.allclose(r.apply(_y), ref, equal_nan = True))
+
+    def test_bin_mean_empty(self):
+        x = numpy.array([0, 1, 2, 3, 8, 9], dtype = float)
+        r = RS.Resampler(x, numpy.array([1, 3, 5, 7, 9]), method = "bin-mean")
+        new_y = r.apply(x)
+        self.assertTrue(numpy.allclose(new_y, [0.5, 2.5, numpy.nan, numpy.nan, 8.5], equal_nan = True))
+
+    def test_linear(self):
+        for x in self.x_list:
+            new_x = numpy.linspace(numpy.amin(x), numpy.amax(x), 777)
+            y = numpy.sin(x / 5)
+            r = RS.Resampler(x, new_x, method = "linear")
+            order = numpy.argsort(x)
+            self.assertTrue(numpy.allclose(r.apply(y), numpy.interp(new_x, x[order], y[order])))
+            # also for more than one spectrum
+            self.assertTrue(numpy.allclose(r.apply(numpy.vstack((y, 2 * y)))[1], 2 * r.apply(y)))
+
+    def test_nearest(self):
+        x = numpy.array([0, 1, 3, 6, 10], dtype = float)
+        r = RS.Resampler(x[::-1], numpy.array([0.4, 0.6, 2.1, 4.4, 8.1, 10]), method = "nearest")
+        self.assertTrue(numpy.all(r.apply(x[::-1]) == [0, 1, 3, 3, 10, 10]))
+
+    def test_cubic(self):
+        """
+        A cubic polynomial is exact, also on a non-uniform axis and at the ends.
+        """
+        x = numpy.sort(numpy.random.default_rng(1).uniform(-2, 2, 50))
+        new_x = numpy.linspace(x[0], x[-1], 301)
+        f = lambda x: 2 * x**3 - x**2 + 0.5 * x - 3
+        r = RS.Resampler(x, new_x, method = "cubic")
+        self.assertTrue(numpy.allclose(r.apply(f(x)), f(new_x)))
+        self.assertTrue(numpy.allclose(RS.Resampler(x, x, method = "cubic").apply(f(x)), f(x)))
+
+    def test_outside(self):
+        x = numpy.arange(10.0)
+        new_x = numpy.array([-1, 0, 4.5, 9, 10])
+        for method in ["linear", "nearest", "cubic"]:
+            new_y = RS.Resampler(x, new_x, method = method).apply(x)
+            self.assertTrue(numpy.all(numpy.isnan(new_y) == [True, False, False, False, True]))
+            self.assertTrue(numpy.allclose(new_y[1:4], [0, 4.5 if method != "nearest" else 4, 9]))
+        new_y = RS.Resampler(x, new_x, method = "linear", fill_value = 0).apply(x)
+        self.assertTrue(new_y[0] == 0 and new_y[-1] == 0)
+
+    def test_nan(self):
+        """
+        NaN in a point only changes the points that use it.
+        """
+        x = numpy.arange(10.0)
+        y = x.copy()
+        y[5] = numpy.nan
+        new_y = RS.Resampler(x, numpy.array([4, 4.5, 6]), method = "linear").apply(y)
+        self.assertTrue(numpy.all(numpy.isnan(new_y) == [False, True, False]))
+
+    def test_dtype(self):
+        x = numpy.arange(10.0)
+        r = RS.Resampler(x, numpy.array([1.5, 2.5]))
+        self.assertTrue(r.apply(x.astype(numpy.float32)).dtype == numpy.float64)
+        self.assertTrue(r.apply(x, dtype = "float32").dtype == numpy.float32)
+
+    def test_errors(self):
+        x = numpy.arange(10.0)
+        with self.assertRaises(ValueError) as cm:
+            RS.Resampler(x, x, method = "spline")
+        with self.assertRaises(ValueError) as cm:
+            RS.Resampler(x[:3], x, method = "cubic")
+        with self.assertRaises(ValueError) as cm:
+            RS.Resampler(x, x[:1], method = "bin-mean")
+        r = RS.Resampler(x, x)
+        with self.assertRaises(ValueError) as cm:
+            r.apply(x[:5])
+        with self.assertRaises(ValueError) as cm:
+            r.apply(x, x = x + 1)
+
+
+class Test_spectra(unittest.TestCase):
+
+    def setUp(self):
+        self.verbose = 0
+        self.x = numpy.linspace(2000, 2100, 1001)
+        self.new_x = numpy.arange(2000.5, 2100, 1.0)
+        self.spectra = [LS.LinearSpectrum(x = self.x.copy(), y = numpy.sin(self.x * i), x_unit = "cm-1", y_unit = "A") for i in range(5)]
+
+    def test_bin_data(self):
+        r = RS.Resampler(self.x, self.new_x, method = "bin-mean")
+        for A in self.spectra:
+            new_x, ref = A.bin_data_helper(self.new_x)
+            A.bin_data(resampler = r)
+            self.assertTrue(numpy.all(A.x == self.new_x))
+            self.assertTrue(numpy.allclose(A.y, ref, equal_nan = True))
+
+    def test_interpolate_data(self):
+        new_x = numpy.linspace(2001, 2099, 333)
+        r = RS.Resampler(self.x, new_x, method = "linear")
+        for A in self.spectra:
+            self.assertTrue(numpy.allclose(A.interpolate_data(resampler = r), A.interpolate_data(new_x = new_x)))
+
+    def test_different_x(self):
+        r = RS.Resampler(self.x + 1, self.new_x, method = "bin-mean")
+        with self.assertRaises(ValueError) as cm:
+            self.spectra[0].bin_data(resampler = r)
+
+    def test_stack(self):
+        S = SS.SpectrumStack(x = self.x, y = numpy.vstack([A.y for A in self.spectra]), x_unit = "cm-1", y_unit = "A")
+        r = RS.Resampler(self.x, self.new_x, method = "bin-mean")
+        S.bin_data(resampler = r)
+        for i, A in enumerate(self.spectra):
+            new_x, ref = A.bin_data_helper(self.new_x)
+            self.assertTrue(numpy.allclose(S.y[i], ref))
+        self.assertTrue(numpy.all(S.x == self.new_x))
+
+
+
+if __name__ == '__main__':
+    verbosity = 1
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_methods)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_spectra)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
@@ -0,0 +1,215 @@
+import importlib
+import warnings
+import unittest
+
+import numpy
+import matplotlib
+import matplotlib.pyplot as plt
+
+import SpectraTools.LinearSpectrum as LS
+import SpectraTools.SpectrumStack as SS
+
+importlib.reload(SS)
+
+class Test_init(unittest.TestCase):
+
+    def setUp(self):
+        self.verbose = 0
+
+    def test_init(self):
+        """
+        Basic test
+        """
+        x = numpy.arange(10)
+        y = numpy.ones((3, 10))
+        S = SS.SpectrumStack(x = x, y = y, x_unit = "cm-1", y_unit = "A", verbose = self.verbose)
+
+        self.assertTrue(len(S) == 3)
+        self.assertTrue(numpy.all(S.y_unit == "A"))
+        self.assertTrue(numpy.all(S.index == [0,1,2]))
+
+    def test_1d_y(self):
+        x = numpy.arange(10)
+        S = SS.SpectrumStack(x = x, y = x**2, verbose = self.verbose)
+        self.assertTrue(numpy.shape(S.y) == (1, 10))
+
+    def test_wrong_metadata_length(self):
+        x = numpy.arange(10)
+        with self.assertRaises(ValueError) as cm:
+            S = SS.SpectrumStack(x = x, y = numpy.ones((3, 10)), labels = ["a", "b"], verbose = self.verbose)
+
+
+class Test_mess_conversion(unittest.TestCase):
+
+    def setUp(self):
+        self.verbose = 0
+        x = numpy.arange(10, dtype = float)
+        self.mess = []
+        for i in range(3):
+            obj = LS.LinearSpectrum(x = x.copy(), y = x * (i + 1), x_unit = "cm-1", y_unit = "A")
+            self.mess.append({"class": "LinearSpectrum", "label": "spectrum {:d}".format(i), "index": i, "object": obj, "other": i * 10})
+
+    def test_from_mess(self):
+        S = SS.SpectrumStack.from_mess(self.mess, verbose = self.verbose)
+        self.assertTrue(numpy.shape(S.y) == (3, 10))
+        self.assertTrue(numpy.allclose(S.y[2,:], 3 * S.x))
+        self.assertTrue(S.labels[1] == "spectrum 1")
+
+    def test_from_mess_exclude(self):
+        S = SS.SpectrumStack.from_mess(self.mess, exclude = [1], verbose = self.verbose)
+        self.assertTrue(len(S) == 2)
+        self.assertTrue(numpy.all(S.index == [0, 2]))
+
+    def test_from_mess_different_x(self):
+        self.mess[1]["object"].x = self.mess[1]["object"].x + 1
+        with self.assertRaises(ValueError) as cm:
+            S = SS.SpectrumStack.from_mess(self.mess, verbose = self.verbose)
+
+    def test_round_trip(self):
+        S = SS.SpectrumStack.from_mess(self.mess, verbose = self.verbose)
+        S.y *= 2
+        mess = S.to_mess()
+        self.assertTrue(len(mess) == 3)
+        for i in range(3):
+            self.assertTrue(mess[i] is self.mess[i])
+            self.assertTrue(mess[i]["other"] == i * 10)
+            self.assertTrue(numpy.allclose(mess[i]["object"].y, 2 * (i + 1) * mess[i]["object"].x))
+        # the objects do not share y with the stack
+        self.assertFalse(numpy.shares_memory(mess[0]["object"].y, S.y))
+
+    def test_derived_stacks(self):
+        """
+        Stacks made from the stack of from_mess do not change the original spectra.
+        """
+        y = [numpy.array(m["object"].y) for m in self.mess]
+        a = SS.SpectrumStack.from_mess(self.mess, verbose = self.verbose)
+        for b in [a * 2, a.copy(), a.select([2, 0])]:
+            b.y *= 3
+            mess = b.to_mess()
+            for i in range(3):
+                self.assertTrue(numpy.all(self.mess[i]["object"].y == y[i]))
+            for m in mess:
+                self.assertFalse(any(m is n for n in self.mess))
+        self.assertTrue(numpy.allclose(mess[0]["object"].y, 3 * y[2]))
+        self.assertTrue(mess[0]["label"] == "spectrum 2")
+
+    def test_to_mess_new_objects(self):
+        x = numpy.arange(5)
+        S = SS.SpectrumStack(x = x, y = numpy.ones((2, 5)), x_unit = "cm-1", y_unit = ["A", "T1"], labels = ["a", "b"], verbose = self.verbose)
+        mess = S.to_mess()
+        self.assertTrue(mess[1]["label"] == "b")
+        self.assertTrue(mess[1]["object"].y_unit == "T1")
+        self.assertTrue(mess[1]["index"] == 1)
+
+        T = SS.SpectrumStack.from_mess(mess, verbose = self.verbose)
+        self.assertTrue(numpy.allclose(T.y, S.y))
+        self.assertTrue(numpy.all(T.y_unit == S.y_unit))
+
+
+class Test_operations(unittest.TestCase):
+
+    def setUp(self):
+        self.verbose = 0
+        self.x = numpy.arange(10, dtype = float)
+        self.y = numpy.vstack((self.x, 2 * self.x + 1, 3 * self.x + 1))
+        self.S = SS.SpectrumStack(x = self.x, y = self.y, x_unit = "cm-1", y_unit = "T1", verbose = self.verbose)
+
+    def test_arithmetic(self):
+        C = self.S + self.S
+        self.assertTrue(numpy.allclose(C.y, 2 * self.y))
+        C = self.S - 1
+        self.assertTrue(numpy.allclose(C.y, self.y - 1))
+        C = self.S / self.S
+        self.assertTrue(numpy.allclose(C.y[1:,:], 1))
+        C = 3 * self.S
+        self.assertTrue(numpy.allclose(C.y, 3 * self.y))
+
+    def test_arithmetic_linear_spectrum(self):
+        B = LS.LinearSpectrum(x = self.x, y = self.x, x_unit = "cm-1", y_unit = "T1")
+        C = self.S - B
+        self.assertTrue(numpy.allclose(C.y, self.y - self.x))
+
+    def test_arithmetic_different_x(self):
+        B = LS.LinearSpectrum(x = self.x + 1, y = self.x, x_unit = "cm-1", y_unit = "T1")
+        with self.assertRaises(ValueError) as cm:
+            C = self.S - B
+
+    def test_crop_x(self):
+        self.S.crop_x(min_x = 3.5, max_x = 6.5, pad = 1)
+        self.assertTrue(numpy.allclose(self.S.x, numpy.arange(3, 8)))
+        self.assertTrue(numpy.shape(self.S.y) == (3, 5))
+
+    def test_crop_x_copy(self):
+        y = self.S.y
+        self.S.crop_x(min_x = 3.5, max_x = 6.5, pad = 1)
+        self.assertTrue(numpy.shares_memory(self.S.y, y))
+        self.S.crop_x(min_x = 4.5, max_x = 5.5, pad = 1, copy = True)
+        self.assertFalse(numpy.shares_memory(self.S.y, y))
+        self.assertTrue(numpy.allclose(self.S.x, numpy.arange(4, 7)))
+
+    def test_bin_data(self):
+        self.S.bin_data(new_x = numpy.array([1, 3, 5, 7, 9]))
+        self.assertTrue(numpy.allclose(self.S.y[0,:], [0.5, 2.5, 4.5, 6.5, 8.5]))
+        self.assertTrue(numpy.shape(self.S.y) == (3, 5))
+
+    def test_convert(self):
+        self.S.convert_x("nm")
+        self.assertTrue(self.S.x_unit == "nm")
+        self.S.convert_y("T100")
+        self.assertTrue(numpy.all(self.S.y_unit == "T100"))
+        self.assertTrue(numpy.allclose(self.S.y, 100 * self.y))
+
+    def test_convert_y_mixed_units(self):
+        self.S.y_unit[0] = "T100"
+        self.S.convert_y("T1")
+        self.assertTrue(numpy.allclose(self.S.y[0,:], self.y[0,:] / 100))
+        self.assertTrue(numpy.allclose(self.S.y[1:,:], self.y[1:,:]))
+
+    def test_get_min_max_x(self):
+        min_x, max_x = self.S.get_min_max_x()
+        self.assertTrue(min_x == 0)
+        self.assertTrue(max_x == 9)
+
+    def test_select(self):
+        C = self.S.select([0, 2])
+        self.assertTrue(numpy.allclose(C.y, self.y[[0,2],:]))
+        self.assertTrue(numpy.all(C.index == [0, 2]))
+
+    def test_float32(self):
+        S = SS.SpectrumStack(x = self.x, y = self.y, x_unit = "cm-1", y_unit = "T1", dtype = "float32", verbose = self.verbose)
+        self.assertTrue(S.y.dtype == numpy.float32)
+        for C in [S + S, S - 1, 3 * S, S.select([0, 2]), S.copy()]:
+            self.assertTrue(C.y.dtype == numpy.float32)
+        S.bin_data(new_x = numpy.array([1, 3, 5, 7, 9]))
+        self.assertTrue(S.y.dtype == numpy.float32)
+        self.assertTrue(numpy.allclose(S.y[0,:], [0.5, 2.5, 4.5, 6.5, 8.5], rtol = 2**-23))
+
+    def test_float32_convert_y(self):
+        """
+        Also with more than one unit, the conversion keeps float32.
+        """
+        y = numpy.random.default_rng(0).uniform(0.1, 1, (3, 10))
+        for y_unit in [["A", "A", "A"], ["A", "A", "T1"]]:
+            S = SS.SpectrumStack(x = self.x, y = y, x_unit = "cm-1", y_unit = y_unit, dtype = "float32", verbose = self.verbose)
+            S.convert_y("T1")
+            self.assertTrue(S.y.dtype == numpy.float32)
+            self.assertTrue(numpy.all(S.y_unit == "T1"))
+            self.assertTrue(numpy.allclose(S.y[0,:], 10**-y[0,:], rtol = 1e-6))
+            self.assertTrue(numpy.allclose(S.y[2,:], y[2,:] if y_unit[2] == "T1" else 10**-y[2,:], rtol = 1e-6))
+
+
+
+if __name__ == '__main__':
+    verbosity = 1
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_init)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_mess_conversion)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_operations)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
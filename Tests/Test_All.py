@@ -7,23 +7,53 @@ import unittest
 
 import SpectraTools.Tests.CommonFunctions_ST_Tests
 import SpectraTools.Tests.hitran_Tests
+import SpectraTools.Tests.hitran_xsect_Tests
+import SpectraTools.Tests.hitran_storage_Tests
+import SpectraTools.Tests.hitran_tips_Tests
+import SpectraTools.Tests.hitran_results_Tests
+import SpectraTools.Tests.hitran_convolve_Tests
+import SpectraTools.Tests.hitran_query_Tests
+import SpectraTools.Tests.hitran_index_Tests
+import SpectraTools.Tests.hitran_fetch_Tests
+import SpectraTools.Tests.hitran_cpf_Tests
+import SpectraTools.Tests.hitran_lookup_Tests
+import SpectraTools.Tests.hitran_basis_Tests
+import SpectraTools.Tests.hitran_blocks_Tests
 import SpectraTools.Tests.LinearSpectrum_Tests
 import SpectraTools.Tests.MultiLinearSpectra_Tests
 import SpectraTools.Tests.nist_import_jcamp_Tests
 import SpectraTools.Tests.nist_Tests
 import SpectraTools.Tests.RefractiveIndex_Tests
 import SpectraTools.Tests.RI_read_yaml_Tests
+import SpectraTools.Tests.SpectrumStack_Tests
+import SpectraTools.Tests.Axis_Tests
+import SpectraTools.Tests.Resampler_Tests
 import SpectraTools.Tests.UnitConversion_Tests
 
 
 importlib.reload(SpectraTools.Tests.CommonFunctions_ST_Tests)
 importlib.reload(SpectraTools.Tests.hitran_Tests)
+importlib.reload(SpectraTools.Tests.hitran_xsect_Tests)
+importlib.reload(SpectraTools.Tests.hitran_storage_Tests)
+importlib.reload(SpectraTools.Tests.hitran_tips_Tests)
+importlib.reload(SpectraTools.Tests.hitran_results_Tests)
+importlib.reload(SpectraTools.Tests.hitran_convolve_Tests)
+importlib.reload(SpectraTools.Tests.hitran_query_Tests)
+importlib.reload(SpectraTools.Tests.hitran_index_Tests)
+importlib.reload(SpectraTools.Tests.hitran_fetch_Tests)
+importlib.reload(SpectraTools.Tests.hitran_cpf_Tests)
+importlib.reload(SpectraTools.Tests.hitran_lookup_Tests)
+importlib.reload(SpectraTools.Tests.hitran_basis_Tests)
+importlib.reload(SpectraTools.Tests.hitran_blocks_Tests)
 importlib.reload(SpectraTools.Tests.LinearSpectrum_Tests)
 importlib.reload(SpectraTools.Tests.MultiLinearSpectra_Tests)
 importlib.reload(SpectraTools.Tests.nist_import_jcamp_Tests)
 importlib.reload(SpectraTools.Tests.nist_Tests)
 importlib.reload(SpectraTools.Tests.RefractiveIndex_Tests)
 importlib.reload(SpectraTools.Tests.RI_read_yaml_Tests)
+importlib.reload(SpectraTools.Tests.SpectrumStack_Tests)
+importlib.reload(SpectraTools.Tests.Axis_Tests)
+importlib.reload(SpectraTools.Tests.Resampler_Tests)
 importlib.reload(SpectraTools.Tests.UnitConversion_Tests)
 
 verbosity = 2
@@ -34,6 +64,54 @@ TS = unittest.TestSuite()
 # tests = TL.loadTestsFromModule(SpectraTools.Tests.hitran_Tests)
 # TS.addTests(tests)
 
+TL = unittest.TestLoader()
+tests = TL.loadTestsFromModule(SpectraTools.Tests.hitran_xsect_Tests)
+TS.addTests(tests)
+
+TL = unittest.TestLoader()
+tests = TL.loadTestsFromModule(SpectraTools.Tests.hitran_storage_Tests)
+TS.addTests(tests)
+
+TL = unittest.TestLoader()
+tests = TL.loadTestsFromModule(SpectraTools.Tests.hitran_tips_Tests)
+TS.addTests(tests)
+
+TL = unittest.TestLoader()
+tests = TL.loadTestsFromModule(SpectraTools.Tests.hitran_results_Tests)
+TS.addTests(tests)
+
+TL = unittest.TestLoader()
+tests = TL.loadTestsFromModule(SpectraTools.Tests.hitran_convolve_Tests)
+TS.addTests(tests)
+
+TL = unittest.TestLoader()
+tests = TL.loadTestsFromModule(SpectraTools.Tests.hitran_query_Tests)
+TS.addTests(tests)
+
+TL = unittest.TestLoader()
+tests = TL.loadTestsFromModule(SpectraTools.Tests.hitran_index_Tests)
+TS.addTests(tests)
+
+TL = unittest.TestLoader()
+tests = TL.loadTestsFromModule(SpectraTools.Tests.hitran_fetch_Tests)
+TS.addTests(tests)
+
+TL = unittest.TestLoader()
+tests = TL.loadTestsFromModule(SpectraTools.Tests.hitran_cpf_Tests)
+TS.addTests(tests)
+
+TL = unittest.TestLoader()
+tests = TL.loadTestsFromModule(SpectraTools.Tests.hitran_lookup_Tests)
+TS.addTests(tests)
+
+TL = unittest.TestLoader()
+tests = TL.loadTestsFromModule(SpectraTools.Tests.hitran_basis_Tests)
+TS.addTests(tests)
+
+TL = unittest.TestLoader()
+tests = TL.loadTestsFromModule(SpectraTools.Tests.hitran_blocks_Tests)
+TS.addTests(tests)
+
 TL = unittest.TestLoader()
 tests = TL.loadTestsFromModule(SpectraTools.Tests.CommonFunctions_ST_Tests)
 TS.addTests(tests)
@@ -62,6 +140,18 @@ TL = unittest.TestLoader()
 tests = TL.loadTestsFromModule(SpectraTools.Tests.RI_read_yaml_Tests)
 TS.addTests(tests)
 
+TL = unittest.TestLoader()
+tests = TL.loadTestsFromModule(SpectraTools.Tests.SpectrumStack_Tests)
+TS.addTests(tests)
+
+TL = unittest.TestLoader()
+tests = TL.loadTestsFromModule(SpectraTools.Tests.Axis_Tests)
+TS.addTests(tests)
+
+TL = unittest.TestLoader()
+tests = TL.loadTestsFromModule(SpectraTools.Tests.Resampler_Tests)
+TS.addTests(tests)
+
 TL = unittest.TestLoader()
 tests = TL.loadTestsFromModule(SpectraTools.Tests.UnitConversion_Tests)
 TS.addTests(tests)
@@ -361,8 +361,34 @@ class Test_calculate_signal(unittest.TestCase):
         plt.plot(b.x, b.y, label = "B")
         plt.plot(ab.x, ab.y, label = "AB")
         plt.legend()
-        plt.show()        
-        
+        plt.show()
+
+
+    def test_calculate_sweep(self):
+        """
+        Each spectrum of the sweep should be the same as the spectrum for that environment.
+        """
+        db_path = self.root
+
+        tablename = "H2O"
+        M = 1
+        I = 1
+        min_x = 1240
+        max_x = 1280
+
+        environments = [{"T": 250}, {"T": 296, "p": 0.5}, {"T": 350, "l": 10}]
+
+        c = HR.hitran(db_path, tablename, [(M,I)], min_x, max_x, y_unit = "A", verbose = self.verbose)
+        c.import_data()
+        stack = c.calculate_sweep(environments, processes = 2)
+
+        self.assertTrue(numpy.shape(stack.y) == (3, len(stack.x)))
+
+        for i, environment in enumerate(environments):
+            c.calculate_signal(environment = dict(environment))
+            self.assertTrue(numpy.all(c.x == stack.x))
+            self.assertTrue(numpy.allclose(c.y, stack.y[i], rtol = 1e-12, atol = 0))
+
         
         
 class Test_data_confirmation(unittest.TestCase):
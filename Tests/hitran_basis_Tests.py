@@ -0,0 +1,96 @@
+import pathlib
+import tempfile
+import unittest
+
+import numpy
+
+import hapi
+
+import SpectraTools.hitran as HR
+import SpectraTools.Resources.hitran_cpf as HCPF
+import SpectraTools.Resources.hitran_xsect as HX
+
+class Test_mixture_signal(unittest.TestCase):
+    """
+    With a synthetic table in a temporary database.
+    """
+
+    def setUp(self):
+        self.verbose = 0
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = pathlib.Path(self.tmp.name)
+        self.tablename = "basis_test"
+        hapi.VARIABLES["BACKEND_DATABASE_NAME"] = str(self.db_path)
+        HX.make_synthetic_table(self.tablename, n_lines = 100, min_x = 2000, max_x = 2010)
+        hapi.cache2storage(self.tablename)
+        self.c = HR.hitran(self.db_path, self.tablename, [(2, 1), (2, 2)], 2000, 2010, verbose = self.verbose)
+        self.environment = {"T": 280, "p": 0.5, "l": 10}
+        self.kwargs = {"line_profile": "Voigt", "OmegaStep": 0.01}
+
+    def tearDown(self):
+        if self.tablename in hapi.LOCAL_TABLE_CACHE:
+            del hapi.LOCAL_TABLE_CACHE[self.tablename]
+        self.tmp.cleanup()
+
+    def test_same_as_calculate_signal(self):
+        self.c.calculate_basis(environment = self.environment, **self.kwargs)
+        self.assertTrue(self.c.basis["components"] == [(2, 1), (2, 2)])
+        for y_unit in ["T1", "cm-1", "cm2/molecule"]:
+            self.c.y_unit = y_unit
+            self.c.mixture_signal([0.5, 0.02])
+            y = self.c.y
+            self.c.calculate_signal(components = [(2, 1, 0.5), (2, 2, 0.02)], environment = self.environment, **self.kwargs)
+            self.assertTrue(numpy.allclose(y, self.c.y, rtol = 1e-12, atol = 0))
+
+    def test_batch(self):
+        """
+        Each spectrum of a batch is the same as the spectrum of that mixture alone.
+        """
+        self.c.calculate_basis(environment = self.environment, **self.kwargs)
+        ratios = numpy.random.default_rng(0).uniform(0, 1, size = (50, 2))
+        stack = self.c.mixture_signal(ratios)
+        self.assertTrue(stack.y.shape == (50, len(self.c.basis["x"])))
+        for i in [0, 17, 49]:
+            self.c.mixture_signal(ratios[i])
+            self.assertTrue(numpy.allclose(stack.y[i], self.c.y, rtol = 1e-12, atol = 0))
+
+    def test_cache(self):
+        """
+        The basis spectra are stored in the result cache.
+        """
+        self.c.calculate_basis(environment = self.environment, **self.kwargs)
+        B = self.c.basis["B"]
+        hits = self.c.result_cache.stats["hits"]
+        self.c.calculate_basis(environment = self.environment, **self.kwargs)
+        self.assertTrue(self.c.result_cache.stats["hits"] == hits + 2)
+        self.assertTrue(numpy.all(self.c.basis["B"] == B))
+
+    def test_cache_cpf_changed(self):
+        """
+        Basis spectra that were calculated with another backend are not used.
+        """
+        previous = HCPF.set_cpf("weideman32")
+        try:
+            self.c.calculate_basis(environment = self.environment, **self.kwargs)
+            HCPF.set_cpf("humlicek")
+            hits = self.c.result_cache.stats["hits"]
+            self.c.calculate_basis(environment = self.environment, **self.kwargs)
+            self.assertTrue(self.c.result_cache.stats["hits"] == hits)
+        finally:
+            hapi.VARIABLES["CPF"] = previous
+
+    def test_errors(self):
+        with self.assertRaises(ValueError) as cm:
+            self.c.mixture_signal([1.0, 1.0])
+        self.c.calculate_basis(environment = self.environment, **self.kwargs)
+        with self.assertRaises(ValueError) as cm:
+            self.c.mixture_signal([1.0, 1.0, 1.0])
+
+
+
+if __name__ == '__main__':
+    verbosity = 1
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_mixture_signal)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
@@ -0,0 +1,138 @@
+import importlib
+import pathlib
+import tempfile
+import tracemalloc
+import unittest
+
+import numpy
+
+import hapi
+
+import SpectraTools.hitran as HR
+import SpectraTools.Resources.hitran_blocks as HB
+import SpectraTools.Resources.hitran_convolve as HCONV
+import SpectraTools.Resources.hitran_xsect as HX
+
+importlib.reload(HB)
+
+class Test_grid(unittest.TestCase):
+
+    def test_same_as_hapi(self):
+        for OmegaRange, OmegaStep in [((2000, 2050), 0.001), ((2001.3, 2012.77), 0.0013), ((2000, 2000.1), 0.1)]:
+            Omegas = hapi.arange_(OmegaRange[0], OmegaRange[1], OmegaStep)
+            lower, upper, n = HB.grid_size(OmegaRange, OmegaStep)
+            self.assertTrue(n == len(Omegas))
+            self.assertTrue(numpy.all(HB.grid_block(lower, upper, n, 0, n) == Omegas))
+            self.assertTrue(numpy.all(HB.grid_block(lower, upper, n, 1, n - 1) == Omegas[1:-1]))
+
+    def test_block_bounds(self):
+        self.assertTrue(HB.block_bounds(2, 12, 4) == [(2, 6), (6, 10), (10, 12)])
+
+
+class Test_block_signal(unittest.TestCase):
+
+    def setUp(self):
+        self.verbose = 0
+        self.tablename = "blocks_test"
+        HX.make_synthetic_table(self.tablename, n_lines = 300, min_x = 2000, max_x = 2050)
+        self.environment = {"T": 296, "p": 0.5, "l": 100}
+        self.kwargs = {"SourceTables": self.tablename, "Environment": self.environment, "OmegaRange": (2001.3, 2040.77), "OmegaStep": 0.001}
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paf = pathlib.Path(self.tmp.name).joinpath("signal.npy")
+
+    def tearDown(self):
+        if self.tablename in hapi.LOCAL_TABLE_CACHE:
+            del hapi.LOCAL_TABLE_CACHE[self.tablename]
+        self.tmp.cleanup()
+
+    def test_coefficient(self):
+        """
+        Lines with wings over the edges of the blocks are included.
+        """
+        w, c = HX.absorption_coefficient("Voigt", **self.kwargs)
+        for block_size in [1000, 7777, len(w)]:
+            x, y = HB.block_signal(self.paf, "Voigt", spectrum = "coefficient", block_size = block_size, verbose = self.verbose, **self.kwargs)
+            self.assertTrue(numpy.all(x == w))
+            self.assertTrue(numpy.allclose(y, c, rtol = 1e-12, atol = 0))
+
+    def test_convolution(self):
+        w, c = HX.absorption_coefficient("Voigt", **self.kwargs)
+        t = hapi.transmittanceSpectrum(w, c, Environment = self.environment)[1]
+        w_ref, t_ref, i1, i2, slit = HCONV.convolve_spectrum(w, t, SlitFunction = hapi.SLIT_GAUSSIAN, Resolution = 0.05, AF_wing = 0.5)
+        x, y = HB.block_signal(self.paf, "Voigt", spectrum = "transmittance", SlitFunction = "GAUSSIAN", Resolution = 0.05, AF_wing = 0.5, block_size = 5000, **self.kwargs)
+        self.assertTrue(numpy.all(x == w_ref))
+        self.assertTrue(numpy.amax(numpy.abs(y - t_ref)) < 1e-12)
+
+        saved = numpy.load(self.paf)
+        self.assertTrue(saved.shape == (2, len(w_ref)))
+
+    def test_memory(self):
+        """
+        The memory that is used depends on the block size and the chunk size, not on the size of the grid.
+        """
+        peaks = []
+        for OmegaRange in [(2000, 2010), (2000, 2050)]:
+            kwargs = dict(self.kwargs, OmegaRange = OmegaRange, OmegaStep = 0.0001, chunk_size = 65536)
+            tracemalloc.start()
+            x, y = HB.block_signal(self.paf, "Voigt", spectrum = "transmittance", SlitFunction = "GAUSSIAN", Resolution = 0.05, AF_wing = 0.5, block_size = 20000, **kwargs)
+            size, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            peaks.append(peak)
+        self.assertTrue(len(x) > 400000)
+        self.assertTrue(peaks[1] < 1.5 * peaks[0])
+
+    def test_errors(self):
+        with self.assertRaises(ValueError) as cm:
+            HB.block_signal(self.paf, "Voigt", SourceTables = self.tablename)
+        with self.assertRaises(ValueError) as cm:
+            HB.block_signal(self.paf, "Voigt", spectrum = "fiets", **self.kwargs)
+        with self.assertRaises(ValueError) as cm:
+            HB.block_signal(self.paf, "Voigt", OmegaGrid = numpy.arange(2000, 2001, 0.1), **self.kwargs)
+
+
+class Test_calculate_signal_blocks(unittest.TestCase):
+    """
+    With the hitran class, with a table in a temporary database.
+    """
+
+    def setUp(self):
+        self.verbose = 0
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = pathlib.Path(self.tmp.name)
+        self.tablename = "blocks_signal_test"
+        hapi.VARIABLES["BACKEND_DATABASE_NAME"] = str(self.db_path)
+        HX.make_synthetic_table(self.tablename, n_lines = 100, min_x = 2000, max_x = 2010)
+        hapi.cache2storage(self.tablename)
+        self.c = HR.hitran(self.db_path, self.tablename, [(2, 1), (2, 2)], 2000, 2010, result_cache = False, verbose = self.verbose)
+
+    def tearDown(self):
+        if self.tablename in hapi.LOCAL_TABLE_CACHE:
+            del hapi.LOCAL_TABLE_CACHE[self.tablename]
+        self.tmp.cleanup()
+
+    def test_same_as_calculate_signal(self):
+        environment = {"T": 300, "p": 0.5, "l": 10}
+        for y_unit in ["T1", "cm-1"]:
+            self.c.y_unit = y_unit
+            self.c.calculate_signal_blocks(self.db_path.joinpath("signal.npy"), environment = environment, line_profile = "Voigt", convolution = "GAUSSIAN", Resolution = 0.05, AF_wing = 0.5, OmegaRange = [2000, 2010], OmegaStep = 0.001, block_size = 3000)
+            x, y = numpy.array(self.c.x), numpy.array(self.c.y)
+            self.c.calculate_signal(environment = environment, line_profile = "Voigt", convolution = "GAUSSIAN", Resolution = 0.05, AF_wing = 0.5, OmegaRange = [2000, 2010], OmegaStep = 0.001)
+            self.assertTrue(numpy.all(x == self.c.x))
+            self.assertTrue(numpy.allclose(y, self.c.y, rtol = 1e-12, atol = 1e-14 * numpy.amax(self.c.y)))
+
+
+
+if __name__ == '__main__':
+    verbosity = 1
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_grid)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_block_signal)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_calculate_signal_blocks)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
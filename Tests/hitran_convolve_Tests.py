@@ -0,0 +1,85 @@
+import importlib
+import unittest
+
+import numpy
+
+import hapi
+
+import SpectraTools.Resources.hitran_convolve as HCONV
+
+importlib.reload(HCONV)
+
+class Test_convolve_same(unittest.TestCase):
+    """
+    Compare with numpy.convolve, for short and long arrays and kernels.
+    """
+
+    def setUp(self):
+        self.verbose = 0
+        self.rng = numpy.random.default_rng(0)
+
+    def test_same_as_numpy(self):
+        for n in [5, 100, 1001, 20000]:
+            for k in [1, 4, 65, 501]:
+                y = self.rng.random(n)
+                kernel = self.rng.random(k)
+                ref = numpy.convolve(y, kernel, mode = "same")
+                for method in ["auto", "direct", "fft"]:
+                    result = HCONV.convolve_same(y, kernel, method = method)
+                    self.assertTrue(result.shape == ref.shape)
+                    self.assertTrue(numpy.allclose(result, ref, rtol = 0, atol = 1e-12 * numpy.amax(ref)))
+
+    def test_2d(self):
+        y = self.rng.random((3, 5000))
+        kernel = self.rng.random(201)
+        result = HCONV.convolve_same(y, kernel, method = "fft")
+        for i in range(3):
+            self.assertTrue(numpy.allclose(result[i], numpy.convolve(y[i], kernel, mode = "same"), rtol = 0, atol = 1e-12 * numpy.amax(result)))
+
+    def test_invalid_method(self):
+        with self.assertRaises(ValueError) as cm:
+            HCONV.convolve_same(numpy.ones(10), numpy.ones(3), method = "fiets")
+
+
+class Test_convolve_spectrum(unittest.TestCase):
+
+    def setUp(self):
+        self.verbose = 0
+        self.w = numpy.arange(2000, 2020, 0.002)
+        self.y = numpy.random.default_rng(0).random(len(self.w))
+
+    def test_same_as_hapi(self):
+        """
+        All slit functions, with a large slit function (FFT) and a small one (direct).
+        """
+        for name, slit_function in HCONV.SLIT_FUNCTIONS.items():
+            for AF_wing in [0.05, 2.0]:
+                w_ref, y_ref, i1_ref, i2_ref, slit_ref = hapi.convolveSpectrum(self.w, self.y.copy(), Resolution = 0.1, AF_wing = AF_wing, SlitFunction = slit_function)
+                w, y, i1, i2, slit = HCONV.convolve_spectrum(self.w, self.y, Resolution = 0.1, AF_wing = AF_wing, SlitFunction = name, verbose = self.verbose)
+                self.assertTrue(numpy.all(w == w_ref))
+                self.assertTrue(i1 == i1_ref and i2 == i2_ref)
+                self.assertTrue(numpy.all(slit == slit_ref))
+                self.assertTrue(numpy.allclose(y, y_ref, rtol = 0, atol = 1e-12 * numpy.amax(y_ref)))
+
+    def test_kernel_cache(self):
+        slit = HCONV.slit_kernel("GAUSSIAN", 0.1, 0.002, 1.0)
+        self.assertTrue(HCONV.slit_kernel(hapi.SLIT_GAUSSIAN, 0.1, 0.002, 1.0) is slit)
+        self.assertFalse(HCONV.slit_kernel("GAUSSIAN", 0.2, 0.002, 1.0) is slit)
+        self.assertFalse(slit.flags.writeable)
+
+    def test_step(self):
+        with self.assertRaises(ValueError) as cm:
+            HCONV.convolve_spectrum(self.w, self.y, Resolution = 0.001)
+
+
+
+if __name__ == '__main__':
+    verbosity = 1
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_convolve_same)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_convolve_spectrum)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
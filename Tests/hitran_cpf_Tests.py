@@ -0,0 +1,120 @@
+import importlib
+import unittest
+
+import numpy
+
+import hapi
+
+import SpectraTools.Resources.hitran_cpf as HCPF
+import SpectraTools.Resources.hitran_xsect as HX
+
+importlib.reload(HCPF)
+
+class Test_backends(unittest.TestCase):
+
+    def setUp(self):
+        self.verbose = 0
+        self.cpf = hapi.VARIABLES["CPF"]
+
+    def tearDown(self):
+        hapi.VARIABLES["CPF"] = self.cpf
+
+    @unittest.skipUnless(HCPF.flag_scipy, "scipy is not installed")
+    def test_max_error(self):
+        """
+        The documented errors, compared with scipy.special.wofz.
+        """
+        result = HCPF.benchmark(n = 200000, repeat = 1, verbose = self.verbose)
+        for name, r in result.items():
+            self.assertTrue(r["max_rel_error"] < HCPF.CPF_MAX_ERROR[name])
+
+    def test_weideman32(self):
+        """
+        Without scipy, the other backends are compared with 'weideman32'.
+        """
+        x, y = HCPF.sample_points(20000)
+        WR, WI = HCPF.weideman32(x, y)
+        w_ref = WR + 1j * WI
+        for name in ["weideman16", "humlicek", "hapi"]:
+            WR, WI = HCPF.get_cpf(name)(x, y)
+            self.assertTrue(numpy.amax(numpy.abs(WR + 1j * WI - w_ref) / numpy.abs(w_ref)) < HCPF.CPF_MAX_ERROR[name])
+
+    def test_blocks(self):
+        """
+        Lines x grid points are evaluated at once, the result is the same as for the flattened arrays.
+        """
+        x = numpy.linspace(-20, 20, 101)[numpy.newaxis, :]
+        y = numpy.array([1e-3, 0.1, 1.0, 10.0])[:, numpy.newaxis]
+        for name in HCPF.CPF_BACKENDS:
+            cpf = HCPF.get_cpf(name)
+            WR, WI = cpf(x, y)
+            self.assertTrue(WR.shape == (4, 101))
+            xx, yy = numpy.broadcast_arrays(x, y)
+            WR_flat, WI_flat = cpf(xx.ravel(), yy.ravel())
+            self.assertTrue(numpy.all(WR.ravel() == WR_flat))
+            self.assertTrue(numpy.all(WI.ravel() == WI_flat))
+
+    def test_get_cpf(self):
+        self.assertTrue(HCPF.get_cpf("humlicek") is HCPF.humlicek)
+        self.assertTrue(HCPF.get_cpf(HCPF.weideman16) is HCPF.weideman16)
+        self.assertTrue(HCPF.get_cpf() is hapi.VARIABLES["CPF"])
+        HCPF.set_cpf("weideman16")
+        self.assertTrue(HCPF.get_cpf() is HCPF.weideman16)
+        hapi.VARIABLES["CPF"] = "humlicek"
+        self.assertTrue(HCPF.get_cpf() is HCPF.humlicek)
+        with self.assertRaises(ValueError) as cm:
+            HCPF.get_cpf("no_such_backend")
+
+    def test_cpf_key(self):
+        HCPF.set_cpf("weideman16")
+        self.assertTrue(HCPF.cpf_key() == "weideman16")
+        self.assertTrue(HCPF.cpf_key("humlicek") == "humlicek")
+        self.assertTrue(HCPF.cpf_key(HCPF.humlicek) == "humlicek")
+        self.assertTrue(HCPF.cpf_key(numpy.exp) is numpy.exp)
+
+
+class Test_absorption_coefficient(unittest.TestCase):
+
+    def setUp(self):
+        self.verbose = 0
+        self.tablename = "cpf_test"
+        HX.make_synthetic_table(self.tablename, n_lines = 200)
+        self.cpf = hapi.VARIABLES["CPF"]
+
+    def tearDown(self):
+        hapi.VARIABLES["CPF"] = self.cpf
+        if self.tablename in hapi.LOCAL_TABLE_CACHE:
+            del hapi.LOCAL_TABLE_CACHE[self.tablename]
+
+    def test_backends(self):
+        """
+        The absorption coefficient with each backend agrees with the default within the error of the backend.
+        """
+        kwargs = {"Components": [(2, 1), (2, 2)], "SourceTables": self.tablename, "Environment": {"T": 296, "p": 0.1}, "OmegaStep": 0.01, "verbose": self.verbose}
+        w, ref = HX.absorption_coefficient("Voigt", cpf = "weideman32", **kwargs)
+        for name in HCPF.CPF_BACKENDS:
+            w, c = HX.absorption_coefficient("Voigt", cpf = name, **kwargs)
+            self.assertTrue(numpy.amax(numpy.abs(c - ref)) / numpy.amax(ref) < 10 * HCPF.CPF_MAX_ERROR[name])
+
+    def test_variables(self):
+        """
+        Without `cpf`, `hapi.VARIABLES['CPF']` is used.
+        """
+        kwargs = {"Components": [(2, 1), (2, 2)], "SourceTables": self.tablename, "Environment": {"T": 296, "p": 0.1}, "OmegaStep": 0.01, "verbose": self.verbose}
+        w, ref = HX.absorption_coefficient("Voigt", cpf = "humlicek", **kwargs)
+        HCPF.set_cpf("humlicek")
+        w, c = HX.absorption_coefficient("Voigt", **kwargs)
+        self.assertTrue(numpy.all(c == ref))
+
+
+
+if __name__ == '__main__':
+    verbosity = 1
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_backends)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_absorption_coefficient)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
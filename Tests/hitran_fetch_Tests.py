@@ -0,0 +1,180 @@
+import http.server
+import importlib
+import pathlib
+import tempfile
+import threading
+import unittest
+import urllib.parse
+
+import numpy
+
+import hapi
+
+import SpectraTools.hitran as HR
+import SpectraTools.Resources.hitran_fetch as HF
+import SpectraTools.Resources.hitran_xsect as HX
+
+importlib.reload(HF)
+
+
+class HitranStandIn(object):
+    """
+    A local HTTP server that answers `/lbl/api` queries as the HITRAN server, with the lines of a synthetic table.
+    """
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.queries = []
+        stand_in = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+                ids = [int(i) for i in query["iso_ids_list"][0].split(",")]
+                numin = float(query["numin"][0])
+                numax = float(query["numax"][0])
+                stand_in.queries.append((ids, numin, numax))
+                body = "".join(l + "\n" for l in stand_in.select(ids, numin, numax))
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(body.encode("utf-8"))
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.host = "http://127.0.0.1:{:d}".format(self.server.server_address[1])
+        self.thread = threading.Thread(target = self.server.serve_forever, daemon = True)
+        self.thread.start()
+
+    def select(self, ids, numin, numax):
+        result = []
+        for l in self.lines:
+            MI = (int(l[0:2]), int(l[2]))
+            nu = float(l[3:15])
+            if hapi.ISO[MI][hapi.ISO_INDEX["id"]] in ids and numin <= nu <= numax:
+                result.append(l)
+        return result
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Test_intervals(unittest.TestCase):
+
+    def test_merge_intervals(self):
+        self.assertTrue(HF.merge_intervals([[3, 4], [1, 2], [2, 2.5], [5, 6], [5.5, 7]]) == [[1, 2.5], [3, 4], [5, 7]])
+
+    def test_missing_intervals(self):
+        self.assertTrue(HF.missing_intervals([], 1, 2) == [[1, 2]])
+        self.assertTrue(HF.missing_intervals([[0, 3]], 1, 2) == [])
+        self.assertTrue(HF.missing_intervals([[1.5, 2.5], [3, 4]], 1, 5) == [[1, 1.5], [2.5, 3], [4, 5]])
+
+    def test_fetch_requests(self):
+        coverage = {(2, 1): [[2000, 2100]]}
+        requests = HF.fetch_requests(coverage, [(2, 1), (2, 2, 0.01)], 2050, 2200)
+        self.assertTrue(requests == [([2050, 2200], [(2, 2)]), ([2100, 2200], [(2, 1)])])
+
+
+class Test_fetch(unittest.TestCase):
+    """
+    Download from a local stand-in for the HITRAN server.
+    """
+
+    def setUp(self):
+        self.verbose = 0
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = pathlib.Path(self.tmp.name)
+        self.tablename = "CO2_fetch_test"
+
+        # the lines of the server
+        hapi.VARIABLES["BACKEND_DATABASE_NAME"] = str(self.db_path)
+        HX.make_synthetic_table("server", n_lines = 300, min_x = 2000, max_x = 2300)
+        hapi.cache2storage("server")
+        del hapi.LOCAL_TABLE_CACHE["server"]
+        with open(self.db_path.joinpath("server.data"), "r") as f:
+            lines = f.read().splitlines()
+        for ext in ["data", "header"]:
+            self.db_path.joinpath("server.{:s}".format(ext)).unlink()
+        self.nu = numpy.array([float(l[3:15]) for l in lines])
+
+        self.server = HitranStandIn(lines)
+        self.global_host = hapi.VARIABLES["GLOBAL_HOST"]
+        hapi.VARIABLES["GLOBAL_HOST"] = self.server.host
+
+    def tearDown(self):
+        hapi.VARIABLES["GLOBAL_HOST"] = self.global_host
+        self.server.stop()
+        if self.tablename in hapi.LOCAL_TABLE_CACHE:
+            del hapi.LOCAL_TABLE_CACHE[self.tablename]
+        self.tmp.cleanup()
+
+    def nu_of_table(self):
+        return numpy.asarray(hapi.LOCAL_TABLE_CACHE[self.tablename]["data"]["nu"])
+
+    def test_incremental(self):
+        components = [(2, 1), (2, 2)]
+        requests = HF.fetch(self.db_path, self.tablename, components, 2000, 2100, verbose = self.verbose)
+        self.assertTrue(len(self.server.queries) == 1)
+        self.assertTrue(numpy.all(self.nu_of_table() == self.nu[self.nu <= 2100]))
+
+        # only 2100 - 2200 is downloaded
+        requests = HF.fetch(self.db_path, self.tablename, components, 2050, 2200, verbose = self.verbose)
+        self.assertTrue(requests == [([2100, 2200], components)])
+        self.assertTrue(self.server.queries[-1] == ([7, 8], 2100, 2200))
+        self.assertTrue(numpy.all(self.nu_of_table() == self.nu[self.nu <= 2200]))
+
+        # nothing is downloaded
+        requests = HF.fetch(self.db_path, self.tablename, components, 2000, 2200, verbose = self.verbose)
+        self.assertTrue(requests == [])
+        self.assertTrue(len(self.server.queries) == 2)
+
+        coverage = HF.read_coverage(self.db_path, self.tablename)
+        self.assertTrue(coverage == {(2, 1): [[2000, 2200]], (2, 2): [[2000, 2200]]})
+
+    def test_new_component(self):
+        HF.fetch(self.db_path, self.tablename, [(2, 1)], 2000, 2300, verbose = self.verbose)
+        HF.fetch(self.db_path, self.tablename, [(2, 1), (2, 2)], 2000, 2300, verbose = self.verbose)
+        self.assertTrue(self.server.queries[-1] == ([8], 2000, 2300))
+        self.assertTrue(numpy.all(self.nu_of_table() == self.nu))
+
+    def test_replace(self):
+        HF.fetch(self.db_path, self.tablename, [(2, 1), (2, 2)], 2000, 2100, verbose = self.verbose)
+        HF.fetch(self.db_path, self.tablename, [(2, 1), (2, 2)], 2200, 2300, replace = True, verbose = self.verbose)
+        self.assertTrue(numpy.all(self.nu_of_table() == self.nu[self.nu >= 2200]))
+
+    def test_changed_table(self):
+        """
+        If the data file is changed, the coverage is not known anymore.
+        """
+        HF.fetch(self.db_path, self.tablename, [(2, 1)], 2000, 2100, verbose = self.verbose)
+        with open(self.db_path.joinpath("{:s}.data".format(self.tablename)), "a") as f:
+            f.write("\n")
+        self.assertTrue(HF.read_coverage(self.db_path, self.tablename) is None)
+
+    def test_import_data(self):
+        c = HR.hitran(self.db_path, self.tablename, [(2, 1), (2, 2)], 2000, 2100, verbose = self.verbose)
+        c.import_data()
+        self.assertTrue(len(self.server.queries) == 1)
+        c.import_data()
+        self.assertTrue(len(self.server.queries) == 1)
+
+        c.max_x = 2200
+        c.import_data()
+        self.assertTrue(self.server.queries[-1] == ([7, 8], 2100, 2200))
+        self.assertTrue(numpy.all(self.nu_of_table() == self.nu[self.nu <= 2200]))
+
+
+
+if __name__ == '__main__':
+    verbosity = 1
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_intervals)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_fetch)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
@@ -0,0 +1,104 @@
+import importlib
+import unittest
+
+import numpy
+
+import hapi
+
+import SpectraTools.Resources.hitran_index as HIDX
+import SpectraTools.Resources.hitran_xsect as HX
+
+importlib.reload(HIDX)
+
+class Test_LineIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.verbose = 0
+        self.tablename = "index_test"
+        HX.make_synthetic_table(self.tablename, n_lines = 1000, components = [(2, 1), (2, 2), (5, 1)])
+        self.data = hapi.LOCAL_TABLE_CACHE[self.tablename]["data"]
+
+    def tearDown(self):
+        if self.tablename in hapi.LOCAL_TABLE_CACHE:
+            del hapi.LOCAL_TABLE_CACHE[self.tablename]
+        HIDX.INDEXES.pop(self.tablename, None)
+
+    def test_rows(self):
+        """
+        Compare with a selection with masks.
+        """
+        index = HIDX.get_index(self.tablename, verbose = self.verbose)
+        self.assertTrue(sorted(index.components()) == [(2, 1), (2, 2), (5, 1)])
+        nu = self.data["nu"]
+        for components in [[(2, 1)], [(2, 2), (5, 1)], [(2, 1), (7, 1)]]:
+            for nu_min, nu_max in [(None, None), (2020, 2050), (nu[3], nu[7])]:
+                mask = numpy.zeros(len(nu), dtype = bool)
+                for M, I in components:
+                    mask |= (self.data["molec_id"] == M) & (self.data["local_iso_id"] == I)
+                if nu_min is not None:
+                    mask &= (nu >= nu_min) & (nu <= nu_max)
+                rows = index.rows(components = components, nu_min = nu_min, nu_max = nu_max)
+                self.assertTrue(numpy.all(rows == numpy.flatnonzero(mask)))
+
+    def test_nu_range(self):
+        index = HIDX.get_index(self.tablename, verbose = self.verbose)
+        self.assertTrue(index.nu_range() == (numpy.amin(self.data["nu"]), numpy.amax(self.data["nu"])))
+        self.assertTrue(index.extremes("gamma_air", [(2, 1)])[1] == numpy.amax(self.data["gamma_air"][(self.data["molec_id"] == 2) & (self.data["local_iso_id"] == 1)]))
+
+    def test_rebuild(self):
+        """
+        The index is reused until the table is replaced.
+        """
+        index = HIDX.get_index(self.tablename, verbose = self.verbose)
+        self.assertTrue(HIDX.get_index(self.tablename) is index)
+        HX.make_synthetic_table(self.tablename, n_lines = 10)
+        index2 = HIDX.get_index(self.tablename)
+        self.assertFalse(index2 is index)
+        self.assertTrue(index2.n_rows == 10)
+
+    def test_no_table(self):
+        with self.assertRaises(KeyError) as cm:
+            HIDX.get_index("no_such_table")
+
+
+class Test_absorption_coefficient(unittest.TestCase):
+    """
+    Only the lines within the wing of the grid are used. The result should be the same as with all lines.
+    """
+
+    def setUp(self):
+        self.verbose = 0
+        self.tablename = "index_xsect_test"
+        HX.make_synthetic_table(self.tablename, n_lines = 5000, min_x = 1000, max_x = 3000)
+        self.abundances = {(2, 1): 0.98, (2, 2): 0.011}
+
+    def tearDown(self):
+        if self.tablename in hapi.LOCAL_TABLE_CACHE:
+            del hapi.LOCAL_TABLE_CACHE[self.tablename]
+        HIDX.INDEXES.pop(self.tablename, None)
+
+    def test_same_as_all_lines(self):
+        Omegas = numpy.arange(2000, 2010, 0.01)
+        for line_profile in ["Voigt", "Lorentz", "Doppler"]:
+            for environment in [{"T": 200, "p": 5}, {"T": 900, "p": 0.1}]:
+                w, xsect = HX.absorption_coefficient(line_profile, Components = [(2, 1, 0.98), (2, 2, 0.011)], SourceTables = self.tablename, Environment = environment, OmegaGrid = Omegas, OmegaWingHW = 50.0, verbose = self.verbose)
+                lines = HX.line_data(self.tablename, self.abundances, line_profile = line_profile)
+                ref = HX.environment_xsect(Omegas, [lines], environment, line_profile = line_profile, intensity_threshold = hapi.DefaultIntensityThreshold, OmegaWingHW = 50.0)
+                self.assertTrue(numpy.all(xsect == ref))
+
+    def test_pruned(self):
+        lines = HX.grid_line_data(self.tablename, numpy.arange(2000, 2010, 0.01), self.abundances, [{"T": 296, "p": 1}], OmegaWingHW = 50.0)
+        self.assertTrue(0 < len(lines["data"]["nu"]) < 1000)
+
+
+
+if __name__ == '__main__':
+    verbosity = 1
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_LineIndex)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_absorption_coefficient)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
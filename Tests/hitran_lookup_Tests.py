@@ -0,0 +1,155 @@
+import importlib
+import pathlib
+import tempfile
+import unittest
+
+import numpy
+
+import hapi
+
+import SpectraTools.hitran as HR
+import SpectraTools.Resources.hitran_cpf as HCPF
+import SpectraTools.Resources.hitran_lookup as HLUT
+import SpectraTools.Resources.hitran_xsect as HX
+
+importlib.reload(HLUT)
+
+class Test_LookupTable(unittest.TestCase):
+
+    def setUp(self):
+        self.verbose = 0
+        self.tablename = "lookup_test"
+        HX.make_synthetic_table(self.tablename, n_lines = 100, min_x = 2000, max_x = 2010)
+        self.kwargs = {"OmegaStep": 0.01, "OmegaWingHW": 20.0}
+        self.table = HLUT.build(self.tablename, [250, 300, 350], [0.5, 1.0], [(2, 1), (2, 2)], processes = 1, verbose = self.verbose, **self.kwargs)
+
+    def tearDown(self):
+        if self.tablename in hapi.LOCAL_TABLE_CACHE:
+            del hapi.LOCAL_TABLE_CACHE[self.tablename]
+
+    def test_grid_points(self):
+        """
+        On the grid, the result is the direct calculation.
+        """
+        w, c = HX.absorption_coefficient("Voigt", Components = [(2, 1), (2, 2)], SourceTables = self.tablename, Environment = {"T": 300, "p": 1.0}, **self.kwargs)
+        self.assertTrue(numpy.all(w == self.table.Omegas))
+        self.assertTrue(numpy.allclose(self.table.interpolate(300, 1.0), c, rtol = 1e-14, atol = 0))
+        w, c = HX.absorption_coefficient("Voigt", Components = [(2, 2)], SourceTables = self.tablename, Environment = {"T": 250, "p": 0.5}, **self.kwargs)
+        self.assertTrue(numpy.allclose(self.table.interpolate(250, 0.5, components = [(2, 2)]), c, rtol = 1e-14, atol = 0))
+
+    def test_weights(self):
+        """
+        Linear in p, linear in log(T).
+        """
+        T = numpy.sqrt(250 * 300)
+        weights = self.table.weights(T, 0.75)
+        self.assertTrue(len(weights) == 4)
+        for iT, ip, w in weights:
+            self.assertTrue(numpy.isclose(w, 0.25))
+        self.assertTrue(self.table.weights(300, 1.0) == [(1, 1, 1.0)])
+
+    def test_outside(self):
+        with self.assertRaises(ValueError) as cm:
+            self.table.interpolate(400, 1.0)
+        with self.assertRaises(ValueError) as cm:
+            self.table.interpolate(300, 1.0, components = [(5, 1)])
+
+    def test_save(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paf = pathlib.Path(tmp).joinpath("table.npz")
+            self.table.save(paf)
+            table = HLUT.load(paf)
+        self.assertTrue(table.components == self.table.components)
+        self.assertTrue(table.stats == self.table.stats)
+        self.assertTrue(numpy.all(table.xsect == self.table.xsect))
+        self.assertTrue(HLUT.load(pathlib.Path("no_such_file.npz")) is None)
+
+    def test_diagnostics(self):
+        """
+        The error in the centers of the cells is smaller for a finer grid. On the grid, there is no error.
+        """
+        result = HLUT.diagnostics(self.table, self.tablename, processes = 1, verbose = self.verbose, **self.kwargs)
+        self.assertTrue(len(result["environments"]) == 2)
+        fine = HLUT.build(self.tablename, numpy.linspace(250, 350, 11), numpy.linspace(0.5, 1.0, 11), [(2, 1), (2, 2)], processes = 1, **self.kwargs)
+        result_fine = HLUT.diagnostics(fine, self.tablename, processes = 1, **self.kwargs)
+        self.assertTrue(0 < result_fine["max_rel_error_all"] < result["max_rel_error_all"] / 10)
+        result = HLUT.diagnostics(self.table, self.tablename, environments = [{"T": 350, "p": 0.5}], processes = 1, **self.kwargs)
+        self.assertTrue(result["max_rel_error_all"] < 1e-14)
+
+
+class Test_lookup_signal(unittest.TestCase):
+    """
+    With the hitran class, with a table in a temporary database.
+    """
+
+    def setUp(self):
+        self.verbose = 0
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = pathlib.Path(self.tmp.name)
+        self.tablename = "lookup_signal_test"
+        hapi.VARIABLES["BACKEND_DATABASE_NAME"] = str(self.db_path)
+        HX.make_synthetic_table(self.tablename, n_lines = 100, min_x = 2000, max_x = 2010)
+        hapi.cache2storage(self.tablename)
+        self.c = HR.hitran(self.db_path, self.tablename, [(2, 1), (2, 2)], 2000, 2010, verbose = self.verbose)
+        self.kwargs = {"OmegaStep": 0.01}
+
+    def tearDown(self):
+        if self.tablename in hapi.LOCAL_TABLE_CACHE:
+            del hapi.LOCAL_TABLE_CACHE[self.tablename]
+        self.tmp.cleanup()
+
+    def test_lookup_signal(self):
+        stats = self.c.build_lookup_table([250, 300], [0.5, 1.0], line_profile = "Voigt", processes = 1, **self.kwargs)
+        self.assertTrue(stats["n_spectra"] == 8)
+        environment = {"T": 300, "p": 0.5, "l": 10}
+        self.c.lookup_signal(environment)
+        y = self.c.y
+        self.c.calculate_signal(environment = environment, line_profile = "Voigt", **self.kwargs)
+        self.assertTrue(numpy.allclose(y, self.c.y, rtol = 1e-12, atol = 0))
+
+    def test_persist(self):
+        """
+        The second time, the table is read from disk.
+        """
+        self.c.build_lookup_table([250, 300], [1.0], line_profile = "Voigt", processes = 1, **self.kwargs)
+        table = self.c.lookup_table
+        self.assertTrue(len(list(self.db_path.joinpath("lookup.npcache").glob("*.npz"))) == 1)
+        self.c.build_lookup_table([250, 300], [1.0], line_profile = "Voigt", processes = 1, **self.kwargs)
+        self.assertFalse(self.c.lookup_table is table)
+        self.assertTrue(self.c.lookup_table.stats == table.stats)
+        self.assertTrue(numpy.all(self.c.lookup_table.xsect == table.xsect))
+
+    def test_persist_cpf_changed(self):
+        """
+        A table that was calculated with another backend is not read from disk.
+        """
+        previous = HCPF.set_cpf("weideman32")
+        try:
+            self.c.build_lookup_table([250, 300], [1.0], line_profile = "Voigt", processes = 1, **self.kwargs)
+            xsect = self.c.lookup_table.xsect
+            HCPF.set_cpf("humlicek")
+            self.c.build_lookup_table([250, 300], [1.0], line_profile = "Voigt", processes = 1, **self.kwargs)
+            self.assertTrue(len(list(self.db_path.joinpath("lookup.npcache").glob("*.npz"))) == 2)
+            self.assertFalse(numpy.all(self.c.lookup_table.xsect == xsect))
+            # the same backend by name is read from disk
+            self.c.build_lookup_table([250, 300], [1.0], line_profile = "Voigt", processes = 1, cpf = "weideman32", **self.kwargs)
+            self.assertTrue(numpy.all(self.c.lookup_table.xsect == xsect))
+        finally:
+            hapi.VARIABLES["CPF"] = previous
+
+    def test_no_table(self):
+        with self.assertRaises(ValueError) as cm:
+            self.c.lookup_signal({"T": 300})
+
+
+
+if __name__ == '__main__':
+    verbosity = 1
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_LookupTable)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_lookup_signal)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
@@ -0,0 +1,189 @@
+import copy
+import importlib
+import unittest
+
+import numpy
+
+import hapi
+
+import SpectraTools.Resources.hitran_query as HQ
+import SpectraTools.Resources.hitran_xsect as HX
+
+importlib.reload(HQ)
+
+class Test_select(unittest.TestCase):
+    """
+    Compare with `hapi.select` for a synthetic table.
+    """
+
+    def setUp(self):
+        self.verbose = 0
+        self.tablename = "query_test"
+        HX.make_synthetic_table(self.tablename, n_lines = 500)
+
+    def tearDown(self):
+        for tablename in [self.tablename, "query_hapi", "query_columns"]:
+            if tablename in hapi.LOCAL_TABLE_CACHE:
+                del hapi.LOCAL_TABLE_CACHE[tablename]
+
+    def compare(self, ParameterNames, Conditions):
+        hapi.select(self.tablename, DestinationTableName = "query_hapi", ParameterNames = ParameterNames, Conditions = Conditions, Output = False)
+        HQ.select(self.tablename, DestinationTableName = "query_columns", ParameterNames = ParameterNames, Conditions = Conditions, Output = False)
+        ref = hapi.LOCAL_TABLE_CACHE["query_hapi"]
+        result = hapi.LOCAL_TABLE_CACHE["query_columns"]
+        for k in ["number_of_rows", "order", "format", "default"]:
+            self.assertTrue(result["header"][k] == ref["header"][k])
+        for k in ref["header"]["order"]:
+            self.assertTrue(numpy.array_equal(numpy.asarray(result["data"][k]), numpy.array(ref["data"][k])))
+
+    def test_conditions(self):
+        conditions = [
+            None,
+            ("and", ("range", "nu", 2020, 2050), (">", "sw", 1e-22)),
+            ("or", ("<", "nu", 2010), ("in", "local_iso_id", ("set", [2, 3]))),
+            ("not", ("between", "nu", 2020, 2080)),
+            ("<", 2010, "nu", 2030),
+            (">", ("/", "sw", "gamma_air"), 1e-21),
+            (">", ("-", "nu", "elower"), 0),
+            ("<", "LineNumber", 10),
+            ("like", ("str", "0"), "global_upper_quanta"),
+        ]
+        for c in conditions:
+            self.compare(None, c)
+
+    def test_parameter_names(self):
+        self.compare(("nu", "sw"), ("<", "nu", 2030))
+
+    def test_selectInto(self):
+        """
+        Rows are added to the destination table.
+        """
+        HQ.select(self.tablename, DestinationTableName = "query_columns", ParameterNames = ("nu", "sw"), Conditions = ("<", "LineNumber", 3), Output = False)
+        HQ.selectInto("query_columns", self.tablename, ("nu", "sw"), ("<", "LineNumber", 2))
+        result = hapi.LOCAL_TABLE_CACHE["query_columns"]
+        nu = hapi.LOCAL_TABLE_CACHE[self.tablename]["data"]["nu"]
+        self.assertTrue(result["header"]["number_of_rows"] == 5)
+        self.assertTrue(numpy.all(result["data"]["nu"] == numpy.concatenate((nu[:3], nu[:2]))))
+
+    def test_expressions(self):
+        columns = HQ.table_columns(self.tablename)
+        n = hapi.LOCAL_TABLE_CACHE[self.tablename]["header"]["number_of_rows"]
+        names, values = HQ.parameter_columns(self.tablename, ("nu", ("let", "x", ("*", "sw", 2.0)), ("+", "nu", 1.0)), numpy.ones(n, dtype = bool))
+        self.assertTrue(names == ["nu", "x", "#0"])
+        self.assertTrue(numpy.all(values[1] == columns["sw"] * 2.0))
+        self.assertTrue(numpy.all(values[2] == columns["nu"] + 1.0))
+
+    def test_filter(self):
+        HQ.filter(self.tablename, ("<", "nu", 2030))
+        nu = hapi.LOCAL_TABLE_CACHE[self.tablename]["data"]["nu"]
+        self.assertTrue(numpy.all(hapi.LOCAL_TABLE_CACHE[HQ.QUERY_BUFFER]["data"]["nu"] == nu[nu < 2030]))
+
+    def test_unsupported(self):
+        with self.assertRaises(HQ.UnsupportedExpression) as cm:
+            HQ.condition_mask(self.tablename, ("count", "nu"))
+
+
+class Test_sort(unittest.TestCase):
+
+    def setUp(self):
+        self.verbose = 0
+        self.tablename = "sort_test"
+        HX.make_synthetic_table(self.tablename, n_lines = 200)
+        self.table = copy.deepcopy(hapi.LOCAL_TABLE_CACHE[self.tablename])
+
+    def tearDown(self):
+        for tablename in [self.tablename, "sort_columns"]:
+            if tablename in hapi.LOCAL_TABLE_CACHE:
+                del hapi.LOCAL_TABLE_CACHE[tablename]
+
+    def test_same_as_hapi(self):
+        """
+        Many rows have the same local_iso_id and global_upper_quanta: the order of these rows should be the same as with HAPI.
+        """
+        ParameterNames = ("local_iso_id", "global_upper_quanta", "sw")
+        for Accending in [True, False]:
+            hapi.LOCAL_TABLE_CACHE[self.tablename] = copy.deepcopy(self.table)
+            HQ.sort(self.tablename, DestinationTableName = "sort_columns", ParameterNames = ParameterNames, Accending = Accending)
+            hapi.sort(self.tablename, ParameterNames = ParameterNames, Accending = Accending)
+            ref = hapi.LOCAL_TABLE_CACHE[self.tablename]
+            result = hapi.LOCAL_TABLE_CACHE["sort_columns"]
+            self.assertTrue(result["header"]["number_of_rows"] == ref["header"]["number_of_rows"])
+            self.assertTrue(result["header"]["table_name"] == "sort_columns")
+            for k in ref["header"]["order"]:
+                self.assertTrue(numpy.array_equal(result["data"][k], numpy.array(ref["data"][k])))
+
+    def test_in_place(self):
+        """
+        A sorted table is sorted again, by an expression.
+        """
+        HQ.sort(self.tablename, ParameterNames = "nu")
+        nu = hapi.LOCAL_TABLE_CACHE[self.tablename]["data"]["nu"]
+        self.assertTrue(numpy.all(numpy.diff(nu) >= 0))
+        HQ.sort(self.tablename, ParameterNames = [("-", 0, "nu")])
+        self.assertTrue(numpy.all(hapi.LOCAL_TABLE_CACHE[self.tablename]["data"]["nu"] == numpy.sort(self.table["data"]["nu"])[::-1]))
+
+
+class Test_group(unittest.TestCase):
+
+    def setUp(self):
+        self.verbose = 0
+        self.tablename = "group_test"
+        HX.make_synthetic_table(self.tablename, n_lines = 500)
+        self.data = hapi.LOCAL_TABLE_CACHE[self.tablename]["data"]
+
+    def tearDown(self):
+        for tablename in [self.tablename, "group_columns"]:
+            if tablename in hapi.LOCAL_TABLE_CACHE:
+                del hapi.LOCAL_TABLE_CACHE[tablename]
+
+    def test_functions(self):
+        ParameterNames = ("local_iso_id", ("count", "nu"), ("let", "S", ("sum", "sw")), ("avg", "nu"), ("min", "nu"), ("max", "nu"), ("ssq", "gamma_air"), ("/", ("sum", "sw"), ("count",)))
+        HQ.group(self.tablename, DestinationTableName = "group_columns", ParameterNames = ParameterNames, GroupParameterNames = ("local_iso_id",), Output = False)
+        result = hapi.LOCAL_TABLE_CACHE["group_columns"]
+        self.assertTrue(result["header"]["order"] == ["local_iso_id", "#0", "S", "#1", "#2", "#3", "#4", "#5"])
+
+        iso = self.data["local_iso_id"]
+        # in order of appearance
+        ids = list(dict.fromkeys(iso.tolist()))
+        self.assertTrue(result["header"]["number_of_rows"] == len(ids))
+        self.assertTrue(list(result["data"]["local_iso_id"]) == ids)
+        for i, j in enumerate(ids):
+            m = iso == j
+            self.assertTrue(result["data"]["#0"][i] == numpy.sum(m))
+            self.assertTrue(numpy.isclose(result["data"]["S"][i], numpy.sum(self.data["sw"][m]), rtol = 1e-14, atol = 0))
+            self.assertTrue(numpy.isclose(result["data"]["#1"][i], numpy.mean(self.data["nu"][m]), rtol = 1e-14, atol = 0))
+            self.assertTrue(result["data"]["#2"][i] == numpy.min(self.data["nu"][m]))
+            self.assertTrue(result["data"]["#3"][i] == numpy.max(self.data["nu"][m]))
+            self.assertTrue(numpy.isclose(result["data"]["#4"][i], numpy.sum(self.data["gamma_air"][m]**2), rtol = 1e-14, atol = 0))
+            self.assertTrue(numpy.isclose(result["data"]["#5"][i], numpy.mean(self.data["sw"][m]), rtol = 1e-14, atol = 0))
+
+    def test_no_groups(self):
+        """
+        Without GroupParameterNames all rows are one group.
+        """
+        HQ.group(self.tablename, DestinationTableName = "group_columns", ParameterNames = (("count",), ("max", "nu")), Output = False)
+        result = hapi.LOCAL_TABLE_CACHE["group_columns"]
+        self.assertTrue(result["header"]["number_of_rows"] == 1)
+        self.assertTrue(result["data"]["#0"][0] == 500)
+        self.assertTrue(result["data"]["#1"][0] == numpy.max(self.data["nu"]))
+
+    def test_same_table(self):
+        with self.assertRaises(Exception) as cm:
+            HQ.group(self.tablename, DestinationTableName = self.tablename, ParameterNames = (("count",),))
+
+
+
+if __name__ == '__main__':
+    verbosity = 1
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_select)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_sort)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_group)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
@@ -0,0 +1,167 @@
+import importlib
+import pathlib
+import tempfile
+import time
+import unittest
+
+import numpy
+
+import hapi
+
+import SpectraTools.hitran as HR
+import SpectraTools.Resources.hitran_cpf as HCPF
+import SpectraTools.Resources.hitran_results as HRES
+import SpectraTools.Resources.hitran_xsect as HX
+
+importlib.reload(HRES)
+
+class Test_ResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.verbose = 0
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = HRES.ResultCache(pathlib.Path(self.tmp.name), verbose = self.verbose)
+        self.fingerprint = {"data_size": 1, "data_mtime_ns": 2}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key(self):
+        key = self.cache.key(self.fingerprint, {"environment": {"T": 296, "p": 1}, "grid": numpy.arange(3)})
+        key2 = self.cache.key(dict(self.fingerprint), {"grid": numpy.arange(3), "environment": {"p": 1, "T": 296}})
+        self.assertTrue(key == key2)
+
+        key3 = self.cache.key(self.fingerprint, {"environment": {"T": 300, "p": 1}, "grid": numpy.arange(3)})
+        self.assertFalse(key == key3)
+
+        key4 = self.cache.key({"data_size": 1, "data_mtime_ns": 3}, {"environment": {"T": 296, "p": 1}, "grid": numpy.arange(3)})
+        self.assertFalse(key == key4)
+
+    def test_no_key(self):
+        """
+        Without fingerprint or with a lambda function, the result is not cached.
+        """
+        self.assertTrue(self.cache.key({}, {"T": 296}) is None)
+        self.assertTrue(self.cache.key(self.fingerprint, {"f": lambda x: x}) is None)
+        self.assertFalse(self.cache.key(self.fingerprint, {"f": numpy.exp}) is None)
+
+    def test_function_key(self):
+        """
+        A function with the same name but another body or other defaults has another key.
+        """
+        sources = ["def profile(x, a = 1):\n    return a * x\n", "def profile(x, a = 1):\n    return a * x**2\n", "def profile(x, a = 2):\n    return a * x\n", "def profile(x, a = 1):\n    return a * x\n"]
+        keys = []
+        for source in sources:
+            namespace = {"__name__": "profiles"}
+            exec(source, namespace)
+            keys.append(self.cache.key(self.fingerprint, {"f": namespace["profile"]}))
+        self.assertTrue(len(set(keys[:3])) == 3)
+        self.assertTrue(keys[0] == keys[3])
+
+    def test_get_put(self):
+        key = self.cache.key(self.fingerprint, {"T": 296})
+        self.assertTrue(self.cache.get(key) is None)
+        x = numpy.linspace(0, 1, 11)
+        self.cache.put(key, x, x**2, "A")
+        x2, y2, y_unit = self.cache.get(key)
+        self.assertTrue(numpy.all(x2 == x))
+        self.assertTrue(numpy.all(y2 == x**2))
+        self.assertTrue(y_unit == "A")
+        self.assertTrue(self.cache.stats == {"hits": 1, "misses": 1, "stored": 1, "evicted": 0})
+
+    def test_eviction(self):
+        """
+        The cache fits two results. The result that has not been used for the longest time is removed.
+        """
+        x = numpy.linspace(0, 1, 1000)
+        keys = [self.cache.key(self.fingerprint, {"i": i}) for i in range(3)]
+        self.cache.put(keys[0], x, x)
+        self.cache.max_size = 2 * self.cache.size()
+        time.sleep(0.01)
+        self.cache.put(keys[1], x, x)
+        time.sleep(0.01)
+        self.cache.get(keys[0])
+        time.sleep(0.01)
+        self.cache.put(keys[2], x, x)
+
+        self.assertTrue(self.cache.stats["evicted"] == 1)
+        self.assertFalse(self.cache.get(keys[0]) is None)
+        self.assertTrue(self.cache.get(keys[1]) is None)
+        self.assertFalse(self.cache.get(keys[2]) is None)
+
+
+class Test_calculate_signal(unittest.TestCase):
+    """
+    A synthetic table is written as a text file in a temporary folder.
+    """
+
+    def setUp(self):
+        self.verbose = 0
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = pathlib.Path(self.tmp.name)
+        self.tablename = "CO2_test"
+        hapi.VARIABLES["BACKEND_DATABASE_NAME"] = str(self.db_path)
+        HX.make_synthetic_table(self.tablename, n_lines = 20)
+        hapi.cache2storage(self.tablename)
+        del hapi.LOCAL_TABLE_CACHE[self.tablename]
+
+    def tearDown(self):
+        if self.tablename in hapi.LOCAL_TABLE_CACHE:
+            del hapi.LOCAL_TABLE_CACHE[self.tablename]
+        self.tmp.cleanup()
+
+    def test_cached(self):
+        c = HR.hitran(self.db_path, self.tablename, [(2, 1), (2, 2)], 2000, 2100, y_unit = "T1", verbose = self.verbose)
+        c.calculate_signal(environment = {"T": 250}, line_profile = "Voigt")
+        self.assertTrue(c.result_cache.stats["stored"] == 1)
+
+        d = HR.hitran(self.db_path, self.tablename, [(2, 1), (2, 2)], 2000, 2100, y_unit = "T1", verbose = self.verbose)
+        d.calculate_signal(environment = {"T": 250}, line_profile = "Voigt")
+        self.assertTrue(d.result_cache.stats["hits"] == 1)
+        self.assertTrue(numpy.all(c.x == d.x))
+        self.assertTrue(numpy.all(c.y == d.y))
+
+        d.calculate_signal(environment = {"T": 300}, line_profile = "Voigt")
+        self.assertTrue(d.result_cache.stats["stored"] == 2)
+
+    def test_cache_size(self):
+        """
+        By default, the size of the results on disk has a maximum.
+        """
+        c = HR.hitran(self.db_path, self.tablename, [(2, 1), (2, 2)], 2000, 2100, y_unit = "T1", verbose = self.verbose)
+        self.assertTrue(c.result_cache.max_size == HRES.RESULT_CACHE_SIZE)
+        d = HR.hitran(self.db_path, self.tablename, [(2, 1), (2, 2)], 2000, 2100, y_unit = "T1", result_cache_size = None, verbose = self.verbose)
+        self.assertTrue(d.result_cache.max_size is None)
+
+    def test_cpf_changed(self):
+        """
+        The key contains the backend that is used, also if cpf is not given. 
+        """
+        previous = HCPF.set_cpf("weideman32")
+        try:
+            c = HR.hitran(self.db_path, self.tablename, [(2, 1), (2, 2)], 2000, 2100, y_unit = "T1", verbose = self.verbose)
+            c.calculate_signal(environment = {"T": 250}, line_profile = "Voigt")
+            y = c.y
+            HCPF.set_cpf("humlicek")
+            c.calculate_signal(environment = {"T": 250}, line_profile = "Voigt")
+            self.assertTrue(c.result_cache.stats["hits"] == 0)
+            self.assertTrue(c.result_cache.stats["stored"] == 2)
+            self.assertFalse(numpy.all(c.y == y))
+            # the same backend by name
+            c.calculate_signal(environment = {"T": 250}, line_profile = "Voigt", cpf = "humlicek")
+            self.assertTrue(c.result_cache.stats["hits"] == 1)
+        finally:
+            hapi.VARIABLES["CPF"] = previous
+
+
+
+if __name__ == '__main__':
+    verbosity = 1
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_ResultCache)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_calculate_signal)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
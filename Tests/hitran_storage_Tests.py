@@ -0,0 +1,204 @@
+import importlib
+import os
+import pathlib
+import tempfile
+import unittest
+
+import numpy
+
+import hapi
+
+import SpectraTools.Resources.hitran_storage as HS
+import SpectraTools.Resources.hitran_xsect as HX
+
+importlib.reload(HS)
+
+class Test_sidecar(unittest.TestCase):
+    """
+    A synthetic table is written as a text file in a temporary folder.
+    """
+
+    def setUp(self):
+        self.verbose = 0
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = pathlib.Path(self.tmp.name)
+        self.tablename = "CO2_test"
+        hapi.VARIABLES["BACKEND_DATABASE_NAME"] = str(self.db_path)
+        HX.make_synthetic_table(self.tablename, n_lines = 20)
+        hapi.cache2storage(self.tablename)
+        hapi.storage2cache(self.tablename)
+        self.reference = {k: numpy.array(v) for k, v in hapi.LOCAL_TABLE_CACHE[self.tablename]["data"].items()}
+        del hapi.LOCAL_TABLE_CACHE[self.tablename]
+
+    def tearDown(self):
+        if self.tablename in hapi.LOCAL_TABLE_CACHE:
+            del hapi.LOCAL_TABLE_CACHE[self.tablename]
+        self.tmp.cleanup()
+
+    def test_load_table(self):
+        """
+        The first time the table is parsed, the second time the sidecar is used. The data should be the same.
+        """
+        source = HS.load_table(self.db_path, self.tablename, verbose = self.verbose)
+        self.assertTrue(source == "parsed")
+        self.assertTrue(HS.is_valid(self.db_path, self.tablename))
+
+        del hapi.LOCAL_TABLE_CACHE[self.tablename]
+        source = HS.load_table(self.db_path, self.tablename, verbose = self.verbose)
+        self.assertTrue(source == "sidecar")
+
+        data = hapi.LOCAL_TABLE_CACHE[self.tablename]["data"]
+        self.assertTrue(set(data.keys()) == set(self.reference.keys()))
+        for k, v in self.reference.items():
+            self.assertTrue(numpy.all(numpy.array(data[k]) == v))
+
+        self.assertTrue(numpy.ma.isMaskedArray(data["nu"]))
+        self.assertTrue(isinstance(numpy.ma.getdata(data["nu"]).base, numpy.memmap) or isinstance(numpy.ma.getdata(data["nu"]), numpy.memmap))
+
+    def test_columns(self):
+        HS.load_table(self.db_path, self.tablename, columns = ["nu", "sw"], verbose = self.verbose)
+        self.assertTrue(set(hapi.LOCAL_TABLE_CACHE[self.tablename]["data"].keys()) == {"nu", "sw"})
+
+        HS.load_columns(self.db_path, self.tablename, columns = ["molec_id", "nu"], verbose = self.verbose)
+        self.assertTrue(set(hapi.LOCAL_TABLE_CACHE[self.tablename]["data"].keys()) == {"nu", "sw", "molec_id"})
+
+        self.assertTrue(HS.missing_columns(self.tablename, ["nu", "elower"]) == ["elower"])
+
+    def test_profile_columns(self):
+        HS.load_table(self.db_path, self.tablename, verbose = self.verbose)
+        order = hapi.LOCAL_TABLE_CACHE[self.tablename]["header"]["order"]
+        del hapi.LOCAL_TABLE_CACHE[self.tablename]
+
+        HS.load_table(self.db_path, self.tablename, columns = HX.profile_columns("Voigt", order), verbose = self.verbose)
+        w, c = HX.absorption_coefficient("Voigt", SourceTables = self.tablename)
+        self.assertTrue(numpy.amax(c) > 0)
+        self.assertFalse("global_upper_quanta" in hapi.LOCAL_TABLE_CACHE[self.tablename]["data"])
+
+    def test_invalidation(self):
+        """
+        If the data file changes, the sidecar is invalid and the table is parsed again.
+        """
+        HS.load_table(self.db_path, self.tablename, verbose = self.verbose)
+        data_path, header_path = HS.table_paths(self.db_path, self.tablename)
+        with open(data_path, "r") as f:
+            lines = f.readlines()
+        with open(data_path, "w") as f:
+            f.writelines(lines[:10])
+        self.assertFalse(HS.is_valid(self.db_path, self.tablename))
+
+        source = HS.load_table(self.db_path, self.tablename, verbose = self.verbose)
+        self.assertTrue(source == "parsed")
+        self.assertTrue(len(hapi.LOCAL_TABLE_CACHE[self.tablename]["data"]["nu"]) == 10)
+
+    def test_copy_on_write(self):
+        """
+        Changing the data in memory does not change the sidecar.
+        """
+        HS.load_table(self.db_path, self.tablename, verbose = self.verbose)
+        HS.load_table(self.db_path, self.tablename, verbose = self.verbose)
+        hapi.LOCAL_TABLE_CACHE[self.tablename]["data"]["sw"][0] = 1.0
+        HS.load_table(self.db_path, self.tablename, verbose = self.verbose)
+        self.assertTrue(hapi.LOCAL_TABLE_CACHE[self.tablename]["data"]["sw"][0] == self.reference["sw"][0])
+
+    def test_db_begin(self):
+        sources = HS.db_begin(self.db_path, verbose = self.verbose)
+        self.assertTrue(sources == {self.tablename: "parsed"})
+        sources = HS.db_begin(self.db_path, verbose = self.verbose)
+        self.assertTrue(sources == {self.tablename: "sidecar"})
+
+    def test_remove_sidecar(self):
+        HS.load_table(self.db_path, self.tablename, verbose = self.verbose)
+        HS.remove_sidecar(self.db_path, self.tablename)
+        self.assertFalse(HS.sidecar_path(self.db_path, self.tablename).is_dir())
+        self.assertFalse(HS.is_valid(self.db_path, self.tablename))
+
+
+class Test_lazy(unittest.TestCase):
+    """
+    Two synthetic tables in a temporary folder, registered lazily.
+    """
+
+    def setUp(self):
+        self.verbose = 0
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = pathlib.Path(self.tmp.name)
+        self.tablenames = ["CO2_a", "CO2_b"]
+        hapi.VARIABLES["BACKEND_DATABASE_NAME"] = str(self.db_path)
+        for i, tablename in enumerate(self.tablenames):
+            HX.make_synthetic_table(tablename, n_lines = 20, seed = i)
+            hapi.cache2storage(tablename)
+            del hapi.LOCAL_TABLE_CACHE[tablename]
+
+    def tearDown(self):
+        for tablename in self.tablenames:
+            if tablename in hapi.LOCAL_TABLE_CACHE:
+                del hapi.LOCAL_TABLE_CACHE[tablename]
+        HS.STORES.pop(str(self.db_path.resolve()), None)
+        self.tmp.cleanup()
+
+    def test_register(self):
+        """
+        Only the headers are loaded, the data is loaded when it is used.
+        """
+        store = HS.db_begin_lazy(self.db_path, verbose = self.verbose)
+        for tablename in self.tablenames:
+            self.assertTrue(isinstance(hapi.LOCAL_TABLE_CACHE[tablename], HS.LazyTable))
+            self.assertFalse(hapi.LOCAL_TABLE_CACHE[tablename].is_materialized())
+        self.assertTrue(store.memory_usage() == 0)
+
+        nu = hapi.getColumn("CO2_a", "nu")
+        self.assertTrue(len(nu) == 20)
+        self.assertTrue(hapi.LOCAL_TABLE_CACHE["CO2_a"].is_materialized())
+        self.assertFalse(hapi.LOCAL_TABLE_CACHE["CO2_b"].is_materialized())
+        self.assertTrue(store.loaded_tables() == ["CO2_a"])
+        self.assertTrue(HS.is_valid(self.db_path, "CO2_a"))
+
+    def test_same_store(self):
+        store = HS.db_begin_lazy(self.db_path, verbose = self.verbose)
+        store2 = HS.db_begin_lazy(self.db_path, memory_budget = 10, verbose = self.verbose)
+        self.assertTrue(store is store2)
+        self.assertTrue(store.memory_budget == 10)
+
+    def test_eviction(self):
+        """
+        With a budget that fits one table, the least recently used table is removed.
+        """
+        store = HS.db_begin_lazy(self.db_path, verbose = self.verbose)
+        hapi.getColumn("CO2_a", "nu")
+        store.memory_budget = store.memory_usage()
+
+        hapi.getColumn("CO2_b", "nu")
+        self.assertFalse(hapi.LOCAL_TABLE_CACHE["CO2_a"].is_materialized())
+        self.assertTrue(hapi.LOCAL_TABLE_CACHE["CO2_b"].is_materialized())
+        self.assertTrue(store.stats["evicted"] == 1)
+
+        # the data is loaded again when it is used
+        nu = hapi.getColumn("CO2_a", "nu")
+        self.assertTrue(len(nu) == 20)
+        self.assertFalse(hapi.LOCAL_TABLE_CACHE["CO2_b"].is_materialized())
+        self.assertTrue(store.stats["materialized"] == 3)
+
+    def test_xsect(self):
+        """
+        The absorption coefficient of a lazy table is the same as for a normal table.
+        """
+        HS.db_begin_lazy(self.db_path, columns = ["molec_id", "local_iso_id", "nu", "sw", "elower", "gamma_air", "n_air", "delta_air"], verbose = self.verbose)
+        w, c = HX.absorption_coefficient("Voigt", SourceTables = "CO2_a")
+        self.assertFalse("a" in hapi.LOCAL_TABLE_CACHE["CO2_a"]["data"])
+
+        HS.load_table(self.db_path, "CO2_a", verbose = self.verbose)
+        w2, c2 = HX.absorption_coefficient("Voigt", SourceTables = "CO2_a")
+        self.assertTrue(numpy.all(c == c2))
+
+
+
+if __name__ == '__main__':
+    verbosity = 1
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_sidecar)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_lazy)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
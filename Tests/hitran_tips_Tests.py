@@ -0,0 +1,96 @@
+import importlib
+import pathlib
+import tempfile
+import unittest
+
+import numpy
+
+import hapi
+
+import SpectraTools.Resources.hitran_tips as TIPS
+
+importlib.reload(TIPS)
+
+class Test_PartitionFunction(unittest.TestCase):
+
+    def setUp(self):
+        self.verbose = 0
+        self.pf = TIPS.PartitionFunction(verbose = self.verbose)
+
+    def test_same_as_hapi(self):
+        """
+        Temperatures at the grid points, near the ends of the table (3-point interpolation) and in between.
+        """
+        for M, I in [(2, 1), (2, 2), (1, 1)]:
+            T_min, T_max = self.pf.temperature_range(M, I)
+            T = numpy.concatenate(([T_min, T_min + 0.5, 5.0, 10.0, 296.0, T_max - 0.5, T_max], numpy.linspace(T_min, T_max, 97)))
+            Q_ref = numpy.array([hapi.PYTIPS(M, I, t) for t in T])
+            Q = self.pf(M, I, T)
+            self.assertTrue(numpy.allclose(Q, Q_ref, rtol = 1e-12, atol = 0))
+
+    def test_scalar(self):
+        Q = self.pf(2, 1, 296)
+        self.assertTrue(isinstance(Q, float))
+        self.assertTrue(numpy.isclose(Q, hapi.PYTIPS(2, 1, 296), rtol = 1e-12, atol = 0))
+
+    def test_out_of_range(self):
+        T_min, T_max = self.pf.temperature_range(2, 1)
+        with self.assertRaises(ValueError) as cm:
+            self.pf(2, 1, numpy.array([296, T_max + 1]))
+
+    def test_function(self):
+        """
+        Another partition function is calculated on a grid.
+        """
+        pf = TIPS.PartitionFunction(function = lambda M, I, T: 2.0 * hapi.PYTIPS(M, I, T), verbose = self.verbose)
+        T = numpy.linspace(100, 1000, 11)
+        Q_ref = numpy.array([2.0 * hapi.PYTIPS(2, 1, t) for t in T])
+        self.assertTrue(numpy.allclose(pf(2, 1, T), Q_ref, rtol = 1e-5, atol = 0))
+
+    def test_memory(self):
+        self.pf(2, 1, 296)
+        self.pf(2, 1, 300)
+        self.assertTrue(self.pf.stats == {"hits": 1, "disk": 0, "built": 1})
+
+
+class Test_disk(unittest.TestCase):
+
+    def setUp(self):
+        self.verbose = 0
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_path = pathlib.Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_disk(self):
+        pf = TIPS.PartitionFunction(cache_path = self.cache_path, verbose = self.verbose)
+        Q = pf(2, 1, numpy.array([200, 296]))
+        self.assertTrue(pf.table_path(2, 1).is_file())
+
+        pf2 = TIPS.PartitionFunction(cache_path = self.cache_path, verbose = self.verbose)
+        Q2 = pf2(2, 1, numpy.array([200, 296]))
+        self.assertTrue(pf2.stats["disk"] == 1)
+        self.assertTrue(numpy.all(Q == Q2))
+
+        pf2.clear(disk = True)
+        self.assertFalse(pf.table_path(2, 1).is_file())
+
+    def test_get_partition_function(self):
+        pf = TIPS.get_partition_function(cache_path = self.cache_path)
+        self.assertTrue(pf is TIPS.get_partition_function(cache_path = self.cache_path))
+        self.assertFalse(pf is TIPS.get_partition_function())
+        TIPS.PARTITION_FUNCTIONS.pop((str(self.cache_path.resolve()), pf.version))
+
+
+
+if __name__ == '__main__':
+    verbosity = 1
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_PartitionFunction)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_disk)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
@@ -0,0 +1,220 @@
+import importlib
+import pathlib
+import tempfile
+import warnings
+import unittest
+
+import numpy
+
+import hapi
+
+import SpectraTools.hitran as HR
+import SpectraTools.Resources.hitran_xsect as HX
+
+importlib.reload(HX)
+
+class Test_absorption_coefficient(unittest.TestCase):
+    """
+    Compare the vectorized calculation with HAPI, using a synthetic table.
+    """
+
+    def setUp(self):
+        self.verbose = 0
+        self.tablename = HX.make_synthetic_table("__test_xsect__", n_lines = 50, min_x = 2000, max_x = 2010)
+        warnings.simplefilter("ignore")
+
+    def tearDown(self):
+        warnings.resetwarnings()
+        del hapi.LOCAL_TABLE_CACHE[self.tablename]
+
+    def compare(self, line_profile, **kwargs):
+        kwargs["SourceTables"] = self.tablename
+        w_ref, c_ref = HX.hapi_absorption_coefficient(line_profile, **kwargs)
+        w, c = HX.absorption_coefficient(line_profile, verbose = self.verbose, **kwargs)
+        self.assertTrue(numpy.all(w == w_ref))
+        self.assertTrue(numpy.amax(numpy.abs(c - c_ref)) <= HX.XSECT_TOLERANCE * numpy.amax(c_ref))
+
+    def test_voigt(self):
+        self.compare("Voigt")
+
+    def test_lorentz(self):
+        self.compare("Lorentz")
+
+    def test_doppler(self):
+        self.compare("Doppler", OmegaStep = 0.002)
+
+    def test_ht(self):
+        self.compare("HT")
+
+    def test_environment(self):
+        """
+        Non-default temperature and pressure, broadening mixture and cm-1 as unit.
+        """
+        self.compare("Voigt", Environment = {"T": 250, "p": 0.5}, Diluent = {"air": 0.7, "self": 0.3}, HITRAN_units = False)
+
+    def test_components(self):
+        self.compare("Voigt", Components = [(2, 1, 0.5)])
+
+    def test_wing_threshold(self):
+        self.compare("Lorentz", OmegaWing = 1, OmegaWingHW = 0, IntensityThreshold = 1e-21)
+
+    def test_small_chunks(self):
+        """
+        The result should not depend on the chunk size.
+        """
+        w, c = HX.absorption_coefficient("Voigt", SourceTables = self.tablename)
+        w, c2 = HX.absorption_coefficient("Voigt", SourceTables = self.tablename, chunk_size = 1000)
+        self.assertTrue(numpy.allclose(c, c2, rtol = 1e-12, atol = 0))
+
+    def test_workers(self):
+        """
+        The result is exactly the same for any number of workers.
+        """
+        w, c = HX.absorption_coefficient("Voigt", SourceTables = self.tablename, chunk_size = 1000)
+        for workers in [2, 3]:
+            w, c2 = HX.absorption_coefficient("Voigt", SourceTables = self.tablename, chunk_size = 1000, workers = workers)
+            self.assertTrue(numpy.all(c == c2))
+
+    def test_invalid_profile(self):
+        with self.assertRaises(ValueError) as cm:
+            HX.absorption_coefficient("fiets", SourceTables = self.tablename)
+
+
+class Test_absorption_coefficients(unittest.TestCase):
+    """
+    Several environments at once should give the same result as one at a time.
+    """
+
+    def setUp(self):
+        self.verbose = 0
+        self.tablename = HX.make_synthetic_table("__test_xsect__", n_lines = 50, min_x = 2000, max_x = 2010)
+        self.environments = [{"T": 250, "p": 0.5}, {"T": 296}, {"T": 400, "p": 2.0}]
+        warnings.simplefilter("ignore")
+
+    def tearDown(self):
+        warnings.resetwarnings()
+        del hapi.LOCAL_TABLE_CACHE[self.tablename]
+
+    def test_same_as_single(self):
+        w, c = HX.absorption_coefficients("Voigt", Environments = self.environments, SourceTables = self.tablename, HITRAN_units = False, processes = 1, verbose = self.verbose)
+        self.assertTrue(numpy.shape(c) == (3, len(w)))
+        for i, environment in enumerate(self.environments):
+            environment = {"T": 296.0, "p": 1.0, **environment}
+            w2, c2 = HX.absorption_coefficient("Voigt", Environment = environment, SourceTables = self.tablename, HITRAN_units = False, verbose = self.verbose)
+            self.assertTrue(numpy.all(w == w2))
+            self.assertTrue(numpy.all(c[i] == c2))
+
+    def test_processes(self):
+        w, c = HX.absorption_coefficients("Lorentz", Environments = self.environments, SourceTables = self.tablename, processes = 1, verbose = self.verbose)
+        w, c2 = HX.absorption_coefficients("Lorentz", Environments = self.environments, SourceTables = self.tablename, processes = 2, verbose = self.verbose)
+        self.assertTrue(numpy.all(c == c2))
+
+    def test_no_environments(self):
+        with self.assertRaises(ValueError) as cm:
+            HX.absorption_coefficients("Voigt", Environments = [], SourceTables = self.tablename)
+
+
+class Test_is_supported(unittest.TestCase):
+
+    def setUp(self):
+        self.verbose = 0
+        self.tablename = HX.make_synthetic_table("__test_xsect__", n_lines = 10)
+
+    def tearDown(self):
+        del hapi.LOCAL_TABLE_CACHE[self.tablename]
+
+    def test_supported(self):
+        self.assertTrue(HX.is_supported(self.tablename, "Voigt"))
+        self.assertTrue(HX.is_supported(self.tablename, "HT"))
+        self.assertFalse(HX.is_supported(self.tablename, "fiets"))
+        self.assertFalse(HX.is_supported("__no_table__", "Voigt"))
+
+    def test_ht_parameters(self):
+        hapi.LOCAL_TABLE_CACHE[self.tablename]["data"]["gamma_HT_0_air_296"] = numpy.ones(10)
+        self.assertTrue(HX.is_supported(self.tablename, "Voigt"))
+        self.assertFalse(HX.is_supported(self.tablename, "HT"))
+
+
+class Test_engine(unittest.TestCase):
+    """
+    The engines of `hitran.calculate_signal` give the same result, with a table in a temporary database.
+    """
+
+    def setUp(self):
+        self.verbose = 0
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = pathlib.Path(self.tmp.name)
+        self.tablename = "engine_test"
+        hapi.VARIABLES["BACKEND_DATABASE_NAME"] = str(self.db_path)
+        HX.make_synthetic_table(self.tablename, n_lines = 50, min_x = 2000, max_x = 2010)
+        hapi.cache2storage(self.tablename)
+        self.c = HR.hitran(self.db_path, self.tablename, [(2, 1), (2, 2)], 2000, 2010, y_unit = "cm-1", result_cache = False, verbose = self.verbose)
+        warnings.simplefilter("ignore")
+
+    def tearDown(self):
+        warnings.resetwarnings()
+        if self.tablename in hapi.LOCAL_TABLE_CACHE:
+            del hapi.LOCAL_TABLE_CACHE[self.tablename]
+        self.tmp.cleanup()
+
+    def test_components(self):
+        """
+        Only the given components are used, for all line profiles.
+        """
+        for line_profile in ["HT", "default", "Voigt", "Lorentz"]:
+            y = {}
+            for engine in ["vectorized", "hapi"]:
+                self.c.calculate_signal(components = [(2, 1)], environment = {"T": 296}, line_profile = line_profile, engine = engine)
+                y[engine] = numpy.array(self.c.y)
+            self.assertTrue(numpy.amax(numpy.abs(y["vectorized"] - y["hapi"])) <= HX.XSECT_TOLERANCE * numpy.amax(y["hapi"]))
+            self.c.calculate_signal(environment = {"T": 296}, line_profile = line_profile, engine = "hapi")
+            self.assertTrue(numpy.amax(numpy.abs(self.c.y - y["hapi"])) > 1e-3 * numpy.amax(self.c.y))
+
+
+class Test_chunk_bounds(unittest.TestCase):
+
+    def test_chunk_bounds(self):
+        counts = numpy.array([3, 3, 3, 10, 1, 1])
+        bounds = HX.chunk_bounds(counts, 6)
+        self.assertTrue(bounds[0] == 0)
+        self.assertTrue(bounds[-1] == len(counts))
+        self.assertTrue(numpy.all(numpy.diff(bounds) > 0))
+
+    def test_line_density(self):
+        """
+        The chunks have the same number of (line, grid point) pairs, not the same number of lines.
+        """
+        counts = numpy.concatenate((numpy.full(100, 10), numpy.full(10, 100)))
+        bounds = HX.chunk_bounds(counts, 500)
+        pairs = numpy.add.reduceat(counts, bounds[:-1])
+        self.assertTrue(len(bounds) == 5)
+        self.assertTrue(numpy.all(pairs == 500))
+
+    def test_chunk_bounds_empty(self):
+        bounds = HX.chunk_bounds(numpy.array([], dtype = int), 6)
+        self.assertTrue(len(bounds) == 2)
+
+
+
+if __name__ == '__main__':
+    verbosity = 1
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_absorption_coefficient)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_absorption_coefficients)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_is_supported)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_engine)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
+
+    if 1:
+        suite = unittest.TestLoader().loadTestsFromTestCase(Test_chunk_bounds)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
@@ -30,9 +30,33 @@ import numpy
 import hapi
 
 import SpectraTools.LinearSpectrum as LS
+import SpectraTools.SpectrumStack as SS
 import SpectraTools.UnitConversion as UC
+import SpectraTools.Resources.CommonFunctions as ST_CF
+import SpectraTools.Resources.hitran_xsect as HX
+import SpectraTools.Resources.hitran_storage as HS
+import SpectraTools.Resources.hitran_tips as HTIPS
+import SpectraTools.Resources.hitran_results as HRES
+import SpectraTools.Resources.hitran_convolve as HCONV
+import SpectraTools.Resources.hitran_index as HIDX
+import SpectraTools.Resources.hitran_fetch as HF
+import SpectraTools.Resources.hitran_cpf as HCPF
+import SpectraTools.Resources.hitran_lookup as HLUT
+import SpectraTools.Resources.hitran_blocks as HB
 
 importlib.reload(hapi)
+importlib.reload(SS)
+importlib.reload(ST_CF)
+importlib.reload(HX)
+importlib.reload(HS)
+importlib.reload(HTIPS)
+importlib.reload(HRES)
+importlib.reload(HCONV)
+importlib.reload(HIDX)
+importlib.reload(HF)
+importlib.reload(HCPF)
+importlib.reload(HLUT)
+importlib.reload(HB)
 
 
 
@@ -73,7 +97,7 @@ class hitran(LS.LinearSpectrum):
 
 
     
-    def __init__(self, db_path, tablename, components, min_x, max_x, verbose = 0, **kwargs):
+    def __init__(self, db_path, tablename, components, min_x, max_x, binary_cache = True, columns = None, lazy = True, memory_budget = None, result_cache = True, result_cache_size = HRES.RESULT_CACHE_SIZE, verbose = 0, **kwargs):
         """
         Initialize the Hitran class. 
         
@@ -90,6 +114,20 @@ class hitran(LS.LinearSpectrum):
             Hitran molecule number and isotopologue number
         min_x,max_x : number
             Minimum and maximum of the wavenumber axis.             
+        binary_cache : bool (True)
+            If True, the tables are loaded from binary sidecar files (see `Resources.hitran_storage`), which is much faster than parsing the text files. The sidecar files are written the first time a table is loaded. 
+        columns : list (None)
+            With `binary_cache`, only load these columns. If None, all columns are loaded. Columns that are needed for `calculate_signal` are loaded when needed.
+        lazy : bool (True)
+            With `binary_cache`, only the headers of the tables in `db_path` are read. The data of a table is loaded when it is used for the first time (see `Resources.hitran_storage.LazyTableStore`). 
+        memory_budget : int (None)
+            With `lazy`, the maximum size (in bytes) of the loaded tables in `db_path`. If it is exceeded, the tables that have not been used for the longest time are removed from memory. If None, there is no maximum. 
+        result_cache : bool (True)
+            If True, the results of `calculate_signal` are stored in `db_path` (see `Resources.hitran_results`). A calculation with the same table and arguments is then read from disk. 
+        result_cache_size : int (`Resources.hitran_results.RESULT_CACHE_SIZE`, 500 MB)
+            The maximum size (in bytes) of the stored results. If it is exceeded, the results that have not been used for the longest time are removed. If None, there is no maximum. 
+        dtype : str (None)
+            'float32' to store `y` in single precision (see `LinearSpectrum`). The absorption coefficient and the convolution are calculated in float64, the result is converted. The results with float32 are cached separately. 
             
             
         Notes
@@ -120,13 +158,41 @@ class hitran(LS.LinearSpectrum):
         self.min_x = min_x
         self.max_x = max_x
         
-        hapi.db_begin(str(self.db_path))
+        self.binary_cache = binary_cache
+        self.lazy = lazy and binary_cache
         
-    def import_data_helper(self):
+        if self.lazy:
+            self.store = HS.db_begin_lazy(self.db_path, memory_budget = memory_budget, columns = columns, verbose = verbose)
+        elif self.binary_cache:
+            HS.db_begin(self.db_path, columns = columns, verbose = verbose)
+        else:
+            hapi.db_begin(str(self.db_path))
+        
+        if self.binary_cache:
+            self.partition_function = HTIPS.get_partition_function(cache_path = pathlib.Path(self.db_path).joinpath("TIPS.{:}".format(HS.SIDECAR_EXTENSION)), verbose = verbose)
+        else:
+            self.partition_function = HTIPS.get_partition_function(verbose = verbose)
+        
+        if result_cache:
+            self.result_cache = HRES.get_result_cache(pathlib.Path(self.db_path).joinpath("results.{:}".format(HS.SIDECAR_EXTENSION)), max_size = result_cache_size, verbose = verbose)
+        else:
+            self.result_cache = None
+        
+        # see build_lookup_table
+        self.lookup_table = None
+        self.lookup_kwargs = {}
+        
+        # see calculate_basis
+        self.basis = None
+        
+    def import_data_helper(self, replace = False):
         """
-        Does the actual importing ('fetching') of data. 
+        Does the actual importing ('fetching') of data. Only the parts of the range that are not in the table yet are downloaded and added to the table (see `Resources.hitran_fetch`).
         
-
+        Keyword Arguments
+        -----------------
+        replace : bool (False)
+            If True, the table is removed and the whole range is downloaded.
         
         Notes
         -----
@@ -134,13 +200,14 @@ class hitran(LS.LinearSpectrum):
         - 2019-03-21/RB: started function
         
         """    
-        if len(self.components) == 1:
-            hapi.fetch(TableName = self.tablename, M = self.components[0][0], I = self.components[0][1], numin = self.min_x, numax = self.max_x)
-        else:   
-            global_id = []
-            for c in self.components:
-                global_id.append(hapi.ISO[c][0])
-            hapi.fetch_by_ids(TableName = self.tablename, iso_id_list = global_id, numin = self.min_x, numax = self.max_x)
+        requests = HF.fetch(self.db_path, self.tablename, self.components, self.min_x, self.max_x, replace = replace, verbose = self.verbose)
+        if len(requests) == 0:
+            return
+
+        if self.binary_cache:
+            HS.write_sidecar(self.db_path, self.tablename, verbose = self.verbose)
+        if self.lazy:
+            self.store.register(self.tablename)
 
         
     def import_data(self, reload = False):
@@ -152,6 +219,8 @@ class hitran(LS.LinearSpectrum):
         reload : bool (False)
             If True, forces a reload of the data. 
             
+        If the table has a coverage manifest (see `Resources.hitran_fetch`), only the missing parts are downloaded. Otherwise, the data is downloaded if the table does not exist or if the range of the lines in the table does not match.
+            
         Notes
         -----
         
@@ -164,13 +233,15 @@ class hitran(LS.LinearSpectrum):
         if reload:
             if self.verbose > 0:
                 print("SpectraTools.Hitran.import_data(): downloading data (reload == True)")    
+            self.import_data_helper(replace = True)
+        elif HF.read_coverage(self.db_path, self.tablename) is not None:
             self.import_data_helper()
         else:
             try:
-                nu = hapi.getColumn(self.tablename, 'nu')
+                nu_min, nu_max = HIDX.get_index(self.tablename, verbose = self.verbose).nu_range()
                 if self.verbose > 1:
-                    print(numpy.amin(nu), numpy.amax(nu))
-                if numpy.amin(nu) <= self.min_x or numpy.amax(nu) >= self.max_x:    
+                    print(nu_min, nu_max)
+                if nu_min is None or nu_min <= self.min_x or nu_max >= self.max_x:    
                     if self.verbose > 0:
                         print("SpectraTools.Hitran.import_data(): downloading data (new range)")
                     self.import_data_helper()
@@ -220,8 +291,10 @@ class hitran(LS.LinearSpectrum):
         if filepath.is_file():
             os.remove(filepath)        
         
+        HS.remove_sidecar(self.db_path, self.tablename)
+        
 
-    def calculate_signal(self, components = None, environment = {}, line_profile = "default", convolution = None, **kwargs):
+    def calculate_signal(self, components = None, environment = {}, line_profile = "default", convolution = None, engine = "vectorized", convolution_method = "auto", cpf = None, workers = 1, **kwargs):
         """
         Calculate the spectra.  
 
@@ -233,6 +306,14 @@ class hitran(LS.LinearSpectrum):
             Environment variables: `T` for temperature in Kelvin (default: 296), `p` for pressure in atmosphere (default: 1) and `l` for pathlength in centimeters (default is 1). 
         line_profile : str {'default', 'HT', 'Voigt', 'Lorentz', 'Doppler'}
             Default is 'HT'.
+        engine : str {'vectorized', 'hapi'}
+            'vectorized' calculates all lines at once (see `Resources.hitran_xsect`). It gives the same result as HAPI within `hitran_xsect.XSECT_TOLERANCE`. If the table can not be calculated with it (for example the HT profile for a table with HT parameters), HAPI is used. 'hapi' always uses HAPI. Both engines only include the lines of `components`, for all line profiles. 
+        convolution_method : str {'auto', 'direct', 'fft'}
+            Method for the convolution with the slit function (see `Resources.hitran_convolve`). With 'auto', slit functions with many points are convolved with FFTs.
+        cpf : str or function (None)
+            Complex probability function for the Voigt and HT profiles: the name of a backend ('exact', 'weideman32', 'weideman16', 'humlicek' or 'hapi', see `Resources.hitran_cpf`) or a function. If None, `hapi.VARIABLES['CPF']` is used.
+        workers : int (1)
+            Number of processes for the lines with the vectorized engine (see `Resources.hitran_xsect.accumulate_lines`). If None, the number of CPUs. The result does not depend on the number of workers.
         
         Notes
         -----
@@ -269,6 +350,10 @@ class hitran(LS.LinearSpectrum):
             if k == "File_spectrum":
                 abs_trans_kwargs["File"] = v
         
+        # the partition sums at T and Tref are taken from cached tables
+        if "partitionFunction" not in coeff_kwargs:
+            coeff_kwargs["partitionFunction"] = self.partition_function
+        
         if self.y_unit == "cm2/molecule":
             HITRAN_units = True
         else:
@@ -276,17 +361,85 @@ class hitran(LS.LinearSpectrum):
         
         # print(coeff_kwargs)
         
-        if line_profile in ['Voigt']:
-            w, c = hapi.absorptionCoefficient_Voigt(Components = components, SourceTables = self.tablename, HITRAN_units = HITRAN_units, Environment = environment, **coeff_kwargs)
-        elif line_profile in ['Lorentz']:
-            w, c = hapi.absorptionCoefficient_Lorentz(Components = components, SourceTables = self.tablename, HITRAN_units = HITRAN_units, Environment = environment, **coeff_kwargs)
-        elif line_profile in ['Doppler']:
-            w, c = hapi.absorptionCoefficient_Doppler(Components = components, SourceTables = self.tablename, HITRAN_units = HITRAN_units, Environment = environment, **coeff_kwargs)
-        elif line_profile in ['default', 'HT']:
-            w, c = hapi.absorptionCoefficient_HT(SourceTables = self.tablename, HITRAN_units = HITRAN_units, Environment = environment, **coeff_kwargs)            
+        if engine not in ["vectorized", "hapi"]:
+            raise ValueError("'{:}' is not a valid engine".format(engine))
+        
+        # a calculation with the same table and arguments is read from disk
+        result_key = None
+        if self.result_cache is not None and "File" not in coeff_kwargs:
+            inputs = {
+                "tablename": self.tablename, 
+                "components": components, 
+                "environment": environment, 
+                "line_profile": line_profile, 
+                "convolution": convolution, 
+                "engine": engine, 
+                "y_unit": self.y_unit, 
+                "HITRAN_units": HITRAN_units, 
+                "coeff_kwargs": coeff_kwargs, 
+                "conv_kwargs": {k: v for k, v in kwargs.items() if k in ["Resolution", "AF_wing"]},
+                "convolution_method": convolution_method,
+                "cpf": HCPF.cpf_key(cpf),
+                "dtype": str(ST_CF.get_dtype(self.dtype)),
+            }
+            result_key = self.result_cache.key(HS.fingerprint(self.db_path, self.tablename), inputs)
+            result = self.result_cache.get(result_key)
+            if result is not None:
+                self.x, self.y, self.y_unit = result
+                return
+        
+        if self.binary_cache and self.tablename in hapi.LOCAL_TABLE_CACHE:
+            if engine == "vectorized":
+                HS.load_columns(self.db_path, self.tablename, columns = HX.profile_columns(line_profile, hapi.LOCAL_TABLE_CACHE[self.tablename]["header"]["order"]), verbose = self.verbose)
+            else:
+                HS.load_columns(self.db_path, self.tablename, verbose = self.verbose)
+        
+        if engine == "vectorized" and "EnvDependences" not in coeff_kwargs and HX.is_supported(self.tablename, line_profile):
+            if self.verbose > 1:
+                print("SpectraTools.Hitran.calculate_signal(): vectorized engine")
+            w, c = HX.absorption_coefficient(line_profile, Components = components, SourceTables = self.tablename, HITRAN_units = HITRAN_units, Environment = environment, cpf = cpf, workers = workers, verbose = self.verbose, **coeff_kwargs)
         else:
-            raise ValueError("'{:}' is not a valid line_profile".format(line_profile))
+            # HAPI uses hapi.VARIABLES['CPF']
+            previous_cpf = HCPF.set_cpf(cpf) if cpf is not None else None
+            try:
+                if line_profile in ['Voigt']:
+                    w, c = hapi.absorptionCoefficient_Voigt(Components = components, SourceTables = self.tablename, HITRAN_units = HITRAN_units, Environment = environment, **coeff_kwargs)
+                elif line_profile in ['Lorentz']:
+                    w, c = hapi.absorptionCoefficient_Lorentz(Components = components, SourceTables = self.tablename, HITRAN_units = HITRAN_units, Environment = environment, **coeff_kwargs)
+                elif line_profile in ['Doppler']:
+                    w, c = hapi.absorptionCoefficient_Doppler(Components = components, SourceTables = self.tablename, HITRAN_units = HITRAN_units, Environment = environment, **coeff_kwargs)
+                elif line_profile in ['default', 'HT']:
+                    w, c = hapi.absorptionCoefficient_HT(Components = components, SourceTables = self.tablename, HITRAN_units = HITRAN_units, Environment = environment, **coeff_kwargs)            
+                else:
+                    raise ValueError("'{:}' is not a valid line_profile".format(line_profile))
+            finally:
+                if previous_cpf is not None:
+                    hapi.VARIABLES["CPF"] = previous_cpf
+
+        self.signal_from_coefficient(w, c, environment, convolution = convolution, convolution_method = convolution_method, **kwargs)
+        
+        if result_key is not None:
+            self.result_cache.put(result_key, self.x, self.y, self.y_unit)
+            
 
+
+
+    def signal_from_coefficient(self, w, c, environment, convolution = None, convolution_method = "auto", **kwargs):
+        """
+        Calculate the spectrum from the absorption coefficient, in `y_unit`, and convolve it with the slit function. The result is stored in `x` and `y`. 
+        
+        Arguments
+        ---------
+        w : ndarray
+            The wavenumbers.
+        c : ndarray
+            The absorption coefficient, in cm2/molecule if `y_unit` is 'cm2/molecule' and otherwise in cm-1.
+        environment : dict
+            With the pathlength `l` in centimeters. 
+        
+        For the keyword arguments, see `calculate_signal`. 
+        
+        """
         if self.y_unit == "":
             self.x, self.y = hapi.absorptionSpectrum(w, c, Environment = environment)   
             self.y_unit = UC.absorption_labels[0]
@@ -327,14 +480,513 @@ class hitran(LS.LinearSpectrum):
                         if v is not None:
                             conv_kwargs[k] = v
 
-                self.x, self.y, _i1, _i2, __slit = hapi.convolveSpectrum(Omega = self.x, CrossSection = self.y, **conv_kwargs)
+                self.x, self.y, _i1, _i2, __slit = HCONV.convolve_spectrum(Omega = self.x, CrossSection = self.y, method = convolution_method, verbose = self.verbose, **conv_kwargs)
+
+
+
+    def calculate_sweep(self, environments, components = None, line_profile = "default", processes = None, engine = "vectorized", cpf = None, **kwargs):
+        """
+        Calculate the spectra for several environments. 
+        
+        The lines are looked up once for all environments and the environments are calculated in a pool of processes (see `Resources.hitran_xsect.absorption_coefficients`). The result is the same as calling `calculate_signal` for each environment, without convolution.
+
+        Arguments
+        ---------
+        environments : list of dicts
+            Environment variables, as for `calculate_signal`: `T` (default: 296), `p` (default: 1) and `l` (default: 1). 
+
+        Keyword Arguments
+        -----------------
+        components : tuple
+            List with tupples for which components should be included in the calculation. 
+        line_profile : str {'default', 'HT', 'Voigt', 'Lorentz', 'Doppler'}
+            Default is 'HT'.
+        processes : int (None)
+            Number of processes. If None, the number of CPUs. With 1, no processes are started. 
+        engine : str {'vectorized', 'hapi'}
+            See `calculate_signal`. With 'hapi', the environments are calculated one by one.
+        cpf : str or function (None)
+            Complex probability function, see `calculate_signal`.
+            
+        Returns
+        -------
+        stack : SpectrumStack
+            One spectrum for each environment, with `y_unit` as unit. 
+        
+        Notes
+        -----
+        
+        For kwargs, see `calculate_signal`. 
+        
+        """
+        
+        if self.verbose > 1:
+            print("SpectraTools.Hitran.calculate_sweep()")
+        
+        if components is None:
+            components = self.components
+        
+        envs = []
+        for environment in environments:
+            env = {"T": 296, "p": 1, "l": 1}
+            env.update(environment)
+            envs.append(env)
+        
+        if engine not in ["vectorized", "hapi"]:
+            raise ValueError("'{:}' is not a valid engine".format(engine))
+        
+        if self.y_unit == "":
+            self.y_unit = UC.absorption_labels[0]
+        if self.y_unit not in UC.transmission_1_labels + UC.transmission_pct_labels + UC.absorption_labels + ["cm-1", "cm2/molecule"]:
+            raise ValueError("'{:}' is not a valid value for y_unit".format(self.y_unit))
+        
+        coeff_kwargs = {}
+        for k, v in kwargs.items():
+            if k in ["partitionFunction", "OmegaRange", "OmegaStep", "OmegaWing", "IntensityThreshold", "OmegaWingHW", "GammaL", "LineShift", "OmegaGrid", "WavenumberRange", "WavenumberStep", "WavenumberWing", "WavenumberWingHW", "WavenumberGrid", "Diluent", "EnvDependences"]:
+                coeff_kwargs[k] = v
+        
+        if "partitionFunction" not in coeff_kwargs:
+            coeff_kwargs["partitionFunction"] = self.partition_function
+        
+        if self.y_unit == "cm2/molecule":
+            HITRAN_units = True
+        else:
+            HITRAN_units = False
+        
+        if self.binary_cache and self.tablename in hapi.LOCAL_TABLE_CACHE:
+            if engine == "vectorized":
+                HS.load_columns(self.db_path, self.tablename, columns = HX.profile_columns(line_profile, hapi.LOCAL_TABLE_CACHE[self.tablename]["header"]["order"]), verbose = self.verbose)
+            else:
+                HS.load_columns(self.db_path, self.tablename, verbose = self.verbose)
+        
+        if engine == "vectorized" and "EnvDependences" not in coeff_kwargs and HX.is_supported(self.tablename, line_profile):
+            w, c = HX.absorption_coefficients(line_profile, Environments = envs, processes = processes, Components = components, SourceTables = self.tablename, HITRAN_units = HITRAN_units, cpf = cpf, verbose = self.verbose, **coeff_kwargs)
+        else:
+            previous_cpf = HCPF.set_cpf(cpf) if cpf is not None else None
+            try:
+                c = []
+                for env in envs:
+                    w, _c = HX.hapi_absorption_coefficient(line_profile, Components = components, SourceTables = self.tablename, HITRAN_units = HITRAN_units, Environment = env, **coeff_kwargs)
+                    c.append(_c)
+                c = numpy.array(c)
+            finally:
+                if previous_cpf is not None:
+                    hapi.VARIABLES["CPF"] = previous_cpf
+        
+        y = numpy.zeros(c.shape)
+        for i, env in enumerate(envs):
+            if self.y_unit in UC.transmission_1_labels:
+                y[i] = hapi.transmittanceSpectrum(w, c[i], Environment = env)[1]
+            elif self.y_unit in UC.transmission_pct_labels:
+                y[i] = 100 * hapi.transmittanceSpectrum(w, c[i], Environment = env)[1]
+            elif self.y_unit in UC.absorption_labels:
+                y[i] = hapi.absorptionSpectrum(w, c[i], Environment = env)[1]
+            else:
+                y[i] = c[i]
+        
+        labels = ["T = {:} K, p = {:} atm, l = {:} cm".format(env["T"], env["p"], env["l"]) for env in envs]
+        
+        return SS.SpectrumStack(x = w, y = y, x_unit = self.x_unit, y_unit = self.y_unit, classes = "hitran", labels = labels, dtype = self.dtype, verbose = self.verbose)
+
+
+
+    def build_lookup_table(self, T, p, components = None, line_profile = "default", processes = None, rebuild = False, cpf = None, **kwargs):
+        """
+        Calculate the absorption coefficients of the components on a grid of temperatures and pressures, for `lookup_signal` (see `Resources.hitran_lookup`). 
+        
+        The table is saved in `db_path`, with the hash of the arguments and of the fingerprint of the table files as name. A table with the same arguments is read from disk. 
+        
+        Arguments
+        ---------
+        T : list
+            Temperatures in Kelvin.
+        p : list
+            Pressures in atmosphere.
+        
+        Keyword Arguments
+        -----------------
+        components : tuple
+            List with tupples for which components should be included in the calculation. 
+        line_profile : str {'default', 'HT', 'Voigt', 'Lorentz', 'Doppler'}
+            The line profile. The table must be supported by the vectorized engine (see `Resources.hitran_xsect.is_supported`).
+        processes : int (None)
+            Number of processes, see `calculate_sweep`. 
+        rebuild : bool (False)
+            If True, the table is calculated even if it is on disk.
+        cpf : str or function (None)
+            See `calculate_signal`. The backend is part of the name of the table on disk, also if cpf is None.
+        
+        For the other kwargs, see `calculate_sweep`. 
+        
+        Returns
+        -------
+        stats : dict
+            Statistics of the build, see `Resources.hitran_lookup.LookupTable`.
+        
+        """
+        
+        if self.verbose > 1:
+            print("SpectraTools.Hitran.build_lookup_table()")
+        
+        if components is None:
+            components = self.components
+        
+        coeff_kwargs = {}
+        for k, v in kwargs.items():
+            if k in ["partitionFunction", "OmegaRange", "OmegaStep", "OmegaWing", "IntensityThreshold", "OmegaWingHW", "GammaL", "LineShift", "OmegaGrid", "WavenumberRange", "WavenumberStep", "WavenumberWing", "WavenumberWingHW", "WavenumberGrid", "Diluent"]:
+                coeff_kwargs[k] = v
+        
+        if "partitionFunction" not in coeff_kwargs:
+            coeff_kwargs["partitionFunction"] = self.partition_function
+        
+        if self.binary_cache and self.tablename in hapi.LOCAL_TABLE_CACHE:
+            HS.load_columns(self.db_path, self.tablename, columns = HX.profile_columns(line_profile, hapi.LOCAL_TABLE_CACHE[self.tablename]["header"]["order"]), verbose = self.verbose)
+        
+        if not HX.is_supported(self.tablename, line_profile):
+            raise ValueError("SpectraTools.Hitran.build_lookup_table(): '{:}' can not be calculated with the vectorized engine for this table".format(line_profile))
+        
+        # the backend that is used now, not the one of hapi.VARIABLES['CPF'] when the table is calculated
+        cpf = HCPF.cpf_key(cpf)
+        
+        inputs = {
+            "tablename": self.tablename, 
+            "T": sorted(float(_T) for _T in T), 
+            "p": sorted(float(_p) for _p in p), 
+            "components": components, 
+            "line_profile": line_profile, 
+            "coeff_kwargs": coeff_kwargs, 
+            "cpf": cpf,
+        }
+        try:
+            key = HRES.inputs_key(HS.fingerprint(self.db_path, self.tablename), inputs, version = HLUT.LOOKUP_VERSION)
+        except HRES.UnhashableError:
+            key = None
+        paf = None
+        if key is not None:
+            paf = pathlib.Path(self.db_path).joinpath("lookup.{:}".format(HS.SIDECAR_EXTENSION), "{:}.{:}".format(key, HLUT.LOOKUP_EXTENSION))
+        
+        table = None
+        if paf is not None and not rebuild:
+            table = HLUT.load(paf, verbose = self.verbose)
+            if table is not None and self.verbose > 0:
+                print("SpectraTools.Hitran.build_lookup_table(): the table is read from disk")
+        
+        if table is None:
+            table = HLUT.build(self.tablename, T, p, components, line_profile = line_profile, processes = processes, cpf = cpf, verbose = self.verbose, **coeff_kwargs)
+            if paf is not None:
+                table.save(paf)
+        
+        self.lookup_table = table
+        self.lookup_kwargs = coeff_kwargs
+        return table.stats
+
+
+    def lookup_signal(self, environment = {}, components = None, convolution = None, convolution_method = "auto", **kwargs):
+        """
+        Calculate the spectrum by interpolation of the lookup table (see `build_lookup_table`): linear in the pressure and linear in the logarithm of the temperature. This is much faster than `calculate_signal`. 
+        
+        Keyword Arguments
+        -----------------
+        environment : dict
+            `T` in Kelvin (default: 296), `p` in atmosphere (default: 1) and `l` in centimeters (default: 1). T and p must be within the grid of the table. 
+        components : tuple
+            Only use these components of the table. If None, all components of the table are used. 
+        convolution : str (None)
+            Slit function, see `calculate_signal`.
+        convolution_method : str {'auto', 'direct', 'fft'}
+            See `calculate_signal`.
+        
+        For kwargs, see `calculate_signal`. 
+        
+        """
+        
+        if self.verbose > 1:
+            print("SpectraTools.Hitran.lookup_signal()")
+        
+        if self.lookup_table is None:
+            raise ValueError("SpectraTools.Hitran.lookup_signal(): there is no lookup table, use build_lookup_table()")
+        
+        env = {"T": 296, "p": 1, "l": 1}
+        env.update(environment)
+        
+        c = self.lookup_table.interpolate(env["T"], env["p"], components = components)
+        if self.y_unit != "cm2/molecule":
+            c *= hapi.volumeConcentration(env["p"], env["T"])
+        
+        self.signal_from_coefficient(self.lookup_table.Omegas, c, env, convolution = convolution, convolution_method = convolution_method, **kwargs)
+
+
+    def lookup_diagnostics(self, environments = None, processes = None):
+        """
+        Compare the lookup table with the direct calculation. 
+        
+        Keyword Arguments
+        -----------------
+        environments : list of dicts (None)
+            With `T` and `p`. If None, the centers of the cells of the grid, where the error is largest. 
+        processes : int (None)
+            Number of processes for the direct calculation.
+        
+        Returns
+        -------
+        result : dict
+            The errors for each environment and the speedup, see `Resources.hitran_lookup.diagnostics`.
+        
+        """
+        
+        if self.lookup_table is None:
+            raise ValueError("SpectraTools.Hitran.lookup_diagnostics(): there is no lookup table, use build_lookup_table()")
+        
+        return HLUT.diagnostics(self.lookup_table, self.tablename, environments = environments, processes = processes, verbose = self.verbose, **self.lookup_kwargs)
+
+
+
+    def calculate_basis(self, environment = {}, components = None, line_profile = "default", engine = "vectorized", cpf = None, workers = 1, **kwargs):
+        """
+        Calculate the absorption coefficient of each component with abundance 1, for `mixture_signal`. 
+        
+        At a fixed temperature and pressure, the absorption coefficient is linear in the abundances of the components. The spectrum of any mixture of the components is then a weighted sum of these basis spectra. The basis spectra are stored in the result cache (if it is used), one for each component. 
+        
+        Keyword Arguments
+        -----------------
+        environment : dict
+            `T` in Kelvin (default: 296), `p` in atmosphere (default: 1) and `l` in centimeters (default: 1).
+        components : tuple
+            List with tupples for which components should be included in the calculation. The abundances are ignored. 
+        line_profile : str {'default', 'HT', 'Voigt', 'Lorentz', 'Doppler'}
+            Default is 'HT'.
+        engine : str {'vectorized', 'hapi'}
+            See `calculate_signal`.
+        cpf : str or function (None)
+            See `calculate_signal`.
+        workers : int (1)
+            See `calculate_signal`.
+        
+        For kwargs, see `calculate_sweep`. 
+        
+        Notes
+        -----
+        
+        The result is stored in `basis`, a dict with `x` (the wavenumbers), `components` (the (M, I) of the components), `B` (the absorption coefficients in cm2/molecule, with shape (components, wavenumbers)) and `environment`. 
+        
+        The `IntensityThreshold` is applied to the intensities of the lines with abundance 1.
+        
+        """
+        
+        if self.verbose > 1:
+            print("SpectraTools.Hitran.calculate_basis()")
+        
+        if components is None:
+            components = self.components
+        MIs = list(dict.fromkeys((int(c[0]), int(c[1])) for c in components))
+        
+        env = {"T": 296, "p": 1, "l": 1}
+        env.update(environment)
+        
+        if engine not in ["vectorized", "hapi"]:
+            raise ValueError("'{:}' is not a valid engine".format(engine))
+        
+        coeff_kwargs = {}
+        for k, v in kwargs.items():
+            if k in ["partitionFunction", "OmegaRange", "OmegaStep", "OmegaWing", "IntensityThreshold", "OmegaWingHW", "GammaL", "LineShift", "OmegaGrid", "WavenumberRange", "WavenumberStep", "WavenumberWing", "WavenumberWingHW", "WavenumberGrid", "Diluent", "EnvDependences"]:
+                coeff_kwargs[k] = v
+        
+        if "partitionFunction" not in coeff_kwargs:
+            coeff_kwargs["partitionFunction"] = self.partition_function
+        
+        if self.binary_cache and self.tablename in hapi.LOCAL_TABLE_CACHE:
+            if engine == "vectorized":
+                HS.load_columns(self.db_path, self.tablename, columns = HX.profile_columns(line_profile, hapi.LOCAL_TABLE_CACHE[self.tablename]["header"]["order"]), verbose = self.verbose)
+            else:
+                HS.load_columns(self.db_path, self.tablename, verbose = self.verbose)
+        
+        Environment = {"T": env["T"], "p": env["p"]}
+        
+        x = None
+        B = []
+        for MI in MIs:
+            component = (MI[0], MI[1], 1.0)
+            
+            result = None
+            result_key = None
+            if self.result_cache is not None:
+                inputs = {
+                    "basis": True, 
+                    "tablename": self.tablename, 
+                    "component": component, 
+                    "environment": Environment, 
+                    "line_profile": line_profile, 
+                    "engine": engine, 
+                    "coeff_kwargs": coeff_kwargs, 
+                    "cpf": HCPF.cpf_key(cpf),
+                }
+                result_key = self.result_cache.key(HS.fingerprint(self.db_path, self.tablename), inputs)
+                result = self.result_cache.get(result_key)
+            
+            if result is not None:
+                w, c, _y_unit = result
+            elif engine == "vectorized" and "EnvDependences" not in coeff_kwargs and HX.is_supported(self.tablename, line_profile):
+                w, c = HX.absorption_coefficient(line_profile, Components = [component], SourceTables = self.tablename, HITRAN_units = True, Environment = Environment, cpf = cpf, workers = workers, verbose = self.verbose, **coeff_kwargs)
+            else:
+                previous_cpf = HCPF.set_cpf(cpf) if cpf is not None else None
+                try:
+                    w, c = HX.hapi_absorption_coefficient(line_profile, Components = [component], SourceTables = self.tablename, HITRAN_units = True, Environment = Environment, **coeff_kwargs)
+                finally:
+                    if previous_cpf is not None:
+                        hapi.VARIABLES["CPF"] = previous_cpf
+            
+            if result is None and result_key is not None:
+                self.result_cache.put(result_key, w, c, "cm2/molecule")
             
+            if x is None:
+                x = w
+            elif len(w) != len(x) or numpy.any(w != x):
+                raise ValueError("SpectraTools.Hitran.calculate_basis(): the components have different wavenumbers, use OmegaRange or OmegaGrid")
+            B.append(c)
+        
+        self.basis = {"x": x, "components": MIs, "B": numpy.array(B), "environment": env}
+
+
+    def mixture_signal(self, mixing_ratios, convolution = None, convolution_method = "auto", **kwargs):
+        """
+        Calculate the spectrum of one or more mixtures of the components of the basis (see `calculate_basis`). The absorption coefficients of all mixtures are calculated with one matrix product. 
+        
+        Arguments
+        ---------
+        mixing_ratios : ndarray
+            The abundances of the components, in the order of `basis['components']`. With shape (components,) for one mixture, or (mixtures, components) for several mixtures.
+        
+        Keyword Arguments
+        -----------------
+        convolution : str (None)
+            Slit function, see `calculate_signal`. Only for one mixture.
+        convolution_method : str {'auto', 'direct', 'fft'}
+            See `calculate_signal`.
+        
+        Returns
+        -------
+        stack : SpectrumStack
+            For several mixtures: one spectrum for each mixture, with `y_unit` as unit. For one mixture, the result is stored in `x` and `y` (as with `calculate_signal`) and nothing is returned. 
+        
+        """
+        
+        if self.verbose > 1:
+            print("SpectraTools.Hitran.mixture_signal()")
+        
+        if self.basis is None:
+            raise ValueError("SpectraTools.Hitran.mixture_signal(): there is no basis, use calculate_basis()")
+        
+        mixing_ratios = numpy.asarray(mixing_ratios, dtype = float)
+        if mixing_ratios.ndim not in [1, 2] or mixing_ratios.shape[-1] != len(self.basis["components"]):
+            raise ValueError("SpectraTools.Hitran.mixture_signal(): the mixing ratios should have {:d} components".format(len(self.basis["components"])))
+        
+        w = self.basis["x"]
+        env = self.basis["environment"]
+        
+        c = mixing_ratios @ self.basis["B"]
+        if self.y_unit != "cm2/molecule":
+            c *= hapi.volumeConcentration(env["p"], env["T"])
+        
+        if mixing_ratios.ndim == 1:
+            self.signal_from_coefficient(w, c, env, convolution = convolution, convolution_method = convolution_method, **kwargs)
+            return
+        
+        if convolution is not None:
+            raise ValueError("SpectraTools.Hitran.mixture_signal(): the convolution is only calculated for one mixture")
+        
+        if self.y_unit == "":
+            self.y_unit = UC.absorption_labels[0]
+        if self.y_unit in UC.transmission_1_labels:
+            y = hapi.transmittanceSpectrum(w, c, Environment = env)[1]
+        elif self.y_unit in UC.transmission_pct_labels:
+            y = 100 * hapi.transmittanceSpectrum(w, c, Environment = env)[1]
+        elif self.y_unit in UC.absorption_labels:
+            y = hapi.absorptionSpectrum(w, c, Environment = env)[1]
+        elif self.y_unit in ["cm-1", "cm2/molecule"]:
+            y = c
+        else:
+            raise ValueError("'{:}' is not a valid value for y_unit".format(self.y_unit))
+        
+        labels = [", ".join("{:}: {:}".format(MI, r) for MI, r in zip(self.basis["components"], ratios)) for ratios in mixing_ratios]
+        
+        return SS.SpectrumStack(x = w, y = y, x_unit = self.x_unit, y_unit = self.y_unit, classes = "hitran", labels = labels, dtype = self.dtype, verbose = self.verbose)
+
 
+
+    def calculate_signal_blocks(self, paf, components = None, environment = {}, line_profile = "default", convolution = None, convolution_method = "auto", block_size = 1048576, cpf = None, workers = 1, **kwargs):
+        """
+        Calculate the spectrum in blocks of wavenumbers and write it to a memory-mapped file (see `Resources.hitran_blocks`). This is for very large grids (for example a wide range with `OmegaStep = 0.001`): only one block is in memory at a time. 
+        
+        The result is the same as with `calculate_signal`, apart from rounding errors. `x` and `y` are memory-mapped from the file (read only). 
+        
+        Arguments
+        ---------
+        paf : pathlib.Path
+            The `.npy` file for the result. 
+        
+        Keyword Arguments
+        -----------------
+        block_size : int
+            Number of points that are calculated at once. 
+        
+        For the other arguments and kwargs, see `calculate_signal`. The default `OmegaRange` is from `min_x` to `max_x`. The result cache is not used and `File_coeff` and `File_spectrum` can not be used. 
+        
+        """
+        
+        if self.verbose > 1:
+            print("SpectraTools.Hitran.calculate_signal_blocks()")
+        
+        if components is None:
+            components = self.components
+        
+        env = {"T": 296, "p": 1, "l": 1}
+        env.update(environment)
+        
+        coeff_kwargs = {}
+        for k, v in kwargs.items():
+            if k in ["partitionFunction", "OmegaRange", "OmegaStep", "OmegaWing", "IntensityThreshold", "OmegaWingHW", "GammaL", "LineShift", "WavenumberRange", "WavenumberStep", "WavenumberWing", "WavenumberWingHW", "Diluent"]:
+                coeff_kwargs[k] = v
         
+        if "partitionFunction" not in coeff_kwargs:
+            coeff_kwargs["partitionFunction"] = self.partition_function
+        if "OmegaRange" not in coeff_kwargs and "WavenumberRange" not in coeff_kwargs:
+            coeff_kwargs["OmegaRange"] = [self.min_x, self.max_x]
         
+        if self.binary_cache and self.tablename in hapi.LOCAL_TABLE_CACHE:
+            HS.load_columns(self.db_path, self.tablename, columns = HX.profile_columns(line_profile, hapi.LOCAL_TABLE_CACHE[self.tablename]["header"]["order"]), verbose = self.verbose)
         
+        if not HX.is_supported(self.tablename, line_profile):
+            raise ValueError("SpectraTools.Hitran.calculate_signal_blocks(): '{:}' can not be calculated with the vectorized engine for this table".format(line_profile))
         
+        if self.y_unit == "":
+            self.y_unit = UC.absorption_labels[0]
         
+        scale = 1.0
+        HITRAN_units = False
+        if self.y_unit in UC.transmission_1_labels:
+            spectrum = "transmittance"
+        elif self.y_unit in UC.transmission_pct_labels:
+            spectrum = "transmittance"
+            scale = 100.0
+        elif self.y_unit in UC.absorption_labels:
+            spectrum = "absorption"
+        elif self.y_unit in ["cm-1", "cm2/molecule"]:
+            spectrum = "coefficient"
+            HITRAN_units = self.y_unit == "cm2/molecule"
+        else:
+            raise ValueError("'{:}' is not a valid value for y_unit".format(self.y_unit))
         
+        conv_kwargs = {}
+        if convolution is not None:
+            if spectrum == "coefficient":
+                print("SpectraTools.Hitran.calculate_signal_blocks(): no convolution is calculated for absorption coefficients")
+            elif convolution not in HCONV.SLIT_FUNCTIONS:
+                raise ValueError("'{:}' is not a valid value for the convolution".format(convolution))
+            else:
+                conv_kwargs["SlitFunction"] = HCONV.SLIT_FUNCTIONS[convolution]
+                for k, v in kwargs.items():
+                    if k in ["Resolution", "AF_wing"]:
+                        if v is not None:
+                            conv_kwargs[k] = v
         
-        
\ No newline at end of file
+        self.x, self.y = HB.block_signal(paf, line_profile, Components = components, SourceTables = self.tablename, Environment = env, HITRAN_units = HITRAN_units, spectrum = spectrum, scale = scale, convolution_method = convolution_method, block_size = block_size, cpf = cpf, workers = workers, verbose = self.verbose, **conv_kwargs, **coeff_kwargs)